@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import BikeDailyStats
+
+
+@admin.register(BikeDailyStats)
+class BikeDailyStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        "date",
+        "bike",
+        "owner",
+        "bookings_count",
+        "cancelled_count",
+        "booked_hours",
+        "revenue",
+        "rating_count",
+    )
+    list_filter = ("date",)
+    search_fields = ("bike__title", "owner__email")
+    raw_id_fields = ("bike", "owner")
+    date_hierarchy = "date"
@@ -0,0 +1,5 @@
+from core.jobs import register
+
+from .services import refresh_daily_stats
+
+register("refresh_daily_stats")(refresh_daily_stats)
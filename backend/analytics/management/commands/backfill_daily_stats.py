@@ -0,0 +1,59 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.services import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-bike daily booking and rating rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            help=(
+                "First day to rebuild (YYYY-MM-DD). Defaults to the beginning "
+                "of time."
+            ),
+        )
+        parser.add_argument(
+            "--end-date",
+            help="Last day to rebuild (YYYY-MM-DD). Defaults to the end of time.",
+        )
+        parser.add_argument(
+            "--bike",
+            type=int,
+            action="append",
+            dest="bike_ids",
+            help="Only rebuild this bike. Can be given several times.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of bikes aggregated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options["start_date"], "--start-date")
+        end_date = self._parse_date(options["end_date"], "--end-date")
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date must not be after --end-date")
+
+        written = rebuild_daily_stats(
+            start_date=start_date,
+            end_date=end_date,
+            bike_ids=options["bike_ids"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully wrote {written} daily stats rows")
+        )
+
+    def _parse_date(self, value, option):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"{option} must be a date in YYYY-MM-DD format")
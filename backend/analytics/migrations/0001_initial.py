@@ -0,0 +1,94 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("bikes", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BikeDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("date", models.DateField()),
+                (
+                    "bookings_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Bookings starting on this day"
+                    ),
+                ),
+                ("completed_count", models.PositiveIntegerField(default=0)),
+                ("cancelled_count", models.PositiveIntegerField(default=0)),
+                (
+                    "booked_hours",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Confirmed rental hours falling on this day",
+                        max_digits=8,
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Confirmed booking revenue apportioned to this day",
+                        max_digits=12,
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                (
+                    "bike",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="bikes.bike",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bike_daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "bike daily stats",
+                "ordering": ["date"],
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "date"], name="bikedailystats_owner_date"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="bikedailystats",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "bike", "date"), name="unique_bike_daily_stats"
+            ),
+        ),
+    ]
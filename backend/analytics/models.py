@@ -0,0 +1,49 @@
+from django.db import models
+
+from users.models import User
+from bikes.models import Bike
+from core.models import BaseModel
+
+
+class BikeDailyStats(BaseModel):
+    """Pre-aggregated booking and rating figures for one bike on one day."""
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="bike_daily_stats"
+    )
+    bike = models.ForeignKey(Bike, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    bookings_count = models.PositiveIntegerField(
+        default=0, help_text="Bookings starting on this day"
+    )
+    completed_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    booked_hours = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        help_text="Confirmed rental hours falling on this day",
+    )
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Confirmed booking revenue apportioned to this day",
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+        verbose_name_plural = "bike daily stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "bike", "date"], name="unique_bike_daily_stats"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "date"], name="bikedailystats_owner_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.bike.title} - {self.date}"
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+MAX_RANGE_DAYS = 366
+DEFAULT_RANGE_DAYS = 30
+
+
+class DashboardQuerySerializer(serializers.Serializer):
+    """Validate the date range and bike filter of a dashboard request."""
+
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    bike = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        end_date = attrs.get("end_date") or timezone.localdate()
+        start_date = attrs.get("start_date") or end_date - timedelta(
+            days=DEFAULT_RANGE_DAYS - 1
+        )
+        if start_date > end_date:
+            raise serializers.ValidationError(
+                "End date must be on or after start date."
+            )
+        if (end_date - start_date).days + 1 > MAX_RANGE_DAYS:
+            raise serializers.ValidationError(
+                f"Date range cannot exceed {MAX_RANGE_DAYS} days."
+            )
+        attrs["start_date"] = start_date
+        attrs["end_date"] = end_date
+        return attrs
+
+
+class DashboardMetricsSerializer(serializers.Serializer):
+    """Metrics derived from a group of daily stats rows."""
+
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    booked_hours = serializers.DecimalField(max_digits=12, decimal_places=2)
+    utilization = serializers.FloatField(
+        help_text="Booked share of available hours, in percent"
+    )
+    bookings_count = serializers.IntegerField()
+    completed_count = serializers.IntegerField()
+    cancelled_count = serializers.IntegerField()
+    cancellation_rate = serializers.FloatField(
+        help_text="Cancelled share of bookings, in percent"
+    )
+    rating_count = serializers.IntegerField()
+    average_rating = serializers.FloatField()
+
+
+class BikeDashboardSerializer(DashboardMetricsSerializer):
+    """Metrics of a single bike over the requested range."""
+
+    bike_id = serializers.IntegerField()
+    bike_title = serializers.CharField()
+
+
+class DailyDashboardSerializer(DashboardMetricsSerializer):
+    """Metrics of all requested bikes on a single day."""
+
+    date = serializers.DateField()
@@ -0,0 +1,242 @@
+"""
+Maintenance of the ``BikeDailyStats`` rollup table.
+
+A booking contributes to the day it starts on (booking and cancellation
+counts) and, when confirmed, to every day its rental window touches (booked
+hours and revenue, apportioned by the hours falling on each day). Ratings
+contribute to the day they were created. The same contribution rules are used
+by the incremental refresh and by the full rebuild so the two always agree.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from bikes.models import Bike
+from bookings.models import Booking, BookingStatus
+from ratings.models import Rating
+
+from .models import BikeDailyStats
+
+CONFIRMED_STATUSES = (
+    BookingStatus.APPROVED,
+    BookingStatus.ACTIVE,
+    BookingStatus.COMPLETED,
+)
+
+BOOKING_ROLLUP_FIELDS = ("bike_id", "start_time", "end_time", "status", "total_price")
+
+HOUR = Decimal("3600")
+CENT = Decimal("0.01")
+
+
+def _empty_bucket():
+    return {
+        "bookings_count": 0,
+        "completed_count": 0,
+        "cancelled_count": 0,
+        "booked_hours": Decimal("0"),
+        "revenue": Decimal("0"),
+        "rating_count": 0,
+        "rating_sum": 0,
+    }
+
+
+def _day_start(day):
+    return timezone.make_aware(
+        datetime.combine(day, time.min), timezone.get_default_timezone()
+    )
+
+
+def local_date(value):
+    """Return the calendar date of a datetime in the project time zone."""
+    return timezone.localtime(value, timezone.get_default_timezone()).date()
+
+
+def booking_days(start_time, end_time):
+    """Return every local date touched by a booking window."""
+    first = local_date(start_time)
+    last = max(first, local_date(end_time))
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def booking_contributions(start_time, end_time, status, total_price):
+    """Split a booking into per-day rollup contributions."""
+    contributions = defaultdict(_empty_bucket)
+
+    first = contributions[local_date(start_time)]
+    first["bookings_count"] += 1
+    if status == BookingStatus.COMPLETED:
+        first["completed_count"] += 1
+    elif status == BookingStatus.CANCELLED:
+        first["cancelled_count"] += 1
+
+    total_seconds = Decimal(str((end_time - start_time).total_seconds()))
+    if status not in CONFIRMED_STATUSES or total_seconds <= 0:
+        return contributions
+
+    for day in booking_days(start_time, end_time):
+        window_start = max(start_time, _day_start(day))
+        window_end = min(end_time, _day_start(day + timedelta(days=1)))
+        seconds = Decimal(str((window_end - window_start).total_seconds()))
+        if seconds <= 0:
+            continue
+        bucket = contributions[day]
+        bucket["booked_hours"] += seconds / HOUR
+        bucket["revenue"] += total_price * seconds / total_seconds
+
+    return contributions
+
+
+def _merge(target, contributions, days=None):
+    for day, values in contributions.items():
+        if days is not None and day not in days:
+            continue
+        bucket = target[day]
+        for key, value in values.items():
+            bucket[key] += value
+
+
+def _is_empty(bucket):
+    return not any(bucket.values())
+
+
+def _to_row(owner_id, bike_id, day, bucket):
+    return BikeDailyStats(
+        owner_id=owner_id,
+        bike_id=bike_id,
+        date=day,
+        bookings_count=bucket["bookings_count"],
+        completed_count=bucket["completed_count"],
+        cancelled_count=bucket["cancelled_count"],
+        booked_hours=bucket["booked_hours"].quantize(CENT),
+        revenue=bucket["revenue"].quantize(CENT),
+        rating_count=bucket["rating_count"],
+        rating_sum=bucket["rating_sum"],
+    )
+
+
+def _collect(bike_ids, range_start, range_end, days=None):
+    """Aggregate bookings and ratings of ``bike_ids`` between two datetimes."""
+    buckets = defaultdict(lambda: defaultdict(_empty_bucket))
+
+    bookings = Booking.objects.filter(bike_id__in=bike_ids)
+    ratings = Rating.objects.filter(bike_id__in=bike_ids)
+    if range_start is not None:
+        bookings = bookings.filter(end_time__gte=range_start)
+        ratings = ratings.filter(created_at__gte=range_start)
+    if range_end is not None:
+        bookings = bookings.filter(start_time__lt=range_end)
+        ratings = ratings.filter(created_at__lt=range_end)
+
+    for row in bookings.values(*BOOKING_ROLLUP_FIELDS).iterator(chunk_size=2000):
+        bike_id = row.pop("bike_id")
+        _merge(buckets[bike_id], booking_contributions(**row), days)
+
+    for bike_id, created_at, rating in ratings.values_list(
+        "bike_id", "created_at", "rating"
+    ).iterator(chunk_size=2000):
+        day = local_date(created_at)
+        if days is not None and day not in days:
+            continue
+        bucket = buckets[bike_id][day]
+        bucket["rating_count"] += 1
+        bucket["rating_sum"] += rating
+
+    return buckets
+
+
+def refresh_bike_days(bike_id, days):
+    """Recompute the rollup rows of one bike for the given local dates."""
+    days = set(days)
+    if not days:
+        return
+
+    range_start = _day_start(min(days))
+    range_end = _day_start(max(days) + timedelta(days=1))
+
+    with transaction.atomic():
+        # Locking the bike serialises concurrent refreshes of it, so the rows
+        # are read and replaced by one at a time and the last to commit saw
+        # every booking committed before it. FOR NO KEY UPDATE leaves new
+        # bookings of the bike free to reference it meanwhile.
+        owner_id = (
+            Bike.objects.select_for_update(no_key=True)
+            .filter(pk=bike_id)
+            .values_list("owner_id", flat=True)
+            .first()
+        )
+        if owner_id is None:
+            # The bike is gone; its rows were removed by the cascade.
+            return
+
+        buckets = _collect([bike_id], range_start, range_end, days)[bike_id]
+        BikeDailyStats.objects.filter(bike_id=bike_id, date__in=days).delete()
+        BikeDailyStats.objects.bulk_create(
+            _to_row(owner_id, bike_id, day, bucket)
+            for day, bucket in buckets.items()
+            if not _is_empty(bucket)
+        )
+
+
+def refresh_daily_stats(bikes):
+    """
+    Job recomputing the rollup rows of ``bikes``, a list of
+    ``[bike_id, [iso_date, ...]]`` pairs.
+    """
+    for bike_id, days in bikes:
+        refresh_bike_days(bike_id, [date.fromisoformat(day) for day in days])
+
+
+def rebuild_daily_stats(start_date=None, end_date=None, bike_ids=None, batch_size=500):
+    """
+    Rebuild rollup rows from scratch, one batch of bikes at a time.
+
+    Returns the number of rows written.
+    """
+    range_start = _day_start(start_date) if start_date else None
+    range_end = _day_start(end_date + timedelta(days=1)) if end_date else None
+
+    bikes = Bike.objects.order_by("pk")
+    if bike_ids is not None:
+        bikes = bikes.filter(pk__in=bike_ids)
+
+    written = 0
+    batch = []
+    for bike in bikes.values_list("pk", "owner_id").iterator(chunk_size=batch_size):
+        batch.append(bike)
+        if len(batch) >= batch_size:
+            written += _rebuild_batch(
+                batch, start_date, end_date, range_start, range_end
+            )
+            batch = []
+    if batch:
+        written += _rebuild_batch(batch, start_date, end_date, range_start, range_end)
+    return written
+
+
+def _rebuild_batch(batch, start_date, end_date, range_start, range_end):
+    owners = dict(batch)
+    buckets = _collect(list(owners), range_start, range_end)
+
+    rows = []
+    for bike_id, days in buckets.items():
+        for day, bucket in days.items():
+            if start_date and day < start_date or end_date and day > end_date:
+                continue
+            if not _is_empty(bucket):
+                rows.append(_to_row(owners[bike_id], bike_id, day, bucket))
+
+    existing = BikeDailyStats.objects.filter(bike_id__in=list(owners))
+    if start_date:
+        existing = existing.filter(date__gte=start_date)
+    if end_date:
+        existing = existing.filter(date__lte=end_date)
+
+    with transaction.atomic():
+        existing.delete()
+        BikeDailyStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
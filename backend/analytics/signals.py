@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bikes.models import Bike
+from bookings.models import Booking
+from bookings.signals import booking_statuses_changed
+from core.jobs import enqueue
+from ratings.models import Rating
+
+from .services import local_date, booking_days
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_window(sender, instance, raw=False, **kwargs):
+    """Keep the stored window so a rescheduled booking clears its old days."""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        Booking.objects.filter(pk=instance.pk)
+        .values_list("bike_id", "start_time", "end_time")
+        .order_by("pk")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_booking_rollups(sender, instance, raw=False, **kwargs):
+    """Recompute the daily stats touched by a booking change."""
+    if raw or _deleted_with_bike(kwargs):
+        return
+    touched = {
+        instance.bike_id: set(booking_days(instance.start_time, instance.end_time))
+    }
+
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        bike_id, start_time, end_time = previous
+        touched.setdefault(bike_id, set()).update(booking_days(start_time, end_time))
+
+    _queue_refresh(touched)
+
+
+@receiver(booking_statuses_changed)
+def refresh_swept_booking_rollups(sender, bookings, **kwargs):
+    """Recompute the daily stats of bookings moved by a bulk status update."""
+    touched = {}
+    for _pk, bike_id, _renter_id, start_time, end_time in bookings:
+        touched.setdefault(bike_id, set()).update(booking_days(start_time, end_time))
+    _queue_refresh(touched)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def refresh_rating_rollups(sender, instance, raw=False, **kwargs):
+    """Recompute the daily stats of the day a rating was left on."""
+    if raw or _deleted_with_bike(kwargs):
+        return
+    _queue_refresh({instance.bike_id: [local_date(instance.created_at)]})
+
+
+def _deleted_with_bike(kwargs):
+    # The bike's rows go with it, and a job per cascaded booking would make
+    # deleting a bike cost a query per booking.
+    return isinstance(kwargs.get("origin"), Bike)
+
+
+def _queue_refresh(touched):
+    # One job per change, committed with it, so the write path pays a single
+    # INSERT and the aggregation runs in the job workers.
+    if not touched:
+        return
+    enqueue(
+        "refresh_daily_stats",
+        {
+            "bikes": [
+                [bike_id, sorted(day.isoformat() for day in days)]
+                for bike_id, days in sorted(touched.items())
+            ]
+        },
+    )
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import OwnerDashboardAPIView
+
+app_name = "analytics"
+
+urlpatterns = [
+    path("dashboard/", OwnerDashboardAPIView.as_view(), name="owner-dashboard"),
+]
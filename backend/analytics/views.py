@@ -0,0 +1,114 @@
+from django.db.models import Sum
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from bikes.models import Bike
+from utils.response import api_response
+
+from .models import BikeDailyStats
+from .serializers import (
+    BikeDashboardSerializer,
+    DailyDashboardSerializer,
+    DashboardMetricsSerializer,
+    DashboardQuerySerializer,
+)
+
+SUMMED_FIELDS = (
+    "revenue",
+    "booked_hours",
+    "bookings_count",
+    "completed_count",
+    "cancelled_count",
+    "rating_count",
+    "rating_sum",
+)
+
+
+def _sums():
+    return {field: Sum(field) for field in SUMMED_FIELDS}
+
+
+def _percentage(part, whole):
+    return round(float(part) / float(whole) * 100, 2) if whole else 0
+
+
+def _metrics(sums, capacity_hours):
+    """Turn summed rollup columns into dashboard metrics."""
+    values = {field: sums.get(field) or 0 for field in SUMMED_FIELDS}
+    rating_sum = values.pop("rating_sum")
+    values["utilization"] = _percentage(values["booked_hours"], capacity_hours)
+    values["cancellation_rate"] = _percentage(
+        values["cancelled_count"], values["bookings_count"]
+    )
+    values["average_rating"] = (
+        round(rating_sum / values["rating_count"], 2) if values["rating_count"] else 0
+    )
+    return values
+
+
+class OwnerDashboardAPIView(APIView):
+    """Revenue, utilization and rating figures for the current user's bikes."""
+
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
+
+    def get(self, request):
+        query = DashboardQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return api_response(
+                success=False,
+                message="Invalid query parameters",
+                errors=query.errors,
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        start_date = query.validated_data["start_date"]
+        end_date = query.validated_data["end_date"]
+        bike_id = query.validated_data.get("bike")
+
+        bikes = Bike.objects.filter(owner=request.user)
+        stats = BikeDailyStats.objects.filter(
+            owner=request.user, date__range=(start_date, end_date)
+        )
+        if bike_id:
+            bikes = bikes.filter(pk=bike_id)
+            stats = stats.filter(bike_id=bike_id)
+        bike_titles = dict(bikes.values_list("pk", "title"))
+        if bike_id and not bike_titles:
+            return api_response(
+                success=False,
+                message="Bike not found or you do not own this bike.",
+                data=None,
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+
+        days = (end_date - start_date).days + 1
+        hours_per_day = 24 * len(bike_titles)
+
+        per_bike = [
+            {
+                "bike_id": row["bike_id"],
+                "bike_title": bike_titles.get(row["bike_id"], ""),
+                **_metrics(row, 24 * days),
+            }
+            for row in stats.values("bike_id").annotate(**_sums()).order_by("bike_id")
+        ]
+        per_day = [
+            {"date": row["date"], **_metrics(row, hours_per_day)}
+            for row in stats.values("date").annotate(**_sums()).order_by("date")
+        ]
+        totals = _metrics(stats.aggregate(**_sums()), hours_per_day * days)
+
+        return api_response(
+            success=True,
+            message="Dashboard statistics fetched successfully",
+            data={
+                "start_date": start_date,
+                "end_date": end_date,
+                "bike_count": len(bike_titles),
+                "totals": DashboardMetricsSerializer(totals).data,
+                "per_bike": BikeDashboardSerializer(per_bike, many=True).data,
+                "per_day": DailyDashboardSerializer(per_day, many=True).data,
+            },
+            status_code=status.HTTP_200_OK,
+        )
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,9 +43,17 @@ INSTALLED_APPS = [
     "payments",
     "ratings",
     "favorites",
+    "analytics",
+    "sync",
+    "notifications",
+    "webhooks",
 ]
 
 MIDDLEWARE = [
+    "utils.middleware.MetricsMiddleware",
+    "utils.middleware.SamplingProfilerMiddleware",
+    "utils.middleware.SQLInstrumentationMiddleware",
+    "utils.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -53,6 +62,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "utils.middleware.IdempotencyMiddleware",
+    "utils.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -79,17 +90,83 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
 
+# Connections come from a pool in each process (utils.pooled_postgresql).
+# DB_POOL_MAX_SIZE=0 turns the pool off; DB_CONN_MAX_AGE then keeps
+# connections open between the requests of a thread, checked before reuse.
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "utils.pooled_postgresql",
         "NAME": os.getenv("DB_NAME", "ebike_rent"),
         "USER": os.getenv("DB_USER", "postgres"),
         "PASSWORD": os.getenv("DB_PASSWORD", "postgres"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "POOL": {
+            "MAX_SIZE": DB_POOL_MAX_SIZE,
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "CHECK_AFTER": float(os.getenv("DB_POOL_CHECK_AFTER", "5")),
+            "MAX_LIFETIME": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+        },
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_MAX_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "0"))
+        ),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas (utils.replicas): DB_REPLICA_HOSTS lists "host" or
+# "host:port" of streaming replicas of the default database, which become the
+# aliases replica1, replica2, ... Safe reads of views with replica_reads = True
+# go to one of them; a user who writes reads from the primary for
+# DB_REPLICA_PIN_SECONDS, and replicas more than DB_REPLICA_MAX_LAG seconds
+# behind are skipped, as checked every DB_REPLICA_CHECK_INTERVAL seconds.
+DATABASE_REPLICAS = []
+for address in filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")):
+    host, _, port = address.strip().partition(":")
+    alias = f"replica{len(DATABASE_REPLICAS) + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        # Tests must not create databases on a read-only replica.
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["utils.replicas.ReplicaRouter"]
+DB_REPLICA_PIN_SECONDS = float(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+
+# Cache, which holds the replica pins above. CACHE_BACKEND is "locmem", a
+# cache in each process; "database", the table CACHE_TABLE made by `manage.py
+# createcachetable`; or "redis", at CACHE_REDIS_URL (needs the redis package).
+# Replicas need a cache that every worker process shares.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHE_BACKENDS = {
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "database": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.getenv("CACHE_TABLE", "django_cache"),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"),
+    },
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}"
+    )
+if DATABASE_REPLICAS and CACHE_BACKEND == "locmem":
+    raise ImproperlyConfigured(
+        "DB_REPLICA_HOSTS needs a cache shared by all workers: "
+        'set CACHE_BACKEND to "database" or "redis"'
+    )
+CACHES = {"default": CACHE_BACKENDS[CACHE_BACKEND]}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -143,6 +220,17 @@ REST_FRAMEWORK = {
         "utils.authentication.OptionalJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "utils.renderers.FastJSONRenderer",
+        "utils.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "rest_framework.parsers.JSONParser",
+        "utils.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 8,
     "EXCEPTION_HANDLER": "drf_standardized_errors.handler.exception_handler",
@@ -154,8 +242,14 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.LoginSerializer",
 }
 
+# Users built from access token claims (utils.authentication). The rest of a
+# user's row is cached in each process for JWT_USER_CACHE_SECONDS.
+JWT_CLAIMS_USER = os.getenv("JWT_CLAIMS_USER", "True") == "True"
+JWT_USER_CACHE_SECONDS = float(os.getenv("JWT_USER_CACHE_SECONDS", "30"))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000").split(
@@ -194,13 +288,129 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+# Seconds an SMTP connection waits on the server before giving up.
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", "30"))
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "noreply@ebikerent.com")
 
 # Password reset settings
 PASSWORD_RESET_TIMEOUT = int(os.getenv("PASSWORD_RESET_TIMEOUT", "3600"))  # 1 hour in seconds
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
+# Streaming exports (utils.exports): rows read per page, each page written as
+# one chunk of the response.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Public bike feed (bikes.feed), rebuilt by `manage.py build_bike_feed`.
+BIKE_FEED_DIR = os.getenv("BIKE_FEED_DIR", str(MEDIA_ROOT / "feeds"))
+BIKE_FEED_KEEP_CHANGES = int(os.getenv("BIKE_FEED_KEEP_CHANGES", "288"))
+
+# Booking status events (bookings.events), streamed by GET
+# /api/v1/bookings/events/. Each process reads new events every poll
+# interval; streams send a heartbeat comment and end after the max duration.
+BOOKING_EVENTS_POLL_INTERVAL = float(os.getenv("BOOKING_EVENTS_POLL_INTERVAL", "1"))
+BOOKING_EVENTS_HEARTBEAT = float(os.getenv("BOOKING_EVENTS_HEARTBEAT", "15"))
+BOOKING_EVENTS_MAX_DURATION = float(os.getenv("BOOKING_EVENTS_MAX_DURATION", "900"))
+BOOKING_EVENTS_RETRY_MS = int(os.getenv("BOOKING_EVENTS_RETRY_MS", "3000"))
+BOOKING_EVENTS_QUEUE_SIZE = int(os.getenv("BOOKING_EVENTS_QUEUE_SIZE", "100"))
+BOOKING_EVENT_RETENTION_DAYS = int(os.getenv("BOOKING_EVENT_RETENTION_DAYS", "7"))
+
+# Delta sync API (sync.services): changes returned per call, and how long
+# changes are kept by `manage.py prune_sync_changes`.
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_CHANGE_RETENTION_DAYS = int(os.getenv("SYNC_CHANGE_RETENTION_DAYS", "30"))
+
+# Background jobs (core.jobs), run by `manage.py run_jobs` with
+# JOB_WORKER_CONCURRENCY threads. Failed jobs are retried after
+# JOB_RETRY_BACKOFF seconds, doubled per attempt, up to JOB_MAX_ATTEMPTS.
+# A running job is leased to its worker for JOB_LEASE seconds, after which
+# the job of a worker that died runs again.
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "900"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Outbound email queue (notifications.services), sent by `manage.py
+# send_emails` in batches over one connection. Failed sends are retried after
+# EMAIL_RETRY_BACKOFF seconds, doubled per attempt, up to EMAIL_MAX_ATTEMPTS.
+# A batch is leased to its worker for EMAIL_SEND_LEASE seconds, after which
+# the emails of a worker that died are sent again. A worker stops its batch
+# when fewer than EMAIL_TIMEOUT seconds of the lease are left.
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", "50"))
+EMAIL_SEND_LEASE = float(os.getenv("EMAIL_SEND_LEASE", "300"))
+EMAIL_QUEUE_POLL_INTERVAL = float(os.getenv("EMAIL_QUEUE_POLL_INTERVAL", "5"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "60"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETENTION_DAYS = int(os.getenv("EMAIL_RETENTION_DAYS", "30"))
+
+# Partner webhooks (webhooks.services), sent by `manage.py deliver_webhooks`.
+# Each endpoint gets batches of up to WEBHOOK_BATCH_SIZE booking events, at
+# most its max_in_flight at once. Failures are retried after
+# WEBHOOK_RETRY_BACKOFF seconds, doubled per failure in a row, and disable
+# the endpoint after WEBHOOK_MAX_ATTEMPTS. An endpoint is leased to its worker
+# for WEBHOOK_LEASE seconds while its batches are sent.
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_LEASE = float(os.getenv("WEBHOOK_LEASE", "120"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_RETRY_BACKOFF = float(os.getenv("WEBHOOK_RETRY_BACKOFF", "30"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "10"))
+
+# Idempotency-Key support for POSTs (utils.idempotency). Responses are kept
+# for IDEMPOTENCY_KEY_TTL seconds; a retry waits up to IDEMPOTENCY_WAIT_TIMEOUT
+# seconds for the first request with its key to finish, and takes the key over
+# once that request has held it for IDEMPOTENCY_LEASE seconds.
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+IDEMPOTENCY_LEASE = int(os.getenv("IDEMPOTENCY_LEASE", "120"))
+
+# SQL instrumentation (utils.middleware.SQLInstrumentationMiddleware)
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv("SQL_INSTRUMENTATION_SAMPLE_RATE", "0.02")
+)
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+SQL_COMMENTS = os.getenv("SQL_COMMENTS", "True") == "True"
+
+# Metrics (utils.metrics), scraped from /metrics/ with "Authorization: Bearer
+# <METRICS_TOKEN>". The endpoint is disabled while no token is set. Set
+# METRICS_DIR to a directory shared by all workers of a multi-process server.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+# Staff-only request profiling (utils.middleware.ProfilingMiddleware), off
+# while unset.
+PROFILING_DIR = os.getenv("PROFILING_DIR") or None
+
+# Continuous stack sampling of API workers
+# (utils.middleware.SamplingProfilerMiddleware), off while unset.
+SAMPLING_PROFILER_DIR = os.getenv("SAMPLING_PROFILER_DIR") or None
+SAMPLING_PROFILER_HZ = float(os.getenv("SAMPLING_PROFILER_HZ", "20"))
+SAMPLING_PROFILER_FLUSH_INTERVAL = float(
+    os.getenv("SAMPLING_PROFILER_FLUSH_INTERVAL", "60")
+)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "utils.log.JSONFormatter"},
+    },
+    "handlers": {
+        "json": {"class": "logging.StreamHandler", "formatter": "json"},
+    },
+    "loggers": {
+        "utils.middleware": {
+            "handlers": ["json"],
+            "level": os.getenv("SQL_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 if not DEBUG:
     REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
-        "rest_framework.renderers.JSONRenderer",
+        "utils.renderers.FastJSONRenderer",
+        "utils.renderers.MessagePackRenderer",
     )
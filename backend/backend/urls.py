@@ -31,6 +31,8 @@ urlpatterns = [
                 path("bookings/", include("bookings.urls")),
                 path("favorites/", include("favorites.urls")),
                 path("ratings/", include("ratings.urls")),
+                path("analytics/", include("analytics.urls")),
+                path("sync/", include("sync.urls")),
             ]
         ),
     ),
@@ -1,4 +1,7 @@
 from django.contrib import admin
+
+from utils.exports import export_action
+from .exports import BikeExport
 from .models import Bike, BikeImage, MaintenanceTicket
 
 
@@ -22,6 +25,7 @@ class BikeAdmin(admin.ModelAdmin):
     list_filter = ("status", "bike_type", "owner")
     search_fields = ("title", "location", "owner__email")
     inlines = [BikeImageInline]
+    actions = [export_action(BikeExport, "csv"), export_action(BikeExport, "ndjson")]
 
 
 @admin.register(BikeImage)
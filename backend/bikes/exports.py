@@ -0,0 +1,24 @@
+from utils.exports import Export
+
+
+class BikeExport(Export):
+    """Bike listings with their owner."""
+
+    name = "bikes"
+    columns = (
+        ("id", "id"),
+        ("title", "title"),
+        ("owner_id", "owner_id"),
+        ("owner_email", "owner__email"),
+        ("location", "location"),
+        ("bike_type", "bike_type"),
+        ("status", "status"),
+        ("hourly_rate", "hourly_rate"),
+        ("daily_rate", "daily_rate"),
+        ("battery_range", "battery_range"),
+        ("max_speed", "max_speed"),
+        ("weight", "weight"),
+        ("features", "features"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    )
@@ -0,0 +1,221 @@
+"""
+Public bulk feed of available bikes, for aggregators.
+
+``build_bike_feed()`` writes gzip-compressed NDJSON files to
+``BIKE_FEED_DIR``, one bike per line:
+
+- ``bikes.ndjson.gz``: every available bike, sorted by id
+- ``changes-<build>.ndjson.gz``: what one build changed. Changed or newly
+  available bikes are written in full. Bikes that were deleted or are no
+  longer available are written as ``{"id": ..., "removed": true}``.
+- ``manifest.json``: the current build number, each file's ETag and the
+  builds that still have a changes file
+
+Only the first build reads every bike. Later builds read the bikes updated
+since the previous build, plus the ids of all available bikes to find
+removals. The first query uses the ``updated_at`` index and the second the
+status index. A bike's ``updated_at`` also moves when its images change (see
+``bikes.signals``).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from utils.metrics import JOB_DURATION
+from utils.renderers import FastJSONRenderer
+
+from .models import Bike, BikeImage, BikeStatus
+
+SNAPSHOT = "bikes.ndjson.gz"
+MANIFEST = "manifest.json"
+FIELDS = (
+    "id",
+    "title",
+    "bike_type",
+    "hourly_rate",
+    "daily_rate",
+    "location",
+    "updated_at",
+)
+# Rows committed while a build runs can carry an updated_at from before the
+# build started. Each build re-reads this much of the previous one; unchanged
+# bikes it finds again are not written to the changes file.
+OVERLAP = timedelta(minutes=5)
+
+
+def changes_name(build):
+    return f"changes-{build:06d}.ndjson.gz"
+
+
+def read_manifest(directory=None):
+    """The manifest of the last build, or None before the first one."""
+    path = Path(directory or settings.BIKE_FEED_DIR) / MANIFEST
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def changes_since(manifest, since):
+    """
+    The manifest entries of the changes files after build ``since``, oldest
+    first, or None when some of them are no longer kept.
+    """
+    entries = [entry for entry in manifest["changes"] if entry["build"] > since]
+    if since < manifest["build"] and (not entries or entries[0]["build"] != since + 1):
+        return None
+    return entries
+
+
+def read_files(paths, block_size=1 << 16):
+    """The bytes of ``paths`` one after the other, a block at a time."""
+    for path in paths:
+        with open(path, "rb") as file:
+            yield from iter(lambda: file.read(block_size), b"")
+
+
+async def aread_files(paths, block_size=1 << 16):
+    """``read_files`` for async responses; each block is read in a thread."""
+    for path in paths:
+        file = await sync_to_async(open, thread_sensitive=False)(path, "rb")
+        try:
+            read = sync_to_async(file.read, thread_sensitive=False)
+            while block := await read(block_size):
+                yield block
+        finally:
+            file.close()
+
+
+def _records(bikes):
+    """{bike id: NDJSON line} for ``bikes``, with their primary image URL."""
+    rows = list(bikes.order_by("pk").values(*FIELDS))
+    storage = BikeImage.image.field.storage
+    # First image in display order, as shown on the bike page.
+    primary = dict(
+        BikeImage.objects.filter(bike_id__in=[row["id"] for row in rows])
+        .order_by("bike_id", "-is_primary", "order", "created_at")
+        .distinct("bike_id")
+        .values_list("bike_id", "image")
+    )
+    render = FastJSONRenderer().render
+    records = {}
+    for row in rows:
+        for rate in ("hourly_rate", "daily_rate"):
+            if row[rate] is not None:
+                row[rate] = str(row[rate])
+        image = primary.get(row["id"])
+        row["primary_image"] = storage.url(image) if image else None
+        records[row["id"]] = render(row)
+    return records
+
+
+def _load_snapshot(path):
+    records = {}
+    with gzip.open(path, "rb") as snapshot:
+        for line in snapshot:
+            line = line.rstrip(b"\n")
+            # Every line starts with {"id":<id>, since "id" comes first in FIELDS.
+            records[int(line[6 : line.index(b",")])] = line
+    return records
+
+
+def _write_gzip(directory, name, lines):
+    """Write ``lines`` to ``directory/name`` atomically; returns the ETag."""
+    digest = hashlib.sha256()
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            # mtime=0 keeps the bytes, and so the ETag, the same for the same lines.
+            with gzip.GzipFile(
+                fileobj=raw, mode="wb", compresslevel=6, mtime=0
+            ) as compressed:
+                for line in lines:
+                    compressed.write(line + b"\n")
+        with open(temp, "rb") as written:
+            for block in iter(lambda: written.read(1 << 16), b""):
+                digest.update(block)
+        # mkstemp creates 0600 files; the web server may serve them directly.
+        os.chmod(temp, 0o644)
+        os.replace(temp, directory / name)
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def build_bike_feed(directory=None, now=None):
+    """Rebuild the feed in ``directory``; returns the new manifest."""
+    directory = Path(directory or settings.BIKE_FEED_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    now = now or timezone.now()
+    manifest = read_manifest(directory)
+    available = Bike.objects.filter(status=BikeStatus.AVAILABLE)
+
+    with JOB_DURATION.time(job="bike_feed_build"):
+        full = manifest is None or not (directory / SNAPSHOT).exists()
+        if full:
+            previous, changed = {}, _records(available)
+            build = (manifest or {}).get("build", 0) + 1
+            history = []
+        else:
+            previous = _load_snapshot(directory / SNAPSHOT)
+            since = datetime.fromisoformat(manifest["updated_through"]) - OVERLAP
+            changed = _records(available.filter(updated_at__gt=since))
+            build = manifest["build"] + 1
+            history = manifest["changes"]
+
+        available_ids = set(available.values_list("pk", flat=True))
+        records = {pk: line for pk, line in previous.items() if pk in available_ids}
+        changes = [line for pk, line in changed.items() if previous.get(pk) != line]
+        render = FastJSONRenderer().render
+        changes += [
+            render({"id": pk, "removed": True})
+            for pk in sorted(previous.keys() - available_ids)
+        ]
+        records.update(changed)
+
+        if full or changes:
+            snapshot_etag = _write_gzip(
+                directory, SNAPSHOT, (records[pk] for pk in sorted(records))
+            )
+        else:
+            snapshot_etag = manifest["snapshot"]["etag"]
+        if not full:
+            history.append(
+                {
+                    "build": build,
+                    "file": changes_name(build),
+                    "etag": _write_gzip(directory, changes_name(build), changes),
+                    "changes": len(changes),
+                }
+            )
+        for expired in history[: -settings.BIKE_FEED_KEEP_CHANGES]:
+            (directory / expired["file"]).unlink(missing_ok=True)
+        history = history[-settings.BIKE_FEED_KEEP_CHANGES :]
+
+        manifest = {
+            "build": build,
+            "generated_at": timezone.now().isoformat(),
+            "updated_through": now.isoformat(),
+            "snapshot": {
+                "file": SNAPSHOT,
+                "etag": snapshot_etag,
+                "bikes": len(records),
+            },
+            "changes": history,
+        }
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=f".{MANIFEST}.")
+        with os.fdopen(fd, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.chmod(temp, 0o644)
+        os.replace(temp, directory / MANIFEST)
+    return manifest
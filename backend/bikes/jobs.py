@@ -0,0 +1,5 @@
+from core.jobs import register
+
+from .feed import build_bike_feed
+
+register("build_bike_feed")(build_bike_feed)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from bikes.feed import build_bike_feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the public feed of available bikes in BIKE_FEED_DIR; run it "
+        "periodically, e.g. every 5 minutes from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", help="Write here instead of BIKE_FEED_DIR")
+
+    def handle(self, *args, **options):
+        manifest = build_bike_feed(options["directory"])
+        changes = manifest["changes"][-1:]
+        summary = (
+            f", {changes[0]['changes']} changes"
+            if changes and changes[0]["build"] == manifest["build"]
+            else " (full rebuild)"
+        )
+        self.stdout.write(
+            f"Built feed {manifest['build']}: "
+            f"{manifest['snapshot']['bikes']} bikes{summary}"
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="maintenanceticket",
+            index=models.Index(
+                fields=["reported_by", "-created_at"], name="ticket_reporter_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="maintenanceticket",
+            index=models.Index(
+                fields=["bike", "-created_at"], name="ticket_bike_created"
+            ),
+        ),
+    ]
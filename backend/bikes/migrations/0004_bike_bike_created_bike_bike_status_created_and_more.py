@@ -0,0 +1,38 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0003_maintenanceticket_ticket_reporter_created_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bike",
+            index=models.Index(fields=["-created_at"], name="bike_created"),
+        ),
+        migrations.AddIndex(
+            model_name="bike",
+            index=models.Index(
+                fields=["status", "-created_at"], name="bike_status_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bike",
+            index=models.Index(
+                fields=["owner", "-created_at"], name="bike_owner_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bikeimage",
+            index=models.Index(
+                fields=["bike", "-is_primary", "order", "created_at"],
+                name="bikeimage_display_order",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.10 on 2026-10-19 06:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0004_bike_bike_created_bike_bike_status_created_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bike",
+            index=models.Index(fields=["updated_at"], name="bike_updated"),
+        ),
+    ]
@@ -52,6 +52,13 @@ class Bike(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at"], name="bike_created"),
+            models.Index(fields=["status", "-created_at"], name="bike_status_created"),
+            models.Index(fields=["owner", "-created_at"], name="bike_owner_created"),
+            # Incremental feed builds and syncs.
+            models.Index(fields=["updated_at"], name="bike_updated"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.owner.get_full_name()}"
@@ -76,6 +83,12 @@ class BikeImage(BaseModel):
     class Meta:
         ordering = ["-is_primary", "order", "created_at"]
         unique_together = [["bike", "order"]]
+        indexes = [
+            models.Index(
+                fields=["bike", "-is_primary", "order", "created_at"],
+                name="bikeimage_display_order",
+            ),
+        ]
 
     def __str__(self):
         return f"Image for {self.bike.title} - {self.image.name}"
@@ -107,6 +120,12 @@ class MaintenanceTicket(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["reported_by", "-created_at"], name="ticket_reporter_created"
+            ),
+            models.Index(fields=["bike", "-created_at"], name="ticket_bike_created"),
+        ]
 
     def __str__(self):
         return f"Maintenance for {self.bike.title}"
@@ -1,7 +1,11 @@
+from django.db.models import Case, Max, When
 from rest_framework import serializers
 
 from .models import Bike, BikeImage, MaintenanceTicket
-from users.serializers import UserSerializer
+from favorites.models import Favorite
+from users.serializers import UserSerializer, UserValuesSerializer
+from utils.profiling import FieldTimingMixin
+from utils.serializers import ValuesSerializer
 
 
 class BikeImageSerializer(serializers.ModelSerializer):
@@ -33,7 +37,7 @@ class BikeImageSerializer(serializers.ModelSerializer):
         return None
 
 
-class BikeSerializer(serializers.ModelSerializer):
+class BikeSerializer(FieldTimingMixin, serializers.ModelSerializer):
     """Serializer for the Bike model."""
 
     owner = UserSerializer(read_only=True)
@@ -84,8 +88,11 @@ class BikeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """Check if the current user has favorited this bike."""
-        request = self.context.get('request')
+        request = self.context.get("request")
         if request and request.user.is_authenticated:
+            # Prefetched by with_bike_relations
+            if hasattr(obj, "user_favorites"):
+                return bool(obj.user_favorites)
             return obj.favorited_by.filter(user=request.user).exists()
         return False
 
@@ -124,13 +131,15 @@ class BikeSerializer(serializers.ModelSerializer):
         bike = super().create(validated_data)
 
         # Create BikeImage instances for uploaded files
-        for i, image_file in enumerate(image_files):
-            BikeImage.objects.create(
+        BikeImage.objects.bulk_create(
+            BikeImage(
                 bike=bike,
                 image=image_file,
                 is_primary=(i == 0),  # First image is primary
                 order=i,
             )
+            for i, image_file in enumerate(image_files)
+        )
 
         return bike
 
@@ -141,56 +150,97 @@ class BikeSerializer(serializers.ModelSerializer):
         primary_image_id = validated_data.pop("primary_image_id", None)
 
         bike = super().update(instance, validated_data)
+        images = BikeImage.objects.filter(bike=bike)
 
         # Delete specified images
         if delete_image_ids:
-            BikeImage.objects.filter(bike=bike, id__in=delete_image_ids).delete()
+            images.filter(id__in=delete_image_ids).delete()
 
         # Add new images if provided
         if image_files:
             # Get the current highest order for existing images
-            max_order = BikeImage.objects.filter(bike=bike).count()
-
-            for i, image_file in enumerate(image_files):
-                BikeImage.objects.create(
+            max_order = images.aggregate(Max("order"))["order__max"]
+            next_order = 0 if max_order is None else max_order + 1
+            BikeImage.objects.bulk_create(
+                BikeImage(
                     bike=bike,
                     image=image_file,
                     is_primary=False,  # Don't override existing primary image automatically
-                    order=max_order + i,
+                    order=next_order + i,
                 )
+                for i, image_file in enumerate(image_files)
+            )
 
-        # Set primary image if specified
+        # Set primary image if specified, unsetting the current one
         if primary_image_id:
-            # Unset current primary
-            BikeImage.objects.filter(bike=bike, is_primary=True).update(
-                is_primary=False
-            )
-            # Set new primary
-            BikeImage.objects.filter(bike=bike, id=primary_image_id).update(
-                is_primary=True
+            images.update(
+                is_primary=Case(When(id=primary_image_id, then=True), default=False)
             )
 
         # Ensure at least one image is primary if images exist
-        bike_images = BikeImage.objects.filter(bike=bike)
-        if bike_images.exists() and not bike_images.filter(is_primary=True).exists():
-            first_image = bike_images.first()
-            first_image.is_primary = True
-            first_image.save()
+        if image_files or delete_image_ids:
+            if not images.filter(is_primary=True).exists():
+                first_image = images.order_by("order", "created_at").values("pk")[:1]
+                images.filter(pk__in=first_image).update(is_primary=True)
+
+        if image_files or delete_image_ids or primary_image_id:
+            # Images prefetched with the instance are stale now
+            getattr(bike, "_prefetched_objects_cache", {}).pop("images", None)
 
         return bike
 
 
+class BikeImageValuesSerializer(ValuesSerializer):
+    """``BikeImageSerializer`` output built from ``.values()`` rows."""
+
+    serializer_class = BikeImageSerializer
+
+    def get_image_url(self, row, prefix):
+        return self.file_url(BikeImage.image.field.storage, row[prefix + "image"])
+
+
+class BikeValuesSerializer(ValuesSerializer):
+    """
+    ``BikeSerializer`` output built from ``.values()`` rows, for the bike
+    list and every list that nests bikes.
+    """
+
+    serializer_class = BikeSerializer
+    nested = {"owner": UserValuesSerializer, "images": BikeImageValuesSerializer}
+
+    def queries(self, rows):
+        yield from super().queries(rows)
+        favorites = self.favorites(rows)
+        self.favorite_ids = set() if favorites is None else set((yield favorites))
+
+    def favorites(self, rows):
+        """Ids of the bikes of ``rows`` the user favorited, if signed in."""
+        user = self.request.user if self.request else None
+        if user is None or not user.is_authenticated:
+            return None
+        return Favorite.objects.filter(
+            user=user, bike_id__in={row[self.pk_key] for row in rows}
+        ).values_list("bike_id", flat=True)
+
+    def get_is_favorited(self, row, prefix):
+        return row[self.pk_key] in self.favorite_ids
+
+
 class MaintenanceTicketSerializer(serializers.ModelSerializer):
     """Serializer for the MaintenanceTicket model."""
 
     reported_by = UserSerializer(read_only=True)
     bike = BikeSerializer(read_only=True)
+    bike_id = serializers.PrimaryKeyRelatedField(
+        source="bike", queryset=Bike.objects.all(), write_only=True
+    )
 
     class Meta:
         model = MaintenanceTicket
         fields = (
             "id",
             "bike",
+            "bike_id",
             "reported_by",
             "description",
             "status",
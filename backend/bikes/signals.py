@@ -0,0 +1,42 @@
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Bike, BikeImage
+
+
+@receiver(post_save, sender=BikeImage)
+@receiver(post_delete, sender=BikeImage)
+def touch_bike(sender, instance, raw=False, **kwargs):
+    """
+    Move the bike's ``updated_at`` when one of its images changes, so
+    anything that syncs bikes by ``updated_at`` sees new primary images.
+
+    Deferred to commit, where the first callback touches every bike changed
+    so far with one UPDATE and the others find nothing left to do. Deleting
+    a bike or many of its images therefore costs one query, not one per image.
+    """
+    if raw:
+        return
+    connection = transaction.get_connection()
+    if not _touch_pending(connection):
+        # A rollback dropped the callbacks and left their ids behind.
+        connection.touched_bike_ids = set()
+    connection.touched_bike_ids.add(instance.bike_id)
+    transaction.on_commit(functools.partial(_touch, connection))
+
+
+def _touch_pending(connection):
+    return any(
+        isinstance(func, functools.partial) and func.func is _touch
+        for _, func, *_ in connection.run_on_commit
+    )
+
+
+def _touch(connection):
+    bike_ids, connection.touched_bike_ids = connection.touched_bike_ids, set()
+    if bike_ids:
+        Bike.objects.filter(pk__in=bike_ids).update(updated_at=timezone.now())
@@ -2,9 +2,13 @@ from django.urls import path
 
 from .views import (
     BikeListAPIView,
+    BikeFeedAPIView,
+    BikeFeedChangesAPIView,
+    BikeFeedSnapshotAPIView,
     BikeCreateAPIView,
     BikeDetailAPIView,
     MyBikesAPIView,
+    MyBikesExportAPIView,
     MaintenanceTicketListCreateAPIView,
     BikeImageListCreateAPIView,
     BikeImageDetailAPIView,
@@ -19,6 +23,11 @@ urlpatterns = [
     path("create/", BikeCreateAPIView.as_view(), name="bike-create"),
     path("<int:pk>/", BikeDetailAPIView.as_view(), name="bike-detail"),
     path("my-bikes/", MyBikesAPIView.as_view(), name="my-bikes"),
+    path(
+        "my-bikes/export.<str:export_format>",
+        MyBikesExportAPIView.as_view(),
+        name="my-bikes-export",
+    ),
     path(
         "<int:pk>/toggle-status/",
         toggle_bike_status_api_view,
@@ -39,6 +48,17 @@ urlpatterns = [
         set_primary_image_api_view,
         name="set-primary-image",
     ),
+    path("feed/", BikeFeedAPIView.as_view(), name="bike-feed"),
+    path(
+        "feed/bikes.ndjson.gz",
+        BikeFeedSnapshotAPIView.as_view(),
+        name="bike-feed-snapshot",
+    ),
+    path(
+        "feed/changes.ndjson.gz",
+        BikeFeedChangesAPIView.as_view(),
+        name="bike-feed-changes",
+    ),
     path(
         "maintenance/",
         MaintenanceTicketListCreateAPIView.as_view(),
@@ -1,4 +1,9 @@
-from django.shortcuts import render
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.shortcuts import aget_object_or_404, render
 from rest_framework import serializers
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
@@ -9,22 +14,31 @@ from rest_framework.permissions import (
     AllowAny,
 )
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
 
-from .models import Bike, BikeImage, MaintenanceTicket
+from .exports import BikeExport
+from .feed import SNAPSHOT, aread_files, changes_since, read_files, read_manifest
+from .models import Bike, BikeImage, BikeStatus, MaintenanceTicket
 from .serializers import (
     BikeSerializer,
     BikeImageSerializer,
+    BikeValuesSerializer,
     MaintenanceTicketSerializer,
 )
+from .querysets import with_bike_relations
+from utils.exports import ExportAPIView
+from utils.querysets import union_of
 from utils.response import api_response
+from utils.streaming import DualStreamingHttpResponse
+from utils.views import AsyncAPIView, AsyncPageNumberPagination
 
 
-class BikeListAPIView(generics.ListAPIView):
+class BikeListAPIView(AsyncAPIView, generics.ListAPIView):
     """List all bikes with filtering and search."""
 
     serializer_class = BikeSerializer
     permission_classes = [AllowAny]
+    replica_reads = True
+    pagination_class = AsyncPageNumberPagination
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -37,10 +51,7 @@ class BikeListAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         """Get bikes based on query parameters."""
-        queryset = Bike.objects.select_related('owner').prefetch_related(
-            'images',
-            'favorited_by'
-        )
+        queryset = Bike.objects.all()
 
         # Filter by owner if requested
         owner = self.request.query_params.get("owner")
@@ -64,21 +75,22 @@ class BikeListAPIView(generics.ListAPIView):
 
         return queryset
 
-    def list(self, request, *args, **kwargs):
-        """Override list method to use custom response format."""
+    async def get(self, request, *args, **kwargs):
+        """List bikes with the async ORM, in the custom response format."""
         queryset = self.filter_queryset(self.get_queryset())
+        # Same output as BikeSerializer, built from .values() rows
+        serializer = BikeValuesSerializer(context=self.get_serializer_context())
+        rows = serializer.rows(queryset)
 
         # Use pagination for requests without limit parameter
-        page = self.paginate_queryset(queryset)
+        page = await self.paginator.apaginate_queryset(rows, request, view=self)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(await serializer.aserialize(page))
 
-        serializer = self.get_serializer(queryset, many=True)
         return api_response(
             success=True,
             message="Bikes fetched successfully",
-            data=serializer.data,
+            data=await serializer.aserialize(rows.values),
             status_code=status.HTTP_200_OK,
         )
 
@@ -126,17 +138,15 @@ class BikeCreateAPIView(generics.CreateAPIView):
         )
 
 
-class BikeDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class BikeDetailAPIView(AsyncAPIView, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a bike."""
 
     serializer_class = BikeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
 
     def get_queryset(self):
-        return Bike.objects.select_related('owner').prefetch_related(
-            'images',
-            'favorited_by'
-        )
+        return with_bike_relations(Bike.objects.all(), self.request.user)
 
     def get_permissions(self):
         """Only the owner can update or delete their bike."""
@@ -144,9 +154,10 @@ class BikeDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAuthenticated()]
         return [permission() for permission in self.permission_classes]
 
-    def retrieve(self, request, *args, **kwargs):
-        """Override retrieve method to use custom response format."""
-        instance = self.get_object()
+    async def get(self, request, *args, **kwargs):
+        """Retrieve a bike with the async ORM, in the custom response format."""
+        instance = await aget_object_or_404(self.get_queryset(), pk=kwargs["pk"])
+        self.check_object_permissions(request, instance)
         serializer = self.get_serializer(instance)
         return api_response(
             success=True,
@@ -203,11 +214,11 @@ class MyBikesAPIView(generics.ListAPIView):
 
     serializer_class = BikeSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
-        return Bike.objects.filter(owner=self.request.user).select_related('owner').prefetch_related(
-            'images',
-            'favorited_by'
+        return with_bike_relations(
+            Bike.objects.filter(owner=self.request.user), self.request.user
         )
 
     def list(self, request, *args, **kwargs):
@@ -242,6 +253,21 @@ class MyBikesAPIView(generics.ListAPIView):
         )
 
 
+class MyBikesExportAPIView(ExportAPIView):
+    """
+    Stream the current user's bikes as CSV or NDJSON. Staff users get every
+    bike.
+    """
+
+    export_class = BikeExport
+    status_choices = BikeStatus.choices
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Bike.objects.all()
+        return Bike.objects.filter(owner=self.request.user)
+
+
 class MaintenanceTicketListCreateAPIView(generics.ListCreateAPIView):
     """List maintenance tickets or create a new one."""
 
@@ -250,8 +276,14 @@ class MaintenanceTicketListCreateAPIView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         """Get maintenance tickets for bikes owned by the user or reported by the user."""
-        return MaintenanceTicket.objects.filter(
-            Q(bike__owner=self.request.user) | Q(reported_by=self.request.user)
+        user = self.request.user
+        tickets = with_bike_relations(
+            MaintenanceTicket.objects.select_related("reported_by"), user, "bike__"
+        )
+        return union_of(
+            tickets,
+            MaintenanceTicket.objects.filter(bike__in=Bike.objects.filter(owner=user)),
+            MaintenanceTicket.objects.filter(reported_by=user),
         )
 
     def perform_create(self, serializer):
@@ -481,3 +513,90 @@ def set_primary_image_api_view(request, bike_id, image_id):
         data=serializer.data,
         status_code=status.HTTP_200_OK,
     )
+
+
+class BikeFeedAPIView(APIView):
+    """
+    Public feed of available bikes (see ``bikes.feed``). This view returns
+    the manifest; the snapshot and changes views below return the files.
+    """
+
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        manifest = read_manifest()
+        if manifest is None:
+            return api_response(
+                success=False,
+                message="The bike feed has not been built yet.",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        return self.respond(request, manifest)
+
+    def respond(self, request, manifest):
+        return api_response(
+            success=True,
+            message="Bike feed manifest fetched successfully",
+            data=manifest,
+            status_code=status.HTTP_200_OK,
+        )
+
+    def file_response(self, request, manifest, names, etag):
+        """Serve ``names`` from the feed directory, one after the other."""
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            # Concatenated gzip members decompress as one stream.
+            paths = [Path(settings.BIKE_FEED_DIR) / name for name in names]
+            response = DualStreamingHttpResponse(read_files(paths), aread_files(paths))
+            response["Content-Type"] = "application/gzip"
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, max-age=60"
+        response["X-Feed-Build"] = manifest["build"]
+        return response
+
+
+class BikeFeedSnapshotAPIView(BikeFeedAPIView):
+    """Every available bike, as gzip-compressed NDJSON."""
+
+    def respond(self, request, manifest):
+        snapshot = manifest["snapshot"]
+        return self.file_response(request, manifest, [SNAPSHOT], snapshot["etag"])
+
+
+class BikeFeedChangesAPIView(BikeFeedAPIView):
+    """The changes made after build ``since``, as gzip-compressed NDJSON."""
+
+    def respond(self, request, manifest):
+        try:
+            since = int(request.query_params["since"])
+        except (KeyError, ValueError):
+            return api_response(
+                success=False,
+                message="Pass the build you have as ?since=<build>.",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        if since >= manifest["build"]:
+            response = api_response(
+                success=True,
+                message="No changes since this build",
+                status_code=status.HTTP_204_NO_CONTENT,
+            )
+            response["X-Feed-Build"] = manifest["build"]
+            return response
+        entries = changes_since(manifest, since)
+        if entries is None:
+            return api_response(
+                success=False,
+                message="Changes since this build are no longer kept; "
+                "download the snapshot instead.",
+                status_code=status.HTTP_410_GONE,
+            )
+        etags = "".join(entry["etag"] for entry in entries)
+        return self.file_response(
+            request,
+            manifest,
+            [entry["file"] for entry in entries],
+            f'"{hashlib.sha256(etags.encode()).hexdigest()[:32]}"',
+        )
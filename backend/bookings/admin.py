@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Booking
+
+from utils.exports import export_action
+from .exports import BookingExport
+from .models import Booking, BookingEvent
 
 
 @admin.register(Booking)
@@ -10,6 +13,10 @@ class BookingAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at", "updated_at", "total_price")
     list_per_page = 25
     date_hierarchy = "created_at"
+    actions = [
+        export_action(BookingExport, "csv"),
+        export_action(BookingExport, "ndjson"),
+    ]
     
     fieldsets = (
         ("Booking Details", {
@@ -23,3 +30,11 @@ class BookingAdmin(admin.ModelAdmin):
             "classes": ("collapse",)
         }),
     )
+
+
+@admin.register(BookingEvent)
+class BookingEventAdmin(admin.ModelAdmin):
+    list_display = ("booking", "previous_status", "status", "renter", "created_at")
+    list_filter = ("status", "created_at")
+    raw_id_fields = ("booking", "renter", "bike")
+    readonly_fields = ("txid", "created_at")
@@ -0,0 +1,222 @@
+"""
+Live booking status events.
+
+Every booking creation and status change writes a ``BookingEvent`` in the
+same transaction (``post_save`` below, and the status sweep in
+``bookings.services``). Each web process runs one ``EventHub`` while it has
+open event streams. The hub reads new events from the table once every
+``BOOKING_EVENTS_POLL_INTERVAL`` seconds and hands them to the streams of
+the renter and the bike owner. No broker is involved: every process reads
+the table, and the cost is one query per process per interval, however many
+streams are open. Streams give their database connection back after each
+read, so open streams hold none while they wait.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utils.db import releasing_connection, snapshot_xmin
+from utils.metrics import JOB_DURATION
+from utils.querysets import union_of
+
+from .models import Booking, BookingEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = (
+    "id",
+    "booking_id",
+    "renter_id",
+    "bike__owner_id",
+    "status",
+    "previous_status",
+    "created_at",
+)
+
+
+@receiver(post_save, sender=Booking)
+def record_status_change(sender, instance, created, raw=False, **kwargs):
+    """Write an event when a booking is created or its status changes."""
+    if raw:
+        return
+    previous = getattr(instance, "_loaded_status", None)
+    if not created and previous == instance.status:
+        return
+    BookingEvent.objects.create(
+        booking_id=instance.pk,
+        renter_id=instance.renter_id,
+        bike_id=instance.bike_id,
+        status=instance.status,
+        previous_status="" if created else previous or "",
+    )
+    instance._loaded_status = instance.status
+
+
+def to_message(row):
+    """The ``text/event-stream`` message for an event row."""
+    data = {
+        "id": row["id"],
+        "booking_id": row["booking_id"],
+        "status": row["status"],
+        "previous_status": row["previous_status"] or None,
+        "created_at": row["created_at"].isoformat().replace("+00:00", "Z"),
+    }
+    return (
+        f"id: {row['id']}\nevent: booking.status\ndata: {json.dumps(data)}\n\n"
+    ).encode()
+
+
+def events_after(user, event_id):
+    """Kept events of ``user``'s bookings after ``event_id``, oldest first."""
+    events = BookingEvent.objects.filter(id__gt=event_id)
+    return list(
+        union_of(
+            events,
+            events.filter(renter=user),
+            events.filter(bike__owner=user),
+        )
+        .order_by("id")
+        .values(*EVENT_FIELDS)
+    )
+
+
+def read_new_events(since, seen):
+    """
+    Events written by transaction ``since`` or later whose ids are not in
+    ``seen``, and the (since, seen) to pass next time; see ``utils.db``.
+    """
+    xmin = snapshot_xmin()
+    if since is None:
+        return [], xmin, set()
+    rows = list(
+        BookingEvent.objects.filter(txid__gte=since)
+        .order_by("id")
+        .values("txid", *EVENT_FIELDS)
+    )
+    new = [row for row in rows if row["id"] not in seen]
+    return new, xmin, {row["id"] for row in rows if row["txid"] >= xmin}
+
+
+class Subscription:
+    """The events for one stream. ``closed`` is set if the stream fell behind."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=settings.BOOKING_EVENTS_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, row):
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # The client reconnects and resumes from its last event id.
+            self.closed = True
+
+
+class EventHub:
+    """Fans events out to the subscriptions of this process; see the module."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.task = None
+        # Where the next read starts; see read_new_events().
+        self.since = None
+        self.seen = set()
+
+    async def subscribe(self, user_id):
+        if self.since is None:
+            since = await sync_to_async(releasing_connection(snapshot_xmin))()
+            if self.since is None:
+                self.since = since
+        subscription = Subscription(user_id)
+        self.subscriptions.setdefault(user_id, set()).add(subscription)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, rows):
+        for row in rows:
+            for user_id in {row["renter_id"], row["bike__owner_id"]}:
+                for subscription in self.subscriptions.get(user_id, ()):
+                    subscription.put(row)
+
+    async def run(self):
+        while self.subscriptions:
+            await asyncio.sleep(settings.BOOKING_EVENTS_POLL_INTERVAL)
+            try:
+                rows, self.since, self.seen = await sync_to_async(
+                    releasing_connection(read_new_events)
+                )(self.since, self.seen)
+            except Exception:
+                logger.exception("Reading booking events failed")
+                continue
+            self.publish(rows)
+        # Start from the present again when the next stream opens.
+        self.since, self.seen = None, set()
+
+
+hub = EventHub()
+
+
+async def stream_events(user, last_event_id=None):
+    """
+    The ``text/event-stream`` body of an event stream for ``user``: the
+    events after ``last_event_id`` when resuming, then new events as they are
+    written. Sends a comment every ``BOOKING_EVENTS_HEARTBEAT`` seconds to
+    keep proxies from closing the connection, and ends after
+    ``BOOKING_EVENTS_MAX_DURATION`` seconds; clients reconnect and resume.
+    An event written around the time a stream opens may be sent twice;
+    clients skip ids they have seen.
+    """
+    subscription = await hub.subscribe(user.pk)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.BOOKING_EVENTS_MAX_DURATION
+    try:
+        yield f"retry: {settings.BOOKING_EVENTS_RETRY_MS}\n\n".encode()
+        replayed = set()
+        if last_event_id is not None:
+            for row in await sync_to_async(releasing_connection(events_after))(
+                user, last_event_id
+            ):
+                replayed.add(row["id"])
+                yield to_message(row)
+        while not subscription.closed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    min(settings.BOOKING_EVENTS_HEARTBEAT, remaining),
+                )
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if row["id"] not in replayed:
+                yield to_message(row)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def prune_booking_events(now=None):
+    """Delete events older than ``BOOKING_EVENT_RETENTION_DAYS``; returns how many."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.BOOKING_EVENT_RETENTION_DAYS)
+    with JOB_DURATION.time(job="booking_event_prune"):
+        deleted, _ = BookingEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
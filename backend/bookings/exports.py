@@ -0,0 +1,22 @@
+from utils.exports import Export
+
+
+class BookingExport(Export):
+    """Bookings with their bike and renter, for accounting."""
+
+    name = "bookings"
+    date_field = "start_time"
+    columns = (
+        ("id", "id"),
+        ("bike_id", "bike_id"),
+        ("bike_title", "bike__title"),
+        ("owner_id", "bike__owner_id"),
+        ("renter_id", "renter_id"),
+        ("renter_email", "renter__email"),
+        ("start_time", "start_time"),
+        ("end_time", "end_time"),
+        ("total_price", "total_price"),
+        ("status", "status"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    )
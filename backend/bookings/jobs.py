@@ -0,0 +1,7 @@
+from core.jobs import register
+
+from .events import prune_booking_events
+from .services import advance_booking_statuses
+
+register("advance_booking_statuses")(advance_booking_statuses)
+register("prune_booking_events")(prune_booking_events)
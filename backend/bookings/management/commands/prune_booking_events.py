@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from bookings.events import prune_booking_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete booking status events older than BOOKING_EVENT_RETENTION_DAYS; "
+        "run it daily, e.g. from cron"
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_booking_events()} booking events")
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0003_maintenanceticket_ticket_reporter_created_and_more"),
+        ("bookings", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["renter", "-created_at"], name="booking_renter_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["bike", "-created_at"], name="booking_bike_created"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0004_bike_bike_created_bike_bike_status_created_and_more"),
+        ("bookings", "0003_booking_booking_renter_created_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(fields=["-created_at"], name="booking_created"),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["bike", "status", "start_time", "end_time"],
+                name="booking_bike_status_window",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["status", "start_time"], name="booking_status_start"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["status", "end_time"], name="booking_status_end"
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Func
 from django.utils.translation import gettext_lazy as _
 
 from users.models import User
@@ -30,6 +31,72 @@ class Booking(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Each side of the "bookings related to me" union, newest first.
+            models.Index(
+                fields=["renter", "-created_at"], name="booking_renter_created"
+            ),
+            models.Index(fields=["bike", "-created_at"], name="booking_bike_created"),
+            models.Index(fields=["-created_at"], name="booking_created"),
+            # Overlap checks when creating a booking.
+            models.Index(
+                fields=["bike", "status", "start_time", "end_time"],
+                name="booking_bike_status_window",
+            ),
+            # Status sweeps: approved -> active and active -> completed.
+            models.Index(fields=["status", "start_time"], name="booking_status_start"),
+            models.Index(fields=["status", "end_time"], name="booking_status_end"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets a save tell whether it changed the status (see bookings.events).
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
 
     def __str__(self):
         return f"{self.bike.title} - {self.renter.get_full_name()}"
+
+
+class BookingEvent(models.Model):
+    """
+    A booking was created or changed status.
+
+    Written in the same transaction as the change and streamed to the renter
+    and the bike owner by ``bookings.events``. Renter and bike are copied from
+    the booking and not constrained, so events outlive deleted bookings until
+    they are pruned.
+    """
+
+    booking = models.ForeignKey(
+        Booking, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    renter = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    bike = models.ForeignKey(
+        Bike, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    status = models.CharField(max_length=20, choices=BookingStatus.choices)
+    previous_status = models.CharField(
+        max_length=20, choices=BookingStatus.choices, blank=True
+    )
+    # Id of the transaction that wrote the event; see utils.db.
+    txid = models.BigIntegerField(
+        db_default=Func(function="txid_current", output_field=models.BigIntegerField())
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["txid"], name="bookingevent_txid"),
+            models.Index(fields=["renter", "id"], name="bookingevent_renter"),
+            models.Index(fields=["bike", "id"], name="bookingevent_bike"),
+            models.Index(fields=["created_at"], name="bookingevent_created"),
+        ]
+
+    def __str__(self):
+        return (
+            f"Booking {self.booking_id}: {self.previous_status or '-'} -> {self.status}"
+        )
@@ -3,11 +3,13 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from .models import Booking, BookingStatus
-from users.serializers import UserSerializer
-from bikes.serializers import BikeSerializer
+from users.serializers import UserSerializer, UserValuesSerializer
+from bikes.serializers import BikeSerializer, BikeValuesSerializer
+from utils.profiling import FieldTimingMixin
+from utils.serializers import ValuesSerializer
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(FieldTimingMixin, serializers.ModelSerializer):
     """Serializer for the Booking model."""
 
     renter = UserSerializer(read_only=True)
@@ -36,6 +38,13 @@ class BookingSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class BookingValuesSerializer(ValuesSerializer):
+    """``BookingSerializer`` output built from ``.values()`` rows."""
+
+    serializer_class = BookingSerializer
+    nested = {"renter": UserValuesSerializer, "bike": BikeValuesSerializer}
+
+
 class BookingCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new bookings."""
 
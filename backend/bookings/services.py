@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.utils import timezone
+
+from utils.metrics import JOB_DURATION
+
+from .models import Booking, BookingEvent, BookingStatus
+from .signals import booking_statuses_changed
+
+# (current status, new status, time that must have passed)
+SWEEP_TRANSITIONS = (
+    (BookingStatus.APPROVED, BookingStatus.ACTIVE, "start_time"),
+    (BookingStatus.ACTIVE, BookingStatus.COMPLETED, "end_time"),
+)
+
+
+def advance_booking_statuses(now=None):
+    """
+    Start approved bookings whose start time has passed and complete active
+    bookings whose end time has passed.
+
+    Each transition is one locking SELECT and one UPDATE no matter how many
+    bookings are due, and the status events of all of them are one INSERT.
+    Returns the number of bookings moved per transition.
+    """
+    now = now or timezone.now()
+    counts = []
+    events = []
+    with JOB_DURATION.time(job="booking_status_sweep"), transaction.atomic():
+        for current, new, deadline in SWEEP_TRANSITIONS:
+            due = list(
+                Booking.objects.select_for_update()
+                .filter(status=current, **{f"{deadline}__lte": now})
+                .order_by()
+                .values_list("pk", "bike_id", "renter_id", "start_time", "end_time")
+            )
+            if due:
+                Booking.objects.filter(pk__in=[row[0] for row in due]).update(
+                    status=new, updated_at=now
+                )
+                booking_statuses_changed.send(sender=Booking, bookings=due)
+                events.extend(
+                    BookingEvent(
+                        booking_id=pk,
+                        bike_id=bike_id,
+                        renter_id=renter_id,
+                        status=new,
+                        previous_status=current,
+                    )
+                    for pk, bike_id, renter_id, _start_time, _end_time in due
+                )
+            counts.append(len(due))
+        if events:
+            BookingEvent.objects.bulk_create(events)
+    return counts
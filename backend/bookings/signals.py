@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after bookings change status through a bulk ``update()``, which skips
+# ``post_save``. ``bookings`` is a list of
+# (pk, bike_id, renter_id, start_time, end_time).
+booking_statuses_changed = Signal()
@@ -7,10 +7,12 @@ from .views import (
     BookingStatusUpdateAPIView,
     MyBookingsAPIView,
     BikeBookingsAPIView,
+    BikeBookingsExportAPIView,
     cancel_booking_api_view,
     start_rental_api_view,
     complete_rental_api_view,
     check_expired_bookings_api_view,
+    booking_events_api_view,
 )
 
 app_name = "bookings"
@@ -44,6 +46,12 @@ urlpatterns = [
         check_expired_bookings_api_view,
         name="check-expired-bookings",
     ),
+    path("events/", booking_events_api_view, name="booking-events"),
     path("my-bookings/", MyBookingsAPIView.as_view(), name="my-bookings"),
     path("bike-bookings/", BikeBookingsAPIView.as_view(), name="bike-bookings"),
+    path(
+        "bike-bookings/export.<str:export_format>",
+        BikeBookingsExportAPIView.as_view(),
+        name="bike-bookings-export",
+    ),
 ] 
\ No newline at end of file
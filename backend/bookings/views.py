@@ -1,17 +1,29 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
 from django.utils import timezone
 
+from bikes.models import Bike
+from .events import stream_events
+from .exports import BookingExport
 from .models import Booking, BookingStatus
+from .services import advance_booking_statuses
 from .serializers import (
     BookingSerializer,
     BookingCreateSerializer,
     BookingStatusUpdateSerializer,
+    BookingValuesSerializer,
 )
+from bikes.querysets import with_bike_relations
+from utils.authentication import QueryParamJWTAuthentication
+from utils.db import releasing_connection
+from utils.exports import ExportAPIView
+from utils.querysets import union_of
 from utils.response import api_response
 
 
@@ -20,6 +32,7 @@ class BookingListAPIView(generics.ListAPIView):
 
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -33,7 +46,9 @@ class BookingListAPIView(generics.ListAPIView):
     def get_queryset(self):
         """Get bookings based on query parameters and user role."""
         user = self.request.user
-        queryset = Booking.objects.select_related("bike", "renter").all()
+        queryset = with_bike_relations(
+            Booking.objects.select_related("renter"), user, "bike__"
+        )
 
         # Filter by role
         role = self.request.query_params.get("role")
@@ -45,8 +60,10 @@ class BookingListAPIView(generics.ListAPIView):
             queryset = queryset.filter(bike__owner=user)
         else:
             # Default: show all bookings related to the user (as renter or bike owner)
-            queryset = queryset.filter(
-                Q(renter=user) | Q(bike__owner=user)
+            queryset = union_of(
+                queryset,
+                Booking.objects.filter(renter=user),
+                Booking.objects.filter(bike__in=Bike.objects.filter(owner=user)),
             )
 
         # Filter by date range
@@ -124,9 +141,12 @@ class BookingDetailAPIView(generics.RetrieveAPIView):
 
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
-        return Booking.objects.select_related("bike", "renter").all()
+        return with_bike_relations(
+            Booking.objects.select_related("renter"), self.request.user, "bike__"
+        )
 
     def get_object(self):
         """Ensure user can only access their own bookings (as renter or bike owner)."""
@@ -158,7 +178,9 @@ class BookingStatusUpdateAPIView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Booking.objects.select_related("bike", "renter").all()
+        return with_bike_relations(
+            Booking.objects.select_related("renter"), self.request.user, "bike__"
+        )
 
     def get_object(self):
         """Ensure user has permission to update booking status."""
@@ -201,6 +223,7 @@ class MyBookingsAPIView(generics.ListAPIView):
 
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -211,24 +234,23 @@ class MyBookingsAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         """Get bookings where current user is the renter."""
-        return Booking.objects.select_related("bike", "renter").filter(
-            renter=self.request.user
-        )
+        return Booking.objects.filter(renter=self.request.user)
 
     def list(self, request, *args, **kwargs):
         """Override list method to use custom response format."""
         queryset = self.filter_queryset(self.get_queryset())
+        # Same output as BookingSerializer, built from .values() rows
+        serializer = BookingValuesSerializer(context=self.get_serializer_context())
+        rows = serializer.rows(queryset)
 
-        page = self.paginate_queryset(queryset)
+        page = self.paginate_queryset(rows)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serializer.serialize(page))
 
-        serializer = self.get_serializer(queryset, many=True)
         return api_response(
             success=True,
             message="Your bookings fetched successfully",
-            data=serializer.data,
+            data=serializer.serialize(rows),
             status_code=status.HTTP_200_OK,
         )
 
@@ -252,6 +274,7 @@ class BikeBookingsAPIView(generics.ListAPIView):
 
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -262,8 +285,12 @@ class BikeBookingsAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         """Get bookings for bikes owned by current user."""
-        return Booking.objects.select_related("bike", "renter").filter(
-            bike__owner=self.request.user
+        return with_bike_relations(
+            Booking.objects.select_related("renter").filter(
+                bike__owner=self.request.user
+            ),
+            self.request.user,
+            "bike__",
         )
 
     def list(self, request, *args, **kwargs):
@@ -298,12 +325,29 @@ class BikeBookingsAPIView(generics.ListAPIView):
         )
 
 
+class BikeBookingsExportAPIView(ExportAPIView):
+    """
+    Stream bookings for bikes owned by the current user as CSV or NDJSON.
+    Staff users get every booking.
+    """
+
+    export_class = BookingExport
+    status_choices = BookingStatus.choices
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Booking.objects.all()
+        return Booking.objects.filter(bike__owner=self.request.user)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def cancel_booking_api_view(request, pk):
     """Cancel a booking."""
     try:
-        booking = Booking.objects.select_related("bike", "renter").get(pk=pk)
+        booking = with_bike_relations(
+            Booking.objects.select_related("renter"), request.user, "bike__"
+        ).get(pk=pk)
     except Booking.DoesNotExist:
         return api_response(
             success=False,
@@ -350,7 +394,9 @@ def cancel_booking_api_view(request, pk):
 def start_rental_api_view(request, pk):
     """Start a rental (approved -> active)."""
     try:
-        booking = Booking.objects.select_related("bike", "renter").get(pk=pk)
+        booking = with_bike_relations(
+            Booking.objects.select_related("renter"), request.user, "bike__"
+        ).get(pk=pk)
     except Booking.DoesNotExist:
         return api_response(
             success=False,
@@ -407,7 +453,9 @@ def start_rental_api_view(request, pk):
 def complete_rental_api_view(request, pk):
     """Complete a rental (active -> completed)."""
     try:
-        booking = Booking.objects.select_related("bike", "renter").get(pk=pk)
+        booking = with_bike_relations(
+            Booking.objects.select_related("renter"), request.user, "bike__"
+        ).get(pk=pk)
     except Booking.DoesNotExist:
         return api_response(
             success=False,
@@ -453,32 +501,8 @@ def complete_rental_api_view(request, pk):
 @permission_classes([IsAuthenticated])
 def check_expired_bookings_api_view(request):
     """Check and automatically update expired bookings."""
-    current_time = timezone.now()
-    
-    # Auto-start approved bookings that should be active
-    approved_bookings = Booking.objects.filter(
-        status=BookingStatus.APPROVED,
-        start_time__lte=current_time
-    )
-    
-    started_count = 0
-    for booking in approved_bookings:
-        booking.status = BookingStatus.ACTIVE
-        booking.save()
-        started_count += 1
-    
-    # Auto-complete active bookings that have ended
-    active_bookings = Booking.objects.filter(
-        status=BookingStatus.ACTIVE,
-        end_time__lte=current_time
-    )
-    
-    completed_count = 0
-    for booking in active_bookings:
-        booking.status = BookingStatus.COMPLETED
-        booking.save()
-        completed_count += 1
-    
+    started_count, completed_count = advance_booking_statuses()
+
     return api_response(
         success=True,
         message=f"Updated {started_count} bookings to active and {completed_count} bookings to completed",
@@ -488,3 +512,44 @@ def check_expired_bookings_api_view(request):
         },
         status_code=status.HTTP_200_OK,
     )
+
+
+async def booking_events_api_view(request):
+    """
+    Stream the status changes of the current user's bookings, as renter and
+    as bike owner, as server-sent events; see ``bookings.events``.
+
+    Authenticate with the bearer token or, from ``EventSource``, with
+    ``?token=``. Reconnecting clients send ``Last-Event-ID`` and get the
+    events they missed. Served over ASGI, an open stream waits on the event
+    loop instead of holding a worker thread.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        authenticated = await sync_to_async(
+            releasing_connection(QueryParamJWTAuthentication().authenticate)
+        )(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated is None:
+        return JsonResponse(
+            {
+                "success": False,
+                "data": None,
+                "message": "Authentication credentials were not provided or are invalid.",
+            },
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    response = StreamingHttpResponse(
+        stream_events(
+            authenticated[0], int(last_event_id) if last_event_id.isdigit() else None
+        ),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Keep nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
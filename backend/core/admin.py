@@ -1 +1,11 @@
 from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "run_at", "attempts", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "idempotency_key")
+    readonly_fields = ("attempts", "last_error", "created_at", "finished_at")
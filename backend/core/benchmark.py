@@ -0,0 +1,437 @@
+"""
+Endpoint latency and throughput benchmarks.
+
+A benchmark run replays a weighted, seeded mix of requests against the hot
+endpoints, either in-process through the Django test client or over HTTP
+against a running server, and reports per-endpoint p50/p95/p99 latency,
+requests per second and (in-process) database queries per request.
+
+Reports are plain JSON so a baseline can be committed next to the code and
+compared against on every change that touches a hot path.
+"""
+
+import json
+import math
+import platform
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from bikes.models import Bike, BikeStatus, BikeType
+from bookings.models import Booking
+from users.models import User
+from users.serializers import LoginSerializer
+
+
+@dataclass
+class BenchmarkRequest:
+    """One request to replay, optionally on behalf of a user."""
+
+    method: str
+    path: str
+    params: dict = field(default_factory=dict)
+    body: dict = None
+    user_id: int = None
+
+
+@dataclass
+class Scenario:
+    """A named kind of request, its share of the mix and its expected statuses."""
+
+    name: str
+    weight: int
+    build: callable
+    expected: tuple = (200,)
+
+
+class BenchmarkData:
+    """Ids of the users and bikes a run draws its requests from."""
+
+    def __init__(self, rng, sample_size=200):
+        available = Bike.objects.filter(status=BikeStatus.AVAILABLE).order_by("pk")
+        self.bikes = list(available.values_list("pk", "owner_id")[: sample_size * 5])
+        bike_owners = Bike.objects.values("owner_id")
+        self.owners = list(
+            User.objects.filter(pk__in=bike_owners)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:sample_size]
+        )
+        renters = Booking.objects.values("renter_id")
+        self.renters = list(
+            User.objects.filter(pk__in=renters)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:sample_size]
+        )
+        if not self.bikes or not self.renters or not self.owners:
+            raise ValueError(
+                "The database needs available bikes, owners and renters; "
+                "run generate_dataset first."
+            )
+        self.locations = list(
+            Bike.objects.order_by().values_list("location", flat=True).distinct()[:20]
+        )
+        rng.shuffle(self.bikes)
+
+    def bike(self, rng):
+        return rng.choice(self.bikes)
+
+    def renter(self, rng, bike=None):
+        while True:
+            renter = rng.choice(self.renters)
+            if bike is None or renter != bike[1] or len(self.renters) == 1:
+                return renter
+
+
+def _bike_list(data, rng):
+    params = {"page": rng.choice([1, 1, 1, 2, 3])}
+    pick = rng.random()
+    if pick < 0.3:
+        params["available_only"] = "true"
+    elif pick < 0.45:
+        params["search"] = rng.choice([str(label) for label in BikeType.labels])
+    elif pick < 0.6 and data.locations:
+        params["location"] = rng.choice(data.locations)
+    elif pick < 0.75:
+        params["min_price"] = rng.choice([20, 40, 60])
+        params["max_price"] = params["min_price"] + 60
+    if rng.random() < 0.2:
+        params["ordering"] = rng.choice(["daily_rate", "-daily_rate", "created_at"])
+    return BenchmarkRequest("GET", reverse("bikes:bike-list"), params)
+
+
+def _bike_detail(data, rng):
+    bike_id, _ = data.bike(rng)
+    return BenchmarkRequest("GET", reverse("bikes:bike-detail", args=[bike_id]))
+
+
+def _booking_create(data, rng):
+    bike = data.bike(rng)
+    # Far enough ahead that most requests do not collide with existing
+    # bookings; collisions are still answered (with a 400) and measured.
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(
+        days=rng.randint(60, 720), hours=rng.randint(0, 23)
+    )
+    end = start + timedelta(hours=rng.choice([1, 2, 4, 8, 24, 48]))
+    body = {
+        "bike_id": bike[0],
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+    }
+    return BenchmarkRequest(
+        "POST",
+        reverse("bookings:booking-create"),
+        body=body,
+        user_id=data.renter(rng, bike),
+    )
+
+
+def _my_bookings(data, rng):
+    return BenchmarkRequest(
+        "GET", reverse("bookings:my-bookings"), user_id=data.renter(rng)
+    )
+
+
+def _owner_bookings(data, rng):
+    return BenchmarkRequest(
+        "GET", reverse("bookings:bike-bookings"), user_id=rng.choice(data.owners)
+    )
+
+
+def _booking_list(data, rng):
+    user_id = rng.choice(data.owners + data.renters)
+    params = {"role": rng.choice(["owner", "renter"])} if rng.random() < 0.5 else {}
+    return BenchmarkRequest(
+        "GET", reverse("bookings:booking-list"), params, user_id=user_id
+    )
+
+
+def _rating_stats(data, rng):
+    bike_id, _ = data.bike(rng)
+    return BenchmarkRequest("GET", reverse("ratings:bike-rating-stats", args=[bike_id]))
+
+
+def _favorite_toggle(data, rng):
+    bike = data.bike(rng)
+    return BenchmarkRequest(
+        "POST",
+        reverse("favorites:favorite-toggle", args=[bike[0]]),
+        body={},
+        user_id=data.renter(rng),
+    )
+
+
+SCENARIOS = [
+    # Later pages of narrow filters may be out of range on small datasets.
+    Scenario("bike_list", 30, _bike_list, expected=(200, 404)),
+    Scenario("bike_detail", 20, _bike_detail),
+    Scenario("booking_create", 5, _booking_create, expected=(201, 400)),
+    Scenario("my_bookings", 10, _my_bookings),
+    Scenario("owner_bookings", 5, _owner_bookings),
+    Scenario("booking_list", 5, _booking_list),
+    Scenario("rating_stats", 15, _rating_stats),
+    Scenario("favorite_toggle", 10, _favorite_toggle, expected=(200, 201)),
+]
+
+
+class TokenCache:
+    """Cache of access tokens, one per benchmarked user."""
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def header(self, user_id):
+        with self._lock:
+            if user_id not in self._tokens:
+                user = User.objects.get(pk=user_id)
+                token = LoginSerializer.get_token(user).access_token
+                self._tokens[user_id] = f"Bearer {token}"
+            return self._tokens[user_id]
+
+
+class InProcessTransport:
+    """Send requests through the Django test client, counting SQL queries."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        host = next(
+            (h for h in settings.ALLOWED_HOSTS if h not in ("*",) and h[0] != "."),
+            "localhost",
+        )
+        self.client = Client(HTTP_HOST=host, HTTP_ACCEPT="application/json")
+
+    def send(self, request):
+        headers = {}
+        if request.user_id is not None:
+            headers["HTTP_AUTHORIZATION"] = self.tokens.header(request.user_id)
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            if request.method == "GET":
+                response = self.client.get(request.path, request.params, **headers)
+            else:
+                response = self.client.generic(
+                    request.method,
+                    request.path,
+                    json.dumps(request.body or {}),
+                    content_type="application/json",
+                    **headers,
+                )
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, queries
+
+
+class HttpTransport:
+    """Send requests to a running server; query counts are not visible."""
+
+    def __init__(self, base_url, tokens, timeout=30):
+        import requests
+
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+        self.tokens = tokens
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = self.requests.Session()
+            self._local.session.headers["Accept"] = "application/json"
+        return self._local.session
+
+    def send(self, request):
+        headers = {}
+        if request.user_id is not None:
+            headers["Authorization"] = self.tokens.header(request.user_id)
+        started = time.perf_counter()
+        response = self._session().request(
+            request.method,
+            self.base_url + request.path,
+            params=request.params or None,
+            json=request.body if request.method != "GET" else None,
+            headers=headers,
+            timeout=self.timeout,
+        )
+        elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def _summary(samples, wall_time):
+    latencies = sorted(sample[1] for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    errors = sum(1 for sample in samples if not sample[3])
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "rps": round(len(samples) / wall_time, 2) if wall_time else None,
+        "queries_per_request": (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def run_benchmark(
+    transport,
+    scenarios=SCENARIOS,
+    requests=500,
+    warmup=20,
+    concurrency=1,
+    seed=42,
+):
+    """
+    Replay ``requests`` requests drawn from ``scenarios`` and return a report.
+
+    The request plan is drawn up front from ``seed``, so two runs against the
+    same data send the same requests in the same order.
+    """
+    rng = random.Random(seed)
+    data = BenchmarkData(rng)
+    weights = [scenario.weight for scenario in scenarios]
+    plan = []
+    for _ in range(warmup + requests):
+        scenario = rng.choices(scenarios, weights=weights)[0]
+        plan.append((scenario, scenario.build(data, rng)))
+
+    for scenario, request in plan[:warmup]:
+        transport.send(request)
+
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    measured = iter(plan[warmup:])
+
+    def worker():
+        while True:
+            with lock:
+                item = next(measured, None)
+            if item is None:
+                return
+            scenario, request = item
+            status, elapsed, queries = transport.send(request)
+            with lock:
+                samples[scenario.name].append(
+                    (status, elapsed, queries, status in scenario.expected)
+                )
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall_time = time.perf_counter() - started
+
+    return {
+        "meta": {
+            "transport": type(transport).__name__,
+            "requests": requests,
+            "warmup": warmup,
+            "concurrency": concurrency,
+            "seed": seed,
+            "dataset": {
+                "users": User.objects.count(),
+                "bikes": Bike.objects.count(),
+                "bookings": Booking.objects.count(),
+            },
+            "python": platform.python_version(),
+            "created_at": timezone.now().isoformat(),
+        },
+        "total": _summary(
+            [sample for group in samples.values() for sample in group], wall_time
+        ),
+        "scenarios": {
+            scenario.name: _summary(samples[scenario.name], wall_time)
+            for scenario in scenarios
+            if samples[scenario.name]
+        },
+    }
+
+
+def compare_reports(
+    current, baseline, latency_tolerance=0.25, latency_floor_ms=5, query_tolerance=0
+):
+    """
+    List the regressions of ``current`` against ``baseline``.
+
+    Latency regresses when p95 grows by more than ``latency_tolerance`` (a
+    fraction) and by more than ``latency_floor_ms``, so jitter on very fast
+    endpoints is not reported. Queries per request regress when they grow by
+    more than ``query_tolerance`` queries, errors on any increase.
+    """
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        now = current["scenarios"].get(name)
+        if now is None:
+            continue
+        growth = now["p95_ms"] - base["p95_ms"]
+        if growth > base["p95_ms"] * latency_tolerance and growth > latency_floor_ms:
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {now['p95_ms']}ms")
+        if (
+            base.get("queries_per_request") is not None
+            and now.get("queries_per_request") is not None
+            and now["queries_per_request"]
+            > base["queries_per_request"] + query_tolerance
+        ):
+            regressions.append(
+                f"{name}: queries/request {base['queries_per_request']} -> "
+                f"{now['queries_per_request']}"
+            )
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {now['errors']}")
+    return regressions
+
+
+def format_report(report, baseline=None):
+    """Render a report as an aligned text table, with deltas to ``baseline``."""
+    columns = ["requests", "errors", "p50_ms", "p95_ms", "p99_ms", "rps"]
+    columns.append("queries_per_request")
+    rows = [("scenario", *columns)]
+    base = (baseline or {}).get("scenarios", {})
+    for name, summary in [*report["scenarios"].items(), ("TOTAL", report["total"])]:
+        cells = []
+        for column in columns:
+            value = summary[column]
+            cell = "-" if value is None else str(value)
+            previous = base.get(name, {}).get(column)
+            if column == "p95_ms" and previous and value is not None:
+                cell += f" ({(value - previous) / previous:+.0%})"
+            cells.append(cell)
+        rows.append((name, *cells))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows
+    )
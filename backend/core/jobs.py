@@ -0,0 +1,204 @@
+"""
+Background jobs in the database, with no broker besides PostgreSQL.
+
+Register a function under a name, then enqueue calls of it from anywhere:
+
+    @register("send_booking_reminders")
+    def send_booking_reminders(day):
+        ...
+
+    enqueue("send_booking_reminders", {"day": "2025-06-01"}, key="reminders:2025-06-01")
+
+Apps register their jobs in a ``jobs`` module, imported when Django starts.
+``manage.py run_jobs`` runs them in a pool of threads. Each thread claims one
+due job with ``SELECT ... FOR UPDATE SKIP LOCKED`` in a short transaction that
+marks it running and leases it for ``JOB_LEASE`` seconds, so workers and
+threads never run the same job. The job then runs outside any transaction,
+so a long job does not hold back the snapshots that sync, the booking event
+stream and webhooks read from; it opens its own transactions where it needs
+them. Its result is recorded afterwards, unless the lease ran out and the job
+was claimed again meanwhile.
+
+A job that raises runs again after ``JOB_RETRY_BACKOFF`` seconds, doubled on
+every further attempt. The writes it committed before raising are kept. A
+worker that dies mid-job leaves the lease to run out, and the job runs again.
+Jobs must therefore be safe to run twice, and should finish well within the
+lease or queue follow-up jobs.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from utils.idempotency import prune_idempotency_keys
+from utils.metrics import JOB_DELAY, JOB_DURATION, JOBS
+
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# name -> (function, max attempts or None for JOB_MAX_ATTEMPTS)
+_registry = {}
+
+
+def register(name, max_attempts=None):
+    """Register the decorated function as the job ``name``."""
+
+    def decorator(func):
+        if name in _registry:
+            raise ValueError(f"Job {name} is already registered")
+        _registry[name] = (func, max_attempts)
+        return func
+
+    return decorator
+
+
+def registered_jobs():
+    return sorted(_registry)
+
+
+def autodiscover():
+    """Import the ``jobs`` module of every installed app."""
+    autodiscover_modules("jobs")
+
+
+def enqueue(name, kwargs=None, priority=0, run_at=None, key=None):
+    """
+    Queue a call of job ``name`` with ``kwargs``, which must be JSON. With a
+    ``key``, returns the job already queued under it, if any, instead.
+    """
+    if name not in _registry:
+        raise ValueError(f"No job is registered as {name!r}")
+    max_attempts = _registry[name][1] or settings.JOB_MAX_ATTEMPTS
+    fields = {
+        "name": name,
+        "kwargs": kwargs or {},
+        "priority": priority,
+        "run_at": run_at or timezone.now(),
+        "max_attempts": max_attempts,
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    try:
+        # A savepoint, so a duplicate key does not break the caller's
+        # transaction.
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=key, **fields)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+
+
+def retry_delay(attempts):
+    """How long to wait after the ``attempts``-th failed run."""
+    return timedelta(seconds=settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def run_next_job(now=None):
+    """Claim and run the next due job; returns it, or None if none is due."""
+    now = now or timezone.now()
+    job = _claim(now)
+    if job is None or job.status != JobStatus.RUNNING:
+        return job
+    lease = job.locked_until
+    _run(job, now)
+    _record(job, lease)
+    return job
+
+
+def _claim(now):
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=JobStatus.QUEUED, run_at__lte=now)
+                | Q(status=JobStatus.RUNNING, locked_until__lte=now)
+            )
+            .order_by("-priority", "run_at", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == JobStatus.RUNNING and job.attempts >= job.max_attempts:
+            # Its worker died on the last attempt.
+            logger.error("Job %s failed for good: its lease ran out", job)
+            job.status = JobStatus.FAILED
+            job.locked_until = None
+            job.last_error = "Lease ran out"
+            job.finished_at = timezone.now()
+            JOBS.inc(job=job.name, result="failed")
+        else:
+            job.status = JobStatus.RUNNING
+            job.locked_until = now + timedelta(seconds=settings.JOB_LEASE)
+            job.attempts += 1
+        job.save(
+            update_fields=[
+                "status",
+                "locked_until",
+                "attempts",
+                "last_error",
+                "finished_at",
+            ]
+        )
+    return job
+
+
+def _run(job, now):
+    JOB_DELAY.observe((now - job.run_at).total_seconds(), job=job.name)
+    job.locked_until = None
+    try:
+        func, _ = _registry[job.name]
+        with JOB_DURATION.time(job=job.name):
+            func(**job.kwargs)
+    except Exception as exc:
+        job.last_error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= job.max_attempts:
+            logger.exception("Job %s failed for good", job)
+            job.status = JobStatus.FAILED
+            job.finished_at = timezone.now()
+            JOBS.inc(job=job.name, result="failed")
+        else:
+            logger.warning("Job %s failed, retrying", job, exc_info=True)
+            job.status = JobStatus.QUEUED
+            job.run_at = now + retry_delay(job.attempts)
+            JOBS.inc(job=job.name, result="retried")
+        return
+    job.status = JobStatus.DONE
+    job.finished_at = timezone.now()
+    job.last_error = ""
+    JOBS.inc(job=job.name, result="done")
+
+
+def _record(job, lease):
+    # Only while the lease is still ours: once it ran out, another worker may
+    # have claimed the job again, and its run is the one to record.
+    recorded = Job.objects.filter(
+        pk=job.pk, status=JobStatus.RUNNING, locked_until=lease
+    ).update(
+        status=job.status,
+        locked_until=None,
+        run_at=job.run_at,
+        last_error=job.last_error,
+        finished_at=job.finished_at,
+    )
+    if not recorded:
+        logger.warning("Job %s outlived its lease; its result is dropped", job)
+
+
+@register("prune_jobs")
+def prune_jobs(now=None):
+    """
+    Delete done and failed jobs finished more than ``JOB_RETENTION_DAYS``
+    ago; returns how many. Their idempotency keys can then be used again.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.JOB_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(finished_at__lt=cutoff).delete()
+    return deleted
+
+
+register("prune_idempotency_keys")(prune_idempotency_keys)
@@ -0,0 +1,123 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmark import (
+    SCENARIOS,
+    HttpTransport,
+    InProcessTransport,
+    TokenCache,
+    compare_reports,
+    format_report,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = "Measure latency, throughput and queries per request of the hot endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help="Benchmark a running server at this base URL instead of in-process",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Requests sent before measuring",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Parallel clients (only with --url)",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Only run this scenario. Can be given several times.",
+        )
+        parser.add_argument("--save", help="Write the report to this JSON file")
+        parser.add_argument(
+            "--compare",
+            help="Compare against a saved report and fail on regressions",
+        )
+        parser.add_argument(
+            "--latency-tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed p95 growth as a fraction (default: 0.25)",
+        )
+        parser.add_argument(
+            "--latency-floor",
+            type=float,
+            default=5,
+            help="p95 growth in milliseconds always tolerated (default: 5)",
+        )
+        parser.add_argument(
+            "--keep-writes",
+            action="store_true",
+            help="Commit the bookings and favorites created by an in-process run. "
+            "Runs against --url always keep them.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options["scenarios"]:
+            scenarios = [s for s in SCENARIOS if s.name in options["scenarios"]]
+
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline: {exc}")
+
+        tokens = TokenCache()
+        run = dict(
+            scenarios=scenarios,
+            requests=options["requests"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+        )
+        try:
+            if options["url"]:
+                transport = HttpTransport(options["url"], tokens)
+                report = run_benchmark(
+                    transport, concurrency=options["concurrency"], **run
+                )
+            else:
+                if options["concurrency"] > 1:
+                    raise CommandError("--concurrency needs --url")
+                # Writes are rolled back so repeated runs see the same data.
+                with transaction.atomic():
+                    report = run_benchmark(InProcessTransport(tokens), **run)
+                    transaction.set_rollback(not options["keep_writes"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(format_report(report, baseline))
+
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Saved report to {options['save']}")
+
+        if baseline is not None:
+            regressions = compare_reports(
+                report,
+                baseline,
+                latency_tolerance=options["latency_tolerance"],
+                latency_floor_ms=options["latency_floor"],
+            )
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f"{len(regressions)} regression(s) against baseline")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.render_benchmark import format_render_report, run_render_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare FastJSONRenderer with DRF's JSONRenderer on list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Renders per measurement; the median is reported",
+        )
+
+    def handle(self, *args, **options):
+        report = run_render_benchmark(
+            page_size=options["page_size"], repeat=options["repeat"]
+        )
+        if report is None:
+            raise CommandError("No bookings to benchmark; run generate_dataset first")
+
+        self.stdout.write(format_render_report(report))
+        mismatched = [
+            name for name, result in report.items() if not result["identical"]
+        ]
+        if mismatched:
+            raise CommandError(
+                f"Output differs from JSONRenderer for: {', '.join(mismatched)}"
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.serializer_benchmark import format_serializer_report, run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare the .values() serializers with the DRF serializers they mirror"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=30,
+            help="Runs per measurement; the median is reported",
+        )
+
+    def handle(self, *args, **options):
+        report = run_serializer_benchmark(
+            page_size=options["page_size"], repeat=options["repeat"]
+        )
+        if report is None:
+            raise CommandError("No bookings to benchmark; run generate_dataset first")
+
+        self.stdout.write(format_serializer_report(report))
+        mismatched = [
+            name for name, result in report.items() if not result["identical"]
+        ]
+        if mismatched:
+            raise CommandError(f"Output differs from DRF for: {', '.join(mismatched)}")
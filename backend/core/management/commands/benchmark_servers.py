@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.server_benchmark import (
+    READ_SCENARIOS,
+    SERVERS,
+    format_server_report,
+    run_server_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the read endpoints under gunicorn with sync "
+        "workers (WSGI) and with uvicorn workers (ASGI)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            action="append",
+            help="Parallel clients; can be given several times (default: 1, 8, 32)",
+        )
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument(
+            "--workers", type=int, default=2, help="gunicorn workers per server"
+        )
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help="Connections trickling a request in during the run",
+        )
+        parser.add_argument(
+            "--server",
+            action="append",
+            dest="servers",
+            choices=list(SERVERS),
+            help="Only run this server. Can be given several times.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=10,
+            help="Seconds before an unanswered request counts as an error",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=[scenario.name for scenario in READ_SCENARIOS],
+            help="Only replay this scenario. Can be given several times.",
+        )
+        parser.add_argument(
+            "--env",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Environment variable for the servers, e.g. DB_POOL_MAX_SIZE=0",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--save", help="Write the report to this JSON file")
+
+    def handle(self, *args, **options):
+        env = {}
+        for assignment in options["env"]:
+            name, sep, value = assignment.partition("=")
+            if not sep:
+                raise CommandError(f"--env takes NAME=VALUE, not {assignment!r}")
+            env[name] = value
+        scenarios = [
+            scenario
+            for scenario in READ_SCENARIOS
+            if scenario.name in (options["scenarios"] or [scenario.name])
+        ]
+        try:
+            report = run_server_benchmark(
+                servers=options["servers"] or list(SERVERS),
+                concurrency=options["concurrency"] or (1, 8, 32),
+                requests=options["requests"],
+                warmup=options["warmup"],
+                workers=options["workers"],
+                slow_clients=options["slow_clients"],
+                seed=options["seed"],
+                timeout=options["timeout"],
+                scenarios=scenarios,
+                env=env,
+            )
+        except (RuntimeError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(format_server_report(report))
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Saved report to {options['save']}")
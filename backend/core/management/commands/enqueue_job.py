@@ -0,0 +1,50 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.jobs import enqueue, registered_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue a background job, e.g. from cron: "
+        "enqueue_job prune_sync_changes --key prune-sync-$(date +%F)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=registered_jobs())
+        parser.add_argument(
+            "--kwarg",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Argument of the job; VALUE is read as JSON if it parses",
+        )
+        parser.add_argument("--priority", type=int, default=0)
+        parser.add_argument(
+            "--delay", type=float, default=0, help="Seconds before the job is due"
+        )
+        parser.add_argument(
+            "--key", help="Idempotency key; a job already queued with it is kept"
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {}
+        for assignment in options["kwarg"]:
+            name, sep, value = assignment.partition("=")
+            if not sep:
+                raise CommandError(f"--kwarg takes NAME=VALUE, not {assignment!r}")
+            try:
+                kwargs[name] = json.loads(value)
+            except ValueError:
+                kwargs[name] = value
+        job = enqueue(
+            options["name"],
+            kwargs,
+            priority=options["priority"],
+            run_at=timezone.now() + timedelta(seconds=options["delay"]),
+            key=options["key"],
+        )
+        self.stdout.write(f"Queued {job}")
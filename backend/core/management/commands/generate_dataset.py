@@ -0,0 +1,107 @@
+import time
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from analytics.services import rebuild_daily_stats
+from core.synthetic import DatasetGenerator, DatasetSize
+
+
+class Command(BaseCommand):
+    help = "Generate a seeded, large-scale synthetic marketplace for performance work"
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument("--bikes", type=int, default=defaults.bikes)
+        parser.add_argument("--bookings", type=int, default=defaults.bookings)
+        parser.add_argument("--favorites", type=int, default=defaults.favorites)
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiply every volume, e.g. 0.01 for a quick local dataset",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed (default: 42)"
+        )
+        parser.add_argument(
+            "--anchor",
+            help="Date treated as 'now' (YYYY-MM-DD). Defaults to today; "
+            "fix it to get identical rows on every run.",
+        )
+        parser.add_argument(
+            "--history-days",
+            type=int,
+            default=365,
+            help="How far back bookings go",
+        )
+        parser.add_argument(
+            "--future-days",
+            type=int,
+            default=30,
+            help="How far ahead bookings go",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=50_000,
+            help="Rows sent per COPY statement",
+        )
+        parser.add_argument(
+            "--rollups",
+            action="store_true",
+            help="Also rebuild the owner dashboard daily stats, which COPY "
+            "bypasses. Slow at full scale; backfill_daily_stats can do it later.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                "generate_dataset loads rows with COPY and needs PostgreSQL"
+            )
+
+        size = DatasetSize(
+            users=options["users"],
+            bikes=options["bikes"],
+            bookings=options["bookings"],
+            favorites=options["favorites"],
+        ).scaled(options["scale"])
+        if size.users < 2 or size.bikes < 1:
+            raise CommandError("At least two users and one bike are needed")
+
+        generator = DatasetGenerator(
+            size,
+            seed=options["seed"],
+            anchor=self._parse_anchor(options["anchor"]),
+            history_days=options["history_days"],
+            future_days=options["future_days"],
+            chunk_size=options["chunk_size"],
+        )
+        started = time.monotonic()
+        counts = generator.run(log=self.stdout.write)
+
+        if options["rollups"]:
+            bike_ids = [bike[0] for bike in generator.bikes]
+            written = rebuild_daily_stats(bike_ids=bike_ids)
+            self.stdout.write(f"daily stats: {written}")
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {sum(counts.values())} rows in "
+                f"{time.monotonic() - started:.1f}s (seed {options['seed']})"
+            )
+        )
+
+    def _parse_anchor(self, value):
+        if not value:
+            return None
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            raise CommandError("--anchor must be a date in YYYY-MM-DD format")
+        return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
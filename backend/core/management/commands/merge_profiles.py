@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.profiling import merge_collapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge the collapsed stacks written by the sampling profiler of every "
+        "worker into one file for flamegraph.pl or speedscope"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Collapsed stack files (default: every *.collapsed file in "
+            "SAMPLING_PROFILER_DIR)",
+        )
+        parser.add_argument(
+            "--route",
+            help="Only this route (e.g. bikes:bike-list), without the route frame",
+        )
+        parser.add_argument("--output", "-o", help="Write here instead of stdout")
+
+    def handle(self, *args, **options):
+        paths = options["paths"]
+        if not paths:
+            directory = settings.SAMPLING_PROFILER_DIR
+            if not directory:
+                raise CommandError(
+                    "Pass collapsed stack files or set SAMPLING_PROFILER_DIR"
+                )
+            paths = sorted(Path(directory).glob("*.collapsed"))
+        if not paths:
+            raise CommandError("No collapsed stack files found")
+
+        try:
+            stacks = merge_collapsed(paths, route=options["route"])
+        except OSError as exc:
+            raise CommandError(f"Could not read profile: {exc}")
+
+        lines = "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        if options["output"]:
+            Path(options["output"]).write_text(lines)
+        else:
+            self.stdout.write(lines, ending="")
+        self.stderr.write(
+            f"Merged {sum(stacks.values())} samples from {len(paths)} file(s)"
+        )
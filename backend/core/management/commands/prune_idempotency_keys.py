@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from utils.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys; run it daily, e.g. from cron"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_idempotency_keys()} idempotency keys")
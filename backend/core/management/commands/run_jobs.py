@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from core.jobs import run_next_job
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs in a pool of threads; runs until stopped, "
+        "or with --once until no job is due"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Jobs run at the same time, one thread each",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when no job is due"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Seconds a thread waits while no job is due",
+        )
+
+    def handle(self, *args, **options):
+        counts = []
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(options["once"], options["poll_interval"], counts),
+                name=f"jobs-{n}",
+            )
+            for n in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(f"Ran {sum(counts)} jobs")
+
+    def work(self, once, poll_interval, counts):
+        ran = 0
+        try:
+            while True:
+                # Drops connections that broke while the thread slept.
+                close_old_connections()
+                try:
+                    job = run_next_job()
+                except DatabaseError:
+                    logger.exception("Could not claim or record a job")
+                    job = None
+                metrics.REGISTRY.maybe_flush()
+                if job is not None:
+                    ran += 1
+                    continue
+                if once:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            counts.append(ran)
+            connections.close_all()
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.10 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="body",
+            field=models.BinaryField(default=b""),
+        ),
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="status_code",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
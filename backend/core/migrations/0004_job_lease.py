@@ -0,0 +1,40 @@
+# Generated by Django 5.0.10 on 2026-10-19 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_idempotencykey_claims"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="locked_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="queued",
+                max_length=16,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("status", "running")),
+                fields=["locked_until"],
+                name="job_running_lease",
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,3 +12,102 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+    def save(self, *args, **kwargs):
+        # Receivers write the sync log (sync.signals) and booking events
+        # (bookings.events) on post_save: they must commit with the change. No
+        # savepoint, so inside a transaction this adds no query.
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", _("Queued")
+    RUNNING = "running", _("Running")
+    DONE = "done", _("Done")
+    FAILED = "failed", _("Failed")
+
+
+class Job(models.Model):
+    """
+    A call of the job registered as ``name`` with ``kwargs``, run by
+    ``manage.py run_jobs`` at or after ``run_at`` (see ``core.jobs``).
+
+    Due jobs run highest ``priority`` first, then oldest ``run_at``. A
+    running job is leased to its worker until ``locked_until``; after that
+    another worker may claim it again. A job that raises is queued again
+    after a backoff until ``max_attempts``, then marked failed.
+    ``idempotency_key``, when set, makes enqueueing the same job twice return
+    the first one.
+    """
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=16, choices=JobStatus.choices, default=JobStatus.QUEUED
+    )
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                models.F("priority").desc(),
+                "run_at",
+                name="job_queued_order",
+                condition=models.Q(status="queued"),
+            ),
+            models.Index(
+                fields=["locked_until"],
+                name="job_running_lease",
+                condition=models.Q(status="running"),
+            ),
+            models.Index(fields=["finished_at"], name="job_finished"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a POST that a user sent with an ``Idempotency-Key``
+    header, replayed when the same user sends the same key again (see
+    ``utils.idempotency``). Ignored after ``expires_at`` and then pruned.
+
+    A row without ``status_code`` is a claim: the first request with the key
+    is still running. Its ``expires_at`` is the end of the claim's lease.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    # Hash of the method, path and body; a key reused for another is refused.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=255, blank=True)
+    body = models.BinaryField(default=b"")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key"
+            ),
+        ]
+        indexes = [models.Index(fields=["expires_at"], name="idempotency_expires")]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
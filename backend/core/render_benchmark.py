@@ -0,0 +1,77 @@
+"""
+Microbenchmark of ``FastJSONRenderer`` against DRF's ``JSONRenderer``.
+
+Each case renders the ``api_response`` body of one list page, built the way
+the view builds it, with both renderers. It reports the median time of each
+and checks that the bytes are identical.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core.serializer_benchmark import CASES, _median_ms, benchmark_viewer
+from utils.renderers import FastJSONRenderer
+from utils.response import api_response
+
+
+def page_body(case, viewer, page_size):
+    """The response data of a ``page_size`` page of ``case``, as the view returns it."""
+    request = RequestFactory().get("/")
+    request.user = viewer
+    _, queryset = case.querysets(viewer)
+    serializer = case.values_class(context={"request": request})
+    rows = serializer.rows(queryset)
+    return api_response(
+        success=True,
+        message="Page fetched successfully",
+        data={
+            "results": serializer.serialize(rows[:page_size]),
+            "count": rows.count(),
+            "next": "http://testserver/?page=2",
+            "previous": None,
+        },
+    ).data
+
+
+def run_render_case(case, viewer, page_size, repeat):
+    body = page_body(case, viewer, page_size)
+    stdlib, fast = JSONRenderer(), FastJSONRenderer()
+    rendered = stdlib.render(body)
+    stdlib_ms = _median_ms(lambda: stdlib.render(body), repeat)
+    fast_ms = _median_ms(lambda: fast.render(body), repeat)
+    return {
+        "rows": len(body["data"]["results"]),
+        "bytes": len(rendered),
+        "identical": fast.render(body) == rendered,
+        "stdlib_ms": round(stdlib_ms, 3),
+        "fast_ms": round(fast_ms, 3),
+        "speedup": round(stdlib_ms / fast_ms, 1) if fast_ms else None,
+    }
+
+
+def run_render_benchmark(page_size=50, repeat=200, cases=CASES):
+    """{case name: result}, or None without data."""
+    viewer = benchmark_viewer()
+    if viewer is None:
+        return None
+    return {
+        case.name: run_render_case(
+            case, AnonymousUser() if case.anonymous else viewer, page_size, repeat
+        )
+        for case in cases
+    }
+
+
+def format_render_report(report):
+    lines = [
+        f"{'case':<20} {'rows':>4} {'bytes':>7}  {'identical':<9}  "
+        f"{'stdlib_ms':>9} {'fast_ms':>7} {'speedup':>7}"
+    ]
+    for name, result in report.items():
+        lines.append(
+            f"{name:<20} {result['rows']:>4} {result['bytes']:>7}  "
+            f"{str(result['identical']):<9}  {result['stdlib_ms']:>9} "
+            f"{result['fast_ms']:>7} {result['speedup']:>6}x"
+        )
+    return "\n".join(lines)
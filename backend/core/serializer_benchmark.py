@@ -0,0 +1,163 @@
+"""
+Microbenchmarks of the ``.values()`` serializers against the DRF serializers
+they mirror.
+
+Each case serializes one page of the same rows both ways and reports the
+median time of:
+
+- ``end_to_end``: loading the page (queries included) and serializing it
+- ``serialize``: serializing rows that are already loaded, i.e. DRF field
+  machinery against the compiled getters
+
+Every run also checks that both outputs render to the same JSON.
+"""
+
+import statistics
+import time
+from dataclasses import dataclass
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from bikes.models import Bike
+from bikes.querysets import with_bike_relations
+from bikes.serializers import BikeSerializer, BikeValuesSerializer
+from bookings.models import Booking
+from bookings.serializers import BookingSerializer, BookingValuesSerializer
+from ratings.models import Rating
+from ratings.serializers import RatingSerializer, RatingValuesSerializer
+from ratings.views import with_rating_relations
+from users.models import User
+
+
+@dataclass
+class SerializerCase:
+    name: str
+    serializer_class: type
+    values_class: type
+    # (viewer) -> (queryset for the DRF serializer, queryset for the values one)
+    querysets: object
+    anonymous: bool = False
+
+
+def _bikes(viewer):
+    queryset = Bike.objects.order_by("-created_at")
+    return with_bike_relations(queryset, viewer), queryset
+
+
+def _bookings(viewer):
+    queryset = Booking.objects.filter(renter=viewer).order_by("-created_at")
+    drf = with_bike_relations(queryset.select_related("renter"), viewer, "bike__")
+    return drf, queryset
+
+
+def _ratings(viewer):
+    bike_id = Rating.objects.order_by("-pk").values_list("bike", flat=True).first()
+    queryset = Rating.objects.filter(bike=bike_id).order_by("-created_at")
+    return with_rating_relations(queryset, viewer), queryset
+
+
+CASES = [
+    SerializerCase("bike list", BikeSerializer, BikeValuesSerializer, _bikes),
+    SerializerCase(
+        "bike list anonymous",
+        BikeSerializer,
+        BikeValuesSerializer,
+        _bikes,
+        anonymous=True,
+    ),
+    SerializerCase(
+        "my bookings", BookingSerializer, BookingValuesSerializer, _bookings
+    ),
+    SerializerCase("bike ratings", RatingSerializer, RatingValuesSerializer, _ratings),
+]
+
+
+def _median_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_case(case, viewer, page_size, repeat):
+    request = RequestFactory().get("/")
+    request.user = viewer
+    context = {"request": request}
+    drf_queryset, values_queryset = case.querysets(viewer)
+    fast = case.values_class(context=context)
+
+    def drf_end_to_end():
+        page = list(drf_queryset[:page_size])
+        return case.serializer_class(page, many=True, context=context).data
+
+    def values_end_to_end():
+        return fast.serialize(fast.rows(values_queryset)[:page_size])
+
+    drf_data = drf_end_to_end()
+    values_data = values_end_to_end()
+    renderer = JSONRenderer()
+
+    instances = list(drf_queryset[:page_size])
+    rows = list(fast.rows(values_queryset)[:page_size])
+    fast.prepare(rows)
+
+    result = {
+        "rows": len(rows),
+        "identical": renderer.render(drf_data) == renderer.render(values_data),
+    }
+    for name, drf, values in (
+        ("end_to_end", drf_end_to_end, values_end_to_end),
+        (
+            "serialize",
+            lambda: case.serializer_class(instances, many=True, context=context).data,
+            lambda: [fast.to_representation(row) for row in rows],
+        ),
+    ):
+        drf_ms = _median_ms(drf, repeat)
+        values_ms = _median_ms(values, repeat)
+        result[name] = {
+            "drf_ms": round(drf_ms, 3),
+            "values_ms": round(values_ms, 3),
+            "speedup": round(drf_ms / values_ms, 1) if values_ms else None,
+        }
+    return result
+
+
+def benchmark_viewer():
+    """A renter with bookings, or None without data."""
+    renter_id = Booking.objects.order_by("-pk").values_list("renter", flat=True).first()
+    return None if renter_id is None else User.objects.get(pk=renter_id)
+
+
+def run_serializer_benchmark(page_size=50, repeat=30, cases=CASES):
+    """{case name: result} for a renter with bookings, or None without data."""
+    renter = benchmark_viewer()
+    if renter is None:
+        return None
+    return {
+        case.name: run_case(
+            case, AnonymousUser() if case.anonymous else renter, page_size, repeat
+        )
+        for case in cases
+    }
+
+
+def format_serializer_report(report):
+    header = (
+        f"{'case':<20} {'rows':>4}  {'identical':<9}  "
+        f"{'drf_ms':>8} {'values_ms':>9} {'speedup':>7}  "
+        f"{'ser_drf_ms':>10} {'ser_values_ms':>13} {'speedup':>7}"
+    )
+    lines = [header]
+    for name, result in report.items():
+        e2e, ser = result["end_to_end"], result["serialize"]
+        lines.append(
+            f"{name:<20} {result['rows']:>4}  {str(result['identical']):<9}  "
+            f"{e2e['drf_ms']:>8} {e2e['values_ms']:>9} {e2e['speedup']:>6}x  "
+            f"{ser['drf_ms']:>10} {ser['values_ms']:>13} {ser['speedup']:>6}x"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,246 @@
+"""
+Throughput of the read endpoints under WSGI and under ASGI.
+
+Starts gunicorn with the same number of workers twice: with sync workers
+serving ``backend.wsgi``, then with uvicorn workers serving ``backend.asgi``.
+It replays the read mix below over HTTP at each concurrency level, the way
+``core.benchmark`` does, and reports requests per second and latency for
+each server and level.
+
+``env`` sets environment variables of both servers, e.g. to compare
+``DB_POOL_MAX_SIZE=0`` (a new connection per request) with the default
+connection pool by running twice.
+
+Optionally, ``slow_clients`` connections keep sending a request one byte at
+a time while the mix runs, like clients on a bad mobile network. A sync
+worker reading such a request can serve nobody else; that is the case ASGI
+is for.
+"""
+
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmark import (
+    SCENARIOS,
+    BenchmarkRequest,
+    HttpTransport,
+    Scenario,
+    TokenCache,
+    run_benchmark,
+)
+
+SERVERS = {
+    "wsgi": ("backend.wsgi", "sync"),
+    "asgi": ("backend.asgi", "uvicorn.workers.UvicornWorker"),
+}
+
+
+def _home(data, rng):
+    return BenchmarkRequest("GET", reverse("core:home"))
+
+
+def _favorite_status(data, rng):
+    bike_id, _ = data.bike(rng)
+    return BenchmarkRequest(
+        "GET",
+        reverse("favorites:favorite-status", args=[bike_id]),
+        user_id=data.renter(rng),
+    )
+
+
+# The endpoints served by async views, in the proportions of SCENARIOS.
+READ_SCENARIOS = [
+    scenario
+    for scenario in SCENARIOS
+    if scenario.name in ("bike_list", "bike_detail", "rating_stats")
+] + [
+    Scenario("home", 10, _home),
+    Scenario("favorite_status", 10, _favorite_status),
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_server(kind, workers=2, startup_timeout=30, env=None):
+    """Run gunicorn serving ``kind`` (``"wsgi"`` or ``"asgi"``); yields its URL."""
+    app, worker_class = SERVERS[kind]
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            "gunicorn.conf.py",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--worker-class",
+            worker_class,
+            app,
+        ],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start in time")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class SlowClients:
+    """
+    ``count`` connections that send a request one byte every ``interval``
+    seconds until the block ends, reconnecting when the server gives up.
+    """
+
+    def __init__(self, url, count, interval=1.0):
+        parts = urlsplit(url)
+        self.address = (parts.hostname, parts.port)
+        self.count = count
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def __enter__(self):
+        self.threads = [
+            threading.Thread(target=self._trickle, daemon=True)
+            for _ in range(self.count)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _trickle(self):
+        while not self.stopped.is_set():
+            try:
+                with socket.create_connection(self.address, timeout=5) as sock:
+                    sock.sendall(b"GET /home/ HTTP/1.1\r\nHost: localhost\r\n")
+                    while not self.stopped.wait(self.interval):
+                        # A header name that never ends.
+                        sock.sendall(b"x")
+            except OSError:
+                self.stopped.wait(self.interval)
+
+
+class ServerTransport(HttpTransport):
+    """
+    ``HttpTransport`` that counts a request the server did not answer in
+    time as an error (status 0) instead of stopping the run.
+    """
+
+    def send(self, request):
+        started = time.perf_counter()
+        try:
+            return super().send(request)
+        except self.requests.RequestException:
+            return 0, time.perf_counter() - started, None
+
+
+def run_server_benchmark(
+    servers=tuple(SERVERS),
+    concurrency=(1, 8, 32),
+    requests=300,
+    warmup=20,
+    workers=2,
+    slow_clients=0,
+    seed=42,
+    timeout=10,
+    scenarios=READ_SCENARIOS,
+    env=None,
+):
+    """Replay ``scenarios`` against each server at each concurrency level."""
+    tokens = TokenCache()
+    results = {}
+    for kind in servers:
+        with (
+            running_server(kind, workers, env=env) as url,
+            SlowClients(url, slow_clients),
+        ):
+            transport = ServerTransport(url, tokens, timeout)
+            results[kind] = {
+                str(level): run_benchmark(
+                    transport,
+                    scenarios=scenarios,
+                    requests=requests,
+                    warmup=warmup,
+                    concurrency=level,
+                    seed=seed,
+                )["total"]
+                for level in concurrency
+            }
+    return {
+        "meta": {
+            "requests": requests,
+            "warmup": warmup,
+            "workers": workers,
+            "slow_clients": slow_clients,
+            "timeout": timeout,
+            "scenarios": [scenario.name for scenario in scenarios],
+            "env": env or {},
+            "seed": seed,
+            "python": platform.python_version(),
+            "created_at": timezone.now().isoformat(),
+        },
+        "servers": results,
+    }
+
+
+def format_server_report(report):
+    """Render a report as an aligned text table, one row per concurrency level."""
+    servers = list(report["servers"])
+    levels = list(next(iter(report["servers"].values()), {}))
+    header = ["concurrency"]
+    for kind in servers:
+        header += [f"{kind} rps", f"{kind} p95_ms", f"{kind} errors"]
+    rows = [header]
+    for level in levels:
+        row = [level]
+        for kind in servers:
+            total = report["servers"][kind][level]
+            row += [str(total["rps"]), str(total["p95_ms"]), str(total["errors"])]
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows
+    )
@@ -0,0 +1,540 @@
+"""
+Seeded synthetic marketplace data for performance work.
+
+Rows are generated from a single ``random.Random(seed)`` and a fixed anchor
+time, and are given explicit primary keys starting after the current maximum
+of each table, so the same seed and anchor on an empty database always
+produce the same rows. They are streamed into PostgreSQL with ``COPY``, one
+chunk at a time, so memory stays flat whatever the volume.
+
+Bookings are laid out per bike as a sequence of non-overlapping rentals over
+the history window; their status follows from where the rental falls relative
+to the anchor. Bike popularity, owner fleet sizes and favorites are skewed so
+that a few bikes and owners carry most of the traffic.
+"""
+
+import io
+import json
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from bikes.models import Bike, BikeImage, BikeStatus, BikeType
+from bookings.models import Booking, BookingStatus
+from favorites.models import Favorite
+from ratings.models import Rating
+from users.models import User
+
+FIRST_NAMES = [
+    "Alex",
+    "Sam",
+    "Jordan",
+    "Taylor",
+    "Morgan",
+    "Casey",
+    "Riley",
+    "Jamie",
+    "Avery",
+    "Quinn",
+    "Robin",
+    "Drew",
+    "Charlie",
+    "Emery",
+    "Harper",
+    "Rowan",
+]
+LAST_NAMES = [
+    "Smith",
+    "Garcia",
+    "Chen",
+    "Okafor",
+    "Müller",
+    "Rossi",
+    "Kowalski",
+    "Silva",
+    "Nguyen",
+    "Haddad",
+    "Larsen",
+    "Tanaka",
+    "Dubois",
+    "Ahmed",
+    "Novak",
+    "Reyes",
+]
+AREAS = [
+    "Downtown",
+    "Mission District",
+    "Waterfront",
+    "University Quarter",
+    "Old Town",
+    "Business District",
+    "Riverside",
+    "Hillside",
+]
+FEATURES = [
+    "LED lights",
+    "Phone mount",
+    "Rear rack",
+    "Suspension fork",
+    "Fenders",
+    "Security lock",
+    "Basket",
+    "Child seat",
+    "Hydraulic brakes",
+    "GPS tracker",
+]
+COMMENTS = [
+    "Great bike, smooth ride.",
+    "Battery lasted the whole day.",
+    "Pickup was easy and the owner was helpful.",
+    "A bit heavy on the hills.",
+    "Would rent again.",
+]
+
+BIKE_TYPE_WEIGHTS = [
+    (BikeType.CITY, 35),
+    (BikeType.HYBRID, 20),
+    (BikeType.MOUNTAIN, 15),
+    (BikeType.ROAD, 12),
+    (BikeType.CARGO, 10),
+    (BikeType.FOLDING, 8),
+]
+BIKE_STATUS_WEIGHTS = [
+    (BikeStatus.AVAILABLE, 85),
+    (BikeStatus.UNAVAILABLE, 10),
+    (BikeStatus.MAINTENANCE, 5),
+]
+RATING_WEIGHTS = [(1, 3), (2, 5), (3, 12), (4, 35), (5, 45)]
+
+HOUR = 3600
+DAY = 24 * HOUR
+CENT = Decimal("0.01")
+
+
+@dataclass
+class DatasetSize:
+    """Number of rows to generate per table."""
+
+    users: int = 100_000
+    bikes: int = 200_000
+    bookings: int = 5_000_000
+    favorites: int = 1_000_000
+    owner_share: float = 0.2
+    max_images: int = 4
+    rated_share: float = 0.4
+
+    def scaled(self, factor):
+        """Return a copy with every volume multiplied by ``factor``."""
+        return DatasetSize(
+            users=max(2, round(self.users * factor)),
+            bikes=max(1, round(self.bikes * factor)),
+            bookings=round(self.bookings * factor),
+            favorites=round(self.favorites * factor),
+            owner_share=self.owner_share,
+            max_images=self.max_images,
+            rated_share=self.rated_share,
+        )
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class CopyWriter:
+    """Stream rows of one model into its table with ``COPY ... FROM STDIN``."""
+
+    def __init__(self, model, chunk_size=50_000):
+        self.model = model
+        self.chunk_size = chunk_size
+        self.fields = model._meta.concrete_fields
+        self.defaults = {
+            field.attname: field.get_default()
+            for field in self.fields
+            if field.has_default() or field.null
+        }
+        columns = ", ".join(connection.ops.quote_name(f.column) for f in self.fields)
+        self.sql = (
+            f"COPY {connection.ops.quote_name(model._meta.db_table)} "
+            f"({columns}) FROM STDIN"
+        )
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.written = 0
+
+    def write(self, row):
+        """Queue one row given as a dict keyed by field attname."""
+        values = []
+        for field in self.fields:
+            name = field.attname
+            values.append(
+                _copy_value(row[name] if name in row else self.defaults[name])
+            )
+        self.buffer.write("\t".join(values))
+        self.buffer.write("\n")
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(self.sql, self.buffer)
+        self.written += self.pending
+        self.pending = 0
+        self.buffer = io.StringIO()
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _allocate(total, weights, cap=None):
+    """Split ``total`` in proportion to ``weights``, at most ``cap`` each."""
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    if cap is not None:
+        counts = [min(count, cap) for count in counts]
+    remaining = total - sum(counts)
+    index = 0
+    while remaining > 0 and index < len(counts) * 2:
+        slot = index % len(counts)
+        if cap is None or counts[slot] < cap:
+            counts[slot] += 1
+            remaining -= 1
+        index += 1
+    return counts
+
+
+class DatasetGenerator:
+    """Generate a reproducible marketplace of the given ``size``."""
+
+    def __init__(
+        self,
+        size,
+        seed=42,
+        anchor=None,
+        history_days=365,
+        future_days=30,
+        chunk_size=50_000,
+        password="synthetic-password",
+    ):
+        self.size = size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        if anchor is None:
+            today = datetime.now(dt_timezone.utc).date()
+            anchor = datetime(
+                today.year, today.month, today.day, tzinfo=dt_timezone.utc
+            )
+        self.anchor = anchor
+        self.history_start = anchor - timedelta(days=history_days)
+        self.history_end = anchor + timedelta(days=future_days)
+        self.chunk_size = chunk_size
+        self.password = password
+        self.counts = {}
+
+    def run(self, log=None):
+        """Generate every table and return the number of rows written to each."""
+        log = log or (lambda message: None)
+        with transaction.atomic():
+            self.generate_users()
+        log(f"users: {self.counts['users']}")
+        with transaction.atomic():
+            self.generate_bikes()
+        log(f"bikes: {self.counts['bikes']}, images: {self.counts['bike_images']}")
+        with transaction.atomic():
+            self.generate_bookings()
+        log(f"bookings: {self.counts['bookings']}, ratings: {self.counts['ratings']}")
+        with transaction.atomic():
+            self.generate_favorites()
+        log(f"favorites: {self.counts['favorites']}")
+        self.reset_sequences()
+        return self.counts
+
+    def _writer(self, model):
+        return CopyWriter(model, self.chunk_size)
+
+    def _timestamp(self, seconds):
+        return self.anchor + timedelta(seconds=seconds)
+
+    def generate_users(self):
+        rng = self.rng
+        first_id = _next_id(User)
+        password = make_password(self.password)
+        owners = max(1, round(self.size.users * self.size.owner_share))
+        writer = self._writer(User)
+        for offset in range(self.size.users):
+            pk = first_id + offset
+            joined = self._timestamp(-rng.uniform(30 * DAY, 730 * DAY))
+            writer.write(
+                {
+                    "id": pk,
+                    "password": password,
+                    "email": f"member{pk}@synthetic.example.com",
+                    "first_name": rng.choice(FIRST_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                    "is_superuser": False,
+                    "is_staff": False,
+                    "is_active": True,
+                    "date_joined": joined,
+                    "is_owner": offset < owners,
+                    "is_renter": True,
+                    "phone": f"+1555{pk % 10_000_000:07d}",
+                    "profile_photo": None,
+                }
+            )
+        writer.flush()
+        self.user_ids = range(first_id, first_id + self.size.users)
+        self.owner_ids = range(first_id, first_id + owners)
+        self.counts["users"] = writer.written
+
+    def generate_bikes(self):
+        rng = self.rng
+        first_id = _next_id(Bike)
+        first_image_id = _next_id(BikeImage)
+        # A few owners run large fleets, most list one or two bikes.
+        owner_weights = [min(rng.paretovariate(1.2), 50) for _ in self.owner_ids]
+        owners = rng.choices(self.owner_ids, weights=owner_weights, k=self.size.bikes)
+
+        bikes = self._writer(Bike)
+        images = self._writer(BikeImage)
+        self.bikes = []
+        image_id = first_image_id
+        for offset, owner_id in enumerate(owners):
+            pk = first_id + offset
+            bike_type = _weighted(rng, BIKE_TYPE_WEIGHTS)
+            label = str(bike_type.label)
+            daily_rate = Decimal(rng.randrange(20, 160, 5))
+            hourly_rate = (
+                (daily_rate / 6).quantize(CENT) if rng.random() < 0.9 else None
+            )
+            created_at = self._timestamp(-rng.uniform(30 * DAY, 540 * DAY))
+            area = rng.choice(AREAS)
+            bikes.write(
+                {
+                    "id": pk,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "owner_id": owner_id,
+                    "title": f"{label} e-bike #{pk}",
+                    "description": f"A well kept {label.lower()} e-bike in {area}.",
+                    "location": f"{area}, San Francisco",
+                    "hourly_rate": hourly_rate,
+                    "daily_rate": daily_rate,
+                    "bike_type": bike_type.value,
+                    "battery_range": rng.randrange(30, 121, 5),
+                    "max_speed": rng.choice([20, 25, 28, 32, 45]),
+                    "weight": Decimal(rng.randrange(1500, 4000)) / 100,
+                    "features": rng.sample(FEATURES, rng.randint(0, 4)),
+                    "status": _weighted(rng, BIKE_STATUS_WEIGHTS).value,
+                }
+            )
+            for order in range(rng.randint(1, self.size.max_images)):
+                images.write(
+                    {
+                        "id": image_id,
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                        "bike_id": pk,
+                        "image": f"bike_images/synthetic/{pk}_{order}.jpg",
+                        "alt_text": f"Photo {order + 1} of bike {pk}",
+                        "caption": "",
+                        "is_primary": order == 0,
+                        "order": order,
+                    }
+                )
+                image_id += 1
+            self.bikes.append((pk, owner_id, hourly_rate, daily_rate))
+        bikes.flush()
+        images.flush()
+        self.counts["bikes"] = bikes.written
+        self.counts["bike_images"] = images.written
+
+    def _bookings_per_bike(self):
+        weights = [min(self.rng.paretovariate(1.5), 8) for _ in self.bikes]
+        return _allocate(self.size.bookings, weights)
+
+    def _duration_hours(self):
+        rng = self.rng
+        if rng.random() < 0.65:
+            return rng.randint(1, 8)
+        return 24 * rng.randint(1, 7)
+
+    def _price(self, hours, hourly_rate, daily_rate):
+        # Same rule as BookingCreateSerializer.
+        if hours >= 24:
+            price = Decimal(str(hours / 24)) * daily_rate
+        elif hourly_rate:
+            price = Decimal(str(hours)) * hourly_rate
+        else:
+            price = Decimal(str(hours)) * (daily_rate / Decimal("24"))
+        return price.quantize(CENT)
+
+    def _status(self, start, end):
+        rng = self.rng
+        if end <= 0:
+            return (
+                BookingStatus.COMPLETED
+                if rng.random() < 0.85
+                else BookingStatus.CANCELLED
+            )
+        if start <= 0:
+            return (
+                BookingStatus.ACTIVE if rng.random() < 0.9 else BookingStatus.CANCELLED
+            )
+        pick = rng.random()
+        if pick < 0.55:
+            return BookingStatus.APPROVED
+        if pick < 0.9:
+            return BookingStatus.REQUESTED
+        return BookingStatus.CANCELLED
+
+    def generate_bookings(self):
+        rng = self.rng
+        booking_id = _next_id(Booking)
+        rating_id = _next_id(Rating)
+        bookings = self._writer(Booking)
+        ratings = self._writer(Rating)
+        window_start = (self.history_start - self.anchor).total_seconds()
+        span = (self.history_end - self.history_start).total_seconds()
+        first_user, last_user = self.user_ids[0], self.user_ids[-1]
+
+        for (bike_id, owner_id, hourly_rate, daily_rate), count in zip(
+            self.bikes, self._bookings_per_bike()
+        ):
+            if not count:
+                continue
+            # Rentals follow each other with exponential gaps that spread
+            # ``count`` bookings of average length over the whole window.
+            mean_gap = max(HOUR, span / count - 36 * HOUR)
+            cursor = window_start + rng.uniform(0, mean_gap)
+            for _ in range(count):
+                hours = self._duration_hours()
+                start = math.floor(cursor / HOUR) * HOUR
+                end = start + hours * HOUR
+                cursor = end + rng.expovariate(1 / mean_gap)
+                status = self._status(start, end)
+
+                renter_id = rng.randint(first_user, last_user)
+                if renter_id == owner_id:
+                    renter_id = first_user if renter_id == last_user else renter_id + 1
+                created = min(start - rng.uniform(HOUR, 14 * DAY), 0)
+                # Requests are untouched; anything else was last changed by
+                # the owner or the status sweep, at the latest when it ended.
+                updated = created
+                if status != BookingStatus.REQUESTED:
+                    updated = max(created, min(end, 0))
+                bookings.write(
+                    {
+                        "id": booking_id,
+                        "created_at": self._timestamp(created),
+                        "updated_at": self._timestamp(updated),
+                        "bike_id": bike_id,
+                        "renter_id": renter_id,
+                        "start_time": self._timestamp(start),
+                        "end_time": self._timestamp(end),
+                        "total_price": self._price(hours, hourly_rate, daily_rate),
+                        "status": status.value,
+                    }
+                )
+                if (
+                    status == BookingStatus.COMPLETED
+                    and rng.random() < self.size.rated_share
+                ):
+                    rated = min(end + rng.uniform(HOUR, 3 * DAY), 0)
+                    ratings.write(
+                        {
+                            "id": rating_id,
+                            "created_at": self._timestamp(rated),
+                            "updated_at": self._timestamp(rated),
+                            "bike_id": bike_id,
+                            "user_id": renter_id,
+                            "booking_id": booking_id,
+                            "rating": _weighted(rng, RATING_WEIGHTS),
+                            "comment": (
+                                rng.choice(COMMENTS) if rng.random() < 0.5 else None
+                            ),
+                        }
+                    )
+                    rating_id += 1
+                booking_id += 1
+        bookings.flush()
+        ratings.flush()
+        self.counts["bookings"] = bookings.written
+        self.counts["ratings"] = ratings.written
+
+    def generate_favorites(self):
+        rng = self.rng
+        favorite_id = _next_id(Favorite)
+        writer = self._writer(Favorite)
+        bike_ids = [bike[0] for bike in self.bikes]
+        # Popular bikes collect most of the favorites, and a few users keep
+        # long lists while most keep none or a handful.
+        cum_weights = []
+        total = 0.0
+        for _ in bike_ids:
+            total += min(rng.paretovariate(1.2), 50)
+            cum_weights.append(total)
+        user_weights = [rng.expovariate(1) for _ in self.user_ids]
+        counts = _allocate(self.size.favorites, user_weights, cap=len(bike_ids))
+
+        for user_id, wanted in zip(self.user_ids, counts):
+            chosen = set()
+            for _ in range(wanted * 4):
+                chosen.add(rng.choices(bike_ids, cum_weights=cum_weights)[0])
+                if len(chosen) == wanted:
+                    break
+            # Fill up lists that keep hitting the same popular bikes.
+            offset = rng.randrange(len(bike_ids))
+            while len(chosen) < wanted:
+                chosen.add(bike_ids[offset % len(bike_ids)])
+                offset += 1
+            for bike_id in sorted(chosen):
+                created = self._timestamp(-rng.uniform(0, 365 * DAY))
+                writer.write(
+                    {
+                        "id": favorite_id,
+                        "created_at": created,
+                        "updated_at": created,
+                        "user_id": user_id,
+                        "bike_id": bike_id,
+                    }
+                )
+                favorite_id += 1
+        writer.flush()
+        self.counts["favorites"] = writer.written
+
+    def reset_sequences(self):
+        """Move every primary key sequence past the explicitly assigned ids."""
+        models = [User, Bike, BikeImage, Booking, Rating, Favorite]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
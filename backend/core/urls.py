@@ -1,11 +1,12 @@
 from django.urls import path
 from django.views.generic import RedirectView
 
-from .views import HomePageAPIView
+from .views import HomePageAPIView, metrics_view
 
 app_name = "core"
 
 urlpatterns = [
     path("", RedirectView.as_view(url="/swagger/"), name="home"),
     path("home/", HomePageAPIView.as_view(), name="home"),
+    path("metrics/", metrics_view, name="metrics"),
 ]
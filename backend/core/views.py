@@ -1,28 +1,33 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions
-from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 
+from utils import metrics
 from utils.response import api_response
+from utils.views import AsyncAPIView
 from bikes.models import Bike
-from bikes.serializers import BikeSerializer
+from bikes.serializers import BikeValuesSerializer
 from bikes.models import MaintenanceTicket
 from bikes.serializers import MaintenanceTicketSerializer
 
 
-class HomePageAPIView(APIView):
+class HomePageAPIView(AsyncAPIView):
     """Home page view."""
 
     permission_classes = [AllowAny]
+    replica_reads = True
 
-    def get(self, request):
-        # Get the first 8 bikes
-        bikes = Bike.objects.all()[:8]
-        # Get the request from the context
-        serializer = BikeSerializer(bikes, many=True, context=self.get_renderer_context())
+    async def get(self, request):
+        # The first 8 bikes, as BikeSerializer renders them
+        serializer = BikeValuesSerializer(context=self.get_renderer_context())
+        bikes = serializer.values(Bike.objects.all())[:8]
         context = {
-            "bikes": serializer.data,
+            "bikes": await serializer.aserialize(bikes),
         }
         return api_response(
             success=True,
@@ -32,6 +37,26 @@ class HomePageAPIView(APIView):
         )
 
 
+def metrics_view(request):
+    """
+    Metrics of all workers in the Prometheus text format. Requires
+    ``Authorization: Bearer <METRICS_TOKEN>``; without a token configured the
+    endpoint does not exist.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    expected = f"Bearer {token}"
+    provided = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(provided.encode(), expected.encode()):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+    snapshot = metrics.with_cache_hit_ratio(metrics.REGISTRY.collect())
+    return HttpResponse(
+        metrics.render(snapshot), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 class MaintenanceTicketListCreateView(generics.ListCreateAPIView):
     serializer_class = MaintenanceTicketSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0004_bike_bike_created_bike_bike_status_created_and_more"),
+        ("favorites", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="favorite",
+            index=models.Index(
+                fields=["user", "-created_at"], name="favorite_user_created"
+            ),
+        ),
+    ]
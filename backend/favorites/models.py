@@ -16,6 +16,9 @@ class Favorite(BaseModel):
     class Meta:
         unique_together = ("user", "bike")  # Prevent duplicate favorites
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="favorite_user_created"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.bike.title}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Favorite
-from bikes.serializers import BikeSerializer
+from bikes.serializers import BikeSerializer, BikeValuesSerializer
+from utils.serializers import ValuesSerializer
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -14,6 +15,13 @@ class FavoriteSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
+class FavoriteValuesSerializer(ValuesSerializer):
+    """``FavoriteSerializer`` output built from ``.values()`` rows."""
+
+    serializer_class = FavoriteSerializer
+    nested = {"bike": BikeValuesSerializer}
+
+
 class CreateFavoriteSerializer(serializers.ModelSerializer):
     """Serializer for creating favorites"""
 
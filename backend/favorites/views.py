@@ -2,13 +2,15 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.db import IntegrityError
 
 from .models import Favorite
 from .serializers import FavoriteSerializer, CreateFavoriteSerializer
 from bikes.models import Bike
+from bikes.querysets import with_bike_relations
 from utils.response import api_response
+from utils.views import AsyncAPIView
 
 
 class FavoriteListView(generics.ListAPIView):
@@ -16,9 +18,12 @@ class FavoriteListView(generics.ListAPIView):
 
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user)
+        return with_bike_relations(
+            Favorite.objects.filter(user=self.request.user), self.request.user, "bike__"
+        )
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -94,17 +99,18 @@ class FavoriteDeleteView(APIView):
             )
 
 
-class FavoriteStatusView(APIView):
+class FavoriteStatusView(AsyncAPIView):
     """Check if a bike is in user's favorites"""
 
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
-    def get(self, request, bike_id):
+    async def get(self, request, bike_id):
         try:
-            bike = get_object_or_404(Bike, id=bike_id)
-            is_favorited = Favorite.objects.filter(
+            bike = await aget_object_or_404(Bike, id=bike_id)
+            is_favorited = await Favorite.objects.filter(
                 user=request.user, bike=bike
-            ).exists()
+            ).aexists()
 
             return api_response(
                 success=True,
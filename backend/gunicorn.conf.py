@@ -0,0 +1,24 @@
+"""
+Gunicorn settings. Start with ``gunicorn -c gunicorn.conf.py backend.asgi``.
+
+Workers are uvicorn workers running the ASGI application. The async read
+views and booking event streams wait on the event loop without holding a
+thread; the other API views run one at a time, as in a sync worker. Streamed
+downloads (exports and bike feed files) must give their responses an async
+iterator (see ``utils.streaming``), or Django reads them whole before sending.
+"""
+
+import glob
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+
+
+def on_starting(server):
+    # Workers of a previous run left their metric files behind; start the
+    # counters from zero like a single-process server would.
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "to", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("to", "subject")
+    readonly_fields = ("attempts", "last_error", "created_at", "sent_at")
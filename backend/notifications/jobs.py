@@ -0,0 +1,5 @@
+from core.jobs import register
+
+from .services import prune_emails
+
+register("prune_emails")(prune_emails)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import prune_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sent and failed emails older than EMAIL_RETENTION_DAYS; run it "
+        "daily, e.g. from cron"
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_emails()} emails")
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.services import send_queued_emails
+from utils import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails in batches; runs until stopped, or with --once "
+        "until nothing is due"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when no email is due"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_QUEUE_BATCH_SIZE,
+            help="Emails sent per batch over one connection",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.EMAIL_QUEUE_POLL_INTERVAL,
+            help="Seconds to wait while no email is due",
+        )
+
+    def handle(self, *args, **options):
+        handled = 0
+        while True:
+            # Drops connections that broke while the worker slept.
+            close_old_connections()
+            claimed = send_queued_emails(batch_size=options["batch_size"])
+            handled += claimed
+            metrics.REGISTRY.maybe_flush()
+            if claimed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+        self.stdout.write(f"Handled {handled} emails")
@@ -0,0 +1,49 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class EmailStatus(models.TextChoices):
+    PENDING = "pending", _("Pending")
+    SENT = "sent", _("Sent")
+    FAILED = "failed", _("Failed")
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent, or sent, by ``manage.py send_emails``.
+
+    Rows are written in the transaction of the request that queued them (see
+    ``notifications.services.queue_email``), so an email goes out only if the
+    change it reports was committed. A failed send is retried at
+    ``send_after`` until ``EMAIL_MAX_ATTEMPTS``, then the row is marked
+    failed. Sent and failed rows are pruned after ``EMAIL_RETENTION_DAYS``.
+    """
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=16, choices=EmailStatus.choices, default=EmailStatus.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    send_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["send_after"],
+                name="email_pending_send_after",
+                condition=Q(status="pending"),
+            ),
+            models.Index(fields=["created_at"], name="email_created"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
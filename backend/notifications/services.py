@@ -0,0 +1,156 @@
+"""
+Outbound email, queued in the database and sent by a worker.
+
+Requests call ``queue_email`` and return without waiting for the mail server.
+``manage.py send_emails`` runs ``send_queued_emails`` in a loop: it claims up
+to ``EMAIL_QUEUE_BATCH_SIZE`` due emails with ``SKIP LOCKED``, so that several
+workers can share the queue, and sends them over one connection of the email
+backend. A failed email is retried after ``EMAIL_RETRY_BACKOFF`` seconds,
+doubled on every further attempt, and marked failed after
+``EMAIL_MAX_ATTEMPTS``.
+
+The claim is a short transaction that moves the emails' ``send_after`` to the
+end of a lease of ``EMAIL_SEND_LEASE`` seconds. The emails are then sent
+outside any transaction, so a slow mail server keeps no transaction open (an
+open one would hold back the commit-order reads of ``utils.db``). A worker
+that dies halfway leaves its emails pending, due again when the lease ends:
+they may be sent twice, but are never lost. A worker whose mail server is so
+slow that fewer than ``EMAIL_TIMEOUT`` seconds of the lease are left stops
+there and hands the rest of its batch back, so that no other worker claims an
+email while it is still being sent.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from utils.metrics import EMAIL_DELAY, EMAILS, JOB_DURATION
+
+from .models import EmailStatus, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(to, subject, body, html_body="", from_email=""):
+    """Queue an email to ``to``; it is sent once the current transaction commits."""
+    email = OutboundEmail.objects.create(
+        to=to,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email,
+    )
+    EMAILS.inc(result="queued")
+    return email
+
+
+def retry_delay(attempts):
+    """How long to wait after the ``attempts``-th failed send."""
+    return timedelta(seconds=settings.EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.to],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def send_queued_emails(batch_size=None, now=None):
+    """
+    Send one batch of due emails; returns how many were claimed, 0 when none
+    are due.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    with JOB_DURATION.time(job="email_batch"):
+        emails = _claim(batch_size, now)
+        if not emails:
+            return 0
+        deadline = time.monotonic() + settings.EMAIL_SEND_LEASE - settings.EMAIL_TIMEOUT
+        connection = get_connection()
+        try:
+            for index, email in enumerate(emails):
+                if index and time.monotonic() >= deadline:
+                    logger.warning(
+                        "Email lease running out; handing back %d emails",
+                        len(emails) - index,
+                    )
+                    break
+                _send(email, connection, now)
+        finally:
+            connection.close()
+        # Emails not sent still hold the send_after they were claimed with,
+        # so saving them makes them due again at once.
+        OutboundEmail.objects.bulk_update(
+            emails, ["status", "attempts", "send_after", "last_error", "sent_at"]
+        )
+    return len(emails)
+
+
+def _claim(batch_size, now):
+    """Lease up to ``batch_size`` due emails to this worker."""
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailStatus.PENDING, send_after__lte=now)
+            .order_by("send_after", "pk")[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            send_after=now + timedelta(seconds=settings.EMAIL_SEND_LEASE)
+        )
+    return emails
+
+
+def _send(email, connection, now):
+    email.attempts += 1
+    try:
+        # A no-op while the connection is open; send() alone would open and
+        # close one per email.
+        connection.open()
+        _message(email, connection).send()
+    except Exception as exc:
+        # Anything the backend raises: refused recipients, timeouts, a
+        # dropped connection. The next send opens a new one.
+        connection.close()
+        email.last_error = f"{type(exc).__name__}: {exc}"
+        if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            logger.error("Giving up on email %s: %s", email.pk, email.last_error)
+            email.status = EmailStatus.FAILED
+            EMAILS.inc(result="failed")
+        else:
+            email.send_after = now + retry_delay(email.attempts)
+            EMAILS.inc(result="retried")
+        return
+    email.status = EmailStatus.SENT
+    email.sent_at = timezone.now()
+    email.last_error = ""
+    EMAILS.inc(result="sent")
+    EMAIL_DELAY.observe((email.sent_at - email.created_at).total_seconds())
+
+
+def prune_emails(now=None):
+    """
+    Delete sent and failed emails older than ``EMAIL_RETENTION_DAYS``; returns
+    how many.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.EMAIL_RETENTION_DAYS)
+    with JOB_DURATION.time(job="email_prune"):
+        deleted, _ = (
+            OutboundEmail.objects.exclude(status=EmailStatus.PENDING)
+            .filter(created_at__lt=cutoff)
+            .delete()
+        )
+    return deleted
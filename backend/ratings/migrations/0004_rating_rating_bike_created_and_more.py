@@ -0,0 +1,29 @@
+# Generated by Django 5.0.10 on 2026-10-19 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bikes", "0004_bike_bike_created_bike_bike_status_created_and_more"),
+        ("bookings", "0004_booking_booking_created_and_more"),
+        ("ratings", "0003_alter_rating_unique_together_rating_booking_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(
+                fields=["bike", "-created_at"], name="rating_bike_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(
+                fields=["user", "-created_at"], name="rating_user_created"
+            ),
+        ),
+    ]
@@ -20,6 +20,10 @@ class Rating(BaseModel):
 
     class Meta:
         unique_together = ("bike", "user", "booking")
+        indexes = [
+            models.Index(fields=["bike", "-created_at"], name="rating_bike_created"),
+            models.Index(fields=["user", "-created_at"], name="rating_user_created"),
+        ]
 
     def __str__(self):
         return f"{self.bike.title} - {self.rating}/5 by {self.user.get_full_name()}"
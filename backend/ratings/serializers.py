@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Rating
-from bikes.serializers import BikeSerializer
-from users.serializers import UserSerializer
-from bookings.serializers import BookingSerializer
+from bikes.serializers import BikeSerializer, BikeValuesSerializer
+from users.serializers import UserSerializer, UserValuesSerializer
+from bookings.serializers import BookingSerializer, BookingValuesSerializer
+from utils.serializers import ValuesSerializer
 from bookings.models import Booking, BookingStatus
 
 
@@ -24,6 +25,17 @@ class RatingSerializer(serializers.ModelSerializer):
         return value
 
 
+class RatingValuesSerializer(ValuesSerializer):
+    """``RatingSerializer`` output built from ``.values()`` rows."""
+
+    serializer_class = RatingSerializer
+    nested = {
+        "bike": BikeValuesSerializer,
+        "user": UserValuesSerializer,
+        "booking": BookingValuesSerializer,
+    }
+
+
 class RatingCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating ratings."""
 
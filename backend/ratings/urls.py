@@ -7,7 +7,7 @@ from .views import (
     BikeRatingsAPIView,
     MyRatingsAPIView,
     RateableBookingsAPIView,
-    bike_rating_stats_api_view,
+    BikeRatingStatsAPIView,
 )
 
 app_name = "ratings"
@@ -19,5 +19,5 @@ urlpatterns = [
     path("my-ratings/", MyRatingsAPIView.as_view(), name="my-ratings"),
     path("rateable-bookings/", RateableBookingsAPIView.as_view(), name="rateable-bookings"),
     path("bikes/<int:bike_id>/", BikeRatingsAPIView.as_view(), name="bike-ratings"),
-    path("bikes/<int:bike_id>/stats/", bike_rating_stats_api_view, name="bike-rating-stats"),
+    path("bikes/<int:bike_id>/stats/", BikeRatingStatsAPIView.as_view(), name="bike-rating-stats"),
 ] 
\ No newline at end of file
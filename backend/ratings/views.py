@@ -1,15 +1,28 @@
 from django.shortcuts import render
 from rest_framework import generics, status, filters
-from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Avg, Count
 from django.db import models
 
 from .models import Rating
-from .serializers import RatingSerializer, RatingCreateSerializer, RatingUpdateSerializer
+from .serializers import (
+    RatingSerializer,
+    RatingCreateSerializer,
+    RatingUpdateSerializer,
+    RatingValuesSerializer,
+)
 from bookings.models import Booking, BookingStatus
+from bikes.querysets import with_bike_relations
 from utils.response import api_response
+from utils.views import AsyncAPIView
+
+
+def with_rating_relations(queryset, user):
+    """Load everything ``RatingSerializer`` reads, including the nested booking."""
+    queryset = queryset.select_related("user", "booking__renter")
+    queryset = with_bike_relations(queryset, user, "bike__")
+    return with_bike_relations(queryset, user, "booking__bike__")
 
 
 class RatingListAPIView(generics.ListAPIView):
@@ -17,6 +30,7 @@ class RatingListAPIView(generics.ListAPIView):
 
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -29,7 +43,7 @@ class RatingListAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         """Get ratings based on query parameters."""
-        queryset = Rating.objects.select_related("bike", "user").all()
+        queryset = with_rating_relations(Rating.objects.all(), self.request.user)
 
         # Filter by bike if requested
         bike_id = self.request.query_params.get("bike")
@@ -113,9 +127,12 @@ class RatingDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
 
     def get_queryset(self):
-        return Rating.objects.select_related("bike", "user").all()
+        if self.request.method == "DELETE":
+            return Rating.objects.select_related("user")
+        return with_rating_relations(Rating.objects.all(), self.request.user)
 
     def get_permissions(self):
         """Only the rating owner can update or delete their rating."""
@@ -185,13 +202,14 @@ class BikeRatingsAPIView(generics.ListAPIView):
 
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ["created_at", "rating"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
         bike_id = self.kwargs.get("bike_id")
-        return Rating.objects.filter(bike__id=bike_id).select_related("bike", "user")
+        return Rating.objects.filter(bike__id=bike_id)
 
     def list(self, request, *args, **kwargs):
         """Override list method to use custom response format with statistics."""
@@ -203,18 +221,20 @@ class BikeRatingsAPIView(generics.ListAPIView):
             total_ratings=Count('id')
         )
 
+        # Same output as RatingSerializer, built from .values() rows
+        serializer = RatingValuesSerializer(context=self.get_serializer_context())
+        rows = serializer.rows(queryset)
+
         # Use pagination for requests without limit parameter
-        page = self.paginate_queryset(queryset)
+        page = self.paginate_queryset(rows)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data, stats)
+            return self.get_paginated_response(serializer.serialize(page), stats)
 
-        serializer = self.get_serializer(queryset, many=True)
         return api_response(
             success=True,
             message="Bike ratings fetched successfully",
             data={
-                "ratings": serializer.data,
+                "ratings": serializer.serialize(rows),
                 "statistics": {
                     "average_rating": round(stats['average_rating'], 2) if stats['average_rating'] else 0,
                     "total_ratings": stats['total_ratings']
@@ -249,6 +269,7 @@ class MyRatingsAPIView(generics.ListAPIView):
 
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     filter_backends = [
         DjangoFilterBackend,
         filters.OrderingFilter,
@@ -258,7 +279,9 @@ class MyRatingsAPIView(generics.ListAPIView):
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        return Rating.objects.filter(user=self.request.user).select_related("bike", "user")
+        return with_rating_relations(
+            Rating.objects.filter(user=self.request.user), self.request.user
+        )
 
     def list(self, request, *args, **kwargs):
         """Override list method to use custom response format."""
@@ -297,6 +320,7 @@ class RateableBookingsAPIView(generics.ListAPIView):
     """List completed bookings that can be rated by the current user."""
 
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ["created_at", "end_time"]
     ordering = ["-end_time"]
@@ -304,12 +328,13 @@ class RateableBookingsAPIView(generics.ListAPIView):
     def get_queryset(self):
         """Get completed bookings by current user that haven't been rated yet."""
         user = self.request.user
-        return Booking.objects.filter(
+        bookings = Booking.objects.filter(
             renter=user,
             status=BookingStatus.COMPLETED
         ).exclude(
             rating__isnull=False  # Exclude bookings that already have ratings
-        ).select_related("bike")
+        ).select_related("renter")
+        return with_bike_relations(bookings, user, "bike__")
 
     def list(self, request, *args, **kwargs):
         """Override list method to use custom response format."""
@@ -347,50 +372,60 @@ class RateableBookingsAPIView(generics.ListAPIView):
         )
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticatedOrReadOnly])
-def bike_rating_stats_api_view(request, bike_id):
+class BikeRatingStatsAPIView(AsyncAPIView):
     """Get rating statistics for a specific bike."""
-    try:
-        from bikes.models import Bike
-        bike = Bike.objects.get(id=bike_id)
-        
-        ratings = Rating.objects.filter(bike=bike)
-        stats = ratings.aggregate(
-            average_rating=Avg('rating'),
-            total_ratings=Count('id')
-        )
-        
-        # Count ratings by star level
-        rating_distribution = {}
-        for i in range(1, 6):
-            rating_distribution[f"{i}_star"] = ratings.filter(rating=i).count()
-        
-        return api_response(
-            success=True,
-            message="Bike rating statistics fetched successfully",
-            data={
-                "bike_id": bike_id,
-                "bike_title": bike.title,
-                "statistics": {
-                    "average_rating": round(stats['average_rating'], 2) if stats['average_rating'] else 0,
-                    "total_ratings": stats['total_ratings'],
-                    "rating_distribution": rating_distribution
-                }
-            },
-            status_code=status.HTTP_200_OK,
-        )
-    except Bike.DoesNotExist:
-        return api_response(
-            success=False,
-            message="Bike not found",
-            data=None,
-            status_code=status.HTTP_404_NOT_FOUND,
-        )
-    except Exception as e:
-        return api_response(
-            success=False,
-            message="An error occurred",
-            data=str(e),
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    replica_reads = True
+
+    async def get(self, request, bike_id):
+        try:
+            from bikes.models import Bike
+            # One query for the bike, the aggregates and the star distribution
+            stars = {
+                f"{i}_star": Count("ratings", filter=Q(ratings__rating=i))
+                for i in range(1, 6)
+            }
+            bike = await (
+                Bike.objects.filter(id=bike_id)
+                .annotate(
+                    average_rating=Avg("ratings__rating"),
+                    total_ratings=Count("ratings"),
+                    **stars,
+                )
+                .aget()
+            )
+            stats = {
+                "average_rating": bike.average_rating,
+                "total_ratings": bike.total_ratings,
+            }
+            rating_distribution = {name: getattr(bike, name) for name in stars}
+
+            return api_response(
+                success=True,
+                message="Bike rating statistics fetched successfully",
+                data={
+                    "bike_id": bike_id,
+                    "bike_title": bike.title,
+                    "statistics": {
+                        "average_rating": round(stats['average_rating'], 2) if stats['average_rating'] else 0,
+                        "total_ratings": stats['total_ratings'],
+                        "rating_distribution": rating_distribution
+                    }
+                },
+                status_code=status.HTTP_200_OK,
+            )
+        except Bike.DoesNotExist:
+            return api_response(
+                success=False,
+                message="Bike not found",
+                data=None,
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return api_response(
+                success=False,
+                message="An error occurred",
+                data=str(e),
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -62,6 +62,11 @@ def main():
         action="store_true",
         help="Fast mode (skip slow tests)"
     )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Also compare endpoint benchmarks against benchmarks/baseline.json"
+    )
     
     args = parser.parse_args()
     
@@ -120,6 +125,16 @@ def main():
     
     print("\n🎉 All tests completed successfully!")
     
+    # Benchmarks run against the development database, which should hold
+    # the same generate_dataset volumes as the baseline
+    if args.benchmark:
+        benchmark_cmd = [
+            "python", "manage.py", "benchmark",
+            "--compare", "benchmarks/baseline.json",
+        ]
+        if not run_command(benchmark_cmd, "Running endpoint benchmarks"):
+            sys.exit(1)
+    
     # Show coverage summary if generated
     if args.coverage and args.html:
         coverage_dir = Path("htmlcov")
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Change
+
+
+@admin.register(Change)
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ("user", "kind", "object_id", "txid", "created_at")
+    list_filter = ("kind", "created_at")
+    search_fields = ("user__email",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("txid", "created_at")
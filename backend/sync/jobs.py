@@ -0,0 +1,5 @@
+from core.jobs import register
+
+from .services import prune_changes
+
+register("prune_sync_changes")(prune_changes)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from sync.services import prune_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync changes older than SYNC_CHANGE_RETENTION_DAYS; run it "
+        "daily, e.g. from cron"
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_changes()} changes")
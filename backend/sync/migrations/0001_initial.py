@@ -0,0 +1,69 @@
+# Generated by Django 5.0.10 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("bike", "Bike"),
+                            ("booking", "Booking"),
+                            ("rating", "Rating"),
+                            ("favorite", "Favorite"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                (
+                    "txid",
+                    models.BigIntegerField(
+                        db_default=models.Func(
+                            function="txid_current",
+                            output_field=models.BigIntegerField(),
+                        )
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user", "txid"], name="change_user_txid"),
+                    models.Index(fields=["created_at"], name="change_created"),
+                ],
+            },
+        ),
+    ]
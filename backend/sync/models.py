@@ -0,0 +1,46 @@
+from django.db import models
+from django.db.models import Func
+from django.utils.translation import gettext_lazy as _
+
+from users.models import User
+
+
+class ChangeKind(models.TextChoices):
+    BIKE = "bike", _("Bike")
+    BOOKING = "booking", _("Booking")
+    RATING = "rating", _("Rating")
+    FAVORITE = "favorite", _("Favorite")
+
+
+class Change(models.Model):
+    """
+    A record visible to ``user`` was created, updated or deleted.
+
+    Only the kind and id are kept: the sync API reads the record's current
+    state, and reports it deleted when it is gone. Rows are written in the
+    transaction of the change (see ``sync.signals``) and pruned after
+    ``SYNC_CHANGE_RETENTION_DAYS``.
+    """
+
+    # No constraint: changes may be written for a user deleted later in the
+    # same transaction. Their rows are pruned like any other.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    kind = models.CharField(max_length=16, choices=ChangeKind.choices)
+    object_id = models.BigIntegerField()
+    # Id of the transaction that inserted the row; sync cursors compare it
+    # with the oldest transaction still running when they were issued.
+    txid = models.BigIntegerField(
+        db_default=Func(function="txid_current", output_field=models.BigIntegerField())
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "txid"], name="change_user_txid"),
+            models.Index(fields=["created_at"], name="change_created"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} for user {self.user_id}"
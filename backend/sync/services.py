@@ -0,0 +1,157 @@
+"""
+Delta sync: what changed in a user's bikes, bookings, ratings and favorites
+since a cursor.
+
+Every change to one of those records adds a ``Change`` row per user who sees
+it (see ``sync.signals``). ``read_changes`` returns the current state of the
+records changed since the cursor, and the ids of those that were deleted or
+are no longer visible to the user, so clients can update their local stores
+instead of refetching whole lists.
+
+A cursor cannot simply be the last change id read (see ``utils.db``).
+Instead it remembers the oldest transaction still running when it was
+issued, and the next sync returns every change written by that transaction
+or a later one. Nothing is skipped; a record changed around the time a
+cursor is issued may be returned twice, which clients handle like any
+update.
+"""
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from bikes.models import Bike
+from bikes.serializers import BikeValuesSerializer
+from bookings.models import Booking
+from bookings.serializers import BookingValuesSerializer
+from favorites.models import Favorite
+from favorites.serializers import FavoriteValuesSerializer
+from ratings.models import Rating
+from ratings.serializers import RatingValuesSerializer
+from utils.db import snapshot_xmin
+from utils.metrics import JOB_DURATION
+
+from .models import Change, ChangeKind
+
+# Kind -> (response key, records of that kind visible to a user, serializer).
+SYNCED = {
+    ChangeKind.BIKE: (
+        "bikes",
+        lambda user: Bike.objects.filter(owner=user),
+        BikeValuesSerializer,
+    ),
+    ChangeKind.BOOKING: (
+        "bookings",
+        lambda user: Booking.objects.filter(Q(renter=user) | Q(bike__owner=user)),
+        BookingValuesSerializer,
+    ),
+    ChangeKind.RATING: (
+        "ratings",
+        lambda user: Rating.objects.filter(Q(user=user) | Q(bike__owner=user)),
+        RatingValuesSerializer,
+    ),
+    ChangeKind.FAVORITE: (
+        "favorites",
+        lambda user: Favorite.objects.filter(user=user),
+        FavoriteValuesSerializer,
+    ),
+}
+
+
+class CursorExpired(Exception):
+    """The changes after the cursor may have been pruned."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    # Changes of transactions from this id on are not known to be synced.
+    since: int
+    # While paging: the last change id returned, and the ``since`` of the
+    # cursor returned after the last page.
+    after: int = 0
+    next_since: int = 0
+    issued: int = 0
+
+    def encode(self):
+        raw = f"{self.since}.{self.after}.{self.next_since}.{self.issued}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value):
+        """The cursor ``encode()`` returned; raises ValueError if it is not one."""
+        try:
+            raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+            fields = [int(part) for part in raw.decode().split(".")]
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValueError(f"Invalid cursor {value!r}") from None
+        if len(fields) != 4 or min(fields) < 0:
+            raise ValueError(f"Invalid cursor {value!r}")
+        return cls(*fields)
+
+
+def _retention():
+    return timedelta(days=settings.SYNC_CHANGE_RETENTION_DAYS)
+
+
+def read_changes(user, cursor=None, context=None, limit=None):
+    """
+    The changes visible to ``user`` after ``cursor``, at most ``limit``
+    (``SYNC_PAGE_SIZE``) at a time, and the cursor to pass next time.
+
+    Without a cursor, no changes are returned, only a cursor for the current
+    position. Raises ``CursorExpired`` for cursors older than
+    ``SYNC_CHANGE_RETENTION_DAYS``.
+    """
+    now = timezone.now()
+    issued = int(now.timestamp())
+    limit = limit or settings.SYNC_PAGE_SIZE
+    data = {key: {"updated": [], "deleted": []} for key, _, _ in SYNCED.values()}
+    if cursor is None:
+        data["cursor"] = Cursor(since=snapshot_xmin(), issued=issued).encode()
+        data["has_more"] = False
+        return data
+    if cursor.issued < (now - _retention()).timestamp():
+        raise CursorExpired
+
+    # Taken before reading, so every change not read now is from this
+    # transaction or a later one.
+    next_since = cursor.next_since or snapshot_xmin()
+    changes = list(
+        Change.objects.filter(user=user, txid__gte=cursor.since, id__gt=cursor.after)
+        .order_by("id")
+        .values_list("id", "kind", "object_id")[: limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        cursor = Cursor(cursor.since, changes[-1][0], next_since, cursor.issued)
+    else:
+        cursor = Cursor(since=next_since, issued=issued)
+
+    changed = {}
+    for _id, kind, object_id in changes:
+        changed.setdefault(kind, set()).add(object_id)
+    for kind, ids in changed.items():
+        key, visible, values_class = SYNCED[kind]
+        serializer = values_class(context=context)
+        updated = serializer.serialize(
+            serializer.rows(visible(user).filter(pk__in=ids).order_by("pk"))
+        )
+        data[key]["updated"] = updated
+        data[key]["deleted"] = sorted(ids - {record["id"] for record in updated})
+    data["cursor"] = cursor.encode()
+    data["has_more"] = has_more
+    return data
+
+
+def prune_changes(now=None):
+    """Delete changes older than ``SYNC_CHANGE_RETENTION_DAYS``; returns how many."""
+    now = now or timezone.now()
+    with JOB_DURATION.time(job="sync_prune"):
+        deleted, _ = Change.objects.filter(created_at__lt=now - _retention()).delete()
+    return deleted
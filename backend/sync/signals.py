@@ -0,0 +1,182 @@
+import functools
+
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from bikes.models import Bike, BikeImage
+from bookings.models import Booking
+from bookings.signals import booking_statuses_changed
+from favorites.models import Favorite
+from ratings.models import Rating
+
+from .models import Change, ChangeKind
+
+
+def record_changes(changes):
+    """
+    Log changes given as ``(kind, object_id, user_ids, bike_id)``: each record
+    changed for ``user_ids`` and, when ``bike_id`` is not None, for that bike's
+    owner.
+
+    The rows are written in the current transaction, so they commit or roll
+    back with the change itself, with one query to look up the owners and one
+    to insert. A record changed again in the same transaction is not logged
+    twice: the rows written so far are kept on the connection until commit,
+    and dropped on a rollback, or when a savepoint starts or ends.
+    """
+    connection = transaction.get_connection()
+    logged, owners = _logged(connection)
+    missing = {
+        bike_id
+        for *_, bike_id in changes
+        if bike_id is not None and bike_id not in owners
+    }
+    if missing:
+        owners.update(Bike.objects.filter(pk__in=missing).values_list("pk", "owner_id"))
+    rows = []
+    for kind, object_id, user_ids, bike_id in changes:
+        users = set(user_ids)
+        if bike_id in owners:
+            users.add(owners[bike_id])
+        for user_id in sorted(users):
+            if (kind, object_id, user_id) not in logged:
+                logged.add((kind, object_id, user_id))
+                rows.append(Change(user_id=user_id, kind=kind, object_id=object_id))
+    if rows:
+        Change.objects.bulk_create(rows)
+
+
+def record_change(kind, object_id, user_ids=(), bike_id=None):
+    """Log one change; see ``record_changes``."""
+    record_changes([(kind, object_id, user_ids, bike_id)])
+
+
+def _logged(connection):
+    """The changes written and bike owners seen in the current transaction."""
+    if not connection.in_atomic_block:
+        return set(), {}
+    state = getattr(connection, "sync_logged", None)
+    if (
+        state is None
+        or state[0] != connection.savepoint_ids
+        or not _forget_pending(connection)
+    ):
+        # A rollback dropped the callback below and left the state behind, or
+        # a savepoint that may be rolled back on its own started or ended.
+        state = connection.sync_logged = (list(connection.savepoint_ids), set(), {})
+        transaction.on_commit(functools.partial(_forget, connection))
+    return state[1], state[2]
+
+
+def _forget_pending(connection):
+    return any(
+        isinstance(func, functools.partial) and func.func is _forget
+        for _, func, *_ in connection.run_on_commit
+    )
+
+
+def _forget(connection):
+    connection.sync_logged = None
+
+
+def _with_owner(instance, user_ids):
+    """
+    ``user_ids`` and the bike id to find the owner of ``instance``'s bike by,
+    or ``user_ids`` with the owner and None when the bike is already loaded.
+    """
+    if type(instance).bike.is_cached(instance):
+        return [*user_ids, instance.bike.owner_id], None
+    return user_ids, instance.bike_id
+
+
+@receiver(post_save, sender=Bike)
+@receiver(post_delete, sender=Bike)
+def bike_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(ChangeKind.BIKE, instance.pk, [instance.owner_id])
+
+
+@receiver(pre_delete, sender=Bike)
+def bike_deleting(sender, instance, **kwargs):
+    """
+    Log the bike and the records deleted with it in one go, so their own
+    receivers find them logged instead of writing one row each.
+    """
+    _logged(transaction.get_connection())[1][instance.pk] = instance.owner_id
+    related = (
+        Booking.objects.filter(bike=instance)
+        .values_list(Value(ChangeKind.BOOKING), "pk", "renter_id")
+        .union(
+            Rating.objects.filter(bike=instance).values_list(
+                Value(ChangeKind.RATING), "pk", "user_id"
+            ),
+            Favorite.objects.filter(bike=instance).values_list(
+                Value(ChangeKind.FAVORITE), "pk", "user_id"
+            ),
+            all=True,
+        )
+    )
+    record_changes(
+        [
+            (ChangeKind.BIKE, instance.pk, [instance.owner_id], None),
+            *(
+                (
+                    kind,
+                    pk,
+                    [user_id],
+                    None if kind == ChangeKind.FAVORITE else instance.pk,
+                )
+                for kind, pk, user_id in related
+            ),
+        ]
+    )
+
+
+@receiver(post_save, sender=BikeImage)
+@receiver(post_delete, sender=BikeImage)
+def bike_image_changed(sender, instance, raw=False, **kwargs):
+    """Images are part of the bike's representation."""
+    if raw:
+        return
+    record_change(ChangeKind.BIKE, instance.bike_id, *_with_owner(instance, []))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(
+        ChangeKind.BOOKING, instance.pk, *_with_owner(instance, [instance.renter_id])
+    )
+
+
+@receiver(booking_statuses_changed)
+def swept_bookings_changed(sender, bookings, **kwargs):
+    record_changes(
+        [
+            (ChangeKind.BOOKING, pk, [renter_id], bike_id)
+            for pk, bike_id, renter_id, _start_time, _end_time in bookings
+        ]
+    )
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(
+        ChangeKind.RATING, instance.pk, *_with_owner(instance, [instance.user_id])
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(ChangeKind.FAVORITE, instance.pk, [instance.user_id])
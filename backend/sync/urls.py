@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+app_name = "sync"
+
+urlpatterns = [
+    path("", views.SyncAPIView.as_view(), name="sync"),
+]
@@ -0,0 +1,45 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from utils.response import api_response
+
+from .services import Cursor, CursorExpired, read_changes
+
+
+class SyncAPIView(APIView):
+    """
+    Changes to the current user's bikes, bookings, ratings and favorites
+    since ``?cursor=``.
+
+    Call it without a cursor before loading the lists to get one. Each call
+    returns the records created or updated since the cursor, the ids of
+    those deleted, and the cursor for the next call. While ``has_more`` is
+    true, call again straight away.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        cursor = request.query_params.get("cursor")
+        try:
+            cursor = Cursor.decode(cursor) if cursor else None
+            data = read_changes(request.user, cursor, context={"request": request})
+        except ValueError:
+            return api_response(
+                success=False,
+                message="Invalid cursor",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        except CursorExpired:
+            return api_response(
+                success=False,
+                message="Cursor expired; reload your data and sync without a cursor",
+                status_code=status.HTTP_410_GONE,
+            )
+        return api_response(
+            success=True,
+            message="Changes fetched successfully",
+            data=data,
+            status_code=status.HTTP_200_OK,
+        )
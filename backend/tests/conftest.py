@@ -5,6 +5,7 @@ Pytest configuration and fixtures for the e-bike rental platform.
 import pytest
 from decimal import Decimal
 from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
@@ -249,6 +250,25 @@ def sample_profile_image():
     return SimpleUploadedFile("profile.jpg", image_content, content_type="image/jpeg")
 
 
+# Read replica stand-in
+@pytest.fixture(scope="session")
+def django_db_modify_db_settings(request):
+    """
+    Add ``replica``, a second local database standing in for a read replica.
+    Nothing reads from it unless a test lists it in ``DATABASE_REPLICAS``.
+    """
+    default = settings.DATABASES["default"]
+    settings.DATABASES.setdefault(
+        "replica",
+        {
+            **default,
+            "NAME": f"{default['NAME']}_replica",
+            "TEST": {**default["TEST"], "NAME": None, "MIRROR": None},
+        },
+    )
+    request.getfixturevalue("django_db_modify_db_settings_parallel_suffix")
+
+
 # Database transaction fixtures
 @pytest.fixture(scope="function")
 def db_transaction():
@@ -0,0 +1,78 @@
+"""
+Maximum number of SQL queries per request, by (route name, HTTP method).
+
+Requests carry access tokens as issued at login, which authenticate without a
+user query. Counts include every savepoint, and are checked by
+``tests/test_query_budgets.py`` with one and with fifty rows on the page.
+Lower a budget when a change saves queries; raising one needs a reason in the
+pull request.
+"""
+
+QUERY_BUDGETS = {
+    # bikes
+    ("bikes:bike-list", "GET"): 4,
+    ("bikes:bike-create", "POST"): 6,
+    ("bikes:bike-detail", "GET"): 3,
+    ("bikes:bike-detail", "PUT"): 15,
+    ("bikes:bike-detail", "PATCH"): 15,
+    ("bikes:bike-detail", "DELETE"): 18,
+    ("bikes:my-bikes", "GET"): 4,
+    ("bikes:my-bikes-export", "GET"): 3,
+    ("bikes:bike-feed", "GET"): 0,
+    ("bikes:bike-feed-snapshot", "GET"): 0,
+    ("bikes:bike-feed-changes", "GET"): 0,
+    ("bikes:toggle-bike-status", "POST"): 6,
+    ("bikes:bike-images", "GET"): 2,
+    ("bikes:bike-images", "POST"): 3,
+    ("bikes:bike-image-detail", "GET"): 1,
+    ("bikes:bike-image-detail", "PUT"): 4,
+    ("bikes:bike-image-detail", "PATCH"): 5,
+    ("bikes:bike-image-detail", "DELETE"): 4,
+    ("bikes:set-primary-image", "POST"): 7,
+    ("bikes:maintenance-list-create", "GET"): 4,
+    ("bikes:maintenance-list-create", "POST"): 6,
+    # bookings
+    # Booking and rating writes queue their rollup refresh: one INSERT each,
+    # or one per transition for the sweep, however many bikes it touches.
+    ("bookings:booking-list", "GET"): 4,
+    ("bookings:booking-create", "POST"): 12,
+    ("bookings:booking-detail", "GET"): 3,
+    ("bookings:booking-status-update", "PUT"): 8,
+    ("bookings:booking-status-update", "PATCH"): 8,
+    ("bookings:booking-cancel", "POST"): 8,
+    ("bookings:booking-start", "POST"): 8,
+    ("bookings:booking-complete", "POST"): 8,
+    ("bookings:check-expired-bookings", "GET"): 12,
+    ("bookings:my-bookings", "GET"): 4,
+    ("bookings:bike-bookings", "GET"): 4,
+    ("bookings:bike-bookings-export", "GET"): 3,
+    # ratings
+    ("ratings:rating-list", "GET"): 6,
+    ("ratings:rating-create", "POST"): 14,
+    ("ratings:rating-detail", "GET"): 5,
+    ("ratings:rating-detail", "PUT"): 8,
+    ("ratings:rating-detail", "PATCH"): 8,
+    ("ratings:rating-detail", "DELETE"): 5,
+    ("ratings:my-ratings", "GET"): 6,
+    ("ratings:rateable-bookings", "GET"): 4,
+    ("ratings:bike-ratings", "GET"): 7,
+    ("ratings:bike-rating-stats", "GET"): 1,
+    # favorites
+    ("favorites:favorites-list", "GET"): 4,
+    ("favorites:favorites-create", "POST"): 5,
+    ("favorites:favorite-delete", "DELETE"): 4,
+    ("favorites:favorite-status", "GET"): 2,
+    ("favorites:favorite-toggle", "POST"): 6,
+    # sync
+    ("sync:sync", "GET"): 14,
+    # users
+    ("users:login", "POST"): 1,
+    ("users:refresh", "POST"): 0,
+    ("users:signup", "POST"): 2,
+    # Queues the email: one INSERT instead of talking to the mail server.
+    ("users:password-reset-request", "POST"): 2,
+    ("users:password-reset-confirm", "POST"): 2,
+    ("users:me", "GET"): 1,
+    ("users:me", "PUT"): 2,
+    ("users:me", "PATCH"): 2,
+}
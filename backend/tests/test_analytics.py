@@ -0,0 +1,207 @@
+"""
+Tests for the owner dashboard daily rollups.
+"""
+
+import pytest
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+
+from analytics.models import BikeDailyStats
+from analytics.services import booking_contributions
+from bookings.models import Booking, BookingStatus
+from bookings.services import advance_booking_statuses
+from core.jobs import run_next_job
+from core.models import Job
+from ratings.models import Rating
+
+
+def _at(day, hour):
+    return datetime(2030, 1, day, hour, tzinfo=dt_timezone.utc)
+
+
+def _run_jobs():
+    while run_next_job():
+        pass
+
+
+@pytest.fixture
+def confirmed_booking(bike, user):
+    """A 30 hour approved booking spanning two days."""
+    booking = Booking.objects.create(
+        bike=bike,
+        renter=user,
+        start_time=_at(1, 18),
+        end_time=_at(3, 0),
+        total_price=Decimal("300.00"),
+        status=BookingStatus.APPROVED,
+    )
+    _run_jobs()
+    return booking
+
+
+@pytest.mark.unit
+class TestBookingContributions:
+    """Test how a booking is split into daily buckets."""
+
+    def test_confirmed_booking_is_apportioned_by_hours(self):
+        contributions = booking_contributions(
+            _at(1, 18), _at(3, 0), BookingStatus.APPROVED, Decimal("300.00")
+        )
+        first, second = contributions[_at(1, 0).date()], contributions[_at(2, 0).date()]
+        assert first["bookings_count"] == 1
+        assert second["bookings_count"] == 0
+        assert first["booked_hours"] == 6
+        assert second["booked_hours"] == 24
+        assert first["revenue"] == Decimal("60")
+        assert second["revenue"] == Decimal("240")
+
+    def test_cancelled_booking_only_counts_on_start_day(self):
+        contributions = booking_contributions(
+            _at(1, 18), _at(3, 0), BookingStatus.CANCELLED, Decimal("300.00")
+        )
+        assert list(contributions) == [_at(1, 0).date()]
+        bucket = contributions[_at(1, 0).date()]
+        assert bucket["cancelled_count"] == 1
+        assert bucket["booked_hours"] == 0
+        assert bucket["revenue"] == 0
+
+
+@pytest.mark.models
+@pytest.mark.booking
+@pytest.mark.django_db
+class TestDailyStatsRefresh:
+    """Test incremental maintenance of the rollup table."""
+
+    def test_booking_creates_rows_per_day(self, confirmed_booking, owner):
+        rows = list(BikeDailyStats.objects.filter(bike=confirmed_booking.bike))
+        assert [row.date for row in rows] == [_at(1, 0).date(), _at(2, 0).date()]
+        assert all(row.owner == owner for row in rows)
+        assert sum(row.revenue for row in rows) == Decimal("300.00")
+
+    def test_status_change_refreshes_rows(self, confirmed_booking):
+        confirmed_booking.status = BookingStatus.CANCELLED
+        confirmed_booking.save()
+        _run_jobs()
+
+        row = BikeDailyStats.objects.get(bike=confirmed_booking.bike)
+        assert row.date == _at(1, 0).date()
+        assert row.cancelled_count == 1
+        assert row.revenue == 0
+
+    def test_reschedule_clears_old_days(self, confirmed_booking):
+        confirmed_booking.start_time = _at(10, 8)
+        confirmed_booking.end_time = _at(10, 12)
+        confirmed_booking.save()
+        _run_jobs()
+
+        dates = list(
+            BikeDailyStats.objects.filter(bike=confirmed_booking.bike).values_list(
+                "date", flat=True
+            )
+        )
+        assert dates == [_at(10, 0).date()]
+
+    def test_status_sweep_refreshes_rows(self, confirmed_booking):
+        assert advance_booking_statuses(now=_at(5, 0)) == [1, 1]
+        _run_jobs()
+
+        confirmed_booking.refresh_from_db()
+        assert confirmed_booking.status == BookingStatus.COMPLETED
+        row = BikeDailyStats.objects.get(
+            bike=confirmed_booking.bike, date=_at(1, 0).date()
+        )
+        assert row.completed_count == 1
+
+    def test_rating_is_counted(self, confirmed_booking, user):
+        rating = Rating.objects.create(bike=confirmed_booking.bike, user=user, rating=4)
+        _run_jobs()
+
+        row = BikeDailyStats.objects.get(
+            bike=confirmed_booking.bike, date=rating.created_at.date()
+        )
+        assert row.rating_count == 1
+        assert row.rating_sum == 4
+
+    def test_sweep_queues_one_job_per_transition(self, bike, user, confirmed_booking):
+        Booking.objects.create(
+            bike=bike,
+            renter=user,
+            start_time=_at(4, 8),
+            end_time=_at(4, 12),
+            total_price=Decimal("40.00"),
+            status=BookingStatus.APPROVED,
+        )
+        _run_jobs()
+
+        assert advance_booking_statuses(now=_at(5, 0)) == [2, 2]
+
+        jobs = Job.objects.filter(name="refresh_daily_stats", status="queued")
+        assert [job.kwargs["bikes"] for job in jobs] == [
+            [[bike.pk, ["2030-01-01", "2030-01-02", "2030-01-03", "2030-01-04"]]]
+        ] * 2
+
+    def test_deleting_bike_queues_no_refresh(self, confirmed_booking):
+        confirmed_booking.bike.delete()
+
+        assert not Job.objects.filter(status="queued").exists()
+        _run_jobs()
+        assert not BikeDailyStats.objects.exists()
+
+    def test_backfill_matches_incremental_rows(self, confirmed_booking):
+        expected = list(
+            BikeDailyStats.objects.values_list("date", "booked_hours", "revenue")
+        )
+        BikeDailyStats.objects.all().delete()
+
+        call_command("backfill_daily_stats")
+
+        assert (
+            list(BikeDailyStats.objects.values_list("date", "booked_hours", "revenue"))
+            == expected
+        )
+
+
+@pytest.mark.views
+@pytest.mark.api
+@pytest.mark.django_db
+class TestOwnerDashboardView:
+    """Test the owner dashboard endpoint."""
+
+    def test_dashboard_totals(self, authenticated_owner_client, confirmed_booking):
+        url = reverse("analytics:owner-dashboard")
+        response = authenticated_owner_client.get(
+            url, {"start_date": "2030-01-01", "end_date": "2030-01-02"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data["data"]
+        assert data["bike_count"] == 1
+        assert data["totals"]["revenue"] == "300.00"
+        assert data["totals"]["booked_hours"] == "30.00"
+        assert data["totals"]["utilization"] == 62.5
+        assert data["totals"]["bookings_count"] == 1
+        assert [day["date"] for day in data["per_day"]] == ["2030-01-01", "2030-01-02"]
+        assert data["per_bike"][0]["bike_id"] == confirmed_booking.bike_id
+
+    def test_dashboard_excludes_other_owners(
+        self, authenticated_user_client, confirmed_booking
+    ):
+        url = reverse("analytics:owner-dashboard")
+        response = authenticated_user_client.get(
+            url, {"start_date": "2030-01-01", "end_date": "2030-01-31"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["data"]["per_bike"] == []
+        assert response.data["data"]["totals"]["revenue"] == "0.00"
+
+    def test_dashboard_rejects_inverted_range(self, authenticated_owner_client):
+        url = reverse("analytics:owner-dashboard")
+        response = authenticated_owner_client.get(
+            url, {"start_date": "2030-01-05", "end_date": "2030-01-01"}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,158 @@
+"""
+Tests for the async read views, served the way ASGI serves them.
+
+Each endpoint must answer over ASGI exactly as it does over WSGI.
+"""
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bikes.models import Bike
+from favorites.models import Favorite
+from users.models import User
+from utils.middleware import observe_queries
+
+
+def asgi_get(url, user=None, data=None):
+    """GET ``url`` through Django's ASGI handler."""
+    headers = {}
+    if user is not None:
+        headers["Authorization"] = f"Bearer {AccessToken.for_user(user)}"
+
+    async def get():
+        return await AsyncClient().get(url, data, headers=headers)
+
+    return async_to_sync(get)()
+
+
+def wsgi_get(url, user=None, data=None):
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client.get(url, data)
+
+
+@pytest.mark.integration
+@pytest.mark.views
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    """The read endpoints answer the same over ASGI and WSGI."""
+
+    @pytest.mark.parametrize("viewer", [None, "user"])
+    def test_bike_list(self, request, viewer, multiple_bikes, bike_image, user):
+        viewer = viewer and request.getfixturevalue(viewer)
+        Favorite.objects.create(user=user, bike=multiple_bikes[0])
+        url = reverse("bikes:bike-list")
+
+        for params in (
+            {},
+            {"search": "Mountain"},
+            {"available_only": "true", "ordering": "daily_rate"},
+        ):
+            asgi = asgi_get(url, viewer, params)
+            assert asgi.status_code == 200
+            assert asgi.json() == wsgi_get(url, viewer, params).json()
+
+    def test_bike_list_page_out_of_range(self, bike):
+        response = asgi_get(reverse("bikes:bike-list"), data={"page": 9})
+
+        assert response.status_code == 404
+
+    def test_bike_detail(self, bike, bike_image, user):
+        Favorite.objects.create(user=user, bike=bike)
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        response = asgi_get(url, user)
+
+        assert response.status_code == 200
+        assert response.json() == wsgi_get(url, user).json()
+        assert response.json()["data"]["is_favorited"] is True
+        assert (
+            asgi_get(reverse("bikes:bike-detail", kwargs={"pk": 0})).status_code == 404
+        )
+
+    def test_bike_detail_writes_stay_synchronous(self, bike, owner):
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+        token = f"Bearer {AccessToken.for_user(owner)}"
+
+        async def patch():
+            return await AsyncClient().patch(
+                url,
+                {"title": "Renamed"},
+                content_type="application/json",
+                headers={"Authorization": token},
+            )
+
+        response = async_to_sync(patch)()
+
+        assert response.status_code == 200
+        assert Bike.objects.get(pk=bike.pk).title == "Renamed"
+
+    def test_rating_stats(self, bike):
+        url = reverse("ratings:bike-rating-stats", kwargs={"bike_id": bike.pk})
+
+        response = asgi_get(url)
+
+        assert response.status_code == 200
+        assert response.json() == wsgi_get(url).json()
+        missing = reverse("ratings:bike-rating-stats", kwargs={"bike_id": 0})
+        assert asgi_get(missing).status_code == 404
+
+    def test_favorite_status(self, bike, user):
+        url = reverse("favorites:favorite-status", kwargs={"bike_id": bike.pk})
+        assert asgi_get(url).status_code == 401
+        assert asgi_get(url, user).json()["data"] == {"is_favorite": False}
+
+        Favorite.objects.create(user=user, bike=bike)
+
+        assert asgi_get(url, user).json()["data"] == {"is_favorite": True}
+
+    def test_home_page(self, multiple_bikes, bike_image, bike_factory):
+        url = "/home/"
+
+        with CaptureQueriesContext(connection) as few:
+            response = asgi_get(url)
+        assert response.json() == wsgi_get(url).json()
+        for i in range(8):
+            bike_factory(title=f"More {i}")
+        with CaptureQueriesContext(connection) as more:
+            asgi_get(url)
+
+        assert response.status_code == 200
+        assert len(response.json()["data"]["bikes"]) == len(multiple_bikes) + 1
+        assert len(more) == len(few)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestQueryObservers:
+    """Request instrumentation sees queries the async ORM runs in other threads."""
+
+    def test_queries_in_other_threads_are_observed(self):
+        seen = []
+
+        def observer(execute, sql, params, many, context):
+            seen.append(sql)
+            return execute(sql, params, many, context)
+
+        def query():
+            try:
+                return User.objects.filter(pk=0).exists()
+            finally:
+                connection.close()
+
+        async def scenario():
+            with observe_queries(observer):
+                await sync_to_async(query, thread_sensitive=False)()
+            await sync_to_async(query, thread_sensitive=False)()
+
+        async_to_sync(scenario)()
+
+        assert len(seen) == 1
+        assert 'FROM "users_user"' in seen[0]
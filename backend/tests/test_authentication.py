@@ -0,0 +1,180 @@
+"""
+Tests for JWT authentication from token claims (utils.authentication).
+"""
+
+import time
+
+import pytest
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.serializers import LoginSerializer
+from utils import authentication, metrics
+from utils.authentication import (
+    ExpiringCache,
+    JWTClaimsAuthentication,
+    OptionalJWTAuthentication,
+)
+
+
+def user_queries(queries):
+    return [q for q in queries if 'FROM "users_user"' in q["sql"]]
+
+
+def bearer(token):
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    authentication._tokens.clear()
+    authentication._users.clear()
+    yield
+    authentication._tokens.clear()
+    authentication._users.clear()
+
+
+@pytest.mark.unit
+class TestExpiringCache:
+    """Test expiry and eviction."""
+
+    def test_expired_values_are_not_returned(self):
+        cache = ExpiringCache(max_size=2)
+        cache.set("old", 1, time.time() - 1)
+        cache.set("new", 2, time.time() + 60)
+
+        assert cache.get("old") is None
+        assert cache.get("new") == 2
+
+    def test_full_cache_drops_expired_then_oldest(self):
+        cache = ExpiringCache(max_size=2)
+        cache.set("first", 1, time.time() + 60)
+        cache.set("expired", 2, time.time() - 1)
+
+        cache.set("second", 3, time.time() + 60)
+        assert set(cache.entries) == {"first", "second"}
+
+        cache.set("third", 4, time.time() + 60)
+        assert set(cache.entries) == {"second", "third"}
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestClaimsUser:
+    """Test users built from the claims of login tokens."""
+
+    def test_login_tokens_carry_the_claims(self, api_client, owner):
+        response = api_client.post(
+            reverse("users:login"),
+            {"email": owner.email, "password": "ownerpass123"},
+            format="json",
+        )
+
+        token = AccessToken(response.data["data"]["access"])
+        assert token["email"] == owner.email
+        assert token["is_owner"] is True
+        assert token["is_renter"] is False
+
+    def test_requests_do_not_query_the_user(self, owner, bike, rf):
+        token = LoginSerializer.get_token(owner).access_token
+        client = APIClient()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("bikes:my-bikes"), **bearer(token))
+
+        assert response.status_code == 200
+        assert user_queries(queries) == []
+
+        user, _ = JWTClaimsAuthentication().authenticate(rf.get("/", **bearer(token)))
+        assert user == owner
+        assert user.get_deferred_fields() >= {"phone", "password"}
+
+    def test_other_fields_load_at_once_from_the_cache(self, owner, rf):
+        token = LoginSerializer.get_token(owner).access_token
+        request = rf.get("/", **bearer(token))
+
+        first, _ = JWTClaimsAuthentication().authenticate(request)
+        with CaptureQueriesContext(connection) as queries:
+            assert first.phone == owner.phone
+            assert first.date_joined == owner.date_joined
+        second, _ = JWTClaimsAuthentication().authenticate(request)
+        with CaptureQueriesContext(connection) as cached:
+            assert second.phone == owner.phone
+
+        assert len(user_queries(queries)) == 1
+        assert user_queries(cached) == []
+
+    def test_saved_users_are_reloaded(self, owner, rf):
+        token = LoginSerializer.get_token(owner).access_token
+        request = rf.get("/", **bearer(token))
+        JWTClaimsAuthentication().authenticate(request)[0].phone
+
+        owner.phone = "+9999999"
+        owner.save()
+
+        assert JWTClaimsAuthentication().authenticate(request)[0].phone == "+9999999"
+
+    def test_tokens_without_claims_load_the_user_once(self, user, rf):
+        request = rf.get("/", **bearer(AccessToken.for_user(user)))
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                assert JWTClaimsAuthentication().authenticate(request)[0] == user
+
+        assert len(user_queries(queries)) == 1
+
+    def test_claims_mode_can_be_turned_off(self, owner, rf, settings):
+        settings.JWT_CLAIMS_USER = False
+        token = LoginSerializer.get_token(owner).access_token
+
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = JWTClaimsAuthentication().authenticate(
+                rf.get("/", **bearer(token))
+            )
+
+        assert user.get_deferred_fields() == set()
+        assert len(user_queries(queries)) == 1
+
+    def test_validated_tokens_are_cached(self, user, rf):
+        request = rf.get("/", **bearer(LoginSerializer.get_token(user).access_token))
+        hits = metrics.CACHE_REQUESTS.values.get(("jwt_tokens", "hit"), 0)
+
+        JWTClaimsAuthentication().authenticate(request)
+        JWTClaimsAuthentication().authenticate(request)
+
+        assert metrics.CACHE_REQUESTS.values[("jwt_tokens", "hit")] == hits + 1
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestOptionalJWTAuthentication:
+    """Test which failures leave a request anonymous."""
+
+    def test_unknown_and_inactive_users_are_anonymous(self, user, rf):
+        request = rf.get("/", **bearer(AccessToken.for_user(user)))
+        user.is_active = False
+        user.save()
+
+        assert OptionalJWTAuthentication().authenticate(request) is None
+
+        user.delete()
+
+        assert OptionalJWTAuthentication().authenticate(request) is None
+
+    def test_invalid_tokens_are_anonymous(self, rf):
+        request = rf.get("/", **bearer("not-a-token"))
+
+        assert OptionalJWTAuthentication().authenticate(request) is None
+
+    def test_database_errors_are_raised(self, user, rf, monkeypatch):
+        def unavailable(user_id):
+            raise OperationalError("connection refused")
+
+        monkeypatch.setattr(authentication, "user_row", unavailable)
+        request = rf.get("/", **bearer(AccessToken.for_user(user)))
+
+        with pytest.raises(OperationalError):
+            OptionalJWTAuthentication().authenticate(request)
@@ -0,0 +1,184 @@
+"""
+Tests for the endpoint benchmark harness.
+"""
+
+import json
+import socket
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from bookings.models import Booking
+from core.benchmark import (
+    SCENARIOS,
+    BenchmarkRequest,
+    InProcessTransport,
+    TokenCache,
+    compare_reports,
+    percentile,
+    run_benchmark,
+)
+from core.server_benchmark import (
+    READ_SCENARIOS,
+    ServerTransport,
+    SlowClients,
+    format_server_report,
+)
+
+
+def _report(p95_ms=10.0, queries=3.0, errors=0):
+    return {
+        "scenarios": {
+            "bike_list": {
+                "p95_ms": p95_ms,
+                "queries_per_request": queries,
+                "errors": errors,
+            }
+        }
+    }
+
+
+@pytest.fixture
+def dataset(db):
+    call_command(
+        "generate_dataset",
+        users=20,
+        bikes=15,
+        bookings=150,
+        favorites=30,
+        anchor="2030-06-01",
+        history_days=60,
+        future_days=14,
+    )
+
+
+@pytest.mark.unit
+class TestReportMath:
+    """Test percentiles and baseline comparison."""
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile([7], 99) == 7
+        assert percentile([], 50) is None
+
+    def test_latency_regression_needs_relative_and_absolute_growth(self):
+        assert compare_reports(_report(p95_ms=14), _report(p95_ms=10)) == []
+        assert compare_reports(_report(p95_ms=16), _report(p95_ms=10)) == [
+            "bike_list: p95 10ms -> 16ms"
+        ]
+
+    def test_extra_queries_and_errors_are_regressions(self):
+        regressions = compare_reports(_report(queries=4, errors=1), _report())
+        assert regressions == [
+            "bike_list: queries/request 3.0 -> 4",
+            "bike_list: errors 0 -> 1",
+        ]
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestRunBenchmark:
+    """Test an in-process benchmark run."""
+
+    def test_report_covers_every_scenario(self, dataset):
+        report = run_benchmark(InProcessTransport(TokenCache()), requests=120, warmup=5)
+
+        assert report["total"]["requests"] == 120
+        assert report["total"]["errors"] == 0
+        assert set(report["scenarios"]) <= {scenario.name for scenario in SCENARIOS}
+        for summary in report["scenarios"].values():
+            assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+            assert summary["queries_per_request"] > 0
+
+    def test_same_seed_sends_same_requests(self, dataset):
+        first = run_benchmark(InProcessTransport(TokenCache()), requests=40, warmup=0)
+        second = run_benchmark(InProcessTransport(TokenCache()), requests=40, warmup=0)
+
+        assert {
+            name: summary["requests"] for name, summary in first["scenarios"].items()
+        } == {
+            name: summary["requests"] for name, summary in second["scenarios"].items()
+        }
+
+    def test_command_rolls_back_writes(self, dataset):
+        bookings = Booking.objects.count()
+
+        call_command("benchmark", requests=30, scenarios=["booking_create"])
+
+        assert Booking.objects.count() == bookings
+
+    def test_command_saves_and_compares(self, dataset, tmp_path):
+        path = tmp_path / "baseline.json"
+        call_command("benchmark", requests=30, save=str(path))
+        baseline = json.loads(path.read_text())
+        assert baseline["meta"]["dataset"]["bikes"] == 15
+
+        for summary in baseline["scenarios"].values():
+            summary["queries_per_request"] -= 1
+        path.write_text(json.dumps(baseline))
+
+        with pytest.raises(CommandError, match="regression"):
+            call_command("benchmark", requests=30, compare=str(path))
+
+    def test_empty_database_is_reported(self, db):
+        with pytest.raises(CommandError, match="generate_dataset"):
+            call_command("benchmark", requests=5)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestServerBenchmark:
+    """Test the pieces of the WSGI/ASGI comparison that run without gunicorn."""
+
+    def test_read_mix_runs(self, dataset):
+        report = run_benchmark(
+            InProcessTransport(TokenCache()),
+            scenarios=READ_SCENARIOS,
+            requests=60,
+            warmup=0,
+        )
+
+        assert report["total"]["errors"] == 0
+        assert {"home", "favorite_status"} <= set(report["scenarios"])
+
+    def test_report_table(self):
+        total = {"rps": 12.5, "p95_ms": 80.0, "errors": 0}
+        report = {"servers": {"wsgi": {"1": total}, "asgi": {"1": total}}}
+
+        header, row = format_server_report(report).splitlines()
+
+        assert header.split()[:4] == ["concurrency", "wsgi", "rps", "wsgi"]
+        assert row.split() == ["1", "12.5", "80.0", "0", "12.5", "80.0", "0"]
+
+    def test_slow_clients_trickle_requests(self):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            server.settimeout(5)
+            url = f"http://127.0.0.1:{server.getsockname()[1]}"
+            with SlowClients(url, 1, interval=0.01):
+                connection, _ = server.accept()
+                received = b""
+                with connection:
+                    connection.settimeout(5)
+                    while len(received) < 45:
+                        received += connection.recv(100)
+
+        assert received.startswith(b"GET /home/ HTTP/1.1\r\n")
+        assert received.endswith(b"x")
+
+    def test_unanswered_requests_are_errors(self):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            url = f"http://127.0.0.1:{server.getsockname()[1]}"
+            transport = ServerTransport(url, TokenCache(), timeout=0.1)
+
+            status, elapsed, _ = transport.send(BenchmarkRequest("GET", "/home/"))
+
+        assert status == 0
+        assert elapsed >= 0.1
@@ -0,0 +1,240 @@
+"""
+Tests for the public feed of available bikes.
+"""
+
+import gzip
+import io
+import json
+import warnings
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bikes.feed import build_bike_feed, read_manifest
+from bikes.models import Bike, BikeImage, BikeStatus
+
+
+def _lines(data):
+    return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+
+def _snapshot(directory):
+    return _lines((directory / "bikes.ndjson.gz").read_bytes())
+
+
+@pytest.fixture
+def feed_dir(settings, tmp_path):
+    settings.BIKE_FEED_DIR = str(tmp_path / "feeds")
+    return tmp_path / "feeds"
+
+
+@pytest.fixture
+def bikes(multiple_bikes):
+    first, second, third = multiple_bikes
+    BikeImage.objects.create(bike=first, image="bike_images/side.jpg", order=1)
+    BikeImage.objects.create(
+        bike=first, image="bike_images/front.jpg", order=2, is_primary=True
+    )
+    Bike.objects.filter(pk=third.pk).update(status=BikeStatus.MAINTENANCE)
+    return multiple_bikes
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestBuildBikeFeed:
+    """Test full and incremental feed builds."""
+
+    def test_first_build_has_every_available_bike(self, feed_dir, bikes):
+        manifest = build_bike_feed()
+
+        first, second, _ = bikes
+        rows = _snapshot(feed_dir)
+        assert [row["id"] for row in rows] == [first.pk, second.pk]
+        assert rows[0]["primary_image"] == "/media/bike_images/front.jpg"
+        assert rows[0]["hourly_rate"] == "15.00"
+        assert rows[0]["bike_type"] == "city"
+        assert rows[1]["primary_image"] is None
+        assert manifest["build"] == 1
+        assert manifest["snapshot"]["bikes"] == 2
+        assert manifest["changes"] == []
+
+    def test_incremental_build_writes_changes(self, feed_dir, bikes):
+        first, second, third = bikes
+        build_bike_feed()
+
+        first.title = "Renamed"
+        first.save()
+        Bike.objects.filter(pk=second.pk).update(status=BikeStatus.UNAVAILABLE)
+        third.status = BikeStatus.AVAILABLE
+        third.save()
+        manifest = build_bike_feed()
+
+        changes = _lines((feed_dir / "changes-000002.ndjson.gz").read_bytes())
+        assert {row["id"]: row.get("title", row.get("removed")) for row in changes} == {
+            first.pk: "Renamed",
+            third.pk: third.title,
+            second.pk: True,
+        }
+        assert [row["id"] for row in _snapshot(feed_dir)] == [first.pk, third.pk]
+        assert manifest["changes"][0]["changes"] == 3
+
+    def test_unchanged_bikes_are_not_repeated(self, feed_dir, bikes):
+        first = build_bike_feed()
+        second = build_bike_feed()
+
+        assert second["snapshot"]["etag"] == first["snapshot"]["etag"]
+        assert second["changes"][0]["changes"] == 0
+
+    def test_image_changes_reach_the_feed(
+        self, feed_dir, bikes, django_capture_on_commit_callbacks
+    ):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Bike.objects.update(updated_at=an_hour_ago - timedelta(days=1))
+        build_bike_feed(now=an_hour_ago)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            BikeImage.objects.filter(image="bike_images/front.jpg").delete()
+        manifest = build_bike_feed()
+
+        rows = _snapshot(feed_dir)
+        assert rows[0]["primary_image"] == "/media/bike_images/side.jpg"
+        assert manifest["changes"][0]["changes"] == 1
+
+    def test_image_changes_touch_each_bike_once(
+        self,
+        bikes,
+        django_capture_on_commit_callbacks,
+    ):
+        first = bikes[0]
+        Bike.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            BikeImage.objects.filter(bike=first).delete()
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+
+        updates = [q for q in queries if q["sql"].startswith('UPDATE "bikes_bike"')]
+        assert len(updates) == 1
+
+        first.refresh_from_db()
+        assert first.updated_at > timezone.now() - timedelta(minutes=1)
+
+    def test_old_changes_files_are_removed(self, feed_dir, bikes, settings):
+        settings.BIKE_FEED_KEEP_CHANGES = 2
+        for _ in range(4):
+            manifest = build_bike_feed()
+
+        assert [entry["build"] for entry in manifest["changes"]] == [3, 4]
+        assert sorted(path.name for path in feed_dir.glob("changes-*")) == [
+            "changes-000003.ndjson.gz",
+            "changes-000004.ndjson.gz",
+        ]
+
+    def test_command(self, feed_dir, bikes):
+        output = io.StringIO()
+
+        call_command("build_bike_feed", stdout=output)
+        call_command("build_bike_feed", stdout=output)
+
+        assert output.getvalue().splitlines() == [
+            "Built feed 1: 2 bikes (full rebuild)",
+            "Built feed 2: 2 bikes, 0 changes",
+        ]
+        assert read_manifest()["build"] == 2
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestBikeFeedViews:
+    """Test serving the feed files."""
+
+    def test_not_built_yet(self, api_client, feed_dir):
+        response = api_client.get(reverse("bikes:bike-feed"))
+
+        assert response.status_code == 404
+
+    def test_manifest(self, api_client, feed_dir, bikes):
+        build_bike_feed()
+
+        response = api_client.get(reverse("bikes:bike-feed"))
+
+        assert response.status_code == 200
+        assert response.data["data"]["build"] == 1
+
+    def test_snapshot_with_etag(self, api_client, feed_dir, bikes):
+        manifest = build_bike_feed()
+        url = reverse("bikes:bike-feed-snapshot")
+
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response["ETag"] == manifest["snapshot"]["etag"]
+        assert response["X-Feed-Build"] == "1"
+        assert len(_lines(b"".join(response.streaming_content))) == 2
+
+        cached = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert cached.status_code == 304
+
+    def test_changes_since(self, api_client, feed_dir, bikes):
+        first, second, _ = bikes
+        build_bike_feed()
+        first.title = "Renamed"
+        first.save()
+        build_bike_feed()
+        second.title = "Renamed too"
+        second.save()
+        build_bike_feed()
+        url = reverse("bikes:bike-feed-changes")
+
+        response = api_client.get(url, {"since": 1})
+        assert response.status_code == 200
+        rows = _lines(b"".join(response.streaming_content))
+        assert [(row["id"], row["title"]) for row in rows] == [
+            (first.pk, "Renamed"),
+            (second.pk, "Renamed too"),
+        ]
+
+        cached = api_client.get(url, {"since": 1}, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert cached.status_code == 304
+        assert api_client.get(url, {"since": 2})["ETag"] != response["ETag"]
+
+    def test_changes_stream_over_asgi(self, feed_dir, bikes):
+        first, second, _ = bikes
+        build_bike_feed()
+        for bike in (first, second):
+            bike.title = f"Renamed {bike.pk}"
+            bike.save()
+            build_bike_feed()
+        url = reverse("bikes:bike-feed-changes")
+
+        async def get():
+            response = await AsyncClient().get(url, {"since": 1})
+            # The ASGI handler sends the parts of aiter(response).
+            return response, [part async for part in response]
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            response, parts = async_to_sync(get)()
+
+        assert response.status_code == 200
+        # One gzip member per changes file, each sent as it is read.
+        assert [len(_lines(part)) for part in parts] == [1, 1]
+        assert not [w for w in caught if "StreamingHttpResponse" in str(w.message)]
+
+    def test_changes_edge_cases(self, api_client, feed_dir, bikes, settings):
+        settings.BIKE_FEED_KEEP_CHANGES = 1
+        for _ in range(3):
+            build_bike_feed()
+        url = reverse("bikes:bike-feed-changes")
+
+        assert api_client.get(url, {"since": 3}).status_code == 204
+        assert api_client.get(url, {"since": 2}).status_code == 200
+        assert api_client.get(url, {"since": 1}).status_code == 410
+        assert api_client.get(url).status_code == 400
@@ -0,0 +1,303 @@
+"""
+Tests for booking status events and the server-sent event stream.
+"""
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bookings import events
+from bookings.events import (
+    EventHub,
+    Subscription,
+    events_after,
+    prune_booking_events,
+    read_new_events,
+)
+from bookings.models import Booking, BookingEvent, BookingStatus
+from bookings.services import advance_booking_statuses
+from utils import metrics
+
+EVENTS_URL = reverse("bookings:booking-events")
+
+
+def _statuses(booking):
+    return list(
+        BookingEvent.objects.filter(booking=booking)
+        .order_by("id")
+        .values_list("previous_status", "status")
+    )
+
+
+@pytest.fixture
+def stream_settings(settings):
+    settings.BOOKING_EVENTS_POLL_INTERVAL = 0.02
+    settings.BOOKING_EVENTS_HEARTBEAT = 0.1
+    settings.BOOKING_EVENTS_MAX_DURATION = 0.5
+    return settings
+
+
+async def _read(response, until=None):
+    """The stream's messages, up to and including the first containing ``until``."""
+    messages = []
+    async for chunk in response.streaming_content:
+        messages.append(chunk.decode())
+        if until and until in messages[-1]:
+            break
+    return messages
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestBookingEvents:
+    """Events are written in the transaction that changes the booking."""
+
+    def test_creation_and_status_changes(self, booking):
+        booking.status = BookingStatus.APPROVED
+        booking.save()
+        booking.save()
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = BookingStatus.CANCELLED
+        booking.save()
+
+        assert _statuses(booking) == [
+            ("", BookingStatus.REQUESTED),
+            (BookingStatus.REQUESTED, BookingStatus.APPROVED),
+            (BookingStatus.APPROVED, BookingStatus.CANCELLED),
+        ]
+
+    def test_unchanged_status_writes_nothing(self, booking):
+        booking = Booking.objects.get(pk=booking.pk)
+        with CaptureQueriesContext(connection) as queries:
+            booking.save(update_fields=["end_time"])
+
+        assert not any("bookings_bookingevent" in q["sql"] for q in queries)
+
+    def test_sweep_writes_one_insert(self, booking):
+        Booking.objects.filter(pk=booking.pk).update(status=BookingStatus.APPROVED)
+
+        with CaptureQueriesContext(connection) as queries:
+            advance_booking_statuses(now=booking.end_time)
+
+        inserts = [
+            q for q in queries if 'INSERT INTO "bookings_bookingevent"' in q["sql"]
+        ]
+        assert len(inserts) == 1
+        assert _statuses(booking)[-2:] == [
+            (BookingStatus.APPROVED, BookingStatus.ACTIVE),
+            (BookingStatus.ACTIVE, BookingStatus.COMPLETED),
+        ]
+
+    def test_events_after_are_the_users(self, booking, user, owner, multiple_users):
+        first = BookingEvent.objects.get(booking=booking)
+        booking.status = BookingStatus.APPROVED
+        booking.save()
+
+        for viewer in (user, owner):
+            assert [row["status"] for row in events_after(viewer, first.pk)] == [
+                BookingStatus.APPROVED
+            ]
+        assert events_after(multiple_users[0], 0) == []
+
+    def test_new_events_are_read_once(self, booking):
+        rows, since, seen = read_new_events(None, set())
+        assert rows == []
+
+        # Everything here is one transaction, still running: its events are
+        # read again each time, and skipped by id.
+        rows, since, seen = read_new_events(since, seen)
+        assert [row["booking_id"] for row in rows] == [booking.pk]
+        booking.status = BookingStatus.APPROVED
+        booking.save()
+        rows, since, seen = read_new_events(since, seen)
+        assert [row["status"] for row in rows] == [BookingStatus.APPROVED]
+        assert read_new_events(since, seen)[0] == []
+
+    def test_prune(self, booking, settings, capsys):
+        assert prune_booking_events() == 0
+        later = timezone.now() + timedelta(
+            days=settings.BOOKING_EVENT_RETENTION_DAYS + 1
+        )
+        assert prune_booking_events(now=later) == 1
+        call_command("prune_booking_events")
+        assert "Deleted 0 booking events" in capsys.readouterr().out
+
+
+@pytest.mark.unit
+class TestEventHub:
+    """Fan-out within one process."""
+
+    def test_publish_reaches_renter_and_owner(self, settings):
+        settings.BOOKING_EVENTS_QUEUE_SIZE = 10
+
+        async def scenario():
+            hub = EventHub()
+            renter, owner, other = Subscription(1), Subscription(2), Subscription(3)
+            for subscription in (renter, owner, other):
+                hub.subscriptions.setdefault(subscription.user_id, set()).add(
+                    subscription
+                )
+            hub.publish([{"id": 7, "renter_id": 1, "bike__owner_id": 2}])
+            return [s.queue.qsize() for s in (renter, owner, other)]
+
+        assert async_to_sync(scenario)() == [1, 1, 0]
+
+    def test_slow_stream_is_closed(self, settings):
+        settings.BOOKING_EVENTS_QUEUE_SIZE = 2
+
+        async def scenario():
+            subscription = Subscription(1)
+            for event_id in range(3):
+                subscription.put({"id": event_id})
+            return subscription.closed
+
+        assert async_to_sync(scenario)() is True
+
+    def test_one_read_per_interval_for_all_streams(self, settings, monkeypatch):
+        settings.BOOKING_EVENTS_POLL_INTERVAL = 0.01
+        settings.BOOKING_EVENTS_QUEUE_SIZE = 10
+        reads = []
+
+        def read(since, seen):
+            reads.append(since)
+            return [], since, seen
+
+        monkeypatch.setattr(events, "read_new_events", read)
+        monkeypatch.setattr(events, "snapshot_xmin", lambda: 1)
+
+        async def scenario():
+            hub = EventHub()
+            subscriptions = [await hub.subscribe(user_id) for user_id in range(50)]
+            await asyncio.sleep(0.1)
+            for subscription in subscriptions:
+                hub.unsubscribe(subscription)
+            await hub.task
+            return hub.since
+
+        assert async_to_sync(scenario)() is None
+        assert 1 <= len(reads) <= 15
+
+
+@pytest.mark.integration
+@pytest.mark.views
+@pytest.mark.django_db
+class TestBookingEventStream:
+    """GET /api/v1/bookings/events/"""
+
+    def test_requires_authentication(self):
+        async def scenario():
+            return await AsyncClient().get(EVENTS_URL)
+
+        response = async_to_sync(scenario)()
+        assert response.status_code == 401
+        assert response.json()["success"] is False
+
+    def test_invalid_token(self):
+        async def scenario():
+            return await AsyncClient().get(EVENTS_URL, {"token": "nope"})
+
+        assert async_to_sync(scenario)().status_code == 401
+
+    def test_streams_status_changes_to_owner(self, stream_settings, booking, owner):
+        token = str(AccessToken.for_user(owner))
+
+        async def scenario():
+            response = await AsyncClient().get(EVENTS_URL, {"token": token})
+            stream = response.streaming_content
+            first = await anext(stream)
+            booking.status = BookingStatus.APPROVED
+            await sync_to_async(booking.save)()
+            rest = await _read(response, until='"status": "approved"')
+            return response, [first.decode()] + rest
+
+        response, messages = async_to_sync(scenario)()
+
+        assert response["Content-Type"] == "text/event-stream"
+        assert response["Cache-Control"] == "no-cache"
+        assert messages[0] == "retry: 3000\n\n"
+        approved = [m for m in messages if '"status": "approved"' in m]
+        assert len(approved) == 1
+        assert approved[0].startswith("id: ")
+        assert "event: booking.status\n" in approved[0]
+        assert f'"booking_id": {booking.pk}' in approved[0]
+        assert '"previous_status": "requested"' in approved[0]
+
+    def test_resumes_after_last_event_id(self, stream_settings, booking, user):
+        first = BookingEvent.objects.get(booking=booking)
+        booking.status = BookingStatus.CANCELLED
+        booking.save()
+        stream_settings.BOOKING_EVENTS_MAX_DURATION = 0.05
+
+        async def scenario():
+            response = await AsyncClient().get(
+                EVENTS_URL,
+                headers={
+                    "Authorization": f"Bearer {AccessToken.for_user(user)}",
+                    "Last-Event-ID": str(first.pk),
+                },
+            )
+            return await _read(response)
+
+        messages = async_to_sync(scenario)()
+
+        # The missed event is replayed first. Live events may repeat ones the
+        # client has seen (here, everything in the test transaction).
+        assert messages[1].startswith("id: ")
+        assert '"status": "cancelled"' in messages[1]
+        assert sum('"status": "cancelled"' in m for m in messages) == 1
+
+    def test_heartbeat_and_end(self, stream_settings, user):
+        token = str(AccessToken.for_user(user))
+
+        async def scenario():
+            response = await AsyncClient().get(EVENTS_URL, {"token": token})
+            return await _read(response)
+
+        messages = async_to_sync(scenario)()
+
+        assert ": ping\n\n" in messages
+        assert not any(m.startswith("id: ") for m in messages)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestStreamConnections:
+    """Open streams give their database connection back."""
+
+    def test_no_connection_is_held_while_streaming(
+        self, stream_settings, booking, user
+    ):
+        first = BookingEvent.objects.get(booking=booking)
+        booking.status = BookingStatus.CANCELLED
+        booking.save()
+        connection.close()
+
+        async def scenario():
+            response = await AsyncClient().get(
+                EVENTS_URL,
+                headers={
+                    "Authorization": f"Bearer {AccessToken.for_user(user)}",
+                    "Last-Event-ID": str(first.pk),
+                },
+            )
+            # The retry message, then the replayed event.
+            messages = await _read(response, until='"status": "cancelled"')
+            # Past the hub's first read of new events.
+            await asyncio.sleep(stream_settings.BOOKING_EVENTS_POLL_INTERVAL * 3)
+            held = metrics.DB_POOL_CONNECTIONS.values[("default", "in_use")]
+            await response.streaming_content.aclose()
+            return messages, held
+
+        messages, held = async_to_sync(scenario)()
+
+        assert '"status": "cancelled"' in messages[-1]
+        assert held == 0
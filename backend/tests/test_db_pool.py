@@ -0,0 +1,197 @@
+"""
+Tests for the pooled PostgreSQL backend (utils.pooled_postgresql).
+"""
+
+import threading
+
+import pytest
+from django.db import connections
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from utils import metrics
+from utils.pooled_postgresql.base import ConnectionPool
+
+
+class FakeInfo:
+    transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.rolled_back = False
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    def __init__(self):
+        self.made = []
+
+    def __call__(self):
+        connection = FakeConnection()
+        self.made.append(connection)
+        return connection
+
+
+def make_pool(**options):
+    options = {
+        "max_size": 2,
+        "timeout": 1,
+        "check_after": 60,
+        "max_lifetime": 3600,
+        **options,
+    }
+    return ConnectionPool("test", **options)
+
+
+@pytest.mark.unit
+class TestConnectionPool:
+    """Test handing out and taking back connections."""
+
+    def test_connections_are_reused(self):
+        pool, connect = make_pool(), Connector()
+
+        first = pool.getconn(connect)
+        pool.putconn(first)
+
+        assert pool.getconn(connect) is first
+        assert len(connect.made) == 1
+
+    def test_full_pool_times_out(self):
+        pool, connect = make_pool(max_size=1, timeout=0.05), Connector()
+        pool.getconn(connect)
+        timeouts = metrics.DB_POOL_TIMEOUTS.values.get(("test",), 0)
+
+        with pytest.raises(OperationalError, match="became free"):
+            pool.getconn(connect)
+
+        assert metrics.DB_POOL_TIMEOUTS.values[("test",)] == timeouts + 1
+        assert len(connect.made) == 1
+
+    def test_returned_connection_goes_to_a_waiter(self):
+        pool, connect = make_pool(max_size=1), Connector()
+        first = pool.getconn(connect)
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn(connect)))
+
+        waiter.start()
+        pool.putconn(first)
+        waiter.join(5)
+
+        assert received == [first]
+
+    def test_open_transactions_are_rolled_back(self):
+        pool, connect = make_pool(), Connector()
+        connection = pool.getconn(connect)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+
+        pool.putconn(connection)
+
+        assert connection.rolled_back
+        assert pool.getconn(connect) is connection
+
+    def test_broken_idle_connections_are_replaced(self):
+        pool, connect = make_pool(check_after=0), Connector()
+        broken = pool.getconn(connect)
+        pool.putconn(broken)
+        broken.broken = True
+        failed = metrics.DB_POOL_CHECKS.values.get(("test", "failed"), 0)
+
+        replacement = pool.getconn(connect)
+
+        assert replacement is not broken
+        assert broken.closed
+        assert metrics.DB_POOL_CHECKS.values[("test", "failed")] == failed + 1
+
+    def test_old_connections_are_closed(self):
+        pool, connect = make_pool(max_lifetime=0), Connector()
+        connection = pool.getconn(connect)
+
+        pool.putconn(connection)
+
+        assert connection.closed
+        assert pool.getconn(connect) is not connection
+
+    def test_failed_connects_free_their_slot(self):
+        pool = make_pool(max_size=1, timeout=0.05)
+
+        def refuse():
+            raise OperationalError("connection refused")
+
+        with pytest.raises(OperationalError, match="refused"):
+            pool.getconn(refuse)
+
+        assert pool.getconn(Connector()) is not None
+
+    def test_close(self):
+        pool, connect = make_pool(), Connector()
+        idle, in_use = pool.getconn(connect), pool.getconn(connect)
+        pool.putconn(idle)
+
+        pool.close()
+        assert idle.closed and not in_use.closed
+        pool.putconn(in_use)
+        assert in_use.closed
+
+    def test_sizes_are_recorded(self):
+        pool, connect = make_pool(), Connector()
+        first = pool.getconn(connect)
+        pool.getconn(connect)
+        pool.putconn(first)
+
+        assert metrics.DB_POOL_CONNECTIONS.values[("test", "idle")] == 1
+        assert metrics.DB_POOL_CONNECTIONS.values[("test", "in_use")] == 1
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestPooledDatabaseWrapper:
+    """Test that Django connections come from and go back to the pool."""
+
+    def test_closed_connections_are_reused(self):
+        wrapper = connections.create_connection("default")
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                first = cursor.fetchone()[0]
+            wrapper.set_autocommit(False)
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            wrapper.close()
+
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                second = cursor.fetchone()[0]
+
+            assert second == first
+            assert wrapper.get_autocommit()
+            assert wrapper.connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+        finally:
+            wrapper.close()
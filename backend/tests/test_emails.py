@@ -0,0 +1,189 @@
+"""
+Tests for the outbound email queue (notifications.services).
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from notifications.models import EmailStatus, OutboundEmail
+from notifications.services import prune_emails, queue_email, send_queued_emails
+from utils import metrics
+
+
+class CountingBackend(EmailBackend):
+    """The locmem backend, counting the connections it opens."""
+
+    opened = 0
+
+    def open(self):
+        if getattr(self, "is_open", False):
+            return None
+        CountingBackend.opened += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+
+class FailingBackend(EmailBackend):
+    """Refuses every email sent to an address starting with ``bounce``."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].startswith("bounce"):
+                raise ConnectionRefusedError("mail server unavailable")
+        return super().send_messages(messages)
+
+
+class ObservingBackend(EmailBackend):
+    """
+    Records, for every email, whether a transaction was open and how many
+    emails another worker would claim meanwhile.
+    """
+
+    seen = []
+
+    def send_messages(self, messages):
+        ObservingBackend.seen.append((connection.in_atomic_block, send_queued_emails()))
+        return super().send_messages(messages)
+
+
+@pytest.fixture
+def counting_backend(settings):
+    settings.EMAIL_BACKEND = "tests.test_emails.CountingBackend"
+    CountingBackend.opened = 0
+
+
+@pytest.fixture
+def failing_backend(settings):
+    settings.EMAIL_BACKEND = "tests.test_emails.FailingBackend"
+    settings.EMAIL_RETRY_BACKOFF = 60
+    settings.EMAIL_MAX_ATTEMPTS = 3
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestEmailQueue:
+    """Test queueing and sending emails."""
+
+    def test_password_reset_is_queued(self, api_client, user):
+        response = api_client.post(
+            reverse("users:password-reset-request"), {"email": user.email}
+        )
+
+        assert response.status_code == 200
+        assert mail.outbox == []
+        email = OutboundEmail.objects.get()
+        assert email.to == user.email
+        assert "/reset-password/" in email.html_body
+
+        assert send_queued_emails() == 1
+
+        [message] = mail.outbox
+        assert message.to == [user.email]
+        assert message.alternatives[0][1] == "text/html"
+        email.refresh_from_db()
+        assert email.status == EmailStatus.SENT
+        assert email.sent_at is not None
+
+    def test_batch_reuses_one_connection(self, counting_backend):
+        for n in range(3):
+            queue_email(f"rider{n}@example.com", "Hello", "Body")
+        sent = metrics.EMAILS.values.get(("sent",), 0)
+
+        assert send_queued_emails(batch_size=2) == 2
+        assert send_queued_emails(batch_size=2) == 1
+        assert send_queued_emails(batch_size=2) == 0
+
+        assert len(mail.outbox) == 3
+        assert CountingBackend.opened == 2
+        assert metrics.EMAILS.values[("sent",)] == sent + 3
+
+    def test_batch_stops_before_its_lease_runs_out(self, settings):
+        settings.EMAIL_SEND_LEASE = 30
+        settings.EMAIL_TIMEOUT = 30
+        for n in range(3):
+            queue_email(f"rider{n}@example.com", "Hello", "Body")
+
+        assert send_queued_emails() == 3
+
+        assert len(mail.outbox) == 1
+        assert OutboundEmail.objects.filter(status=EmailStatus.SENT).count() == 1
+        assert send_queued_emails() == 2
+        assert len(mail.outbox) == 2
+
+    def test_failures_are_retried_with_backoff(self, failing_backend):
+        email = queue_email("bounce@example.com", "Hello", "Body")
+        queue_email("rider@example.com", "Hello", "Body")
+        now = timezone.now()
+
+        assert send_queued_emails(now=now) == 2
+        email.refresh_from_db()
+        assert email.status == EmailStatus.PENDING
+        assert email.attempts == 1
+        assert email.send_after == now + timedelta(seconds=60)
+        assert "mail server unavailable" in email.last_error
+        assert len(mail.outbox) == 1
+
+        assert send_queued_emails(now=now + timedelta(seconds=59)) == 0
+        send_queued_emails(now=now + timedelta(seconds=60))
+        email.refresh_from_db()
+        assert email.send_after == now + timedelta(seconds=180)
+
+        send_queued_emails(now=now + timedelta(seconds=180))
+        email.refresh_from_db()
+        assert email.status == EmailStatus.FAILED
+        assert email.attempts == 3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_worker_drains_the_queue(self):
+        for n in range(3):
+            queue_email(f"rider{n}@example.com", "Hello", "Body")
+        out = StringIO()
+
+        call_command("send_emails", "--once", "--batch-size", "2", stdout=out)
+
+        assert len(mail.outbox) == 3
+        assert "Handled 3 emails" in out.getvalue()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_batch_is_sent_outside_a_transaction(self, settings):
+        settings.EMAIL_BACKEND = "tests.test_emails.ObservingBackend"
+        ObservingBackend.seen = []
+        for n in range(2):
+            queue_email(f"rider{n}@example.com", "Hello", "Body")
+
+        assert send_queued_emails() == 2
+
+        assert ObservingBackend.seen == [(False, 0), (False, 0)]
+        assert len(mail.outbox) == 2
+
+    def test_abandoned_lease_is_sent_again(self, settings):
+        settings.EMAIL_SEND_LEASE = 300
+        queue_email("rider@example.com", "Hello", "Body")
+        now = timezone.now()
+        # A worker that claimed the email and died before sending it.
+        OutboundEmail.objects.update(send_after=now + timedelta(seconds=300))
+
+        assert send_queued_emails(now=now) == 0
+        assert send_queued_emails(now=now + timedelta(seconds=300)) == 1
+        assert OutboundEmail.objects.get().status == EmailStatus.SENT
+
+    def test_prune_keeps_pending_emails(self, settings):
+        settings.EMAIL_RETENTION_DAYS = 30
+        sent = queue_email("rider@example.com", "Hello", "Body")
+        pending = queue_email("other@example.com", "Hello", "Body")
+        OutboundEmail.objects.filter(pk=sent.pk).update(status=EmailStatus.SENT)
+        later = timezone.now() + timedelta(days=31)
+
+        assert prune_emails(now=later) == 1
+        assert list(OutboundEmail.objects.values_list("pk", flat=True)) == [pending.pk]
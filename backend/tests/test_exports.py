@@ -0,0 +1,306 @@
+"""
+Tests for the streaming CSV and NDJSON exports and their admin actions.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import warnings
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bikes.models import Bike
+from bookings.exports import BookingExport
+from bookings.models import Booking, BookingStatus
+from users.models import User
+
+
+def _content(response):
+    assert response.streaming
+    return b"".join(response.streaming_content).decode()
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in _content(response).splitlines()]
+
+
+def asgi_stream(path, user):
+    """
+    GET ``path`` as ``user`` through Django's ASGI handler. Returns the
+    response start message and the body parts in the order they were sent.
+    """
+    messages = []
+    request = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if request:
+            return request.pop()
+        await asyncio.Event().wait()  # The client never disconnects.
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "query_string": b"",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", f"Bearer {AccessToken.for_user(user)}".encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    async_to_sync(ASGIHandler())(scope, receive, send)
+    start, *body = messages
+    return start, [message["body"] for message in body if message.get("body")]
+
+
+@pytest.fixture
+def history(multiple_users, multiple_bikes):
+    """Five bookings of the owner's bikes in June 2030, one of another owner's."""
+    renter = multiple_users[1]
+    june = timezone.make_aware(datetime(2030, 6, 1, 10))
+    statuses = [
+        BookingStatus.COMPLETED,
+        BookingStatus.COMPLETED,
+        BookingStatus.CANCELLED,
+        BookingStatus.REQUESTED,
+        BookingStatus.COMPLETED,
+    ]
+    bookings = [
+        Booking.objects.create(
+            bike=multiple_bikes[day % 3],
+            renter=renter,
+            start_time=june + timedelta(days=day),
+            end_time=june + timedelta(days=day, hours=2),
+            total_price=Decimal("30.00"),
+            status=status,
+        )
+        for day, status in enumerate(statuses)
+    ]
+    other_bike = Bike.objects.create(
+        owner=multiple_users[0],
+        title="Other owner's bike",
+        description="Not exported",
+        location="Elsewhere",
+        daily_rate=Decimal("50.00"),
+        battery_range=40,
+        max_speed=25,
+        weight=Decimal("20.00"),
+    )
+    Booking.objects.create(
+        bike=other_bike,
+        renter=renter,
+        start_time=june,
+        end_time=june + timedelta(hours=1),
+        total_price=Decimal("15.00"),
+        status=BookingStatus.COMPLETED,
+    )
+    return bookings
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestBookingExport:
+    """Test the bike bookings export endpoint."""
+
+    url = "bookings:bike-bookings-export"
+
+    def test_ndjson_has_owner_bookings_in_id_order(
+        self, authenticated_owner_client, history
+    ):
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "ndjson"})
+        )
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert response["Content-Disposition"].startswith(
+            'attachment; filename="bookings-'
+        )
+        rows = _ndjson(response)
+        assert [row["id"] for row in rows] == [booking.pk for booking in history]
+        first = rows[0]
+        assert first["total_price"] == "30.00"
+        assert first["start_time"] == "2030-06-01T10:00:00Z"
+        assert first["renter_email"] == "user2@example.com"
+        assert first["bike_title"] == history[0].bike.title
+
+    def test_csv(self, authenticated_owner_client, history):
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "csv"})
+        )
+
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        assert len(rows) == 5
+        assert list(rows[0]) == [name for name, _ in BookingExport.columns]
+        assert rows[2]["status"] == BookingStatus.CANCELLED
+        assert rows[2]["total_price"] == "30.00"
+
+    def test_status_and_date_filters(self, authenticated_owner_client, history):
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "ndjson"}),
+            {
+                "status": [BookingStatus.COMPLETED, BookingStatus.CANCELLED],
+                "start_date": "2030-06-02",
+                "end_date": "2030-06-05",
+            },
+        )
+
+        rows = _ndjson(response)
+        assert [row["id"] for row in rows] == [
+            history[1].pk,
+            history[2].pk,
+            history[4].pk,
+        ]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"status": "lost"},
+            {"start_date": "2030-06-05", "end_date": "2030-06-01"},
+            {"start_date": "June"},
+        ],
+    )
+    def test_invalid_filters(self, authenticated_owner_client, params):
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "csv"}), params
+        )
+
+        assert response.status_code == 400
+        assert response.data["success"] is False
+
+    def test_unknown_format(self, authenticated_owner_client):
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "xlsx"})
+        )
+
+        assert response.status_code == 404
+
+    def test_requires_authentication(self, api_client):
+        response = api_client.get(reverse(self.url, kwargs={"export_format": "csv"}))
+
+        assert response.status_code == 401
+
+    def test_staff_export_every_booking(self, api_client, history, multiple_users):
+        staff = multiple_users[2]
+        User.objects.filter(pk=staff.pk).update(is_staff=True)
+        staff.refresh_from_db()
+        api_client.force_authenticate(user=staff)
+
+        response = api_client.get(reverse(self.url, kwargs={"export_format": "ndjson"}))
+
+        assert len(_ndjson(response)) == 6
+
+    def test_streams_in_chunks(self, authenticated_owner_client, history, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+
+        response = authenticated_owner_client.get(
+            reverse(self.url, kwargs={"export_format": "csv"})
+        )
+
+        chunks = list(response.streaming_content)
+        # Header, then 2 + 2 + 1 rows.
+        assert [chunk.count(b"\n") for chunk in chunks] == [1, 2, 2, 1]
+
+
+@pytest.mark.views
+@pytest.mark.django_db(transaction=True)
+class TestAsgiExport:
+    """Test that exports stream over ASGI, not read into memory first."""
+
+    def test_streams_in_chunks(self, owner, history, settings):
+        settings.EXPORT_CHUNK_SIZE = 2
+        url = reverse("bookings:bike-bookings-export", kwargs={"export_format": "csv"})
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            start, chunks = asgi_stream(url, owner)
+
+        assert start["status"] == 200
+        # Header, then 2 + 2 + 1 rows, each page sent as soon as it is read.
+        assert [chunk.count(b"\n") for chunk in chunks] == [1, 2, 2, 1]
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        assert [int(row["id"]) for row in rows] == [booking.pk for booking in history]
+        assert not [w for w in caught if "StreamingHttpResponse" in str(w.message)]
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestBikeExport:
+    """Test the owner's bike export endpoint."""
+
+    def test_csv_values(self, authenticated_owner_client, multiple_bikes):
+        Bike.objects.filter(pk=multiple_bikes[0].pk).update(hourly_rate=None)
+
+        response = authenticated_owner_client.get(
+            reverse("bikes:my-bikes-export", kwargs={"export_format": "csv"}),
+            {"status": "available"},
+        )
+
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        assert [int(row["id"]) for row in rows] == [bike.pk for bike in multiple_bikes]
+        assert rows[0]["hourly_rate"] == ""
+        assert rows[0]["weight"] == "22.50"
+        assert json.loads(rows[0]["features"]) == ["Feature 1", "Feature 2"]
+
+    def test_other_owners_bikes_are_excluded(self, api_client, multiple_bikes, user):
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(
+            reverse("bikes:my-bikes-export", kwargs={"export_format": "ndjson"})
+        )
+
+        assert _content(response) == ""
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestExportAdminActions:
+    """Test the export actions of the booking and bike admins."""
+
+    @pytest.fixture
+    def admin_client(self, client, db):
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="admin-pass-123"
+        )
+        client.force_login(admin)
+        return client
+
+    def test_booking_csv_action(self, admin_client, history):
+        response = admin_client.post(
+            reverse("admin:bookings_booking_changelist"),
+            {
+                "action": "export_csv",
+                "_selected_action": [history[0].pk, history[1].pk],
+            },
+        )
+
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        assert sorted(int(row["id"]) for row in rows) == [history[0].pk, history[1].pk]
+
+    def test_bike_ndjson_action(self, admin_client, multiple_bikes):
+        response = admin_client.post(
+            reverse("admin:bikes_bike_changelist"),
+            {
+                "action": "export_ndjson",
+                "_selected_action": [bike.pk for bike in multiple_bikes],
+            },
+        )
+
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert len(_ndjson(response)) == 3
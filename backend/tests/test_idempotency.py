@@ -0,0 +1,242 @@
+"""
+Tests for Idempotency-Key support on POSTs (utils.idempotency).
+"""
+
+import threading
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connections
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bookings.models import Booking
+from core.models import IdempotencyKey
+from favorites.models import Favorite
+from favorites.views import FavoriteToggleView
+from users.serializers import LoginSerializer
+from utils.idempotency import prune_idempotency_keys
+
+
+def _client(user):
+    client = APIClient()
+    token = LoginSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+def _toggle(client, bike, key):
+    return client.post(
+        reverse("favorites:favorite-toggle", kwargs={"bike_id": bike.pk}),
+        HTTP_IDEMPOTENCY_KEY=key,
+    )
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestIdempotencyKeys:
+    """Test that retried POSTs run once."""
+
+    def test_retried_booking_is_created_once(self, user, bike):
+        client = _client(user)
+        start = timezone.now() + timedelta(days=1)
+        data = {
+            "bike_id": bike.pk,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=4)).isoformat(),
+        }
+        url = reverse("bookings:booking-create")
+
+        first = client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="b-1")
+        retry = client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="b-1")
+
+        assert first.status_code == 201
+        assert retry.status_code == 201
+        assert retry.content == first.content
+        assert retry["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first
+        assert Booking.objects.filter(renter=user).count() == 1
+
+    def test_toggle_flips_once_per_key(self, user, bike):
+        client = _client(user)
+
+        assert _toggle(client, bike, "t-1").status_code == 201
+        assert _toggle(client, bike, "t-1").status_code == 201
+        assert Favorite.objects.filter(user=user, bike=bike).exists()
+
+        assert _toggle(client, bike, "t-2").status_code == 200
+        assert not Favorite.objects.filter(user=user, bike=bike).exists()
+
+    def test_keys_belong_to_one_user(self, user, owner, bike):
+        _toggle(_client(user), bike, "shared")
+
+        assert _toggle(_client(owner), bike, "shared").status_code == 201
+        assert Favorite.objects.filter(bike=bike).count() == 2
+
+    def test_reused_key_with_other_request_is_refused(self, user, bike, multiple_bikes):
+        client = _client(user)
+        _toggle(client, bike, "t-1")
+
+        response = _toggle(client, multiple_bikes[0], "t-1")
+
+        assert response.status_code == 422
+        assert not Favorite.objects.filter(bike=multiple_bikes[0]).exists()
+
+    def test_server_errors_are_not_saved(self, user, bike, monkeypatch):
+        client = _client(user)
+        original = FavoriteToggleView.post
+
+        def fail(self, request, bike_id):
+            original(self, request, bike_id)
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(FavoriteToggleView, "post", fail)
+        client.raise_request_exception = False
+
+        assert _toggle(client, bike, "t-1").status_code == 500
+        assert not IdempotencyKey.objects.exists()
+
+        monkeypatch.setattr(FavoriteToggleView, "post", original)
+        assert _toggle(client, bike, "t-1").status_code == 200
+        assert IdempotencyKey.objects.get().status_code == 200
+
+    def test_abandoned_claims_are_taken_over(self, user, bike, settings):
+        settings.IDEMPOTENCY_LEASE = 60
+        IdempotencyKey.objects.create(
+            user=user, key="t-1", fingerprint="x", expires_at=timezone.now()
+        )
+
+        assert _toggle(_client(user), bike, "t-1").status_code == 201
+        saved = IdempotencyKey.objects.get()
+        assert saved.status_code == 201
+        assert saved.expires_at > timezone.now() + timedelta(hours=1)
+
+    def test_without_key_or_token_nothing_is_saved(self, user, bike):
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        _toggle(client, bike, "t-1")
+        _client(user).post(
+            reverse("favorites:favorite-toggle", kwargs={"bike_id": bike.pk})
+        )
+
+        assert not IdempotencyKey.objects.exists()
+
+    def test_retries_over_asgi(self, user, bike):
+        url = reverse("favorites:favorite-toggle", kwargs={"bike_id": bike.pk})
+        headers = {
+            "Authorization": f"Bearer {LoginSerializer.get_token(user).access_token}",
+            "Idempotency-Key": "t-1",
+        }
+
+        async def post_twice():
+            client = AsyncClient()
+            return [await client.post(url, headers=headers) for _ in range(2)]
+
+        first, retry = async_to_sync(post_twice)()
+
+        assert first.status_code == retry.status_code == 201
+        assert retry["Idempotent-Replayed"] == "true"
+        assert Favorite.objects.filter(user=user, bike=bike).exists()
+
+    def test_expired_keys_run_again_and_are_pruned(self, user, bike):
+        client = _client(user)
+        _toggle(client, bike, "t-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        assert _toggle(client, bike, "t-1").status_code == 200
+        assert IdempotencyKey.objects.get().status_code == 200
+
+        later = timezone.now() + timedelta(days=2)
+        assert prune_idempotency_keys(now=later) == 1
+        out = StringIO()
+        call_command("prune_idempotency_keys", stdout=out)
+        assert "Deleted 0 idempotency keys" in out.getvalue()
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRetries:
+    """Test that requests with the same key are serialized."""
+
+    @pytest.fixture
+    def slow_toggle(self, monkeypatch):
+        """Makes the first toggle wait until ``release`` is set."""
+        started, release = threading.Event(), threading.Event()
+        original = FavoriteToggleView.post
+
+        def post(self, request, bike_id):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+            return original(self, request, bike_id)
+
+        monkeypatch.setattr(FavoriteToggleView, "post", post)
+        return started, release
+
+    @staticmethod
+    def _in_thread(target, results):
+        def run():
+            try:
+                results.append(target())
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_retry_waits_and_replays(self, user, bike, slow_toggle):
+        started, release = slow_toggle
+        client = _client(user)
+        first, retry = [], []
+        first_thread = self._in_thread(lambda: _toggle(client, bike, "k"), first)
+        assert started.wait(5)
+        retry_thread = self._in_thread(lambda: _toggle(_client(user), bike, "k"), retry)
+
+        # Another key does not wait for the lock held by the first request.
+        other = _toggle(_client(user), bike, "other")
+        retry_thread.join(0.2)
+        assert retry_thread.is_alive()
+        release.set()
+        first_thread.join(5)
+        retry_thread.join(5)
+
+        assert other.status_code == 201
+        assert first[0].status_code == 200
+        assert retry[0].content == first[0].content
+        assert retry[0]["Idempotent-Replayed"] == "true"
+        assert not Favorite.objects.exists()
+
+    def test_duplicate_favorite_with_key(self, user, bike):
+        # The view catches the IntegrityError of the INSERT; the claim must not
+        # be in the transaction it aborts.
+        Favorite.objects.create(user=user, bike=bike)
+        client = _client(user)
+        url = reverse("favorites:favorites-create")
+
+        first = client.post(url, {"bike": bike.pk}, HTTP_IDEMPOTENCY_KEY="f-1")
+        retry = client.post(url, {"bike": bike.pk}, HTTP_IDEMPOTENCY_KEY="f-1")
+
+        assert first.status_code == 400
+        assert retry.content == first.content
+        assert retry["Idempotent-Replayed"] == "true"
+
+    def test_retry_gives_up_after_wait_timeout(self, user, bike, slow_toggle, settings):
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0.1
+        started, release = slow_toggle
+        first = []
+        thread = self._in_thread(lambda: _toggle(_client(user), bike, "k"), first)
+        assert started.wait(5)
+
+        response = _toggle(_client(user), bike, "k")
+
+        release.set()
+        thread.join(5)
+        assert response.status_code == 409
+        assert first[0].status_code == 201
@@ -0,0 +1,253 @@
+"""
+Tests for the background job runner (core.jobs).
+"""
+
+import threading
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, connections
+from django.utils import timezone
+
+from core.jobs import enqueue, prune_jobs, register, registered_jobs, run_next_job
+from core.models import Job, JobStatus
+
+calls = []
+started = threading.Event()
+release = threading.Event()
+
+
+@register("test_record")
+def record(value=None):
+    calls.append(value)
+
+
+@register("test_fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@register("test_block")
+def block():
+    started.set()
+    release.wait(5)
+
+
+@register("test_in_transaction")
+def in_transaction():
+    calls.append(connection.in_atomic_block)
+
+
+@register("test_steal")
+def steal():
+    # As if the lease ran out and another worker claimed the job again.
+    Job.objects.filter(name="test_steal").update(
+        locked_until=timezone.now() + timedelta(hours=1)
+    )
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    calls.clear()
+    started.clear()
+    release.clear()
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestJobs:
+    """Test enqueueing and running jobs."""
+
+    def test_due_jobs_run_by_priority(self):
+        later = timezone.now() + timedelta(hours=1)
+        enqueue("test_record", {"value": "low"})
+        enqueue("test_record", {"value": "high"}, priority=5)
+        enqueue("test_record", {"value": "later"}, priority=9, run_at=later)
+
+        while run_next_job():
+            pass
+
+        assert calls == ["high", "low"]
+        assert Job.objects.filter(status=JobStatus.DONE).count() == 2
+        assert run_next_job(now=later).kwargs == {"value": "later"}
+
+    def test_idempotency_keys(self):
+        first = enqueue("test_record", {"value": 1}, key="daily")
+        second = enqueue("test_record", {"value": 2}, key="daily")
+
+        assert second.pk == first.pk
+        assert Job.objects.count() == 1
+
+    def test_unknown_jobs_are_refused(self):
+        with pytest.raises(ValueError, match="No job"):
+            enqueue("test_missing")
+
+    def test_failures_retry(self, settings):
+        settings.JOB_RETRY_BACKOFF = 30
+        enqueue("test_fail")
+        now = timezone.now()
+
+        job = run_next_job(now=now)
+
+        assert job.status == JobStatus.QUEUED
+        assert job.attempts == 1
+        assert job.run_at == now + timedelta(seconds=30)
+        assert job.last_error == "RuntimeError: boom"
+        assert Job.objects.get(pk=job.pk).status == JobStatus.QUEUED
+        assert run_next_job(now=now) is None
+
+        job = run_next_job(now=now + timedelta(seconds=30))
+
+        assert job.status == JobStatus.FAILED
+        assert job.finished_at is not None
+
+    def test_expired_leases_are_claimed_again(self, settings):
+        settings.JOB_LEASE = 60
+        now = timezone.now()
+        job = enqueue("test_record", {"value": "again"})
+        Job.objects.filter(pk=job.pk).update(
+            status=JobStatus.RUNNING, attempts=1, locked_until=now
+        )
+
+        assert run_next_job(now=now - timedelta(seconds=1)) is None
+        job = run_next_job(now=now)
+
+        assert calls == ["again"]
+        assert job.attempts == 2
+        job.refresh_from_db()
+        assert job.status == JobStatus.DONE
+        assert job.locked_until is None
+
+    def test_expired_lease_on_last_attempt_fails(self):
+        now = timezone.now()
+        job = enqueue("test_fail")
+        Job.objects.filter(pk=job.pk).update(
+            status=JobStatus.RUNNING, attempts=2, locked_until=now
+        )
+
+        job = run_next_job(now=now)
+
+        assert job.status == JobStatus.FAILED
+        assert job.last_error == "Lease ran out"
+
+    def test_result_of_a_lost_lease_is_dropped(self):
+        job = enqueue("test_steal")
+
+        run_next_job()
+
+        job.refresh_from_db()
+        assert job.status == JobStatus.RUNNING
+        assert job.finished_at is None
+
+    def test_registered_sweeps(self):
+        assert {
+            "advance_booking_statuses",
+            "build_bike_feed",
+            "prune_booking_events",
+            "prune_emails",
+            "prune_idempotency_keys",
+            "prune_jobs",
+            "prune_sync_changes",
+        } <= set(registered_jobs())
+
+    def test_enqueue_command(self):
+        out = StringIO()
+
+        call_command(
+            "enqueue_job",
+            "test_record",
+            "--kwarg",
+            "value=[1, 2]",
+            "--priority",
+            "3",
+            "--key",
+            "cron",
+            stdout=out,
+        )
+
+        job = Job.objects.get(idempotency_key="cron")
+        assert job.kwargs == {"value": [1, 2]}
+        assert job.priority == 3
+        assert "Queued test_record" in out.getvalue()
+
+    def test_prune_jobs(self, settings):
+        settings.JOB_RETENTION_DAYS = 7
+        enqueue("test_record", key="old")
+        queued = enqueue("test_record", key="queued", run_at=timezone.now())
+        run_next_job()
+        later = timezone.now() + timedelta(days=8)
+        Job.objects.filter(pk=queued.pk).update(run_at=later)
+
+        assert prune_jobs(now=later) == 1
+        assert list(Job.objects.values_list("idempotency_key", flat=True)) == ["queued"]
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestJobWorkers:
+    """Test that concurrent workers share the queue."""
+
+    def test_claimed_jobs_are_skipped(self):
+        enqueue("test_block", priority=1)
+        enqueue("test_record", {"value": "other"})
+
+        def worker():
+            try:
+                run_next_job()
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert started.wait(5)
+
+        job = run_next_job()
+
+        release.set()
+        thread.join(5)
+        assert job.name == "test_record"
+        assert Job.objects.filter(status=JobStatus.DONE).count() == 2
+
+    def test_jobs_run_outside_a_transaction(self):
+        job = enqueue("test_in_transaction")
+
+        run_next_job()
+
+        assert calls == [False]
+        job.refresh_from_db()
+        assert job.status == JobStatus.DONE
+
+    def test_claimed_jobs_are_leased(self, settings):
+        settings.JOB_LEASE = 60
+        job = enqueue("test_block")
+
+        thread = threading.Thread(target=TestJobWorkers.run_one)
+        thread.start()
+        assert started.wait(5)
+
+        # The claim is committed while the job runs.
+        job.refresh_from_db()
+        release.set()
+        thread.join(5)
+        assert job.status == JobStatus.RUNNING
+        assert job.attempts == 1
+        assert job.locked_until > timezone.now()
+
+    @staticmethod
+    def run_one():
+        try:
+            run_next_job()
+        finally:
+            connections.close_all()
+
+    def test_run_jobs_command(self):
+        for value in range(5):
+            enqueue("test_record", {"value": value})
+        out = StringIO()
+
+        call_command("run_jobs", "--once", "--concurrency", "2", stdout=out)
+
+        assert sorted(calls) == [0, 1, 2, 3, 4]
+        assert "Ran 5 jobs" in out.getvalue()
@@ -0,0 +1,196 @@
+"""
+Tests for the metrics registry and the /metrics/ endpoint.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from bookings.services import advance_booking_statuses
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, Registry, render
+
+
+@pytest.fixture
+def registry():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ["status"], registry=registry)
+    latency = Histogram(
+        "latency_seconds", "Latency", ["route"], buckets=(0.1, 1), registry=registry
+    )
+    return registry, requests, latency
+
+
+@pytest.fixture
+def metrics_token(settings):
+    settings.METRICS_TOKEN = "scrape-secret"
+    return {"HTTP_AUTHORIZATION": "Bearer scrape-secret"}
+
+
+def _sample(text, line_start):
+    """Value of the exposition line starting with ``line_start``."""
+    (line,) = [line for line in text.splitlines() if line.startswith(line_start + " ")]
+    return float(line.rsplit(" ", 1)[1])
+
+
+@pytest.mark.unit
+class TestRegistry:
+    """Test metric recording and the text format."""
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        registry, requests, latency = registry
+        for value in (0.05, 0.5, 0.7, 3):
+            latency.observe(value, route="bikes:bike-list")
+        requests.inc(status=200)
+        requests.inc(2, status=200)
+
+        text = render(registry.snapshot())
+
+        assert "# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{route="bikes:bike-list",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="bikes:bike-list",le="1"} 3' in text
+        assert 'latency_seconds_bucket{route="bikes:bike-list",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{route="bikes:bike-list"} 4' in text
+        assert _sample(text, 'latency_seconds_sum{route="bikes:bike-list"}') == 4.25
+        assert 'requests_total{status="200"} 3' in text
+
+    def test_label_values_are_escaped(self, registry):
+        registry, requests, _ = registry
+        requests.inc(status='a"b\\c\nd')
+
+        assert 'requests_total{status="a\\"b\\\\c\\nd"} 1' in render(
+            registry.snapshot()
+        )
+
+    def test_labels_must_match(self, registry):
+        _, requests, _ = registry
+        with pytest.raises(ValueError):
+            requests.inc(route="x")
+
+    def test_workers_are_added_up(self, registry, settings, tmp_path):
+        registry, requests, latency = registry
+        settings.METRICS_DIR = str(tmp_path)
+        requests.inc(status=200)
+        latency.observe(0.5, route="x")
+
+        other = Registry()
+        other_requests = Counter(
+            "requests_total", "Requests", ["status"], registry=other
+        )
+        other_latency = Histogram(
+            "latency_seconds", "Latency", ["route"], buckets=(0.1, 1), registry=other
+        )
+        other_requests.inc(status=200)
+        other_requests.inc(status=500)
+        other_latency.observe(2, route="x")
+        (tmp_path / "99999.json").write_text(json.dumps(other.snapshot()))
+
+        text = render(registry.collect())
+
+        assert 'requests_total{status="200"} 2' in text
+        assert 'requests_total{status="500"} 1' in text
+        assert 'latency_seconds_bucket{route="x",le="1"} 1' in text
+        assert 'latency_seconds_count{route="x"} 2' in text
+        assert {path.name for path in tmp_path.iterdir()} == {
+            "99999.json",
+            f"{os.getpid()}.json",
+        }
+
+    def test_gauges_are_set_and_added_up(self, settings, tmp_path):
+        settings.METRICS_DIR = str(tmp_path)
+        registry, other = Registry(), Registry()
+        for value, target in ((3, registry), (2, other)):
+            gauge = Gauge("open", "Open", ["database"], registry=target)
+            gauge.set(value + 1, database="default")
+            gauge.set(value, database="default")
+        (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(other.snapshot()))
+
+        text = render(registry.collect())
+
+        assert "# TYPE open gauge" in text
+        assert 'open{database="default"} 5' in text
+
+    def test_gauges_of_exited_workers_are_left_out(self, settings, tmp_path):
+        settings.METRICS_DIR = str(tmp_path)
+        registry, exited = Registry(), Registry()
+        for target in (registry, exited):
+            Gauge("open", "Open", ["database"], registry=target).set(
+                2, database="default"
+            )
+            Counter("served_total", "Served", registry=target).inc()
+        worker = subprocess.Popen([sys.executable, "-c", "pass"])
+        worker.wait()
+        (tmp_path / f"{worker.pid}.json").write_text(json.dumps(exited.snapshot()))
+
+        text = render(registry.collect())
+
+        assert 'open{database="default"} 2' in text
+        assert "served_total 2" in text
+
+    def test_cache_hit_ratio_is_derived(self):
+        snapshot = {
+            "cache_requests_total": {
+                "type": "counter",
+                "help": "",
+                "labels": ["cache", "result"],
+                "buckets": [],
+                "samples": [[["users", "hit"], 3], [["users", "miss"], 1]],
+            }
+        }
+        text = render(metrics.with_cache_hit_ratio(snapshot))
+
+        assert 'cache_hit_ratio{cache="users"} 0.75' in text
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    """Test the protected scrape endpoint and what requests record."""
+
+    def test_requests_are_recorded(self, api_client, bike, metrics_token):
+        api_client.get(reverse("bikes:bike-list"))
+        api_client.get(reverse("bikes:bike-list"))
+
+        response = api_client.get(reverse("core:metrics"), **metrics_token)
+        text = response.content.decode()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        labels = 'route="bikes:bike-list",method="GET"'
+        assert _sample(text, f"http_request_duration_seconds_count{{{labels}}}") >= 2
+        assert _sample(text, f'http_responses_total{{{labels},status="200"}}') >= 2
+        assert _sample(text, 'db_queries_per_request_sum{route="bikes:bike-list"}') > 0
+
+    def test_unmatched_paths_share_a_label(self, api_client, metrics_token):
+        api_client.get("/no/such/page/")
+
+        text = api_client.get(reverse("core:metrics"), **metrics_token).content.decode()
+
+        assert 'route="unmatched",method="GET",status="404"' in text
+
+    def test_sweep_duration_is_recorded(self, api_client, metrics_token):
+        advance_booking_statuses()
+
+        text = api_client.get(reverse("core:metrics"), **metrics_token).content.decode()
+
+        assert (
+            _sample(text, 'job_duration_seconds_count{job="booking_status_sweep"}') >= 1
+        )
+
+    def test_token_is_required(self, api_client, metrics_token):
+        url = reverse("core:metrics")
+
+        assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+        response = api_client.get(url, HTTP_AUTHORIZATION="Bearer wrong")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_disabled_without_token(self, api_client, settings):
+        settings.METRICS_TOKEN = ""
+
+        response = api_client.get(reverse("core:metrics"))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
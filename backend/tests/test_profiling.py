@@ -0,0 +1,228 @@
+"""
+Tests for staff-only request profiling.
+"""
+
+import io
+import json
+import pstats
+import threading
+import time
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bikes.serializers import BikeSerializer
+from utils import profiling
+from utils.profiling import (
+    FieldTimings,
+    StackSampler,
+    collapsed_stacks,
+    field_timings,
+)
+
+
+@pytest.fixture
+def profiling_dir(settings, tmp_path):
+    settings.PROFILING_DIR = str(tmp_path)
+    return tmp_path
+
+
+def _jwt_client(api_client, user):
+    token = RefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return api_client
+
+
+@pytest.fixture
+def staff_client(api_client, user):
+    user.is_staff = True
+    user.save(update_fields=["is_staff"])
+    return _jwt_client(api_client, user)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    """Test which requests are profiled and what is written."""
+
+    def test_staff_request_is_profiled(self, staff_client, booking, profiling_dir):
+        url = reverse("bookings:booking-detail", kwargs={"pk": booking.pk})
+        response = staff_client.get(url, HTTP_X_PROFILE="1")
+
+        assert response.status_code == status.HTTP_200_OK
+        profile_id = response.headers["X-Profile-Id"]
+        assert "bookings_booking-detail" in profile_id
+        assert "calls" in response.headers["X-Profile-Summary"]
+        assert "BookingSerializer.bike=" in response.headers["X-Profile-Fields"]
+
+        pstats.Stats(str(profiling_dir / f"{profile_id}.prof"))
+        stacks = (profiling_dir / f"{profile_id}.collapsed").read_text().splitlines()
+        assert any("bookings/views.py" in line for line in stacks)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+        summary = json.loads((profiling_dir / f"{profile_id}.json").read_text())
+        fields = {entry["field"]: entry for entry in summary["serializer_fields"]}
+        assert fields["BookingSerializer.bike"]["calls"] == 1
+        assert fields["BikeSerializer.images"]["calls"] == 1
+        assert summary["functions"]
+
+    def test_query_flag_works(self, staff_client, bike, profiling_dir):
+        response = staff_client.get(reverse("bikes:bike-list"), {"profile": "1"})
+
+        assert "X-Profile-Id" in response.headers
+        assert len(list(profiling_dir.glob("*.prof"))) == 1
+
+    def test_non_staff_requests_are_not_profiled(
+        self, api_client, user, bike, profiling_dir
+    ):
+        client = _jwt_client(api_client, user)
+        response = client.get(reverse("bikes:bike-list"), HTTP_X_PROFILE="1")
+        anonymous = APIClient().get(reverse("bikes:bike-list"), HTTP_X_PROFILE="1")
+
+        assert "X-Profile-Id" not in response.headers
+        assert "X-Profile-Id" not in anonymous.headers
+        assert list(profiling_dir.iterdir()) == []
+
+    def test_disabled_without_directory(self, staff_client, settings):
+        settings.PROFILING_DIR = None
+
+        response = staff_client.get(reverse("bikes:bike-list"), HTTP_X_PROFILE="1")
+
+        assert "X-Profile-Id" not in response.headers
+
+
+@pytest.mark.unit
+class TestProfilingHelpers:
+    """Test field timing and the collapsed stack conversion."""
+
+    @pytest.mark.django_db
+    def test_field_timing_keeps_output(self, bike):
+        plain = BikeSerializer(bike).data
+        timings = FieldTimings()
+        context = field_timings.set(timings)
+        try:
+            timed = BikeSerializer(bike).data
+        finally:
+            field_timings.reset(context)
+
+        assert timed == plain
+        assert {name for name, _, _ in timings.slowest()} >= {
+            "BikeSerializer.owner",
+            "BikeSerializer.images",
+            "BikeSerializer.is_favorited",
+        }
+
+    def test_time_is_split_between_callers(self):
+        def key(name):
+            return ("/app/module.py", 1, name)
+
+        stats = pstats.Stats.__new__(pstats.Stats)
+        # func: (primitive calls, calls, own time, cumulative time, callers)
+        stats.stats = {
+            key("main"): (1, 1, 0.0, 1.0, {}),
+            key("a"): (1, 1, 0.1, 0.4, {key("main"): (1, 1, 0.1, 0.4)}),
+            key("b"): (1, 1, 0.1, 0.6, {key("main"): (1, 1, 0.1, 0.6)}),
+            key("leaf"): (
+                2,
+                2,
+                0.8,
+                0.8,
+                {key("a"): (1, 1, 0.3, 0.3), key("b"): (1, 1, 0.5, 0.5)},
+            ),
+        }
+
+        lines = dict(line.rsplit(" ", 1) for line in collapsed_stacks(stats))
+
+        main = "/app/module.py:1:main"
+        leaf = "/app/module.py:1:leaf"
+        assert lines[f"{main};/app/module.py:1:a;{leaf}"] == "300000"
+        assert lines[f"{main};/app/module.py:1:b;{leaf}"] == "500000"
+        assert lines[f"{main};/app/module.py:1:b"] == "100000"
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def sampler_settings(settings, tmp_path):
+    settings.SAMPLING_PROFILER_DIR = str(tmp_path)
+    settings.SAMPLING_PROFILER_HZ = 500
+    settings.SAMPLING_PROFILER_FLUSH_INTERVAL = 60
+    yield tmp_path
+    if profiling._sampler is not None:
+        profiling._sampler.stop()
+        profiling._sampler = None
+
+
+@pytest.mark.integration
+class TestStackSampler:
+    """Test the continuous sampler and merging its output."""
+
+    def test_request_threads_are_sampled_by_route(self, tmp_path):
+        sampler = StackSampler(str(tmp_path), hz=500, flush_interval=60)
+        stop = threading.Event()
+        busy = threading.Thread(target=_spin, args=(stop,))
+        idle = threading.Thread(target=stop.wait)
+        busy.start()
+        idle.start()
+        sampler.routes[busy.ident] = "bikes:bike-list"
+        sampler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not sampler.stacks and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sampler.stop()
+            stop.set()
+            busy.join()
+            idle.join()
+
+        stacks = list(sampler.stacks)
+        assert stacks
+        assert all(stack.startswith("bikes:bike-list;") for stack in stacks)
+        assert any("tests/test_profiling.py" in stack for stack in stacks)
+        lines = open(sampler.path).read().splitlines()
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(
+            sampler.stacks.values()
+        )
+
+    @pytest.mark.django_db
+    def test_middleware_labels_requests(self, api_client, bike, sampler_settings):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            api_client.get(reverse("bikes:bike-list"))
+            sampler = profiling._sampler
+            if any(stack.startswith("bikes:bike-list;") for stack in sampler.stacks):
+                break
+        else:
+            pytest.fail("No bike list samples recorded")
+
+        assert sampler.routes == {}
+
+    def test_merge_command_adds_up_workers(self, tmp_path, settings):
+        settings.SAMPLING_PROFILER_DIR = str(tmp_path)
+        (tmp_path / "web-1.collapsed").write_text(
+            "bikes:bike-list;main;render 3\nusers:me;main;decode 1\n"
+        )
+        (tmp_path / "web-2.collapsed").write_text("bikes:bike-list;main;render 2\n")
+
+        output = tmp_path / "merged.txt"
+        call_command("merge_profiles", output=str(output), stderr=io.StringIO())
+        assert output.read_text() == (
+            "bikes:bike-list;main;render 5\nusers:me;main;decode 1\n"
+        )
+
+        route_only = tmp_path / "route.txt"
+        call_command(
+            "merge_profiles",
+            str(tmp_path / "web-1.collapsed"),
+            route="bikes:bike-list",
+            output=str(route_only),
+            stderr=io.StringIO(),
+        )
+        assert route_only.read_text() == "main;render 3\n"
@@ -0,0 +1,495 @@
+"""
+Per-endpoint query budgets.
+
+Every route of the bikes, bookings, ratings, favorites and users APIs is
+requested against a marketplace holding one row of everything and against one
+holding fifty, with the page size set to match. The number of queries must
+stay within the route's budget in ``tests/query_budgets.py`` and must not grow
+with the amount of data on the page.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.contrib.auth.tokens import default_token_generator
+from PIL import Image
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bikes.feed import build_bike_feed
+from bikes.models import Bike, BikeImage, BikeStatus, BikeType, MaintenanceTicket
+from bookings.models import Booking, BookingStatus
+from favorites.models import Favorite
+from ratings.models import Rating
+from sync.models import Change, ChangeKind
+from sync.services import Cursor
+from users.models import User
+from users.serializers import LoginSerializer
+
+from .query_budgets import QUERY_BUDGETS
+
+SIZES = (1, 50)
+BUDGETED_APPS = ("bikes", "bookings", "ratings", "favorites", "sync", "users")
+PASSWORD = "budget-pass-123"
+
+
+def image_upload(name="bike.gif"):
+    buffer = BytesIO()
+    Image.new("RGB", (1, 1)).save(buffer, "GIF")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/gif")
+
+
+def build_marketplace(size):
+    """
+    Create an owner with ``size`` bikes and a renter with ``size`` rows of
+    every kind, plus one spare bike left free for bookings and favorites.
+    """
+    tag = f"n{size}"
+    now = timezone.now()
+    owner = User.objects.create_user(
+        email=f"owner-{tag}@example.com",
+        password=PASSWORD,
+        first_name="Bike",
+        last_name="Owner",
+        is_owner=True,
+    )
+    renter = User.objects.create_user(
+        email=f"renter-{tag}@example.com",
+        password=PASSWORD,
+        first_name="Rita",
+        last_name="Renter",
+    )
+    reviewers = User.objects.bulk_create(
+        User(email=f"reviewer-{tag}-{i}@example.com", password="!", first_name="Rev")
+        for i in range(size)
+    )
+
+    bikes = Bike.objects.bulk_create(
+        Bike(
+            owner=owner,
+            title=f"Budget bike {i}",
+            description="Bike for query budgets",
+            location="Budget City",
+            hourly_rate=Decimal("10.00"),
+            daily_rate=Decimal("60.00"),
+            bike_type=BikeType.CITY,
+            battery_range=50,
+            max_speed=25,
+            weight=Decimal("20.0"),
+            status=BikeStatus.AVAILABLE,
+        )
+        for i in range(size + 1)
+    )
+    *bikes, spare = bikes
+    main = bikes[0]
+
+    BikeImage.objects.bulk_create(
+        BikeImage(bike=bike, image="bike_images/budget.gif", is_primary=True)
+        for bike in bikes
+    )
+    BikeImage.objects.bulk_create(
+        BikeImage(bike=main, image="bike_images/budget.gif", order=i)
+        for i in range(1, size + 1)
+    )
+    images = list(BikeImage.objects.filter(bike=main).order_by("order"))
+
+    def bookings(status, start):
+        return Booking.objects.bulk_create(
+            Booking(
+                bike=bike,
+                renter=renter,
+                start_time=start,
+                end_time=start + timedelta(hours=2),
+                total_price=Decimal("20.00"),
+                status=status,
+            )
+            for bike in bikes
+        )
+
+    rated = bookings(BookingStatus.COMPLETED, now - timedelta(days=10))
+    unrated = bookings(BookingStatus.COMPLETED, now - timedelta(days=8))
+    requested = bookings(BookingStatus.REQUESTED, now + timedelta(days=3))
+    approved_due = bookings(BookingStatus.APPROVED, now - timedelta(hours=1))
+    active_due = bookings(BookingStatus.ACTIVE, now - timedelta(hours=3))
+    reviewed = Booking.objects.bulk_create(
+        Booking(
+            bike=main,
+            renter=reviewer,
+            start_time=now - timedelta(days=20, hours=3 * i),
+            end_time=now - timedelta(days=20, hours=3 * i - 2),
+            total_price=Decimal("20.00"),
+            status=BookingStatus.COMPLETED,
+        )
+        for i, reviewer in enumerate(reviewers)
+    )
+
+    ratings = Rating.objects.bulk_create(
+        Rating(bike=booking.bike, user=renter, booking=booking, rating=4)
+        for booking in rated
+    )
+    Rating.objects.bulk_create(
+        Rating(bike=main, user=booking.renter, booking=booking, rating=i % 5 + 1)
+        for i, booking in enumerate(reviewed)
+    )
+    Favorite.objects.bulk_create(Favorite(user=renter, bike=bike) for bike in bikes)
+    MaintenanceTicket.objects.bulk_create(
+        MaintenanceTicket(bike=bike, reported_by=renter, description="Squeaky brakes")
+        for bike in bikes
+    )
+
+    return SimpleNamespace(
+        size=size,
+        tag=tag,
+        owner=owner,
+        renter=renter,
+        main=main,
+        spare=spare,
+        images=images,
+        rating=ratings[0],
+        unrated=unrated[0],
+        requested=requested[0],
+        approved_due=approved_due[0],
+        active_due=active_due[0],
+    )
+
+
+def call(user, route, kwargs=None, data=None, format="json"):
+    return SimpleNamespace(
+        user=user, url=reverse(route, kwargs=kwargs), data=data, format=format
+    )
+
+
+def feed_call(route, data=None):
+    """A request for the bike feed, built twice so it has a changes file."""
+    build_bike_feed()
+    build_bike_feed()
+    return call(None, route, data=data)
+
+
+def sync_call(m):
+    """A sync of the renter after every record of the marketplace changed."""
+    changed = {
+        ChangeKind.BIKE: Bike.objects.all(),
+        ChangeKind.BOOKING: Booking.objects.filter(renter=m.renter),
+        ChangeKind.RATING: Rating.objects.filter(user=m.renter),
+        ChangeKind.FAVORITE: Favorite.objects.filter(user=m.renter),
+    }
+    Change.objects.bulk_create(
+        Change(user=m.renter, kind=kind, object_id=pk)
+        for kind, queryset in changed.items()
+        for pk in queryset.values_list("pk", flat=True)
+    )
+    cursor = Cursor(since=0, issued=int(timezone.now().timestamp()))
+    return call(m.renter, "sync:sync", data={"cursor": cursor.encode()})
+
+
+def bike_payload(m):
+    return {
+        "title": "Updated budget bike",
+        "description": "Bike for query budgets",
+        "location": "Budget City",
+        "hourly_rate": "12.00",
+        "daily_rate": "70.00",
+        "bike_type": BikeType.CITY,
+        "battery_range": 60,
+        "max_speed": 25,
+        "weight": "21.0",
+        "status": BikeStatus.AVAILABLE,
+        "image_files": [image_upload(f"new-{i}.gif") for i in range(m.size)],
+    }
+
+
+def bike_update(m):
+    payload = bike_payload(m)
+    payload["delete_image_ids"] = [image.pk for image in m.images[1:]]
+    payload["primary_image_id"] = m.images[0].pk
+    return call(
+        m.owner, "bikes:bike-detail", {"pk": m.main.pk}, payload, format="multipart"
+    )
+
+
+def image_detail(m, data=None, format="json"):
+    kwargs = {"bike_id": m.main.pk, "pk": m.images[0].pk}
+    return call(m.owner, "bikes:bike-image-detail", kwargs, data, format)
+
+
+def profile_update(m):
+    return call(m.renter, "users:me", data={"first_name": "Rita", "phone": "555 0100"})
+
+
+# (route name, method) -> request against a marketplace
+REQUESTS = {
+    # bikes
+    ("bikes:bike-list", "GET"): lambda m: call(m.renter, "bikes:bike-list"),
+    ("bikes:bike-create", "POST"): lambda m: call(
+        m.owner, "bikes:bike-create", data=bike_payload(m), format="multipart"
+    ),
+    ("bikes:bike-detail", "GET"): lambda m: call(
+        m.renter, "bikes:bike-detail", {"pk": m.main.pk}
+    ),
+    ("bikes:bike-detail", "PUT"): bike_update,
+    ("bikes:bike-detail", "PATCH"): bike_update,
+    ("bikes:bike-detail", "DELETE"): lambda m: call(
+        m.owner, "bikes:bike-detail", {"pk": m.main.pk}
+    ),
+    ("bikes:my-bikes", "GET"): lambda m: call(m.owner, "bikes:my-bikes"),
+    ("bikes:bike-feed", "GET"): lambda m: feed_call("bikes:bike-feed"),
+    ("bikes:bike-feed-snapshot", "GET"): lambda m: feed_call(
+        "bikes:bike-feed-snapshot"
+    ),
+    ("bikes:bike-feed-changes", "GET"): lambda m: feed_call(
+        "bikes:bike-feed-changes", {"since": 1}
+    ),
+    ("bikes:my-bikes-export", "GET"): lambda m: call(
+        m.owner, "bikes:my-bikes-export", {"export_format": "csv"}
+    ),
+    ("bikes:toggle-bike-status", "POST"): lambda m: call(
+        m.owner, "bikes:toggle-bike-status", {"pk": m.main.pk}
+    ),
+    ("bikes:bike-images", "GET"): lambda m: call(
+        m.owner, "bikes:bike-images", {"bike_id": m.main.pk}
+    ),
+    ("bikes:bike-images", "POST"): lambda m: call(
+        m.owner,
+        "bikes:bike-images",
+        {"bike_id": m.main.pk},
+        {"image": image_upload(), "order": m.size + 1},
+        format="multipart",
+    ),
+    ("bikes:bike-image-detail", "GET"): image_detail,
+    ("bikes:bike-image-detail", "PUT"): lambda m: image_detail(
+        m, {"image": image_upload(), "caption": "Side view"}, format="multipart"
+    ),
+    ("bikes:bike-image-detail", "PATCH"): lambda m: image_detail(
+        m, {"caption": "Side view"}
+    ),
+    ("bikes:bike-image-detail", "DELETE"): image_detail,
+    ("bikes:set-primary-image", "POST"): lambda m: call(
+        m.owner,
+        "bikes:set-primary-image",
+        {"bike_id": m.main.pk, "image_id": m.images[-1].pk},
+    ),
+    ("bikes:maintenance-list-create", "GET"): lambda m: call(
+        m.owner, "bikes:maintenance-list-create"
+    ),
+    ("bikes:maintenance-list-create", "POST"): lambda m: call(
+        m.renter,
+        "bikes:maintenance-list-create",
+        data={"bike_id": m.main.pk, "description": "Loose chain"},
+    ),
+    # bookings
+    ("bookings:booking-list", "GET"): lambda m: call(m.renter, "bookings:booking-list"),
+    ("bookings:booking-create", "POST"): lambda m: call(
+        m.renter,
+        "bookings:booking-create",
+        data={
+            "bike_id": m.spare.pk,
+            "start_time": (timezone.now() + timedelta(days=1)).isoformat(),
+            "end_time": (timezone.now() + timedelta(days=1, hours=3)).isoformat(),
+        },
+    ),
+    ("bookings:booking-detail", "GET"): lambda m: call(
+        m.renter, "bookings:booking-detail", {"pk": m.requested.pk}
+    ),
+    ("bookings:booking-status-update", "PUT"): lambda m: call(
+        m.owner,
+        "bookings:booking-status-update",
+        {"pk": m.requested.pk},
+        {"status": BookingStatus.APPROVED},
+    ),
+    ("bookings:booking-status-update", "PATCH"): lambda m: call(
+        m.owner,
+        "bookings:booking-status-update",
+        {"pk": m.requested.pk},
+        {"status": BookingStatus.APPROVED},
+    ),
+    ("bookings:booking-cancel", "POST"): lambda m: call(
+        m.renter, "bookings:booking-cancel", {"pk": m.requested.pk}
+    ),
+    ("bookings:booking-start", "POST"): lambda m: call(
+        m.renter, "bookings:booking-start", {"pk": m.approved_due.pk}
+    ),
+    ("bookings:booking-complete", "POST"): lambda m: call(
+        m.renter, "bookings:booking-complete", {"pk": m.active_due.pk}
+    ),
+    ("bookings:check-expired-bookings", "GET"): lambda m: call(
+        m.owner, "bookings:check-expired-bookings"
+    ),
+    ("bookings:my-bookings", "GET"): lambda m: call(m.renter, "bookings:my-bookings"),
+    ("bookings:bike-bookings", "GET"): lambda m: call(
+        m.owner, "bookings:bike-bookings"
+    ),
+    ("bookings:bike-bookings-export", "GET"): lambda m: call(
+        m.owner,
+        "bookings:bike-bookings-export",
+        {"export_format": "ndjson"},
+        {"status": BookingStatus.COMPLETED},
+    ),
+    # ratings
+    ("ratings:rating-list", "GET"): lambda m: call(m.renter, "ratings:rating-list"),
+    ("ratings:rating-create", "POST"): lambda m: call(
+        m.renter,
+        "ratings:rating-create",
+        data={"booking": m.unrated.pk, "rating": 5, "comment": "Smooth ride"},
+    ),
+    ("ratings:rating-detail", "GET"): lambda m: call(
+        m.renter, "ratings:rating-detail", {"pk": m.rating.pk}
+    ),
+    ("ratings:rating-detail", "PUT"): lambda m: call(
+        m.renter,
+        "ratings:rating-detail",
+        {"pk": m.rating.pk},
+        {"rating": 5, "comment": "Even better the second time"},
+    ),
+    ("ratings:rating-detail", "PATCH"): lambda m: call(
+        m.renter, "ratings:rating-detail", {"pk": m.rating.pk}, {"rating": 3}
+    ),
+    ("ratings:rating-detail", "DELETE"): lambda m: call(
+        m.renter, "ratings:rating-detail", {"pk": m.rating.pk}
+    ),
+    ("ratings:my-ratings", "GET"): lambda m: call(m.renter, "ratings:my-ratings"),
+    ("ratings:rateable-bookings", "GET"): lambda m: call(
+        m.renter, "ratings:rateable-bookings"
+    ),
+    ("ratings:bike-ratings", "GET"): lambda m: call(
+        m.renter, "ratings:bike-ratings", {"bike_id": m.main.pk}
+    ),
+    ("ratings:bike-rating-stats", "GET"): lambda m: call(
+        m.renter, "ratings:bike-rating-stats", {"bike_id": m.main.pk}
+    ),
+    # favorites
+    ("favorites:favorites-list", "GET"): lambda m: call(
+        m.renter, "favorites:favorites-list"
+    ),
+    ("favorites:favorites-create", "POST"): lambda m: call(
+        m.renter, "favorites:favorites-create", data={"bike": m.spare.pk}
+    ),
+    ("favorites:favorite-delete", "DELETE"): lambda m: call(
+        m.renter, "favorites:favorite-delete", {"bike_id": m.main.pk}
+    ),
+    ("favorites:favorite-status", "GET"): lambda m: call(
+        m.renter, "favorites:favorite-status", {"bike_id": m.main.pk}
+    ),
+    ("favorites:favorite-toggle", "POST"): lambda m: call(
+        m.renter, "favorites:favorite-toggle", {"bike_id": m.spare.pk}
+    ),
+    # sync
+    ("sync:sync", "GET"): sync_call,
+    # users
+    ("users:login", "POST"): lambda m: call(
+        None, "users:login", data={"email": m.renter.email, "password": PASSWORD}
+    ),
+    ("users:refresh", "POST"): lambda m: call(
+        None, "users:refresh", data={"refresh": str(RefreshToken.for_user(m.renter))}
+    ),
+    ("users:signup", "POST"): lambda m: call(
+        None,
+        "users:signup",
+        data={
+            "email": f"signup-{m.tag}@example.com",
+            "password": "Fresh-pass-2024",
+            "password2": "Fresh-pass-2024",
+            "first_name": "New",
+            "last_name": "Rider",
+        },
+    ),
+    ("users:password-reset-request", "POST"): lambda m: call(
+        None, "users:password-reset-request", data={"email": m.renter.email}
+    ),
+    ("users:password-reset-confirm", "POST"): lambda m: call(
+        None,
+        "users:password-reset-confirm",
+        {
+            "uid": urlsafe_base64_encode(force_bytes(m.renter.pk)),
+            "token": default_token_generator.make_token(m.renter),
+        },
+        {"new_password": "Fresh-pass-2024", "new_password_confirm": "Fresh-pass-2024"},
+    ),
+    ("users:me", "GET"): lambda m: call(m.renter, "users:me"),
+    ("users:me", "PUT"): profile_update,
+    ("users:me", "PATCH"): profile_update,
+}
+
+
+def budgeted_routes():
+    """Every (route name, method) served by the budgeted apps."""
+    routes = set()
+    for app in BUDGETED_APPS:
+        urls = import_module(f"{app}.urls")
+        for pattern in urls.urlpatterns:
+            view = getattr(pattern.callback, "cls", None)
+            if view is None:
+                # Event streams stay open; tests/test_booking_events.py
+                # covers their queries.
+                continue
+            for method in view.http_method_names:
+                if method not in ("head", "options") and hasattr(view, method):
+                    routes.add((f"{urls.app_name}:{pattern.name}", method.upper()))
+    return routes
+
+
+def count_queries(request):
+    """Send ``request`` like a real client and return the queries it ran."""
+    client = APIClient()
+    if request.user is not None:
+        token = LoginSerializer.get_token(request.user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    method = getattr(client, request.method.lower())
+    with CaptureQueriesContext(connection) as context:
+        response = method(request.url, request.data, format=request.format)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    assert response.status_code < 400, (request.url, response.data)
+    return len(context.captured_queries)
+
+
+@pytest.fixture
+def budget_settings(settings, tmp_path):
+    settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    settings.MEDIA_ROOT = tmp_path
+    settings.BIKE_FEED_DIR = tmp_path / "feeds"
+
+
+@pytest.mark.unit
+class TestBudgetManifest:
+    """The manifest must keep up with the URL configuration."""
+
+    def test_every_route_has_a_budget(self):
+        assert budgeted_routes() - set(QUERY_BUDGETS) == set()
+
+    def test_every_budget_has_a_route_and_request(self):
+        assert set(QUERY_BUDGETS) - budgeted_routes() == set()
+        assert set(REQUESTS) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """Each route stays within its budget and does not grow with page size."""
+
+    @pytest.mark.parametrize(
+        "route", sorted(QUERY_BUDGETS), ids=lambda route: f"{route[1]} {route[0]}"
+    )
+    def test_route_within_budget(self, route, budget_settings, monkeypatch):
+        counts = {}
+        for size in SIZES:
+            marketplace = build_marketplace(size)
+            monkeypatch.setattr(PageNumberPagination, "page_size", size)
+            request = REQUESTS[route](marketplace)
+            request.method = route[1]
+            counts[size] = count_queries(request)
+
+        assert max(counts.values()) <= QUERY_BUDGETS[route], counts
+        assert counts[max(SIZES)] <= counts[min(SIZES)], counts
@@ -0,0 +1,395 @@
+"""
+EXPLAIN-based regression tests for the hot list, sweep and conflict queries.
+
+The planner is steered towards index paths for each check: sequential scans,
+hash and merge joins (and sorts, where checked) are disabled, so a ``Seq Scan``,
+a full index scan or a ``Sort`` only shows up when no index can answer the
+query. That keeps the checks meaningful on small test tables, where a full scan
+is otherwise the cheapest plan. Hot statements additionally have to read the
+index added for them, so dropping or reshaping one fails its test even when
+another index could still avoid a sequential scan.
+"""
+
+import json
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from bikes.models import Bike, BikeImage, BikeStatus, MaintenanceTicket
+from bikes.views import MaintenanceTicketListCreateAPIView
+from bookings.models import Booking, BookingStatus
+from bookings.views import BookingListAPIView
+from favorites.models import Favorite
+from ratings.models import Rating
+from users.models import User
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _prefer_indexes(cursor):
+    for setting in ("enable_seqscan", "enable_hashjoin", "enable_mergejoin"):
+        cursor.execute(f"SET LOCAL {setting} = off")
+
+
+def explain(queryset):
+    """Return the flattened plan nodes of ``queryset``, preferring index paths."""
+    with connection.cursor() as cursor:
+        _prefer_indexes(cursor)
+    plan = json.loads(queryset.explain(format="json"))
+    return list(_plan_nodes(plan[0]["Plan"]))
+
+
+def explain_sql(sql):
+    """Plan a captured statement, preferring index paths and avoiding sorts."""
+    with connection.cursor() as cursor:
+        _prefer_indexes(cursor)
+        cursor.execute("SET LOCAL enable_sort = off")
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _relations(node):
+    return {n["Relation Name"] for n in _plan_nodes(node) if "Relation Name" in n}
+
+
+def plan_problems(plan, allow_sort=()):
+    """Describe every sequential scan and unexpected sort in a plan."""
+    problems = []
+    for node in _plan_nodes(plan):
+        if node["Node Type"] == "Seq Scan":
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            tables = _relations(node)
+            if not tables <= set(allow_sort):
+                problems.append(f"{node['Node Type']} over {', '.join(sorted(tables))}")
+    return problems
+
+
+# Prefetches of a page's images and favorites fetch children of several bikes
+# at once and are sorted in memory; the sort is bounded by the page size.
+PREFETCH_SORTS = ("bikes_bikeimage", "favorites_favorite")
+
+
+def hot_query_plans(request):
+    """Run ``request`` and EXPLAIN every SELECT it issued."""
+    with CaptureQueriesContext(connection) as context:
+        response = request()
+    assert response.status_code < 400, response.data
+    return {
+        query["sql"]: explain_sql(query["sql"])
+        for query in context.captured_queries
+        if query["sql"].startswith("SELECT")
+    }
+
+
+def hot_query_problems(plans, allow_sort=()):
+    """Map each captured statement to the problems found in its plan."""
+    allow_sort = (*PREFETCH_SORTS, *allow_sort)
+    problems = {}
+    for sql, plan in plans.items():
+        found = plan_problems(plan, allow_sort)
+        if found:
+            problems[sql] = found
+    return problems
+
+
+def indexes_used(plans):
+    """Names of every index read by the captured statements."""
+    return {
+        node["Index Name"]
+        for plan in plans.values()
+        for node in _plan_nodes(plan)
+        if "Index Name" in node
+    }
+
+
+def full_scans(nodes, table):
+    """Plan nodes reading every row of ``table``."""
+    return [
+        node
+        for node in nodes
+        if node.get("Relation Name") == table
+        and (
+            node["Node Type"] == "Seq Scan"
+            or (
+                node["Node Type"] in ("Index Scan", "Index Only Scan")
+                and "Index Cond" not in node
+            )
+        )
+    ]
+
+
+def view_queryset(view_class, user, **params):
+    """Build the filtered queryset a list view would paginate for ``user``."""
+    request = APIRequestFactory().get("/", params)
+    force_authenticate(request, user=user)
+    view = view_class()
+    view.setup(request)
+    view.request = view.initialize_request(request)
+    view.format_kwarg = None
+    return view.filter_queryset(view.get_queryset())
+
+
+@pytest.fixture
+def seeded_marketplace(db, owner, user):
+    """
+    A small marketplace in which ``owner`` and ``user`` are a few of many
+    members, so that their own rows are a small share of every table.
+    """
+    now = timezone.now()
+    members = [
+        owner,
+        user,
+        *User.objects.bulk_create(
+            User(email=f"member{i}@example.com", first_name="Member", last_name=str(i))
+            for i in range(30)
+        ),
+    ]
+    bikes = Bike.objects.bulk_create(
+        Bike(
+            owner=members[i % len(members)],
+            title=f"Seeded bike {i}",
+            description="Seeded for query plan tests",
+            location=f"Area {i % 5}",
+            hourly_rate=Decimal("10.00"),
+            daily_rate=Decimal("60.00"),
+            battery_range=50,
+            max_speed=25,
+            weight=Decimal("20.00"),
+            status=BikeStatus.UNAVAILABLE if i % 4 == 3 else BikeStatus.AVAILABLE,
+        )
+        for i in range(4 * len(members))
+    )
+    BikeImage.objects.bulk_create(
+        BikeImage(bike=bike, image=f"bike_images/{bike.pk}.jpg", is_primary=True)
+        for bike in bikes
+    )
+    statuses = list(BookingStatus.values)
+    bookings = Booking.objects.bulk_create(
+        Booking(
+            bike=bikes[i % len(bikes)],
+            renter=members[(7 * i + 3) % len(members)],
+            start_time=now + timedelta(hours=i - 500),
+            end_time=now + timedelta(hours=i - 498),
+            total_price=Decimal("20.00"),
+            status=statuses[i % len(statuses)],
+        )
+        for i in range(1000)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=member, bike=bike)
+        for i, member in enumerate(members)
+        for bike in bikes[i : i + 10]
+    )
+    Rating.objects.bulk_create(
+        Rating(bike=booking.bike, user=booking.renter, booking=booking, rating=4)
+        for booking in bookings
+        if booking.status == BookingStatus.COMPLETED
+    )
+    MaintenanceTicket.objects.bulk_create(
+        MaintenanceTicket(
+            bike=bike, reported_by=members[(i + 5) % len(members)], description="Seeded"
+        )
+        for i, bike in enumerate(bikes)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return bikes
+
+
+@pytest.fixture
+def related_bookings(db, user, owner, bike, booking_data):
+    """Bookings where ``owner`` is the bike owner and where they are the renter."""
+    other_bike = Bike.objects.create(
+        owner=user,
+        title="Renter's own bike",
+        description="Owned by the regular user",
+        location="Elsewhere",
+        daily_rate="50.00",
+        battery_range=40,
+        max_speed=25,
+        weight="20.00",
+    )
+    as_owner = Booking.objects.create(bike=bike, renter=user, **booking_data)
+    as_renter = Booking.objects.create(bike=other_bike, renter=owner, **booking_data)
+    return as_owner, as_renter
+
+
+@pytest.mark.integration
+@pytest.mark.booking
+@pytest.mark.django_db
+class TestRelatedBookingsPlan:
+    """The default "related to me" booking list must stay index-driven."""
+
+    def test_or_filter_needs_full_scan(self, owner, seeded_marketplace):
+        """Sanity check: the OR across the join cannot use an index."""
+        queryset = Booking.objects.filter(Q(renter=owner) | Q(bike__owner=owner))
+        nodes = explain(queryset)
+        assert full_scans(nodes, "bookings_booking") + full_scans(nodes, "bikes_bike")
+
+    def test_union_plan_uses_indexes(self, owner, seeded_marketplace):
+        queryset = view_queryset(BookingListAPIView, owner)
+        nodes = explain(queryset)
+
+        assert full_scans(nodes, "bookings_booking") == []
+        assert full_scans(nodes, "bikes_bike") == []
+
+    def test_union_matches_or_filter(self, owner, seeded_marketplace):
+        queryset = view_queryset(BookingListAPIView, owner)
+        expected = Booking.objects.filter(Q(renter=owner) | Q(bike__owner=owner))
+        assert list(queryset) == list(expected)
+
+    def test_union_keeps_filters_and_pagination(
+        self, authenticated_owner_client, related_bookings
+    ):
+        as_owner, as_renter = related_bookings
+        url = reverse("bookings:booking-list")
+
+        response = authenticated_owner_client.get(url, {"search": "Renter's own"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["data"]["count"] == 1
+        assert response.data["data"]["results"][0]["id"] == as_renter.id
+
+        response = authenticated_owner_client.get(url, {"ordering": "created_at"})
+        ids = [item["id"] for item in response.data["data"]["results"]]
+        assert ids == [as_owner.id, as_renter.id]
+
+
+@pytest.mark.integration
+@pytest.mark.bike
+@pytest.mark.django_db
+class TestMaintenanceTicketPlan:
+    """The maintenance ticket list must stay index-driven."""
+
+    def test_union_plan_uses_indexes(self, owner, seeded_marketplace):
+        queryset = view_queryset(MaintenanceTicketListCreateAPIView, owner)
+        nodes = explain(queryset)
+
+        assert full_scans(nodes, "bikes_maintenanceticket") == []
+        expected = MaintenanceTicket.objects.filter(
+            Q(bike__owner=owner) | Q(reported_by=owner)
+        )
+        assert list(queryset) == list(expected)
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestHotQueryPlans:
+    """Every query behind the hot endpoints must be answered from an index."""
+
+    def assert_index_driven(self, request, indexes=(), allow_sort=()):
+        plans = hot_query_plans(request)
+        assert hot_query_problems(plans, allow_sort) == {}
+        assert set(indexes) <= indexes_used(plans)
+
+    def test_bike_list(self, api_client, seeded_marketplace):
+        url = reverse("bikes:bike-list")
+        self.assert_index_driven(lambda: api_client.get(url), ["bike_created"])
+
+    def test_available_bike_list(self, api_client, seeded_marketplace):
+        url = reverse("bikes:bike-list")
+        self.assert_index_driven(
+            lambda: api_client.get(url, {"available_only": "true"}),
+            ["bike_status_created"],
+        )
+
+    def test_my_bikes(self, authenticated_owner_client, seeded_marketplace):
+        url = reverse("bikes:my-bikes")
+        self.assert_index_driven(
+            lambda: authenticated_owner_client.get(url), ["bike_owner_created"]
+        )
+
+    def test_bike_detail(self, api_client, seeded_marketplace):
+        url = reverse("bikes:bike-detail", kwargs={"pk": seeded_marketplace[0].pk})
+        self.assert_index_driven(
+            lambda: api_client.get(url), ["bikeimage_display_order"]
+        )
+
+    def test_my_bookings(self, authenticated_user_client, seeded_marketplace):
+        url = reverse("bookings:my-bookings")
+        self.assert_index_driven(
+            lambda: authenticated_user_client.get(url),
+            ["booking_renter_created"],
+        )
+
+    def test_renter_booking_list(self, authenticated_user_client, seeded_marketplace):
+        url = reverse("bookings:booking-list")
+        self.assert_index_driven(
+            lambda: authenticated_user_client.get(url, {"role": "renter"}),
+            ["booking_renter_created"],
+        )
+
+    def test_owner_booking_lists(self, authenticated_owner_client, seeded_marketplace):
+        # Bookings of several bikes have to be merged by date, which needs a
+        # sort bounded by the owner's own bookings; scans must still be indexed.
+        allow_sort = ["bikes_bike", "bookings_booking"]
+        for url, params in [
+            (reverse("bookings:bike-bookings"), {}),
+            (reverse("bookings:booking-list"), {"role": "owner"}),
+            (reverse("bookings:booking-list"), {}),
+        ]:
+            self.assert_index_driven(
+                lambda: authenticated_owner_client.get(url, params),
+                allow_sort=allow_sort,
+            )
+
+    def test_booking_conflict_check(
+        self, authenticated_user_client, seeded_marketplace
+    ):
+        bike = next(
+            b for b in seeded_marketplace if b.owner.email == "owner@example.com"
+        )
+        # Inside the seeded booking history, so the window is not trivially empty.
+        start = timezone.now() + timedelta(days=5)
+        payload = {
+            "bike_id": bike.pk,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=3)).isoformat(),
+        }
+        url = reverse("bookings:booking-create")
+        self.assert_index_driven(
+            lambda: authenticated_user_client.post(url, payload, format="json"),
+            ["booking_bike_status_window"],
+        )
+
+    def test_status_sweep(self, authenticated_user_client, seeded_marketplace):
+        url = reverse("bookings:check-expired-bookings")
+        self.assert_index_driven(
+            lambda: authenticated_user_client.get(url),
+            ["booking_status_start", "booking_status_end"],
+        )
+
+    def test_favorites(self, authenticated_user_client, seeded_marketplace):
+        url = reverse("favorites:favorites-list")
+        self.assert_index_driven(
+            lambda: authenticated_user_client.get(url), ["favorite_user_created"]
+        )
+
+    def test_ratings(self, authenticated_user_client, seeded_marketplace):
+        bike = seeded_marketplace[4]
+        for url, index in [
+            (
+                reverse("ratings:bike-ratings", kwargs={"bike_id": bike.pk}),
+                "rating_bike_created",
+            ),
+            (reverse("ratings:my-ratings"), "rating_user_created"),
+        ]:
+            self.assert_index_driven(
+                lambda: authenticated_user_client.get(url),
+                [index],
+                allow_sort=["bikes_bikeimage"],
+            )
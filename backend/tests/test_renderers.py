@@ -0,0 +1,226 @@
+"""
+Tests for the API renderers and parsers. FastJSONRenderer must render the
+same bytes as DRF's JSONRenderer, with or without orjson, and MessagePack
+bodies must carry the same data as JSON ones.
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+import zoneinfo
+from datetime import timedelta
+
+import msgpack
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core.render_benchmark import run_render_benchmark
+from bookings.models import Booking, BookingStatus
+from ratings.models import Rating
+from utils import renderers
+from utils.renderers import FastJSONRenderer, MessagePackRenderer
+
+MSGPACK = "application/msgpack"
+
+LONDON = zoneinfo.ZoneInfo("Europe/London")
+
+DATA = {
+    "utc": datetime.datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.UTC),
+    "london_winter": datetime.datetime(2024, 1, 1, 12, tzinfo=LONDON),
+    "london_summer": datetime.datetime(2024, 7, 1, 12, tzinfo=LONDON),
+    "naive": datetime.datetime(2024, 7, 1),
+    "date": datetime.date(2024, 1, 2),
+    "time": datetime.time(1, 2, 3, 5),
+    "duration": datetime.timedelta(hours=1, microseconds=5),
+    "uuid": uuid.UUID("445d2827-42af-4c0f-a624-fc5edaa011cf"),
+    "price": "25.00",
+    "average": decimal.Decimal("4.5000000000000000"),
+    "lazy": gettext_lazy("Bike not found"),
+    "text": "Café\u2028line\u2029end",
+    7: ["int", "key"],
+    "nested": [{"float": 0.1, "none": None, "bool": True}, (1, 2)],
+}
+
+
+def _render(renderer, data, **kwargs):
+    return renderer.render(data, **kwargs)
+
+
+@pytest.mark.unit
+class TestFastJSONRenderer:
+    """Compare the output with JSONRenderer."""
+
+    def test_same_bytes_as_json_renderer(self):
+        assert FastJSONRenderer().render(DATA) == JSONRenderer().render(DATA)
+
+    def test_decimals_and_datetimes(self):
+        rendered = FastJSONRenderer().render(DATA)
+
+        assert b'"price":"25.00"' in rendered
+        assert b'"average":4.5' in rendered
+        assert b'"utc":"2024-01-01T12:00:00.123456Z"' in rendered
+        assert b'"london_summer":"2024-07-01T12:00:00+01:00"' in rendered
+        assert b"\\u2028" in rendered and b"\\u2029" in rendered
+
+    def test_fallback_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(renderers, "orjson", None)
+
+        assert FastJSONRenderer().render(DATA) == JSONRenderer().render(DATA)
+
+    def test_data_orjson_cannot_encode(self):
+        data = {"big": 2**70}
+
+        assert FastJSONRenderer().render(data) == b'{"big":1180591620717411303424}'
+        with pytest.raises(TypeError):
+            FastJSONRenderer().render({"object": object()})
+
+    def test_indent_uses_json_renderer(self):
+        fast = FastJSONRenderer().render(
+            DATA, "application/json; indent=4", {"indent": None}
+        )
+
+        assert fast == JSONRenderer().render(DATA, "application/json; indent=4")
+        assert b'\n    "utc"' in fast
+
+    def test_none_renders_empty(self):
+        assert FastJSONRenderer().render(None) == b""
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestRendererSettings:
+    """Test that API views render with FastJSONRenderer."""
+
+    def test_views_use_fast_renderer(self, api_client, multiple_bikes):
+        response = api_client.get(reverse("bikes:bike-list"))
+
+        assert response.status_code == 200
+        assert isinstance(response.accepted_renderer, FastJSONRenderer)
+        assert response.content == JSONRenderer().render(response.data)
+
+    def test_render_benchmark(self, booking):
+        report = run_render_benchmark(page_size=10, repeat=2)
+
+        assert report["my bookings"]["rows"] == 1
+        for result in report.values():
+            assert result["identical"] is True
+            assert result["fast_ms"] > 0
+
+
+@pytest.mark.unit
+class TestMessagePackRenderer:
+    """Compare MessagePack data with JSON data."""
+
+    def test_same_data_as_json(self):
+        data = {key: value for key, value in DATA.items() if isinstance(key, str)}
+
+        packed = msgpack.unpackb(MessagePackRenderer().render(data))
+
+        assert packed == json.loads(JSONRenderer().render(data))
+        assert packed["utc"] == "2024-01-01T12:00:00.123456Z"
+        assert packed["average"] == 4.5
+        assert packed["price"] == "25.00"
+
+    def test_none_renders_empty(self):
+        assert MessagePackRenderer().render(None) == b""
+
+
+@pytest.mark.views
+@pytest.mark.django_db
+class TestMessagePackNegotiation:
+    """Test Accept and Content-Type negotiation on API views."""
+
+    @pytest.fixture
+    def rated_booking(self, booking):
+        Booking.objects.filter(pk=booking.pk).update(status=BookingStatus.COMPLETED)
+        Rating.objects.create(
+            bike=booking.bike, user=booking.renter, booking=booking, rating=4
+        )
+        return booking
+
+    @pytest.mark.parametrize(
+        "name,kwargs",
+        [
+            ("bikes:bike-list", {}),
+            ("bookings:my-bookings", {}),
+            ("ratings:bike-ratings", {"bike_id": "bike"}),
+            ("ratings:bike-rating-stats", {"bike_id": "bike"}),
+            ("bookings:booking-detail", {"pk": "booking"}),
+        ],
+    )
+    def test_same_data_as_json(
+        self, authenticated_user_client, rated_booking, name, kwargs
+    ):
+        objects = {"bike": rated_booking.bike.pk, "booking": rated_booking.pk}
+        url = reverse(
+            name, kwargs={key: objects[value] for key, value in kwargs.items()}
+        )
+
+        as_json = authenticated_user_client.get(url)
+        as_msgpack = authenticated_user_client.get(url, HTTP_ACCEPT=MSGPACK)
+
+        assert as_msgpack.status_code == as_json.status_code == 200
+        assert as_msgpack["Content-Type"] == MSGPACK
+        assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+
+    def test_format_parameter(self, api_client, multiple_bikes):
+        response = api_client.get(reverse("bikes:bike-list"), {"format": "msgpack"})
+
+        assert response["Content-Type"] == MSGPACK
+        assert msgpack.unpackb(response.content)["success"] is True
+
+    def test_errors_follow_accept(self, api_client):
+        response = api_client.get(reverse("bookings:my-bookings"), HTTP_ACCEPT=MSGPACK)
+
+        assert response.status_code == 401
+        assert response["Content-Type"] == MSGPACK
+        assert msgpack.unpackb(response.content) == json.loads(
+            JSONRenderer().render(response.data)
+        )
+
+    def test_create_from_msgpack_body(self, authenticated_user_client, bike):
+        start_time = timezone.now() + timedelta(days=1)
+        body = msgpack.packb(
+            {
+                "bike_id": bike.id,
+                "start_time": start_time.isoformat(),
+                "end_time": (start_time + timedelta(hours=4)).isoformat(),
+            }
+        )
+
+        response = authenticated_user_client.post(
+            reverse("bookings:booking-create"),
+            body,
+            content_type=MSGPACK,
+            HTTP_ACCEPT=MSGPACK,
+        )
+
+        assert response.status_code == 201
+        data = msgpack.unpackb(response.content)["data"]
+        assert data["bike"]["id"] == bike.id
+        assert data["status"] == BookingStatus.REQUESTED
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b"\xc1",
+            msgpack.packb({"bike_id": 1}) + b"\x01",
+            msgpack.packb({1: "integer key"}),
+            msgpack.packb({"bike_id": b"binary"}),
+            msgpack.packb(
+                {"start_time": datetime.datetime.now(datetime.UTC)}, datetime=True
+            ),
+        ],
+        ids=["invalid", "extra data", "integer key", "binary", "timestamp"],
+    )
+    def test_rejects_bodies_json_cannot_express(self, authenticated_user_client, body):
+        response = authenticated_user_client.post(
+            reverse("bookings:booking-create"), body, content_type=MSGPACK
+        )
+
+        assert response.status_code == 400
+        assert "MessagePack parse error" in response.content.decode()
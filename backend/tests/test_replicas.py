@@ -0,0 +1,240 @@
+"""
+Tests for read replica routing (utils.replicas).
+
+The ``replica`` database added in conftest.py stands in for a replica. It is
+a separate database, so rows copied into it with different values show which
+database a request read from.
+"""
+
+import runpy
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, router
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend import settings as project_settings
+from bikes.models import Bike
+from bookings.models import Booking
+from utils import replicas
+
+SETTINGS_FILE = project_settings.__file__
+
+
+def to_replica(*objects, **changes):
+    """Copy ``objects`` into the replica, with ``changes`` applied to each."""
+    for obj in objects:
+        copy = type(obj).objects.get(pk=obj.pk)
+        for field, value in changes.items():
+            setattr(copy, field, value)
+        copy.save(using="replica")
+
+
+def client_for(user=None):
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ["replica"]
+    replicas._checks.clear()
+    cache.clear()
+    yield "replica"
+    replicas._checks.clear()
+    cache.clear()
+
+
+@pytest.mark.unit
+class TestReplicaRouter:
+    """Test where the router sends reads outside a request."""
+
+    def test_reads_outside_a_scope_use_the_primary(self, settings):
+        settings.DATABASE_REPLICAS = ["replica"]
+
+        assert router.db_for_read(Bike) == "default"
+        with replicas.replica_scope():
+            assert router.db_for_read(Bike) == "default"
+
+    def test_no_replicas(self, settings):
+        settings.DATABASE_REPLICAS = []
+
+        with replicas.replica_scope() as scope:
+            scope.use_replica()
+            assert router.db_for_read(Bike) == "default"
+
+    def test_token_user_id(self, rf):
+        token = AccessToken()
+        token["user_id"] = 42
+
+        assert replicas.token_user_id(rf.get("/")) is None
+        assert (
+            replicas.token_user_id(rf.get("/", HTTP_AUTHORIZATION="Bearer x")) is None
+        )
+        request = rf.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        assert replicas.token_user_id(request) == 42
+        assert replicas.token_user_id(rf.get("/", {"token": str(token)})) == 42
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+class TestReplicaReads:
+    """Test which requests read from the replica."""
+
+    def test_safe_reads_go_to_the_replica(self, replica, bike, owner):
+        to_replica(owner)
+        to_replica(bike, title="On the replica")
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        assert client_for().get(url).data["data"]["title"] == "On the replica"
+        listed = client_for().get(reverse("bikes:bike-list")).data["data"]
+        assert [row["title"] for row in listed["results"]] == ["On the replica"]
+
+    def test_async_views_read_from_the_replica(self, replica, bike, owner):
+        to_replica(owner)
+        to_replica(bike, title="On the replica")
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        response = async_to_sync(AsyncClient().get)(url)
+
+        assert response.json()["data"]["title"] == "On the replica"
+
+    def test_writes_read_from_the_primary(self, replica, bike, owner):
+        to_replica(owner)
+        to_replica(bike, title="On the replica")
+
+        response = client_for(owner).patch(
+            reverse("bikes:bike-detail", kwargs={"pk": bike.pk}),
+            {"description": "Changed"},
+            format="json",
+        )
+
+        assert response.data["data"]["title"] == bike.title
+        assert Bike.objects.get(pk=bike.pk).description == "Changed"
+        assert Bike.objects.using("replica").get(pk=bike.pk).description != "Changed"
+
+    def test_writers_are_pinned_to_the_primary(self, replica, bike, owner, user):
+        to_replica(owner, user)
+        to_replica(bike, title="On the replica")
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        client_for(owner).patch(url, {"title": "Renamed"}, format="json")
+
+        assert client_for(owner).get(url).data["data"]["title"] == "Renamed"
+        assert client_for(user).get(url).data["data"]["title"] == "On the replica"
+        assert client_for().get(url).data["data"]["title"] == "On the replica"
+
+        cache.clear()  # The pin expires.
+
+        assert client_for(owner).get(url).data["data"]["title"] == "On the replica"
+
+    def test_failed_writes_do_not_pin(self, replica, bike, owner, user):
+        to_replica(owner, user)
+        to_replica(bike, title="On the replica")
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        assert client_for(user).patch(url, {"title": "Mine"}).status_code == 403
+
+        assert client_for(user).get(url).data["data"]["title"] == "On the replica"
+
+    def test_reading_your_own_new_booking(self, replica, bike, owner, user):
+        to_replica(owner, user, bike)
+        start = timezone.now() + timedelta(days=1)
+        client = client_for(user)
+
+        created = client.post(
+            reverse("bookings:booking-create"),
+            {
+                "bike_id": bike.pk,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=4)).isoformat(),
+            },
+            format="json",
+        )
+        detail = reverse(
+            "bookings:booking-detail", kwargs={"pk": created.data["data"]["id"]}
+        )
+
+        assert client.get(detail).status_code == 200
+        assert not Booking.objects.using("replica").exists()
+        cache.clear()
+        assert client.get(detail).status_code == 404
+
+    def test_exports_stream_from_the_replica(self, replica, bike, owner):
+        to_replica(owner)
+        to_replica(bike, title="On the replica")
+        url = reverse("bikes:my-bikes-export", kwargs={"export_format": "csv"})
+
+        response = client_for(owner).get(url)
+
+        assert "On the replica" in b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+class TestReplicaHealth:
+    """Test that lagging or unreachable replicas are skipped."""
+
+    def test_replica_lag(self, replica):
+        # The stand-in is not in recovery.
+        assert replicas.replica_lag(replica) == 0
+
+    def test_lagging_replica_is_skipped(self, replica, settings, monkeypatch):
+        settings.DB_REPLICA_MAX_LAG = 5
+        monkeypatch.setattr(replicas, "replica_lag", lambda alias: 30.0)
+
+        assert replicas.choose_replica() is None
+
+    def test_unreachable_replica_is_skipped(self, replica, monkeypatch):
+        def unreachable(alias):
+            raise OperationalError("connection refused")
+
+        monkeypatch.setattr(replicas, "replica_lag", unreachable)
+
+        assert replicas.choose_replica() is None
+
+    def test_checks_are_cached(self, replica, settings, monkeypatch):
+        lags = iter([0.0, 30.0])
+        monkeypatch.setattr(replicas, "replica_lag", lambda alias: next(lags))
+
+        assert replicas.choose_replica() == replica
+        assert replicas.choose_replica() == replica
+
+        settings.DB_REPLICA_CHECK_INTERVAL = 0
+
+        assert replicas.choose_replica() is None
+
+    def test_requests_fall_back_to_the_primary(self, replica, bike, owner, monkeypatch):
+        to_replica(owner)
+        to_replica(bike, title="On the replica")
+        monkeypatch.setattr(replicas, "replica_lag", lambda alias: 30.0)
+        url = reverse("bikes:bike-detail", kwargs={"pk": bike.pk})
+
+        assert client_for().get(url).data["data"]["title"] == bike.title
+
+
+@pytest.mark.unit
+class TestReplicaSettings:
+    """Test that replicas are refused without a shared cache."""
+
+    def test_replicas_need_a_shared_cache(self, monkeypatch):
+        monkeypatch.setenv("DB_REPLICA_HOSTS", "replica.internal:5433")
+        monkeypatch.delenv("CACHE_BACKEND", raising=False)
+
+        with pytest.raises(ImproperlyConfigured, match="CACHE_BACKEND"):
+            runpy.run_path(SETTINGS_FILE)
+
+        monkeypatch.setenv("CACHE_BACKEND", "database")
+        loaded = runpy.run_path(SETTINGS_FILE)
+
+        assert loaded["DATABASE_REPLICAS"] == ["replica1"]
+        assert loaded["CACHES"]["default"]["LOCATION"] == "django_cache"
@@ -0,0 +1,174 @@
+"""
+Tests for the SQL instrumentation middleware.
+"""
+
+import json
+import logging
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from bikes.models import Bike
+from utils.log import JSONFormatter
+from utils.middleware import (
+    RequestQueries,
+    SQLInstrumentationMiddleware,
+    query_shape,
+    sql_comment,
+)
+
+
+@pytest.fixture
+def sampled(settings):
+    settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0
+    settings.SQL_N_PLUS_ONE_THRESHOLD = 3
+
+
+@pytest.fixture
+def sql_log(caplog):
+    logger = logging.getLogger("utils.middleware")
+    logger.addHandler(caplog.handler)
+    caplog.set_level(logging.INFO, logger="utils.middleware")
+    yield caplog
+    logger.removeHandler(caplog.handler)
+
+
+def _run(queries, statements):
+    for sql in statements:
+        queries(lambda *args: None, sql, None, False, {})
+
+
+@pytest.mark.unit
+class TestQueryTracking:
+    """Test query shapes, comments and repeat detection."""
+
+    def test_in_lists_of_any_length_share_a_shape(self):
+        assert query_shape('SELECT 1 WHERE "id" IN (%s, %s, %s)') == query_shape(
+            'SELECT 1 WHERE "id" IN (%s)'
+        )
+
+    def test_comment_cannot_break_out_or_add_parameters(self):
+        comment = sql_comment({"route": "bikes:bike-list", "view": "x*/; DROP %s"})
+        assert comment == " /*route='bikes:bike-list',view='x_/__DROP__s'*/"
+        assert sql_comment({"route": None}) == ""
+
+    def test_repeated_shapes_are_reported(self):
+        queries = RequestQueries(sampled=True, comments=False)
+        _run(queries, ["SELECT a WHERE id = %s"] * 4 + ["SELECT b"])
+
+        assert queries.count == 5
+        assert queries.repeated(threshold=3) == [("SELECT a WHERE id = %s", 4)]
+        assert queries.repeated(threshold=5) == []
+
+    def test_unsampled_requests_are_only_tagged(self):
+        executed = []
+        queries = RequestQueries(sampled=False, comments=True)
+        queries.tag(route="bikes:bike-list")
+        queries(lambda sql, *args: executed.append(sql), "SELECT 1", None, False, {})
+
+        assert executed == ["SELECT 1 /*route='bikes:bike-list'*/"]
+        assert queries.count == 0
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestSQLInstrumentationMiddleware:
+    """Test the middleware on real requests."""
+
+    def test_sampled_request_reports_queries(
+        self, authenticated_user_client, bike, sampled, sql_log
+    ):
+        url = reverse("bikes:bike-list")
+        with CaptureQueriesContext(connection) as context:
+            response = authenticated_user_client.get(url, {"search": "100% e-bike"})
+
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        assert f'desc="{len(context.captured_queries)} queries"' in timing
+        assert "nplusone" not in timing
+
+        (record,) = sql_log.records
+        assert record.levelno == logging.INFO
+        assert record.route == "bikes:bike-list"
+        assert record.view == "bikes.views.BikeListAPIView"
+        assert record.db_queries == len(context.captured_queries)
+        assert record.n_plus_one == []
+
+    def test_repeated_queries_are_flagged(self, multiple_bikes, sampled, sql_log):
+        def n_plus_one_view(request):
+            for bike in Bike.objects.order_by("pk"):
+                bike.owner.email
+            return HttpResponse()
+
+        middleware = SQLInstrumentationMiddleware(n_plus_one_view)
+        response = middleware(RequestFactory().get("/bikes/"))
+
+        assert 'nplusone;desc="1 repeated queries"' in response.headers["Server-Timing"]
+        (record,) = sql_log.records
+        assert record.levelno == logging.WARNING
+        (repeated,) = record.n_plus_one
+        assert repeated["count"] == len(multiple_bikes)
+        assert 'FROM "users_user"' in repeated["sql"]
+
+    def test_statements_reach_the_database_tagged(self, bike, settings):
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 0
+        executed = []
+
+        def record(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        def view(request):
+            # The handler calls process_view once the URL is resolved.
+            middleware.process_view(request, view, (), {})
+            with connection.execute_wrapper(record):
+                # A literal % in a parameter must survive the added comment.
+                titles = Bike.objects.filter(title__contains="50% off")
+                return HttpResponse(str(list(titles)))
+
+        middleware = SQLInstrumentationMiddleware(view)
+        request = RequestFactory().get("/api/v1/bikes/")
+        request.resolver_match = resolve(request.path)
+        response = middleware(request)
+
+        assert response.content == b"[]"
+        (sql,) = executed
+        assert sql.endswith(
+            " /*route='bikes:bike-list',view='tests.test_sql_instrumentation.view'*/"
+        )
+
+    def test_function_views_are_named(
+        self, authenticated_user_client, bike, sampled, sql_log
+    ):
+        authenticated_user_client.get(reverse("bookings:check-expired-bookings"))
+
+        (record,) = sql_log.records
+        assert record.view == "bookings.views.check_expired_bookings_api_view"
+        assert record.route == "bookings:check-expired-bookings"
+
+    def test_unsampled_requests_have_no_header(
+        self, authenticated_user_client, settings, sql_log
+    ):
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 0
+        response = authenticated_user_client.get(reverse("bikes:bike-list"))
+
+        assert "Server-Timing" not in response.headers
+        assert sql_log.records == []
+
+
+@pytest.mark.unit
+class TestJSONFormatter:
+    """Test the structured log format."""
+
+    def test_extra_fields_are_included(self):
+        record = logging.makeLogRecord(
+            {"msg": "GET %s", "args": ("/x",), "levelname": "INFO", "db_queries": 3}
+        )
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert entry["message"] == "GET /x"
+        assert entry["level"] == "INFO"
+        assert entry["db_queries"] == 3
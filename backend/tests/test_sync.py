@@ -0,0 +1,264 @@
+"""
+Tests for the delta sync API and the change log behind it.
+
+The API tests run outside a test transaction: cursors depend on which
+transactions have committed.
+"""
+
+import threading
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking, BookingStatus
+from bookings.services import advance_booking_statuses
+from favorites.models import Favorite
+from ratings.models import Rating
+from sync.models import Change, ChangeKind
+from sync.services import Cursor, prune_changes
+
+SYNC_URL = reverse("sync:sync")
+
+
+def _sync(client, cursor=None):
+    response = client.get(SYNC_URL, {"cursor": cursor} if cursor else {})
+    assert response.status_code == 200, response.data
+    return response.data["data"]
+
+
+def _ids(data, key):
+    return [record["id"] for record in data[key]["updated"]]
+
+
+@pytest.mark.unit
+class TestCursor:
+    """Cursor encoding."""
+
+    def test_round_trip(self):
+        cursor = Cursor(since=1234, after=56, next_since=1300, issued=1700000000)
+        assert Cursor.decode(cursor.encode()) == cursor
+
+    @pytest.mark.parametrize("value", ["", "not a cursor", "MS4y", "LTEuMC4wLjA"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            Cursor.decode(value)
+
+
+@pytest.mark.integration
+@pytest.mark.views
+@pytest.mark.django_db(transaction=True)
+class TestSyncAPI:
+    """GET /api/v1/sync/"""
+
+    def test_requires_authentication(self, api_client):
+        assert api_client.get(SYNC_URL).status_code == 401
+
+    def test_first_call_returns_only_a_cursor(self, authenticated_user_client, booking):
+        data = _sync(authenticated_user_client)
+
+        assert data["cursor"]
+        assert data["has_more"] is False
+        for key in ("bikes", "bookings", "ratings", "favorites"):
+            assert data[key] == {"updated": [], "deleted": []}
+
+    def test_booking_reaches_renter_and_owner_only(
+        self, api_client, user, owner, bike, booking_data, multiple_users
+    ):
+        cursors = {}
+        for viewer in (user, owner, multiple_users[0]):
+            api_client.force_authenticate(user=viewer)
+            cursors[viewer.pk] = _sync(api_client)["cursor"]
+
+        booking = Booking.objects.create(bike=bike, renter=user, **booking_data)
+
+        for viewer, expected in ((user, [booking.pk]), (owner, [booking.pk])):
+            api_client.force_authenticate(user=viewer)
+            data = _sync(api_client, cursors[viewer.pk])
+            assert _ids(data, "bookings") == expected
+            assert data["bookings"]["updated"][0]["bike"]["id"] == bike.pk
+            # Nothing new the second time.
+            assert _ids(_sync(api_client, data["cursor"]), "bookings") == []
+
+        api_client.force_authenticate(user=multiple_users[0])
+        assert _ids(_sync(api_client, cursors[multiple_users[0].pk]), "bookings") == []
+
+    def test_updates_are_collapsed_to_current_state(
+        self, authenticated_owner_client, bike
+    ):
+        cursor = _sync(authenticated_owner_client)["cursor"]
+        bike.title = "Renamed"
+        bike.save()
+        bike.title = "Renamed again"
+        bike.save()
+
+        data = _sync(authenticated_owner_client, cursor)
+
+        assert [record["title"] for record in data["bikes"]["updated"]] == [
+            "Renamed again"
+        ]
+
+    def test_deleted_favorite_is_a_tombstone(
+        self, authenticated_user_client, user, bike
+    ):
+        favorite = Favorite.objects.create(user=user, bike=bike)
+        cursor = _sync(authenticated_user_client)["cursor"]
+        favorite_id = favorite.pk
+
+        favorite.delete()
+        data = _sync(authenticated_user_client, cursor)
+
+        assert data["favorites"] == {"updated": [], "deleted": [favorite_id]}
+
+    def test_bike_delete_tombstones_cascaded_records(
+        self, api_client, user, owner, bike, booking
+    ):
+        rating = Rating.objects.create(bike=bike, user=user, booking=booking, rating=5)
+        api_client.force_authenticate(user=owner)
+        owner_cursor = _sync(api_client)["cursor"]
+        api_client.force_authenticate(user=user)
+        renter_cursor = _sync(api_client)["cursor"]
+        bike_id, booking_id, rating_id = bike.pk, booking.pk, rating.pk
+
+        bike.delete()
+
+        renter_data = _sync(api_client, renter_cursor)
+        assert renter_data["bookings"]["deleted"] == [booking_id]
+        assert renter_data["ratings"]["deleted"] == [rating_id]
+        assert renter_data["bikes"]["deleted"] == []
+        api_client.force_authenticate(user=owner)
+        owner_data = _sync(api_client, owner_cursor)
+        assert owner_data["bikes"]["deleted"] == [bike_id]
+        assert owner_data["bookings"]["deleted"] == [booking_id]
+        assert owner_data["ratings"]["deleted"] == [rating_id]
+
+    def test_swept_bookings_are_synced(self, authenticated_user_client, booking):
+        cursor = _sync(authenticated_user_client)["cursor"]
+        Booking.objects.filter(pk=booking.pk).update(status=BookingStatus.APPROVED)
+
+        advance_booking_statuses(now=booking.start_time + timedelta(minutes=1))
+        data = _sync(authenticated_user_client, cursor)
+
+        assert [record["status"] for record in data["bookings"]["updated"]] == [
+            BookingStatus.ACTIVE
+        ]
+
+    def test_change_committed_after_a_later_one_is_not_skipped(
+        self, authenticated_user_client, user, bike, bike_factory
+    ):
+        favorite = Favorite.objects.create(user=user, bike=bike)
+        cursor = _sync(authenticated_user_client)["cursor"]
+        written, release = threading.Event(), threading.Event()
+
+        def slow_transaction():
+            try:
+                with transaction.atomic():
+                    Change.objects.create(
+                        user=user, kind=ChangeKind.FAVORITE, object_id=favorite.pk
+                    )
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=slow_transaction)
+        thread.start()
+        assert written.wait(10)
+        later = Favorite.objects.create(user=user, bike=bike_factory())
+        first = _sync(authenticated_user_client, cursor)
+        release.set()
+        thread.join()
+        second = _sync(authenticated_user_client, first["cursor"])
+
+        assert _ids(first, "favorites") == [later.pk]
+        assert favorite.pk in _ids(second, "favorites")
+
+    def test_pages(self, authenticated_owner_client, bike_factory, settings):
+        settings.SYNC_PAGE_SIZE = 2
+        cursor = _sync(authenticated_owner_client)["cursor"]
+        bikes = [bike_factory(title=f"Bike {i}") for i in range(5)]
+
+        seen, pages = [], 0
+        while True:
+            data = _sync(authenticated_owner_client, cursor)
+            seen += _ids(data, "bikes")
+            cursor, pages = data["cursor"], pages + 1
+            if not data["has_more"]:
+                break
+
+        assert sorted(seen) == [bike.pk for bike in bikes]
+        assert pages == 3
+        assert _ids(_sync(authenticated_owner_client, cursor), "bikes") == []
+
+    def test_invalid_cursor(self, authenticated_user_client):
+        response = authenticated_user_client.get(SYNC_URL, {"cursor": "nope"})
+        assert response.status_code == 400
+
+    def test_expired_cursor(self, authenticated_user_client, settings):
+        issued = timezone.now() - timedelta(
+            days=settings.SYNC_CHANGE_RETENTION_DAYS + 1
+        )
+        cursor = Cursor(since=1, issued=int(issued.timestamp())).encode()
+
+        response = authenticated_user_client.get(SYNC_URL, {"cursor": cursor})
+
+        assert response.status_code == 410
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestChangeLog:
+    """Changes are logged in the transaction of the change."""
+
+    def _bike_changes(self, bike):
+        return Change.objects.filter(kind=ChangeKind.BIKE, object_id=bike.pk).count()
+
+    def test_changes_roll_back_with_their_transaction(self, user, bike):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            Favorite.objects.create(user=user, bike=bike)
+            raise RuntimeError("rolled back")
+
+        assert not Change.objects.filter(kind=ChangeKind.FAVORITE).exists()
+
+    def test_record_changed_twice_is_logged_once(self, bike):
+        logged = self._bike_changes(bike)
+
+        with transaction.atomic():
+            bike.save()
+            bike.save()
+
+        assert self._bike_changes(bike) == logged + 1
+
+    def test_rolled_back_savepoint_does_not_hide_a_later_change(self, user, bike):
+        logged = self._bike_changes(bike)
+
+        with transaction.atomic():
+            Favorite.objects.create(user=user, bike=bike)
+            with pytest.raises(RuntimeError), transaction.atomic():
+                bike.save()
+                raise RuntimeError("rolled back")
+            bike.save()
+
+        assert self._bike_changes(bike) == logged + 1
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestPruneChanges:
+    """Retention of the change log."""
+
+    def test_deletes_old_changes(self, bike, settings):
+        logged = Change.objects.count()
+        assert Change.objects.filter(object_id=bike.pk).exists()
+
+        assert prune_changes() == 0
+        later = timezone.now() + timedelta(days=settings.SYNC_CHANGE_RETENTION_DAYS + 1)
+        assert prune_changes(now=later) == logged
+        assert not Change.objects.exists()
+
+    def test_command(self, bike, capsys):
+        call_command("prune_sync_changes")
+        assert "Deleted 0 changes" in capsys.readouterr().out
@@ -0,0 +1,144 @@
+"""
+Tests for the seeded synthetic dataset generator.
+"""
+
+import pytest
+from datetime import datetime, timezone as dt_timezone
+from django.core.management import call_command
+from django.db.models import Count, Q
+
+from analytics.models import BikeDailyStats
+from bikes.models import Bike
+from bookings.models import Booking, BookingStatus
+from favorites.models import Favorite
+from ratings.models import Rating
+from users.models import User
+
+ANCHOR = datetime(2030, 6, 1, tzinfo=dt_timezone.utc)
+
+SMALL = {
+    "users": 40,
+    "bikes": 30,
+    "bookings": 600,
+    "favorites": 120,
+    "anchor": "2030-06-01",
+    "history_days": 90,
+    "future_days": 14,
+    "chunk_size": 100,
+}
+
+
+def _generate(**options):
+    call_command("generate_dataset", **{**SMALL, **options})
+
+
+def _fingerprint():
+    return {
+        "users": list(
+            User.objects.order_by("pk").values_list("pk", "email", "is_owner")
+        ),
+        "bikes": list(
+            Bike.objects.order_by("pk").values_list(
+                "pk", "owner_id", "daily_rate", "status"
+            )
+        ),
+        "bookings": list(
+            Booking.objects.order_by("pk").values_list(
+                "pk",
+                "bike_id",
+                "renter_id",
+                "start_time",
+                "end_time",
+                "status",
+                "total_price",
+            )
+        ),
+        "ratings": list(
+            Rating.objects.order_by("pk").values_list("booking_id", "rating")
+        ),
+        "favorites": list(
+            Favorite.objects.order_by("pk").values_list("user_id", "bike_id")
+        ),
+    }
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestGenerateDataset:
+    """Test the generate_dataset management command."""
+
+    def test_generates_requested_volumes(self):
+        _generate()
+
+        assert User.objects.count() == 40
+        assert Bike.objects.count() == 30
+        assert Booking.objects.count() == 600
+        assert Favorite.objects.count() == 120
+        assert Rating.objects.exists()
+
+    def test_every_bike_has_one_primary_image(self):
+        _generate()
+
+        bikes = Bike.objects.annotate(
+            image_count=Count("images"),
+            primary_count=Count("images", filter=Q(images__is_primary=True)),
+        )
+        assert all(1 <= bike.image_count <= 4 for bike in bikes)
+        assert all(bike.primary_count == 1 for bike in bikes)
+
+    def test_bookings_are_consistent(self):
+        _generate()
+
+        previous = {}
+        bookings = Booking.objects.select_related("bike").order_by(
+            "bike_id", "start_time"
+        )
+        for booking in bookings:
+            assert booking.renter_id != booking.bike.owner_id
+            assert booking.created_at <= booking.start_time
+            last_end = previous.get(booking.bike_id)
+            assert last_end is None or booking.start_time >= last_end
+            previous[booking.bike_id] = booking.end_time
+
+            if booking.status == BookingStatus.COMPLETED:
+                assert booking.end_time <= ANCHOR
+            elif booking.status == BookingStatus.ACTIVE:
+                assert booking.start_time <= ANCHOR < booking.end_time
+            elif booking.status in (BookingStatus.APPROVED, BookingStatus.REQUESTED):
+                assert booking.start_time > ANCHOR
+
+    def test_ratings_follow_completed_bookings(self):
+        _generate()
+
+        for rating in Rating.objects.select_related("booking"):
+            assert rating.booking.status == BookingStatus.COMPLETED
+            assert rating.user_id == rating.booking.renter_id
+            assert rating.created_at >= rating.booking.end_time
+
+    def test_same_seed_generates_same_rows(self):
+        _generate()
+        first = _fingerprint()
+        User.objects.all().delete()
+
+        _generate()
+
+        assert _fingerprint() == first
+
+    def test_sequences_are_reset(self):
+        _generate()
+
+        user = User.objects.create_user(
+            email="after@example.com",
+            password="pass1234",
+            first_name="A",
+            last_name="B",
+        )
+        assert user.pk > User.objects.exclude(pk=user.pk).order_by("-pk")[0].pk
+
+    def test_rollups_are_optional(self):
+        _generate()
+        assert not BikeDailyStats.objects.exists()
+
+        User.objects.all().delete()
+        _generate(rollups=True)
+        assert BikeDailyStats.objects.exists()
@@ -0,0 +1,175 @@
+"""
+Parity tests for the ``.values()`` serializers: they must render exactly the
+same JSON as the DRF serializers they mirror.
+"""
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from bikes.models import Bike, BikeImage
+from bikes.querysets import with_bike_relations
+from bikes.serializers import BikeSerializer, BikeValuesSerializer
+from bookings.models import Booking, BookingStatus
+from bookings.serializers import BookingSerializer, BookingValuesSerializer
+from core.serializer_benchmark import run_serializer_benchmark
+from favorites.models import Favorite
+from ratings.models import Rating
+from ratings.serializers import RatingSerializer, RatingValuesSerializer
+from ratings.views import with_rating_relations
+
+
+@pytest.fixture
+def marketplace(owner, user, multiple_bikes, booking_data):
+    """Bikes with and without images, favorites and optional values."""
+    first, second, third = multiple_bikes
+    owner.profile_photo = "profile_photos/owner.jpg"
+    owner.save(update_fields=["profile_photo"])
+    third.hourly_rate = None
+    third.features = []
+    third.save(update_fields=["hourly_rate", "features"])
+    for order, primary in ((1, False), (0, True), (2, False)):
+        BikeImage.objects.create(
+            bike=first,
+            image=f"bike_images/first-{order}.jpg",
+            alt_text="Side view",
+            is_primary=primary,
+            order=order,
+        )
+    BikeImage.objects.create(bike=second, image="bike_images/second.jpg", order=0)
+    Favorite.objects.create(user=user, bike=second)
+
+    bookings = [
+        Booking.objects.create(bike=bike, renter=user, **booking_data)
+        for bike in (first, second, third)
+    ]
+    Booking.objects.filter(pk=bookings[0].pk).update(status=BookingStatus.COMPLETED)
+    Rating.objects.create(
+        bike=first, user=user, booking=bookings[0], rating=5, comment="Great"
+    )
+    Rating.objects.create(bike=first, user=owner, rating=3, comment=None)
+    return multiple_bikes
+
+
+def _context(user):
+    request = RequestFactory().get("/api/v1/bikes/")
+    request.user = user
+    return {"request": request}
+
+
+def _render(data):
+    return JSONRenderer().render(data)
+
+
+PAIRS = [
+    pytest.param(
+        BikeSerializer,
+        BikeValuesSerializer,
+        lambda user: with_bike_relations(Bike.objects.all(), user),
+        id="bike",
+    ),
+    pytest.param(
+        BookingSerializer,
+        BookingValuesSerializer,
+        lambda user: with_bike_relations(
+            Booking.objects.select_related("renter"), user, "bike__"
+        ),
+        id="booking",
+    ),
+    pytest.param(
+        RatingSerializer,
+        RatingValuesSerializer,
+        lambda user: with_rating_relations(Rating.objects.all(), user),
+        id="rating",
+    ),
+]
+
+
+@pytest.mark.serializers
+@pytest.mark.django_db
+class TestValuesSerializerParity:
+    """Compare rendered JSON byte for byte."""
+
+    @pytest.mark.parametrize("serializer_class,values_class,queryset", PAIRS)
+    @pytest.mark.parametrize("viewer", ["renter", "anonymous", "no request"])
+    def test_same_json(
+        self, marketplace, user, serializer_class, values_class, queryset, viewer
+    ):
+        if viewer == "no request":
+            context = {}
+            queryset = queryset(None)
+        else:
+            viewer = user if viewer == "renter" else AnonymousUser()
+            context = _context(viewer)
+            queryset = queryset(viewer)
+
+        expected = _render(serializer_class(queryset, many=True, context=context).data)
+        fast = values_class(context=context)
+        actual = _render(fast.serialize(fast.rows(queryset)))
+
+        assert actual == expected
+
+    def test_favorites_and_images_are_included(self, marketplace, user):
+        fast = BikeValuesSerializer(context=_context(user))
+        data = {
+            bike["id"]: bike for bike in fast.serialize(fast.rows(Bike.objects.all()))
+        }
+        first, second, third = marketplace
+
+        assert data[second.pk]["is_favorited"] is True
+        assert data[first.pk]["is_favorited"] is False
+        assert [image["order"] for image in data[first.pk]["images"]] == [0, 1, 2]
+        assert data[first.pk]["images"][0]["image_url"].startswith("http://testserver/")
+        assert data[third.pk]["hourly_rate"] is None
+
+    def test_page_queries(self, marketplace, user, django_assert_num_queries):
+        fast = BookingValuesSerializer(context=_context(user))
+        rows = fast.rows(Booking.objects.order_by("-created_at"))
+
+        # Bookings with renter, bike and owner; images; favorites.
+        with django_assert_num_queries(3):
+            data = fast.serialize(rows[:2])
+        assert len(data) == 2
+
+    def test_count_skips_the_joins(self, marketplace, django_assert_num_queries):
+        rows = RatingValuesSerializer().rows(Rating.objects.all())
+
+        with django_assert_num_queries(1) as captured:
+            assert rows.count() == 2
+        assert "JOIN" not in captured.captured_queries[0]["sql"]
+
+    def test_weight_keeps_its_decimal_places(self, marketplace):
+        Bike.objects.filter(pk=marketplace[0].pk).update(weight=Decimal("22"))
+        bike = Bike.objects.filter(pk=marketplace[0].pk)
+        fast = BikeValuesSerializer()
+
+        (data,) = fast.serialize(fast.rows(bike))
+        assert data["weight"] == BikeSerializer(bike.get()).data["weight"]
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+class TestSerializerBenchmark:
+    """Test the microbenchmark of the values serializers."""
+
+    def test_every_case_matches_drf(self, marketplace):
+        report = run_serializer_benchmark(page_size=10, repeat=2)
+
+        assert set(report) == {
+            "bike list",
+            "bike list anonymous",
+            "my bookings",
+            "bike ratings",
+        }
+        for result in report.values():
+            assert result["identical"] is True
+            assert result["rows"] > 0
+            assert result["serialize"]["values_ms"] > 0
+
+    def test_empty_database_is_reported(self, db):
+        with pytest.raises(CommandError, match="generate_dataset"):
+            call_command("benchmark_serializers", repeat=1)
@@ -0,0 +1,263 @@
+"""
+Tests for partner webhooks (webhooks.services) against a local HTTP server.
+"""
+
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking, BookingEvent, BookingStatus
+from bookings.services import advance_booking_statuses
+from webhooks import services
+from webhooks.models import WebhookEndpoint
+from webhooks.services import (
+    SIGNATURE_HEADER,
+    deliver_next,
+    deliver_webhooks,
+    sign,
+    verify_signature,
+)
+
+
+class Receiver(BaseHTTPRequestHandler):
+    """Records the batches POSTed to it and answers with ``server.status``."""
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.in_flight -= 1
+            server.requests.append((self.headers[SIGNATURE_HEADER], body))
+        self.send_response(server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.status = 200
+    server.delay = 0
+    server.in_flight = server.max_in_flight = 0
+    server.url = f"http://127.0.0.1:{server.server_port}/hooks"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _events(server):
+    return [
+        event for _, body in server.requests for event in json.loads(body)["events"]
+    ]
+
+
+def _bookings(bike, user, count):
+    start = timezone.now() - timedelta(hours=2)
+    return [
+        Booking.objects.create(
+            bike=bike,
+            renter=user,
+            start_time=start + timedelta(days=n),
+            end_time=start + timedelta(days=n, hours=1),
+            total_price="10.00",
+        )
+        for n in range(count)
+    ]
+
+
+@pytest.mark.integration
+@pytest.mark.django_db(transaction=True)
+class TestWebhookDelivery:
+    """Test that booking events reach partner endpoints."""
+
+    def test_status_changes_are_signed_and_sent(
+        self, receiver, authenticated_user_client, booking, settings
+    ):
+        endpoint = WebhookEndpoint.objects.create(url=receiver.url)
+        booking.status = BookingStatus.APPROVED
+        booking.save()
+        authenticated_user_client.post(
+            reverse("bookings:booking-cancel", kwargs={"pk": booking.pk})
+        )
+
+        assert deliver_webhooks() == 2
+
+        [(header, body)] = receiver.requests
+        assert verify_signature(endpoint.secret, body, header)
+        assert not verify_signature("other", body, header)
+        assert [(e["type"], e["previous_status"]) for e in _events(receiver)] == [
+            ("booking.approved", "requested"),
+            ("booking.cancelled", "approved"),
+        ]
+        assert deliver_webhooks() == 0
+        assert len(receiver.requests) == 1
+
+    def test_sweep_and_owner_filter(self, receiver, bike, user, multiple_users):
+        mine = WebhookEndpoint.objects.create(url=receiver.url, owner=bike.owner)
+        WebhookEndpoint.objects.create(url=receiver.url, owner=multiple_users[0])
+        [booking] = _bookings(bike, user, 1)
+        Booking.objects.filter(pk=booking.pk).update(status=BookingStatus.APPROVED)
+
+        advance_booking_statuses()
+
+        assert deliver_webhooks() == 3
+        assert len(receiver.requests) == 1
+        events = _events(receiver)
+        assert [e["type"] for e in events] == [
+            "booking.requested",
+            "booking.active",
+            "booking.completed",
+        ]
+        mine.refresh_from_db()
+        assert mine.cursor_id == events[-1]["id"]
+
+    def test_batches_respect_the_concurrency_limit(
+        self, receiver, bike, user, settings
+    ):
+        settings.WEBHOOK_BATCH_SIZE = 2
+        receiver.delay = 0.1
+        WebhookEndpoint.objects.create(url=receiver.url, max_in_flight=2)
+        bookings = _bookings(bike, user, 7)
+
+        assert deliver_webhooks() == 4
+        assert deliver_webhooks() == 3
+
+        assert receiver.max_in_flight == 2
+        assert len(receiver.requests) == 4
+        ids = sorted(e["booking_id"] for e in _events(receiver))
+        assert ids == sorted(b.pk for b in bookings)
+
+    def test_failures_back_off_then_disable(self, receiver, bike, user, settings):
+        settings.WEBHOOK_RETRY_BACKOFF = 30
+        settings.WEBHOOK_MAX_ATTEMPTS = 2
+        receiver.status = 500
+        endpoint = WebhookEndpoint.objects.create(url=receiver.url)
+        _bookings(bike, user, 1)
+        now = timezone.now()
+
+        assert deliver_webhooks(now=now) == 0
+
+        endpoint.refresh_from_db()
+        assert endpoint.failures == 1
+        assert endpoint.retry_at == now + timedelta(seconds=30)
+        assert endpoint.last_error == "HTTP 500"
+        assert endpoint.cursor_id == 0
+        assert deliver_next(now=now + timedelta(seconds=29)) is None
+
+        deliver_webhooks(now=now + timedelta(seconds=30))
+
+        endpoint.refresh_from_db()
+        assert not endpoint.is_active
+        assert len(receiver.requests) == 2
+
+    def test_retry_resumes_at_the_failed_batch(self, receiver, bike, user, settings):
+        settings.WEBHOOK_BATCH_SIZE = 1
+        endpoint = WebhookEndpoint.objects.create(url=receiver.url)
+        _bookings(bike, user, 2)
+        receiver.status = 503
+
+        deliver_webhooks()
+        receiver.status = 200
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(retry_at=timezone.now())
+
+        assert deliver_webhooks() == 1
+        assert deliver_webhooks() == 1
+        first, *rest = _events(receiver)
+        assert [e["id"] for e in rest] == [first["id"], first["id"] + 1]
+
+    def test_batches_are_sent_outside_a_transaction(
+        self, receiver, bike, user, monkeypatch
+    ):
+        endpoint = WebhookEndpoint.objects.create(url=receiver.url)
+        _bookings(bike, user, 1)
+        original = services._post
+        claims = []
+
+        def post(endpoint, rows):
+            # In the sender's thread, with a connection of its own.
+            try:
+                with transaction.atomic():
+                    # Raises if the worker still holds the row lock.
+                    WebhookEndpoint.objects.select_for_update(nowait=True).get(
+                        pk=endpoint.pk
+                    )
+                claims.append(deliver_next())
+            finally:
+                connection.close()
+            return original(endpoint, rows)
+
+        monkeypatch.setattr(services, "_post", post)
+
+        assert deliver_webhooks() == 1
+        assert claims == [None]
+        endpoint.refresh_from_db()
+        assert endpoint.retry_at <= timezone.now()
+
+    def test_abandoned_lease_is_taken_over(self, receiver, bike, user, settings):
+        settings.WEBHOOK_LEASE = 120
+        now = timezone.now()
+        # A worker that claimed the endpoint and died before sending.
+        WebhookEndpoint.objects.create(
+            url=receiver.url, retry_at=now + timedelta(seconds=120)
+        )
+        _bookings(bike, user, 1)
+
+        assert deliver_webhooks(now=now) == 0
+        assert deliver_webhooks(now=now + timedelta(seconds=120)) == 1
+
+    def test_new_endpoints_skip_earlier_events(self, receiver, bike, user):
+        _bookings(bike, user, 1)
+        WebhookEndpoint.objects.create(url=receiver.url)
+
+        assert deliver_webhooks() == 0
+        assert receiver.requests == []
+
+    def test_status_rolls_back_with_its_event(self, booking, monkeypatch):
+        def fail(**kwargs):
+            raise RuntimeError("outbox unavailable")
+
+        monkeypatch.setattr(BookingEvent.objects, "create", fail)
+        booking.status = BookingStatus.CANCELLED
+
+        with pytest.raises(RuntimeError):
+            booking.save()
+
+        booking.refresh_from_db()
+        assert booking.status == BookingStatus.REQUESTED
+
+    def test_worker_command(self, receiver, bike, user):
+        WebhookEndpoint.objects.create(url=receiver.url)
+        _bookings(bike, user, 3)
+        out = StringIO()
+
+        call_command("deliver_webhooks", "--once", stdout=out)
+
+        assert len(_events(receiver)) == 3
+        assert "Delivered 3 events" in out.getvalue()
+
+
+def test_signatures_expire():
+    header = sign("secret", b"{}", timestamp=1000)
+
+    assert verify_signature("secret", b"{}", header, now=1200)
+    assert not verify_signature("secret", b"{}", header, now=1400)
+    assert not verify_signature("secret", b"{}", "garbage")
@@ -40,3 +40,20 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.get_full_name()
+
+    # Set on users built from access token claims (utils.authentication).
+    from_token = False
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if not (self.from_token and fields and deferred.intersection(fields)):
+            return super().refresh_from_db(using, fields)
+        # A deferred field is read: load the rest of the row with it, from
+        # the short-lived cache of users.
+        from utils.authentication import user_row
+
+        row = user_row(self.pk)
+        if row is None:
+            raise User.DoesNotExist("User matching query does not exist.")
+        for attname in deferred:
+            setattr(self, attname, row[attname])
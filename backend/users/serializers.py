@@ -4,10 +4,14 @@ from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from notifications.services import queue_email
+from utils.authentication import user_claims
+from utils.serializers import ValuesSerializer
 
 User = get_user_model()
 
@@ -43,6 +47,17 @@ class SignupSerializer(serializers.ModelSerializer):
         return user
 
 
+class LoginSerializer(TokenObtainPairSerializer):
+    """Token pair whose tokens carry the user's claims (utils.authentication)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User model."""
 
@@ -59,6 +74,12 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class UserValuesSerializer(ValuesSerializer):
+    """``UserSerializer`` output built from ``.values()`` rows."""
+
+    serializer_class = UserSerializer
+
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user information."""
 
@@ -91,7 +112,7 @@ class PasswordResetRequestSerializer(serializers.Serializer):
             return value
 
     def save(self):
-        """Send password reset email."""
+        """Queue the password reset email."""
         user = self.context.get('user')
         if not user:
             # Don't send email if user doesn't exist, but don't reveal this
@@ -127,18 +148,13 @@ class PasswordResetRequestSerializer(serializers.Serializer):
         
         plain_message = strip_tags(html_message)
 
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            # Log the error in production
-            print(f"Failed to send password reset email: {e}")
+        # Sent by the email worker, so the request does not wait on SMTP.
+        queue_email(
+            to=user.email,
+            subject=subject,
+            body=plain_message,
+            html_body=html_message,
+        )
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
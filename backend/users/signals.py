@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.authentication import forget_user
+
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """
+    Drop a changed user from this process's cache of authenticated users.
+    Other processes keep theirs for up to ``JWT_USER_CACHE_SECONDS``.
+    """
+    forget_user(instance.pk)
@@ -5,6 +5,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from utils.response import api_response
 from utils.authentication import OptionalJWTAuthentication
+from .models import User
 from .serializers import (
     SignupSerializer, 
     UserSerializer, 
@@ -85,8 +86,13 @@ class TokenRefreshAPIView(TokenRefreshView):
 class MeAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_user(self, request):
+        # Fresh from the database, not the cached row of request.user, so
+        # that users see their own changes at once.
+        return User.objects.get(pk=request.user.pk)
+
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(self.get_user(request))
         return api_response(
             success=True,
             message="User fetched successfully",
@@ -95,11 +101,12 @@ class MeAPIView(APIView):
     
     def put(self, request):
         """Update user profile."""
-        serializer = UserUpdateSerializer(request.user, data=request.data, partial=True)
+        user = self.get_user(request)
+        serializer = UserUpdateSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             # Return updated user data
-            user_serializer = UserSerializer(request.user)
+            user_serializer = UserSerializer(user)
             return api_response(
                 success=True,
                 message="Profile updated successfully",
@@ -1,9 +1,151 @@
+"""
+JWT authentication without a user query per request.
+
+Access tokens issued at login carry the ``USER_CLAIMS`` of their user (see
+``users.serializers.LoginSerializer``), and refreshed access tokens copy them
+from the refresh token. ``JWTClaimsAuthentication`` builds ``request.user``
+from them: a ``User`` with only those fields loaded and the others deferred.
+Filtering by it, comparing it or assigning it to a foreign key needs no
+query. Reading any other field loads the rest of the row at once, from an
+in-process cache kept for ``JWT_USER_CACHE_SECONDS`` (``User.refresh_from_db``).
+Tokens without the claims, issued before they were added, load their user
+from the same cache.
+
+The claims are as of login: a user deactivated or changed since keeps the old
+values until the access token expires. ``JWT_CLAIMS_USER = False`` loads the
+user from the database on every request instead.
+
+Validated tokens are cached until they expire, so each token's signature is
+checked once per process.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics
+
+USER_CLAIMS = ("email", "first_name", "last_name", "is_owner", "is_renter", "is_staff")
+
+
+class ExpiringCache:
+    """
+    Up to ``max_size`` values, each dropped at the ``time.time()`` deadline
+    it was set with. When full, expired entries go first, then the oldest.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, deadline):
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.max_size:
+                now = time.time()
+                for old_key, (old_deadline, _value) in list(self.entries.items()):
+                    if old_deadline <= now:
+                        del self.entries[old_key]
+                if len(self.entries) >= self.max_size:
+                    del self.entries[next(iter(self.entries))]
+            self.entries[key] = (deadline, value)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# raw token -> validated token
+_tokens = ExpiringCache(max_size=10_000)
+# user id -> {attname: value} of the whole row
+_users = ExpiringCache(max_size=10_000)
+
+
+def user_claims(user):
+    """The claims access tokens carry for ``user``."""
+    return {claim: getattr(user, claim) for claim in USER_CLAIMS}
 
 
-class OptionalJWTAuthentication(JWTAuthentication):
+def user_row(user_id):
+    """
+    The fields of user ``user_id`` by attname, from the in-process cache, or
+    None if there is no such user.
+    """
+    row = _users.get(user_id)
+    metrics.record_cache_lookup("jwt_users", row is not None)
+    if row is None:
+        User = get_user_model()
+        attnames = [field.attname for field in User._meta.concrete_fields]
+        row = User._default_manager.filter(pk=user_id).values(*attnames).first()
+        if row is not None:
+            _users.set(user_id, row, time.time() + settings.JWT_USER_CACHE_SECONDS)
+    return row
+
+
+def forget_user(user_id):
+    """Drop user ``user_id`` from the cache of this process."""
+    _users.pop(user_id)
+
+
+def _user_from(fields):
+    User = get_user_model()
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in fields]
+    user = User.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
+    user.from_token = True
+    return user
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """Authenticate with the user claims of the token; see the module."""
+
+    def get_validated_token(self, raw_token):
+        token = _tokens.get(raw_token)
+        metrics.record_cache_lookup("jwt_tokens", token is not None)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            _tokens.set(raw_token, token, token["exp"])
+        return token
+
+    def get_user(self, validated_token):
+        if not settings.JWT_CLAIMS_USER:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        fields = {
+            claim: validated_token[claim]
+            for claim in USER_CLAIMS
+            if claim in validated_token
+        }
+        if len(fields) < len(USER_CLAIMS):
+            fields = user_row(user_id)
+            if fields is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if not fields["is_active"]:
+                raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return _user_from({**fields, get_user_model()._meta.pk.attname: user_id})
+
+
+class OptionalJWTAuthentication(JWTClaimsAuthentication):
     """
     Custom JWT authentication that doesn't fail on invalid tokens.
     This allows public endpoints to work even with expired/invalid tokens.
@@ -12,10 +154,23 @@ class OptionalJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         try:
             return super().authenticate(request)
-        except (InvalidToken, TokenError):
-            # If token is invalid/expired, treat as anonymous user
-            # This allows AllowAny permissions to work properly
-            return None
-        except Exception:
-            # For any other authentication errors, also treat as anonymous
+        except (AuthenticationFailed, TokenError):
+            # If token is invalid/expired or its user is gone, treat as
+            # anonymous user. This allows AllowAny permissions to work
+            # properly. Database errors are not authentication failures and
+            # are raised.
             return None
+
+
+class QueryParamJWTAuthentication(JWTClaimsAuthentication):
+    """
+    JWT authentication that also accepts the access token as ``?token=``, for
+    clients such as the browser's ``EventSource`` that cannot send headers.
+    """
+
+    def authenticate(self, request):
+        token = request.GET.get("token")
+        if not token:
+            return super().authenticate(request)
+        validated_token = self.get_validated_token(token.encode())
+        return self.get_user(validated_token), validated_token
@@ -0,0 +1,47 @@
+"""
+Reading rows in commit order from tables with a ``txid`` column.
+
+Ids from a sequence are allocated when a row is inserted, not when its
+transaction commits, so a reader that remembers the last id it saw can skip
+a row committed late with a lower id. Tables read as a stream instead store
+the id of the transaction that inserted each row (``txid_current()``), and
+readers remember ``snapshot_xmin()``: every transaction with a lower id had
+finished when it was taken, so reading ``txid >= xmin`` next time cannot
+miss a row, at the cost of reading again the rows of transactions that were
+still running.
+
+``releasing_connection`` is for the synchronous parts of long-lived async
+responses.
+"""
+
+import functools
+
+from django.db import connections
+
+
+def snapshot_xmin(using="default"):
+    """The oldest transaction still running, as of now."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def releasing_connection(func, using="default"):
+    """
+    ``func``, closing the database connection of the thread it runs in (or
+    giving it back to the pool) when it returns. For the synchronous calls of
+    long-lived async responses, such as event streams: Django closes a
+    request's connection only when the response finishes.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connection = connections[using]
+            # Inside a transaction the connection still belongs to its owner.
+            if not connection.in_atomic_block:
+                connection.close()
+
+    return wrapper
@@ -0,0 +1,258 @@
+"""
+Streaming CSV and NDJSON exports of large querysets.
+
+An ``Export`` names the columns to write and the ``values_list`` lookups they
+are read from. Rows are read in pages of ``EXPORT_CHUNK_SIZE`` in primary key
+order, each page starting after the last key of the one before, and written
+one page per chunk, so memory use does not grow with the number of rows.
+Each page is its own query, so no transaction or cursor is held open while
+the client downloads.
+
+The response streams under WSGI and ASGI alike (see ``utils.streaming``).
+Under ASGI each page is read in a thread, which gives its connection back
+when the read returns.
+
+Values are written as the API writes them: decimals as strings, datetimes as
+ISO 8601 strings. In CSV, JSON columns are JSON text and nulls are empty.
+"""
+
+import csv
+import datetime
+import decimal
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from utils.db import releasing_connection
+from utils.renderers import FastJSONRenderer
+from utils.replicas import using_read_database
+from utils.response import api_response
+from utils.streaming import DualStreamingHttpResponse
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _value(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        representation = value.isoformat()
+        if representation.endswith("+00:00"):
+            representation = representation[:-6] + "Z"
+        return representation
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """The file-like object ``csv.writer`` needs, returning each line."""
+
+    def write(self, value):
+        return value
+
+
+class Export:
+    """A set of rows to stream; subclasses set ``name`` and ``columns``."""
+
+    name = "export"
+    # (column name, values_list lookup) in output order.
+    columns = ()
+    # Field the start_date/end_date filters apply to.
+    date_field = "created_at"
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def filter(self, start_date=None, end_date=None, status=None):
+        """Rows in the [start_date, end_date] local date range with ``status``."""
+        queryset = self.queryset
+        if start_date:
+            queryset = queryset.filter(
+                **{f"{self.date_field}__gte": _start_of_day(start_date)}
+            )
+        if end_date:
+            queryset = queryset.filter(
+                **{
+                    f"{self.date_field}__lt": _start_of_day(
+                        end_date + datetime.timedelta(days=1)
+                    )
+                }
+            )
+        if status:
+            queryset = queryset.filter(status__in=status)
+        return type(self)(queryset)
+
+    def page(self, after=None):
+        """
+        Up to ``EXPORT_CHUNK_SIZE`` rows with a primary key above ``after``,
+        in key order, as (key, *values) tuples.
+        """
+        queryset = self.queryset.order_by("pk")
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        lookups = [lookup for _, lookup in self.columns]
+        return list(queryset.values_list("pk", *lookups)[: settings.EXPORT_CHUNK_SIZE])
+
+    def _batches(self, encode):
+        after = None
+        while True:
+            rows = self.page(after)
+            if rows:
+                yield b"".join(encode(row[1:]) for row in rows)
+            if len(rows) < settings.EXPORT_CHUNK_SIZE:
+                return
+            after = rows[-1][0]
+
+    async def _abatches(self, encode):
+        page = sync_to_async(releasing_connection(self.page, using=self.queryset.db))
+        after = None
+        while True:
+            rows = await page(after)
+            if rows:
+                yield b"".join(encode(row[1:]) for row in rows)
+            if len(rows) < settings.EXPORT_CHUNK_SIZE:
+                return
+            after = rows[-1][0]
+
+    def _ndjson_encoder(self):
+        names = [name for name, _ in self.columns]
+        render = FastJSONRenderer().render
+
+        def encode(row):
+            # The renderer writes datetimes like _value(); decimals need help.
+            values = [
+                str(value) if type(value) is decimal.Decimal else value for value in row
+            ]
+            return render(dict(zip(names, values))) + b"\n"
+
+        return encode
+
+    def _csv_writer(self):
+        writer = csv.writer(_Echo())
+        header = writer.writerow([name for name, _ in self.columns]).encode()
+
+        def encode(row):
+            return writer.writerow(
+                [
+                    json.dumps(value) if isinstance(value, (list, dict)) else value
+                    for value in map(_value, row)
+                ]
+            ).encode()
+
+        return header, encode
+
+    def ndjson(self):
+        """One JSON object per line."""
+        return self._batches(self._ndjson_encoder())
+
+    async def andjson(self):
+        """``ndjson()`` for async responses."""
+        async for batch in self._abatches(self._ndjson_encoder()):
+            yield batch
+
+    def csv(self):
+        """A header line, then one line per row."""
+        header, encode = self._csv_writer()
+        yield header
+        yield from self._batches(encode)
+
+    async def acsv(self):
+        """``csv()`` for async responses."""
+        header, encode = self._csv_writer()
+        yield header
+        async for batch in self._abatches(encode):
+            yield batch
+
+    def response(self, export_format):
+        """A streaming download of every row in ``export_format``."""
+        if export_format == "csv":
+            content, async_content = self.csv(), self.acsv()
+        else:
+            content, async_content = self.ndjson(), self.andjson()
+        response = DualStreamingHttpResponse(
+            content, async_content, content_type=CONTENT_TYPES[export_format]
+        )
+        filename = f"{self.name}-{timezone.localdate():%Y%m%d}.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Validate the date range and status filters of an export request."""
+
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    status = serializers.MultipleChoiceField(choices=(), required=False)
+
+    def __init__(self, *args, status_choices=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["status"].choices = status_choices
+
+    def validate(self, attrs):
+        start_date, end_date = attrs.get("start_date"), attrs.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError(
+                "End date must be on or after start date."
+            )
+        return attrs
+
+
+class ExportAPIView(APIView):
+    """
+    Stream ``export_class`` rows of ``get_queryset()`` as CSV or NDJSON,
+    filtered by the ``start_date``, ``end_date`` and ``status`` parameters.
+    """
+
+    export_class = Export
+    status_choices = ()
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request, export_format):
+        if export_format not in CONTENT_TYPES:
+            return api_response(
+                success=False,
+                message=f"Unknown export format {export_format!r}.",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        query = ExportQuerySerializer(
+            data=request.query_params, status_choices=self.status_choices
+        )
+        if not query.is_valid():
+            return api_response(
+                success=False,
+                message="Invalid query parameters",
+                errors=query.errors,
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        # Rows are read after the response leaves the view and its replica scope.
+        queryset = using_read_database(self.get_queryset())
+        export = self.export_class(queryset).filter(**query.validated_data)
+        return export.response(export_format)
+
+
+def export_action(export_class, export_format):
+    """A Django admin action streaming the selected rows with ``export_class``."""
+
+    def action(modeladmin, request, queryset):
+        return export_class(queryset).response(export_format)
+
+    action.__name__ = f"export_{export_format}"
+    action.short_description = f"Export selected rows as {export_format.upper()}"
+    return action
@@ -0,0 +1,185 @@
+"""
+Idempotency keys for POST requests.
+
+A client that may retry a POST, such as a mobile app on a flaky network,
+sends a unique ``Idempotency-Key`` header with it. The first request with a
+key runs as usual and its response is saved in ``core.IdempotencyKey`` for
+``IDEMPOTENCY_KEY_TTL`` seconds. Retries with the same key get the saved
+response back, with ``Idempotent-Replayed: true``, and the view does not run
+again. Keys belong to the user of the access token. Anonymous requests and
+other methods are left alone.
+
+The first request claims its key in a short transaction, by inserting a row
+without a response. The view then runs outside that transaction, as it would
+without a key, and its response is stored in the row afterwards. A retry
+that finds the key claimed waits for the response, checking every few
+milliseconds, and gets ``409`` after ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds.
+Requests with other keys never wait. A claim is held for
+``IDEMPOTENCY_LEASE`` seconds. After that, a retry takes the key over, as the
+request that claimed it is assumed to have died. Server errors (5xx) and
+``429`` are not stored: their claim is dropped, and the client may retry. A
+key reused for a different method, path or body is refused with ``422``.
+"""
+
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+from utils.metrics import IDEMPOTENT_REQUESTS, JOB_DURATION
+
+from . import replicas
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# What _claim() found.
+CLAIMED, SAVED, BUSY, MISMATCH = "claimed", "saved", "busy", "mismatch"
+
+
+def fingerprint(request):
+    """Hash of what makes a request the same request."""
+    digest = hashlib.sha256(f"{request.method} {request.get_full_path()}\n".encode())
+    if request.content_type == "multipart/form-data":
+        # Uploads may be too large to read into memory here.
+        digest.update(request.META.get("CONTENT_LENGTH", "").encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(message, status_code):
+    return JsonResponse(
+        {"success": False, "data": None, "message": message}, status=status_code
+    )
+
+
+def _replay(saved):
+    response = HttpResponse(
+        bytes(saved.body), status=saved.status_code, content_type=saved.content_type
+    )
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _claim(user_id, key, request_hash, now):
+    """
+    Claim ``key`` for this request, or find it taken. Returns the row and one
+    of ``CLAIMED``, ``SAVED``, ``BUSY`` or ``MISMATCH``.
+    """
+    lease = now + timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+    using = router.db_for_write(IdempotencyKey)
+    with transaction.atomic(using=using):
+        row = (
+            IdempotencyKey.objects.select_for_update()
+            .filter(user_id=user_id, key=key)
+            .first()
+        )
+        if row is None:
+            try:
+                # A savepoint: a concurrent first request may insert it too.
+                with transaction.atomic(using=using):
+                    row = IdempotencyKey.objects.create(
+                        user_id=user_id,
+                        key=key,
+                        fingerprint=request_hash,
+                        expires_at=lease,
+                    )
+            except IntegrityError:
+                # The other request's row is visible once the error is raised.
+                if not IdempotencyKey.objects.filter(user_id=user_id, key=key).exists():
+                    raise
+                return None, BUSY
+            return row, CLAIMED
+        if row.expires_at > now:
+            if row.fingerprint != request_hash:
+                return row, MISMATCH
+            return row, BUSY if row.status_code is None else SAVED
+        # The response expired, or the request that claimed the key died.
+        row.fingerprint = request_hash
+        row.status_code = None
+        row.content_type = ""
+        row.body = b""
+        row.expires_at = lease
+        row.save(
+            update_fields=[
+                "fingerprint",
+                "status_code",
+                "content_type",
+                "body",
+                "expires_at",
+            ]
+        )
+        return row, CLAIMED
+
+
+def _claimed(row):
+    """The row of ``row``'s claim, if no other request has taken it over."""
+    # expires_at is set anew by each claim, so it identifies this one.
+    return IdempotencyKey.objects.filter(
+        pk=row.pk, status_code__isnull=True, expires_at=row.expires_at
+    )
+
+
+def handle(request, get_response):
+    """Serve ``request`` with ``get_response`` at most once per key."""
+    key = request.headers.get(HEADER)
+    if request.method != "POST" or not key:
+        return get_response(request)
+    if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+        return _error(f"{HEADER} is too long", 400)
+    user_id = replicas.token_user_id(request)
+    if user_id is None:
+        return get_response(request)
+
+    request_hash = fingerprint(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    delay = 0.01
+    while True:
+        row, state = _claim(user_id, key, request_hash, timezone.now())
+        if state != BUSY:
+            break
+        if time.monotonic() >= deadline:
+            IDEMPOTENT_REQUESTS.inc(result="conflict")
+            return _error("A request with this key is still in progress", 409)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+    if state == MISMATCH:
+        IDEMPOTENT_REQUESTS.inc(result="mismatch")
+        return _error(f"{HEADER} was used for a different request", 422)
+    if state == SAVED:
+        IDEMPOTENT_REQUESTS.inc(result="replayed")
+        return _replay(row)
+
+    try:
+        response = get_response(request)
+    except BaseException:
+        _claimed(row).delete()
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        _claimed(row).delete()
+        return response
+    if response.streaming:
+        _claimed(row).delete()
+        return response
+    _claimed(row).update(
+        status_code=response.status_code,
+        content_type=response.headers.get("Content-Type", ""),
+        body=response.content,
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+    IDEMPOTENT_REQUESTS.inc(result="saved")
+    return response
+
+
+def prune_idempotency_keys(now=None):
+    """Delete keys that expired; returns how many."""
+    now = now or timezone.now()
+    with JOB_DURATION.time(job="idempotency_prune"):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now).delete()
+    return deleted
@@ -0,0 +1,363 @@
+"""
+A small in-process metrics registry exposed in the Prometheus text format.
+
+Each worker process keeps its own values. When ``METRICS_DIR`` is set, every
+process also writes them to ``<METRICS_DIR>/<pid>.json`` at most once per
+``METRICS_FLUSH_INTERVAL`` seconds, and a scrape served by any worker adds up
+the files of all of them. Files of exited workers are kept so counters never
+go backwards; clear the directory when the server starts. Their gauges are
+left out, as an exited worker no longer holds what they measured.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+class Registry:
+    """Holds the metrics of this process and merges those of its siblings."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        """Current values of this process, in a JSON-friendly form."""
+        with self.lock:
+            return {
+                name: {
+                    "type": metric.type,
+                    "help": metric.documentation,
+                    "labels": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": [
+                        [list(labels), value] for labels, value in metric.values.items()
+                    ],
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Write this process's values to the shared directory."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 1)
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def collect(self):
+        """Values of every worker, added up per metric and label set."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return self.snapshot()
+
+        self.flush()
+        merged = {}
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue  # Removed or being replaced while we read it.
+            alive = _is_alive(filename[: -len(".json")])
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, {**metric, "samples": []})
+                if metric["type"] != "gauge" or alive:
+                    _merge(target, metric)
+        return merged
+
+
+def _is_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Alive, but run by another user.
+    except ValueError:
+        return False
+    return True
+
+
+def _merge(target, metric):
+    samples = {tuple(labels): value for labels, value in target["samples"]}
+    for labels, value in metric["samples"]:
+        labels = tuple(labels)
+        if labels not in samples:
+            samples[labels] = value
+        elif isinstance(value, list):
+            samples[labels] = [a + b for a, b in zip(samples[labels], value)]
+        else:
+            samples[labels] += value
+    target["samples"] = [[list(labels), value] for labels, value in samples.items()]
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = registry.lock
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Merged across live processes by adding
+    up, so it suits per-process amounts such as open connections.
+    """
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """
+    Stores, per label set, the number of observations in each bucket followed
+    by their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name,
+        documentation,
+        labelnames=(),
+        buckets=DEFAULT_BUCKETS,
+        registry=REGISTRY,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 3)
+            index = next(
+                (i for i, bound in enumerate(self.buckets) if value <= bound),
+                len(self.buckets),
+            )
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["samples"]):
+            if metric["type"] != "histogram":
+                lines.append(
+                    f"{name}{_label_text(metric['labels'], labels)} {_number(value)}"
+                )
+                continue
+            cumulative = 0
+            bounds = [*metric["buckets"], float("inf")]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                label_text = _label_text(
+                    metric["labels"], labels, [("le", _number(bound))]
+                )
+                lines.append(f"{name}_bucket{label_text} {cumulative}")
+            label_text = _label_text(metric["labels"], labels)
+            lines.append(f"{name}_sum{label_text} {_number(value[-2])}")
+            lines.append(f"{name}_count{label_text} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving a request, by route",
+    ["route", "method"],
+)
+RESPONSES = Counter(
+    "http_responses_total",
+    "Responses sent, by route and status",
+    ["route", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "SQL queries run while serving a request, by route",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL queries while serving a request, by route",
+    ["route"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups, by cache and result", ["cache", "result"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Duration of background jobs and sweeps",
+    ["job"],
+    buckets=JOB_BUCKETS,
+)
+JOBS = Counter(
+    "jobs_total",
+    "Background jobs run by the job worker, by job and result",
+    ["job", "result"],
+)
+JOB_DELAY = Histogram(
+    "job_queue_delay_seconds",
+    "Time from a job being due to it starting, by job",
+    ["job"],
+    buckets=JOB_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections held by the connection pools, by database and state",
+    ["database", "state"],
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time taken to get a connection from the pool, by database",
+    ["database"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Requests for a connection that found the pool full until the timeout",
+    ["database"],
+)
+DB_POOL_CHECKS = Counter(
+    "db_pool_health_checks_total",
+    "Health checks of idle pooled connections, by database and result",
+    ["database", "result"],
+)
+EMAILS = Counter(
+    "emails_total",
+    "Outbound emails queued, sent, retried or given up on, by result",
+    ["result"],
+)
+EMAIL_DELAY = Histogram(
+    "email_delivery_delay_seconds",
+    "Time from queueing an email to sending it",
+    buckets=JOB_BUCKETS,
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "POSTs with an Idempotency-Key, by result: saved, replayed, conflict or mismatch",
+    ["result"],
+)
+WEBHOOK_REQUESTS = Counter(
+    "webhook_requests_total",
+    "Batches of booking events POSTed to partner webhooks, by result",
+    ["result"],
+)
+WEBHOOK_DELAY = Histogram(
+    "webhook_delivery_delay_seconds",
+    "Time from writing a booking event to its delivery to a webhook",
+    buckets=JOB_BUCKETS,
+)
+
+
+def record_cache_lookup(cache, hit):
+    """Count one lookup in ``cache``; the hit ratio is derived at scrape time."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def with_cache_hit_ratio(snapshot):
+    """Add a ``cache_hit_ratio`` gauge computed from ``cache_requests_total``."""
+    totals = {}
+    for (cache, result), value in snapshot.get(CACHE_REQUESTS.name, {}).get(
+        "samples", []
+    ):
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == "hit" else 0), lookups + value)
+    if totals:
+        snapshot["cache_hit_ratio"] = {
+            "type": "gauge",
+            "help": "Share of cache lookups that were hits, by cache",
+            "labels": ["cache"],
+            "buckets": [],
+            "samples": [
+                [[cache], hits / lookups] for cache, (hits, lookups) in totals.items()
+            ],
+        }
+    return snapshot
@@ -0,0 +1,493 @@
+import cProfile
+import functools
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import idempotency, metrics, replicas
+from .profiling import FieldTimings, field_timings, get_sampler, write_profile
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, ...) lists differ in length between otherwise identical queries.
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+# Anything that could end the comment or be read as a query parameter.
+_UNSAFE_TAG = re.compile(r"[^\w.:/<>-]")
+
+
+def query_shape(sql):
+    """Reduce ``sql`` to its shape so repeated queries compare equal."""
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def sql_comment(tags):
+    """Render ``tags`` as a trailing SQL comment, sqlcommenter style."""
+    pairs = ",".join(
+        f"{key}='{_UNSAFE_TAG.sub('_', str(value))}'"
+        for key, value in sorted(tags.items())
+        if value
+    )
+    return f" /*{pairs}*/" if pairs else ""
+
+
+# The execute wrappers of the current request. Under ASGI, Django runs the
+# synchronous code and ORM calls of a request in a thread of its own, on that
+# thread's connection, so wrappers cannot be installed on a connection when
+# the request starts; every connection runs these instead, and the context
+# follows the request into its thread.
+_query_observers = ContextVar("query_observers", default=())
+
+
+def _observe(execute, sql, params, many, context):
+    for observer in reversed(_query_observers.get()):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_observers(connection, **kwargs):
+    if _observe not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _observe)
+
+
+connection_created.connect(_install_observers, dispatch_uid="utils.middleware")
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Pass every query run in this context, in any thread, through
+    ``observer``, an execute wrapper (see ``connection.execute_wrapper``).
+    """
+    for connection in connections.all(initialized_only=True):
+        _install_observers(connection)
+    token = _query_observers.set(_query_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _query_observers.reset(token)
+
+
+def view_name(view_func):
+    """Dotted path of the view class or function behind ``view_func``."""
+    view = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", view_func
+    )
+    return f"{view.__module__}.{view.__name__}"
+
+
+class RequestQueries:
+    """Queries run while serving one request."""
+
+    def __init__(self, sampled, comments):
+        self.sampled = sampled
+        self.comments = comments
+        self.tags = {}
+        self.comment = ""
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+        self.comment = sql_comment(self.tags)
+
+    def __call__(self, execute, sql, params, many, context):
+        tagged = sql + self.comment if self.comments else sql
+        if not self.sampled:
+            return execute(tagged, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(tagged, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        """(shape, count) of every query run at least ``threshold`` times."""
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Tag every SQL statement with the view and route that issued it, and for a
+    sample of requests count queries, time them and look for N+1 patterns.
+
+    Sampled requests get a ``Server-Timing`` header and a log record on the
+    ``utils.middleware`` logger. Settings:
+
+    - ``SQL_INSTRUMENTATION_SAMPLE_RATE``: share of requests measured
+    - ``SQL_N_PLUS_ONE_THRESHOLD``: runs of one query shape reported as N+1
+    - ``SQL_COMMENTS``: append the ``/*route=...,view=...*/`` comment
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        queries = self.start(request)
+        if queries is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with observe_queries(queries):
+            response = self.get_response(request)
+        if queries.sampled:
+            self.report(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        queries = self.start(request)
+        if queries is None:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        with observe_queries(queries):
+            response = await self.get_response(request)
+        if queries.sampled:
+            self.report(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def start(self, request):
+        """The ``RequestQueries`` of ``request``, or None if it is not observed."""
+        rate = getattr(settings, "SQL_INSTRUMENTATION_SAMPLE_RATE", 0)
+        queries = RequestQueries(
+            sampled=rate > 0 and random.random() < rate,
+            comments=getattr(settings, "SQL_COMMENTS", True),
+        )
+        if not (queries.sampled or queries.comments):
+            return None
+        request.sql_queries = queries
+        return queries
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        queries = getattr(request, "sql_queries", None)
+        if queries is not None:
+            match = request.resolver_match
+            queries.tag(route=match.view_name, view=view_name(view_func))
+
+    def report(self, request, response, queries, duration):
+        threshold = getattr(settings, "SQL_N_PLUS_ONE_THRESHOLD", 5)
+        repeated = queries.repeated(threshold)
+        db_ms = queries.duration * 1000
+
+        timings = [
+            f'db;dur={db_ms:.1f};desc="{queries.count} queries"',
+            f"app;dur={duration * 1000:.1f}",
+        ]
+        if repeated:
+            timings.append(f'nplusone;desc="{len(repeated)} repeated queries"')
+        response.headers["Server-Timing"] = ", ".join(timings)
+
+        level = logging.WARNING if repeated else logging.INFO
+        logger.log(
+            level,
+            "%s %s: %d queries in %.1fms",
+            request.method,
+            request.path,
+            queries.count,
+            db_ms,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "route": queries.tags.get("route"),
+                "view": queries.tags.get("view"),
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 1),
+                "db_queries": queries.count,
+                "db_time_ms": round(db_ms, 1),
+                "n_plus_one": [
+                    {"sql": shape, "count": count} for shape, count in repeated
+                ],
+            },
+        )
+
+
+class ReplicaMiddleware:
+    """
+    Let safe requests to views with ``replica_reads = True`` read from a
+    replica (``utils.replicas``), unless their user wrote recently, and pin
+    users who write to the primary for a while.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with replicas.replica_scope() as request.replica_scope:
+            response = self.get_response(request)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with replicas.replica_scope() as request.replica_scope:
+            response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # The session user is loaded from the database on first use.
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        if not (
+            request.method in SAFE_METHODS
+            and getattr(view, "replica_reads", False)
+            and getattr(settings, "DATABASE_REPLICAS", None)
+        ):
+            return
+        user_id = replicas.token_user_id(request)
+        if user_id is None or not replicas.is_pinned(user_id):
+            request.replica_scope.use_replica()
+
+    @staticmethod
+    def pin(request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            replicas.pin_to_primary(getattr(user, jwt_settings.USER_ID_FIELD))
+
+
+class IdempotencyMiddleware:
+    """
+    Run a POST with an ``Idempotency-Key`` header once per user and key, and
+    replay its response to retries (``utils.idempotency``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return idempotency.handle(request, self.get_response)
+
+    async def __acall__(self, request):
+        if request.method != "POST" or idempotency.HEADER not in request.headers:
+            return await self.get_response(request)
+        # handle() waits with time.sleep() while the key is busy.
+        return await sync_to_async(idempotency.handle)(
+            request, async_to_sync(self.get_response)
+        )
+
+
+class QueryTimer:
+    """Count and time every query run while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, status code and database usage of every request in
+    ``utils.metrics``, labelled by route name (``unmatched`` when no URL
+    pattern matched).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with observe_queries(QueryTimer()) as queries:
+            response = self.get_response(request)
+        return self.record(request, response, queries, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with observe_queries(QueryTimer()) as queries:
+            response = await self.get_response(request)
+        return self.record(request, response, queries, time.perf_counter() - start)
+
+    def record(self, request, response, queries, duration):
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        metrics.REQUEST_DURATION.observe(duration, route=route, method=request.method)
+        metrics.RESPONSES.inc(
+            route=route, method=request.method, status=response.status_code
+        )
+        metrics.DB_QUERIES.observe(queries.count, route=route)
+        metrics.DB_TIME.observe(queries.duration, route=route)
+        metrics.REGISTRY.maybe_flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Run one request under cProfile when a staff user asks for it with an
+    ``X-Profile: 1`` header or a ``profile=1`` query parameter.
+
+    The ``.prof`` file, a collapsed-stack file for flame graphs and a JSON
+    summary with per-serializer-field timings are written to
+    ``PROFILING_DIR``; the response carries their id and a short summary in
+    ``X-Profile-*`` headers. Does nothing while ``PROFILING_DIR`` is unset.
+
+    cProfile sees one thread. Under ASGI the request is profiled from the
+    thread its synchronous code and ORM calls run in; the parts of async
+    views that run on the event loop are not in the profile.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.requested(request):
+            return self.get_response(request)
+        return self.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not self.requested(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.profile)(
+            request, async_to_sync(self.get_response)
+        )
+
+    def profile(self, request, get_response):
+        directory = getattr(settings, "PROFILING_DIR", None)
+        if not (directory and self.is_staff(request)):
+            return get_response(request)
+
+        timings = FieldTimings()
+        context = field_timings.set(timings)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+            field_timings.reset(context)
+        duration = time.perf_counter() - start
+
+        summary = write_profile(profiler, timings, request, duration, directory)
+        response.headers["X-Profile-Id"] = summary["id"]
+        response.headers["X-Profile-Summary"] = (
+            f"{summary['duration_ms']}ms; {summary['calls']} calls"
+        )
+        response.headers["X-Profile-Top"] = ", ".join(
+            f"{entry['function']}={entry['own_ms']}ms"
+            for entry in summary["functions"][:3]
+        )
+        if summary["serializer_fields"]:
+            response.headers["X-Profile-Fields"] = ", ".join(
+                f"{entry['field']}={entry['ms']}ms"
+                for entry in summary["serializer_fields"][:5]
+            )
+        return response
+
+    @staticmethod
+    def requested(request):
+        return getattr(settings, "PROFILING_DIR", None) and (
+            request.headers.get("X-Profile") == "1" or request.GET.get("profile") == "1"
+        )
+
+    @staticmethod
+    def is_staff(request):
+        """Session users are known here; API clients send a JWT."""
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            try:
+                user, _ = JWTAuthentication().authenticate(request) or (None, None)
+            except Exception:
+                return False
+        return bool(user and user.is_staff)
+
+
+class SamplingProfilerMiddleware:
+    """
+    Let the background stack sampler of this worker (``utils.profiling``)
+    know which route each thread is serving. Removed from the stack unless
+    ``SAMPLING_PROFILER_DIR`` is set.
+
+    Sync only, as the sampler tracks threads: while it is enabled, Django
+    serves async views through it in a thread under ASGI as well.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SAMPLING_PROFILER_DIR", None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # The sampler thread does not survive a fork, so start it here rather
+        # than when the application is loaded.
+        routes = get_sampler().routes
+        thread_id = threading.get_ident()
+        routes[thread_id] = "unresolved"
+        try:
+            return self.get_response(request)
+        finally:
+            del routes[thread_id]
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        get_sampler().routes[threading.get_ident()] = request.resolver_match.view_name
@@ -0,0 +1,38 @@
+"""
+Request parsers to go with the renderers in ``utils.renderers``.
+"""
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses ``application/msgpack`` request bodies into the same data a JSON
+    body would give: maps, arrays, strings, numbers, booleans and nil. Binary
+    values and extension types are rejected, since JSON has no equivalent.
+    """
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False, strict_map_key=True)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+        _check_json_types(data)
+        return data
+
+
+def _check_json_types(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            _check_json_types(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_json_types(item)
+    elif not isinstance(value, (str, int, float, bool, type(None))):
+        raise ParseError(
+            f"MessagePack parse error - unsupported type {type(value).__name__}"
+        )
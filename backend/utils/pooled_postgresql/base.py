@@ -0,0 +1,257 @@
+"""
+PostgreSQL with a connection pool in each process.
+
+Django opens a connection for each request and closes it at the end, unless
+``CONN_MAX_AGE`` keeps it for the next request of the same thread. Under
+ASGI every request runs in a thread of its own, so connections are never
+reused that way. This backend hands out connections from a pool per
+database instead: ``close()`` gives the connection back, rolled back if a
+transaction was left open, and the next ``connect()`` of any thread in the
+process takes it.
+
+Set with ``"ENGINE": "utils.pooled_postgresql"`` and a ``POOL`` dict next to
+``OPTIONS`` (see ``POOL_DEFAULTS``):
+
+- ``MAX_SIZE``: connections per database and process; 0 disables the pool
+- ``TIMEOUT``: seconds to wait for a connection while all are in use
+- ``CHECK_AFTER``: idle seconds after which a connection is pinged
+  (``SELECT 1``) before being handed out; broken ones are replaced
+- ``MAX_LIFETIME``: seconds after which a connection is closed when it comes
+  back, so that connections move to a new primary after a failover
+
+Pool sizes, wait times, timeouts and health checks are recorded in
+``utils.metrics``. The pool replaces ``CONN_MAX_AGE``, which must stay 0.
+"""
+
+import atexit
+import functools
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg2 import Error, OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from utils import metrics
+
+POOL_DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10.0,
+    "CHECK_AFTER": 5.0,
+    "MAX_LIFETIME": 3600.0,
+}
+
+# (process id, alias, connection parameters) -> ConnectionPool
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Up to ``max_size`` connections, handed out by ``getconn()`` and returned
+    with ``putconn()``.
+    """
+
+    def __init__(self, name, max_size, timeout, check_after, max_lifetime):
+        self.name = name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        # Most recently returned last, to hand out warm connections first.
+        self.idle = []
+        # connection -> time.monotonic() when it was opened
+        self.opened = {}
+        # Connections being opened, counted against max_size.
+        self.opening = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def getconn(self, connect):
+        """A connection from the pool, or a new one made by ``connect()``."""
+        with metrics.DB_POOL_WAIT.time(database=self.name):
+            deadline = time.monotonic() + self.timeout
+            while True:
+                connection, returned = self._reserve(deadline)
+                if connection is None:
+                    return self._open(connect)
+                if self._healthy(connection, returned):
+                    return connection
+                self._discard(connection)
+
+    def putconn(self, connection):
+        try:
+            if (
+                not self.closed
+                and not connection.closed
+                and time.monotonic() - self.opened[connection] < self.max_lifetime
+            ):
+                if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                with self.condition:
+                    self.idle.append((connection, time.monotonic()))
+                    self.condition.notify()
+                    self._record()
+                return
+        except Error:
+            pass  # Broken while rolling back.
+        self._discard(connection)
+
+    def close(self):
+        """Close the idle connections, and the others as they come back."""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _reserve(self, deadline):
+        """An idle (connection, returned at), or (None, None) to open one."""
+        with self.condition:
+            while True:
+                if self.idle:
+                    connection, returned = self.idle.pop()
+                    self._record()
+                    return connection, returned
+                if len(self.opened) + self.opening < self.max_size:
+                    self.opening += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.DB_POOL_TIMEOUTS.inc(database=self.name)
+                    raise OperationalError(
+                        f"No connection to {self.name} became free within "
+                        f"{self.timeout:g}s ({self.max_size} in use)"
+                    )
+                self.condition.wait(remaining)
+
+    def _open(self, connect):
+        connection = None
+        try:
+            connection = connect()
+        finally:
+            with self.condition:
+                self.opening -= 1
+                if connection is not None:
+                    self.opened[connection] = time.monotonic()
+                else:
+                    self.condition.notify()
+                self._record()
+        return connection
+
+    def _healthy(self, connection, returned):
+        if connection.closed:
+            return False
+        if time.monotonic() - returned < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Error:
+            healthy = False
+        else:
+            healthy = True
+        metrics.DB_POOL_CHECKS.inc(
+            database=self.name, result="ok" if healthy else "failed"
+        )
+        return healthy
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        finally:
+            with self.condition:
+                self.opened.pop(connection, None)
+                self.condition.notify()
+                self._record()
+
+    def _record(self):
+        # Called with the condition held.
+        idle = len(self.idle)
+        metrics.DB_POOL_CONNECTIONS.set(idle, database=self.name, state="idle")
+        metrics.DB_POOL_CONNECTIONS.set(
+            len(self.opened) - idle, database=self.name, state="in_use"
+        )
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """The pool of this process for ``alias``, or None if pooling is off."""
+    options = {**POOL_DEFAULTS, **settings_dict.get("POOL", {})}
+    if alias == NO_DB_ALIAS or not options["MAX_SIZE"]:
+        return None
+    if settings_dict["CONN_MAX_AGE"]:
+        raise ImproperlyConfigured(
+            f"Database {alias!r} has a connection pool; set CONN_MAX_AGE to 0."
+        )
+    # Tests switch the database name, and forked workers need pools of their own.
+    key = (os.getpid(), alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                alias,
+                max_size=options["MAX_SIZE"],
+                timeout=options["TIMEOUT"],
+                check_after=options["CHECK_AFTER"],
+                max_lifetime=options["MAX_LIFETIME"],
+            )
+    return pool
+
+
+def close_pools(alias=None):
+    """Close the pools of this process, or those of ``alias``."""
+    with _pools_lock:
+        pools = [
+            _pools.pop(key)
+            for key in list(_pools)
+            if key[0] == os.getpid() and alias in (None, key[1])
+        ]
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Idle pooled connections would keep these from dropping or copying the
+    # test database.
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools(self.connection.alias)
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        connect = functools.partial(super().get_new_connection, conn_params)
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        if self.pool is None:
+            return connect()
+        # Set by the parent when it makes a connection, and read nowhere else;
+        # pooled connections were all made with these settings.
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", base.IsolationLevel.READ_COMMITTED
+            )
+        )
+        return self.pool.getconn(connect)
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection)
+        # Back in the pool, even if close() was called inside a transaction.
+        self.connection = None
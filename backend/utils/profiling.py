@@ -0,0 +1,293 @@
+"""
+Profiling helpers: on-demand cProfile runs of single requests (see
+``utils.middleware.ProfilingMiddleware``) and a continuous stack sampler (see
+``utils.middleware.SamplingProfilerMiddleware``).
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import pstats
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+# FieldTimings of the request being profiled, None otherwise.
+field_timings = contextvars.ContextVar("field_timings", default=None)
+
+
+class FieldTimings:
+    """Time spent producing each serializer field, nested fields included."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.seconds = Counter()
+
+    def add(self, name, seconds):
+        self.calls[name] += 1
+        self.seconds[name] += seconds
+
+    def slowest(self, limit=None):
+        """[(name, calls, seconds)], slowest first."""
+        return [
+            (name, self.calls[name], seconds)
+            for name, seconds in self.seconds.most_common(limit)
+        ]
+
+
+class FieldTimingMixin:
+    """
+    Time every field of the serializer while a request is being profiled.
+    Otherwise ``to_representation`` is the unchanged DRF one.
+    """
+
+    def to_representation(self, instance):
+        timings = field_timings.get()
+        if timings is None:
+            return super().to_representation(instance)
+
+        # Serializer.to_representation, with a timer around each field.
+        ret = {}
+        prefix = type(self).__name__
+        for field in self._readable_fields:
+            start = time.perf_counter()
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = (
+                attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            )
+            if check_for_none is None:
+                ret[field.field_name] = None
+            else:
+                ret[field.field_name] = field.to_representation(attribute)
+            timings.add(f"{prefix}.{field.field_name}", time.perf_counter() - start)
+        return ret
+
+
+def frame_name(func):
+    """``path:line:function`` of a pstats function key, paths kept short."""
+    filename, line, name = func
+    if filename == "~":  # Built-in functions
+        return name
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        filename = os.path.relpath(filename, base_dir)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    return f"{filename}:{line}:{name}".replace(";", ",")
+
+
+def collapsed_stacks(stats, max_depth=64):
+    """
+    Convert cProfile statistics to the collapsed stack format read by
+    flamegraph.pl and speedscope (``a;b;c <microseconds>`` per line).
+
+    cProfile only records caller/callee pairs, so a function's time is split
+    between its callers in proportion to the time each of them spent in it.
+    """
+    callees = defaultdict(dict)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            callees[caller][func] = edge_cumulative
+
+    stacks = Counter()
+
+    def walk(func, path, share):
+        _, _, own, cumulative, _ = stats.stats[func]
+        path = [*path, frame_name(func)]
+        stacks[";".join(path)] += own * share
+        if len(path) >= max_depth:
+            return
+        for callee, edge_cumulative in callees[func].items():
+            callee_cumulative = stats.stats[callee][3]
+            if not callee_cumulative or frame_name(callee) in path:
+                continue
+            callee_share = share * edge_cumulative / callee_cumulative
+            # Paths worth less than a microsecond are noise.
+            if callee_cumulative * callee_share >= 1e-6:
+                walk(callee, path, callee_share)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return [
+        f"{stack} {round(seconds * 1e6)}"
+        for stack, seconds in stacks.most_common()
+        if round(seconds * 1e6)
+    ]
+
+
+def write_profile(profiler, timings, request, duration, directory):
+    """
+    Write ``<id>.prof``, ``<id>.collapsed`` and ``<id>.json`` to
+    ``directory`` and return the profile id and a summary of it.
+    """
+    match = request.resolver_match
+    label = match.view_name.replace(":", "_") if match else "unmatched"
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{label}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory, profile_id)
+    os.makedirs(directory, exist_ok=True)
+
+    profiler.create_stats()
+    profiler.dump_stats(f"{path}.prof")
+    stats = pstats.Stats(profiler)
+    with open(f"{path}.collapsed", "w") as handle:
+        handle.write("\n".join(collapsed_stacks(stats)) + "\n")
+
+    slowest = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+    summary = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "duration_ms": round(duration * 1000, 1),
+        "calls": stats.total_calls,
+        "functions": [
+            {
+                "function": frame_name(func),
+                "calls": calls,
+                "own_ms": round(own * 1000, 2),
+                "cumulative_ms": round(cumulative * 1000, 2),
+            }
+            for func, (_, calls, own, cumulative, _) in slowest[:25]
+        ],
+        "serializer_fields": [
+            {"field": name, "calls": calls, "ms": round(seconds * 1000, 2)}
+            for name, calls, seconds in timings.slowest()
+        ],
+    }
+    with open(f"{path}.json", "w") as handle:
+        json.dump(summary, handle, indent=2)
+    return summary
+
+
+class StackSampler:
+    """
+    Background thread that records, ``hz`` times a second, the Python stack
+    of every thread currently serving a request.
+
+    Stacks are kept in collapsed form with the route as root frame, so one
+    flame graph shows every route side by side. Every ``flush_interval``
+    seconds the totals of this process overwrite
+    ``<directory>/<host>-<pid>.collapsed``; ``manage.py merge_profiles`` adds
+    up the files of all workers.
+    """
+
+    def __init__(self, directory, hz, flush_interval):
+        self.directory = directory
+        self.interval = 1 / hz
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self.path = os.path.join(
+            directory, f"{socket.gethostname()}-{self.pid}.collapsed"
+        )
+        # Thread id -> route of the request it is serving.
+        self.routes = {}
+        self.stacks = Counter()
+        self.frame_names = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="stack-sampler", daemon=True
+        )
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.flush()
+
+    def run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self.stopped.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def sample(self):
+        frames = sys._current_frames()
+        for thread_id, route in list(self.routes.items()):
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                name = self.frame_names.get(code)
+                if name is None:
+                    name = self.frame_names[code] = frame_name(
+                        (code.co_filename, code.co_firstlineno, code.co_name)
+                    )
+                names.append(name)
+                frame = frame.f_back
+            names.append(route)
+            stack = ";".join(reversed(names))
+            with self.lock:
+                self.stacks[stack] += 1
+
+    def flush(self):
+        with self.lock:
+            lines = [f"{stack} {count}" for stack, count in self.stacks.items()]
+        if not lines:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as handle:
+            handle.write("\n".join(lines) + "\n")
+        os.replace(temporary, self.path)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """The sampler of this process, started on first use after a fork."""
+    global _sampler
+    if _sampler is None or _sampler.pid != os.getpid():
+        with _sampler_lock:
+            if _sampler is None or _sampler.pid != os.getpid():
+                _sampler = StackSampler(
+                    settings.SAMPLING_PROFILER_DIR,
+                    hz=settings.SAMPLING_PROFILER_HZ,
+                    flush_interval=settings.SAMPLING_PROFILER_FLUSH_INTERVAL,
+                )
+                _sampler.start()
+    return _sampler
+
+
+def merge_collapsed(paths, route=None):
+    """
+    Add up the collapsed stacks in ``paths``. With ``route``, keep only that
+    route's stacks and drop the route frame.
+    """
+    stacks = Counter()
+    for path in paths:
+        with open(path) as handle:
+            for line in handle:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if not stack or not count.isdigit():
+                    continue
+                if route is not None:
+                    root, _, stack = stack.partition(";")
+                    if root != route or not stack:
+                        continue
+                stacks[stack] += int(count)
+    return stacks
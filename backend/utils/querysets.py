@@ -0,0 +1,12 @@
+def union_of(queryset, *branches):
+    """
+    Restrict ``queryset`` to the rows matched by any of ``branches``.
+
+    ``Q(a) | Q(b)`` across a join cannot be answered from either side's index,
+    so Postgres falls back to scanning the whole table. Each branch here is
+    reduced to a primary key lookup and the branches are combined with UNION,
+    letting every branch use its own index. The result is still a regular
+    queryset, so filters, search, ordering and pagination keep working.
+    """
+    keys = [branch.order_by().values("pk") for branch in branches]
+    return queryset.filter(pk__in=keys[0].union(*keys[1:]))
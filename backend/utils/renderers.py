@@ -0,0 +1,87 @@
+"""
+API renderers: JSON backed by orjson, and MessagePack.
+
+JSON
+----
+
+``FastJSONRenderer`` returns the same bytes as ``JSONRenderer`` for everything
+the API sends: strings, numbers, dicts and lists from serializers, plus the
+raw values views put in ``api_response`` data. orjson encodes datetimes,
+dates, times and UUIDs natively. ``DecimalField`` output, such as bike
+prices, is already a string. Other values, such as the ``Decimal`` from an
+``Avg`` aggregate or lazy translations, go through DRF's encoder, so they are
+rendered exactly as before.
+
+DRF's renderer is used when orjson is not installed, for indented output
+(the browsable API), when ``UNICODE_JSON`` or ``COMPACT_JSON`` are off, and
+for data orjson cannot encode, such as integers over 64 bits.
+
+MessagePack
+-----------
+``MessagePackRenderer`` serves ``application/msgpack`` to clients that ask
+for it in ``Accept`` (or with ``?format=msgpack``). Values are converted the
+way the JSON renderers convert them, so a MessagePack body unpacks to the
+same data as the JSON body parses to: datetimes, dates and UUIDs are ISO
+8601 strings, ``DecimalField`` values stay strings and raw ``Decimal``
+values become floats.
+"""
+
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSONRenderer escapes these so the output is also valid JavaScript.
+_LINE_SEPARATOR = "\u2028".encode()
+_PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+# Values orjson cannot encode natively are converted as JSONRenderer does.
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes with orjson when it can."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Let json report the error, or encode what orjson cannot.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if _LINE_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b"\\u2028")
+        if _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_PARAGRAPH_SEPARATOR, b"\\u2029")
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders ``application/msgpack``; see the module docstring."""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, datetime=False)
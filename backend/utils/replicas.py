@@ -0,0 +1,189 @@
+"""
+Routing safe reads to read replicas of the ``default`` database.
+
+Views opt in with ``replica_reads = True``. For GET, HEAD and OPTIONS
+requests to them, ``ReplicaMiddleware`` (``utils.middleware``) lets
+``ReplicaRouter`` send reads to one of the ``DATABASE_REPLICAS``, picked at
+random per request. Everything else reads from the primary:
+
+- code outside such a request: unsafe requests, commands and jobs;
+- reads inside a transaction on the primary, such as ``select_for_update``;
+- reads after the request wrote, so that it sees its own writes;
+- requests of a user who wrote in the last ``DB_REPLICA_PIN_SECONDS``, so
+  that reading your own new booking does not race replication;
+- while every replica is unreachable or more than ``DB_REPLICA_MAX_LAG``
+  seconds behind. Each process checks a replica at most every
+  ``DB_REPLICA_CHECK_INTERVAL`` seconds.
+
+Pins are kept in the ``default`` cache, which must be one that every worker
+process shares: settings refuse replicas with the per-process ``locmem``
+cache (see ``CACHE_BACKEND``).
+
+Replicas are copies of the primary, so the router allows every migration
+everywhere; ``migrate`` is only ever run against ``default``.
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, router
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics
+from .authentication import JWTClaimsAuthentication
+
+logger = logging.getLogger(__name__)
+
+# How far behind the primary a replica is. An idle primary writes no WAL, so
+# a replica that has replayed everything it received is not behind, however
+# old its last replayed transaction.
+_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+# alias -> (time.monotonic() of the check, usable)
+_checks = {}
+
+_scope = ContextVar("replica_scope", default=None)
+
+
+class ReplicaScope:
+    """Where the reads of one request go: ``database``, None for the primary."""
+
+    def __init__(self):
+        self.database = None
+
+    def use_replica(self):
+        self.database = choose_replica()
+
+    def use_primary(self):
+        self.database = None
+
+
+@contextmanager
+def replica_scope():
+    """
+    Open the scope of one request; reads go to the primary until
+    ``use_replica()`` is called on the yielded ``ReplicaScope``.
+    """
+    scope = ReplicaScope()
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def replica_lag(alias):
+    """Seconds the replica ``alias`` is behind the primary."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    # Nothing replayed yet.
+    return float("inf") if lag is None else float(lag)
+
+
+def is_usable(alias):
+    """Whether ``alias`` answered its last lag check and was close enough."""
+    now = time.monotonic()
+    checked = _checks.get(alias)
+    if checked and now - checked[0] < settings.DB_REPLICA_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError:
+        logger.warning("Replica %s is unreachable", alias, exc_info=True)
+        usable = False
+    else:
+        usable = lag <= settings.DB_REPLICA_MAX_LAG
+        if not usable:
+            logger.warning("Replica %s is %.1fs behind", alias, lag)
+    _checks[alias] = (now, usable)
+    return usable
+
+
+def choose_replica():
+    """A usable replica at random, or None to read from the primary."""
+    usable = [
+        alias
+        for alias in getattr(settings, "DATABASE_REPLICAS", ())
+        if is_usable(alias)
+    ]
+    return random.choice(usable) if usable else None
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Read from the primary for ``user_id`` for ``DB_REPLICA_PIN_SECONDS``."""
+    cache.set(_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    pinned = cache.get(_pin_key(user_id)) is not None
+    metrics.record_cache_lookup("replica_pins", pinned)
+    return pinned
+
+
+def token_user_id(request):
+    """
+    The user id in the access token of ``request``, without reading the
+    database, or None when there is no valid token.
+    """
+    authentication = JWTClaimsAuthentication()
+    try:
+        header = authentication.get_header(request)
+        raw_token = (
+            authentication.get_raw_token(header) if header else None
+        ) or request.GET.get("token")
+        if not raw_token:
+            return None
+        token = authentication.get_validated_token(raw_token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def using_read_database(queryset):
+    """
+    ``queryset`` bound to the database its reads go to now. For querysets
+    read after the response leaves the view, such as streamed exports.
+    """
+    return queryset.using(router.db_for_read(queryset.model))
+
+
+class ReplicaRouter:
+    """Send the reads of a replica scope to its replica; see the module."""
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or scope.database is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return scope.database
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.use_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, "DATABASE_REPLICAS", ())}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
@@ -0,0 +1,278 @@
+"""
+Read-only serializers that build their output from ``.values()`` rows.
+
+A ``ValuesSerializer`` mirrors a DRF ``ModelSerializer`` (its
+``serializer_class``) and produces exactly the same data for it, without
+creating model instances or going through DRF's per-field machinery:
+
+- the field list and order are taken from the DRF serializer, and each
+  field is compiled once into a getter that reads the row
+- nested serializers for foreign keys are read from the same row through a
+  join; ``many=True`` nested serializers for reverse foreign keys are loaded
+  with one query per page
+- ``SerializerMethodField`` ``foo`` calls ``get_foo(row, prefix)`` on the
+  values serializer; the queries for whatever those need are yielded by
+  ``queries(rows)``, which ``prepare(rows)`` runs, or ``aprepare(rows)`` with
+  the async ORM when async views call ``aserialize()``
+
+Use it on list endpoints where serialization dominates; the DRF serializer
+stays the reference for writes, schemas and single objects.
+"""
+
+from operator import itemgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns database values unchanged.
+_UNCHANGED = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+
+def _converting_getter(key, convert):
+    def get(row):
+        value = row[key]
+        return None if value is None else convert(value)
+
+    return get
+
+
+def _datetime_getter(key, field):
+    # DateTimeField.to_representation for ISO 8601 output, with the time zone
+    # looked up once per serializer rather than once per value.
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if hasattr(field, "timezone"):
+        timezone = field.timezone
+    else:
+        timezone = field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or timezone is None:
+        return _converting_getter(key, field.to_representation)
+
+    def get(row):
+        value = row[key]
+        if not value:
+            return None
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(timezone).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return get
+
+
+class ValuesSerializer:
+    """Base class; see the module docstring."""
+
+    serializer_class = None
+    # Field name -> ValuesSerializer subclass for every nested serializer.
+    nested = {}
+
+    _compiled = {}
+
+    def __init__(self, context=None, prefix=""):
+        self.context = context or {}
+        self.request = self.context.get("request")
+        self.prefix = prefix
+        self.model = self.serializer_class.Meta.model
+        self.pk_key = prefix + self.model._meta.pk.attname
+        self.columns = [self.pk_key]
+        self.getters = []
+        self.joined = []
+        self.children = []
+        self.file_urls = {}
+        for name, kind, field in self._fields():
+            self.getters.append((name, self._getter(name, kind, field)))
+
+    @classmethod
+    def _fields(cls):
+        """(name, kind, field) of every readable field, compiled once per class."""
+        if cls not in ValuesSerializer._compiled:
+            fields = []
+            for field in cls.serializer_class()._readable_fields:
+                name = field.field_name
+                if isinstance(field, serializers.SerializerMethodField):
+                    kind = "method"
+                elif isinstance(field, serializers.ListSerializer):
+                    kind = "children"
+                elif isinstance(field, serializers.BaseSerializer):
+                    kind = "joined"
+                elif isinstance(field, serializers.FileField):
+                    kind = "file"
+                elif isinstance(field, serializers.DateTimeField):
+                    kind = "datetime"
+                elif isinstance(field, _UNCHANGED) or (
+                    isinstance(field, serializers.JSONField) and not field.binary
+                ):
+                    kind = "column"
+                else:
+                    kind = "convert"
+                if kind in ("children", "joined") and name not in cls.nested:
+                    raise ImproperlyConfigured(
+                        f"{cls.__name__}.nested has no serializer for {name!r}"
+                    )
+                if kind not in ("method", "children", "joined") and (
+                    field.source != name
+                ):
+                    raise ImproperlyConfigured(
+                        f"{cls.__name__} cannot read {name!r} from {field.source!r}"
+                    )
+                fields.append((name, kind, field))
+            ValuesSerializer._compiled[cls] = fields
+        return ValuesSerializer._compiled[cls]
+
+    def _getter(self, name, kind, field):
+        key = self.prefix + name
+        if kind == "method":
+            method = getattr(self, f"get_{name}")
+            prefix = self.prefix
+            return lambda row: method(row, prefix)
+        if kind == "joined":
+            nested = self.nested[name](self.context, prefix=f"{key}__")
+            self.columns.extend(nested.columns)
+            self.joined.append(nested)
+            to_representation = nested.to_representation
+            pk_key = nested.pk_key
+            return lambda row: None if row[pk_key] is None else to_representation(row)
+        if kind == "children":
+            child = self.nested[name](self.context)
+            relation = self.model._meta.get_field(name)
+            grouped = {}
+            self.children.append((child, relation.field.attname, grouped))
+            to_representation = child.to_representation
+            pk_key = self.pk_key
+            return lambda row: [
+                to_representation(child_row)
+                for child_row in grouped.get(row[pk_key], ())
+            ]
+
+        if key != self.pk_key:
+            self.columns.append(key)
+        if kind == "file":
+            storage = self.model._meta.get_field(name).storage
+            return lambda row: self.file_url(storage, row[key])
+        if kind == "datetime":
+            return _datetime_getter(key, field)
+        if kind == "column":
+            return itemgetter(key)
+        return _converting_getter(key, field.to_representation)
+
+    def file_url(self, storage, name):
+        """``FileField`` output for the stored file ``name``."""
+        if not name:
+            return None
+        url = self.file_urls.get(name)
+        if url is None:
+            url = storage.url(name)
+            if self.request is not None:
+                url = self.request.build_absolute_uri(url)
+            self.file_urls[name] = url
+        return url
+
+    def rows(self, queryset):
+        """
+        The ``.values()`` rows this serializer reads, for ``queryset``.
+        Paginators count ``queryset`` itself, without the joins.
+        """
+        return Rows(queryset, self.values(queryset))
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def prepare(self, rows):
+        """Load what the rows of one page need besides the rows themselves."""
+        queries = self.queries(rows)
+        loaded = None
+        while True:
+            try:
+                query = queries.send(loaded)
+            except StopIteration:
+                return
+            loaded = list(query)
+
+    async def aprepare(self, rows):
+        """``prepare()`` with the async ORM, for async views."""
+        queries = self.queries(rows)
+        loaded = None
+        while True:
+            try:
+                query = queries.send(loaded)
+            except StopIteration:
+                return
+            loaded = [row async for row in query]
+
+    def queries(self, rows):
+        """
+        Generator of the querysets that ``rows`` need. ``prepare()`` or
+        ``aprepare()`` runs each one and sends its rows back. Subclasses that
+        load more extend it.
+        """
+        for nested in self.joined:
+            yield from nested.queries(
+                [row for row in rows if row[nested.pk_key] is not None]
+            )
+        if not self.children:
+            return
+        ids = {row[self.pk_key] for row in rows}
+        for child, fk, grouped in self.children:
+            grouped.clear()
+            child_rows = yield child.model._default_manager.filter(
+                **{f"{fk}__in": ids}
+            ).values(fk, *child.columns)
+            yield from child.queries(child_rows)
+            for row in child_rows:
+                grouped.setdefault(row[fk], []).append(row)
+
+    def to_representation(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def serialize(self, rows):
+        """Serialized data of ``rows``, like ``serializer_class(many=True).data``."""
+        rows = list(rows)
+        if rows:
+            self.prepare(rows)
+        return [self.to_representation(row) for row in rows]
+
+    async def aserialize(self, rows):
+        """``serialize()`` for async views; ``rows`` is a list or a queryset."""
+        if not isinstance(rows, list):
+            rows = [row async for row in rows]
+        if rows:
+            await self.aprepare(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class Rows:
+    """
+    ``.values()`` rows that paginate like the queryset they were built from:
+    ``count()`` runs on ``queryset``, slicing and iterating on ``values``.
+    """
+
+    def __init__(self, queryset, values):
+        self.queryset = queryset
+        self.values = values
+
+    @property
+    def ordered(self):
+        return self.values.ordered
+
+    def count(self):
+        return self.queryset.count()
+
+    async def acount(self):
+        return await self.queryset.acount()
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
@@ -0,0 +1,30 @@
+"""
+Streaming responses for both WSGI and ASGI servers.
+
+Django serves a ``StreamingHttpResponse`` built on a synchronous iterator
+under ASGI by reading the whole iterator into a list in a thread first, and
+one built on an asynchronous iterator under WSGI by reading it into a list on
+an event loop. Either way the body sits in memory before the first byte is
+sent. A ``DualStreamingHttpResponse`` carries one iterator of each kind, and
+each server streams the one it can.
+"""
+
+from contextlib import aclosing
+
+from django.http import StreamingHttpResponse
+
+
+class DualStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Streams ``streaming_content`` under WSGI and ``async_streaming_content``
+    under ASGI. The two must yield the same bytes; only one is consumed.
+    """
+
+    def __init__(self, streaming_content, async_streaming_content, *args, **kwargs):
+        super().__init__(streaming_content, *args, **kwargs)
+        self.async_streaming_content = async_streaming_content
+
+    async def __aiter__(self):
+        async with aclosing(self.async_streaming_content) as content:
+            async for part in content:
+                yield self.make_bytes(part)
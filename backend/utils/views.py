@@ -0,0 +1,78 @@
+"""
+API views whose handlers can be coroutines.
+
+DRF's ``APIView`` dispatches synchronously. ``AsyncAPIView`` dispatches on
+the event loop when served over ASGI (``backend.asgi``): ``async def``
+handlers are awaited and read the database with Django's async ORM, while
+authentication, permissions, throttling and plain handlers run through
+``sync_to_async`` as Django runs synchronous views. Responses, errors and
+rendering are DRF's, so clients cannot tell the difference.
+"""
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """An ``APIView`` that may mix ``async def`` and plain handlers."""
+
+    # Django's View requires every handler to be of the same kind.
+    view_is_async = True
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """``APIView.dispatch``, awaiting async handlers."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication looks the user up.
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = self.http_method_not_allowed
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), handler)
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """``PageNumberPagination`` with ``apaginate_queryset`` for async views."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset``, counting and reading with the async ORM."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Counted here so that paginator.page() does not count synchronously.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        return [item async for item in self.page.object_list]
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import WebhookEndpoint
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ("url", "owner", "is_active", "failures", "delivered_at")
+    list_filter = ("is_active",)
+    search_fields = ("url", "owner__email")
+    raw_id_fields = ("owner",)
+    readonly_fields = (
+        "cursor_txid",
+        "cursor_id",
+        "failures",
+        "retry_at",
+        "last_error",
+        "created_at",
+        "delivered_at",
+    )
+    actions = ["enable"]
+
+    @admin.action(description="Enable and retry now")
+    def enable(self, request, queryset):
+        queryset.update(is_active=True, failures=0, retry_at=timezone.now())
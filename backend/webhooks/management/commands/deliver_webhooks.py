@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from utils import metrics
+from webhooks.services import deliver_webhooks
+
+
+class Command(BaseCommand):
+    help = (
+        "Send booking events to partner webhooks; runs until stopped, or with "
+        "--once until no endpoint has new events"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit when nothing is left to send"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.WEBHOOK_POLL_INTERVAL,
+            help="Seconds to wait while no endpoint has new events",
+        )
+
+    def handle(self, *args, **options):
+        delivered = 0
+        while True:
+            # Drops connections that broke while the worker slept.
+            close_old_connections()
+            count = deliver_webhooks()
+            delivered += count
+            metrics.REGISTRY.maybe_flush()
+            if count:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+        self.stdout.write(f"Delivered {delivered} events")
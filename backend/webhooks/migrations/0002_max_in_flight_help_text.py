@@ -0,0 +1,21 @@
+# Generated by Django 5.0.10 on 2026-10-19 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webhooks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="webhookendpoint",
+            name="max_in_flight",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text="Batches sent to the endpoint at the same time. Above 1, batches can arrive out of order and the receiver must sort events by id.",
+            ),
+        ),
+    ]
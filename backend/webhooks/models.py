@@ -0,0 +1,70 @@
+import secrets
+
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+from utils.db import snapshot_xmin
+
+
+def new_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A partner URL that receives booking events as signed, batched POSTs from
+    ``manage.py deliver_webhooks`` (see ``webhooks.services``).
+
+    The endpoint keeps a cursor into ``BookingEvent``, in commit order, and
+    starts with the events written after it was created. With an ``owner``,
+    it receives only the events of that owner's bikes. Failed deliveries are
+    retried at ``retry_at``; after ``WEBHOOK_MAX_ATTEMPTS`` failures in a row
+    the endpoint is disabled until it is enabled again from the admin.
+    """
+
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=new_secret)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="webhook_endpoints",
+        help_text="Only send the events of this owner's bikes; all if blank.",
+    )
+    max_in_flight = models.PositiveSmallIntegerField(
+        default=1,
+        help_text=(
+            "Batches sent to the endpoint at the same time. Above 1, batches "
+            "can arrive out of order and the receiver must sort events by id."
+        ),
+    )
+    is_active = models.BooleanField(default=True)
+    # The last event delivered, as (txid, id); see utils.db.
+    cursor_txid = models.BigIntegerField(default=0)
+    cursor_id = models.BigIntegerField(default=0)
+    failures = models.PositiveSmallIntegerField(default=0)
+    retry_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["retry_at"],
+                name="webhook_active_retry_at",
+                condition=Q(is_active=True),
+            ),
+        ]
+
+    def __str__(self):
+        return self.url
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.cursor_txid:
+            # Every event of an older transaction was written before now.
+            self.cursor_txid = snapshot_xmin()
+        super().save(*args, **kwargs)
@@ -0,0 +1,254 @@
+"""
+Booking events sent to partner webhooks.
+
+``BookingEvent`` rows are the outbox: each is written in the transaction that
+changes the booking (``bookings.events`` and the status sweep in
+``bookings.services``), so an event is sent if and only if its change
+committed. ``manage.py deliver_webhooks`` runs ``deliver_webhooks`` in a
+loop. Each endpoint is claimed with ``SKIP LOCKED``, so one worker at a time
+sends to it, while other workers take other endpoints. The events after the
+endpoint's cursor are read in commit order (see ``utils.db``) and POSTed in
+batches of ``WEBHOOK_BATCH_SIZE``, at most ``max_in_flight`` of them at once.
+
+The claim is a short transaction that leases the endpoint for
+``WEBHOOK_LEASE`` seconds by moving its ``retry_at``. The batches are POSTed
+with no transaction open, since an open one would hold back the snapshot
+xmin that these reads depend on, and the cursor is saved afterwards. A
+worker that dies leaves the endpoint due again when the lease ends.
+
+The cursor moves past the accepted batches up to the first one that failed.
+The endpoint is then retried after ``WEBHOOK_RETRY_BACKOFF`` seconds, doubled
+on every further failure in a row, and disabled after
+``WEBHOOK_MAX_ATTEMPTS``. Delivery is at least once: batches sent after a
+failed one are sent again, so receivers skip event ids they have seen. It is
+in order only with ``max_in_flight`` at 1. Batches sent at once can arrive in
+any order, so their receivers sort events by id. Events are pruned after ``BOOKING_EVENT_RETENTION_DAYS`` whether or not
+they were delivered.
+
+Every request is signed with the endpoint's secret::
+
+    X-BoltBike-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bookings.models import BookingEvent
+from utils.db import snapshot_xmin
+from utils.metrics import JOB_DURATION, WEBHOOK_DELAY, WEBHOOK_REQUESTS
+
+from .models import WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-BoltBike-Signature"
+
+EVENT_FIELDS = (
+    "id",
+    "booking_id",
+    "bike_id",
+    "status",
+    "previous_status",
+    "created_at",
+)
+
+SAVED_FIELDS = (
+    "is_active",
+    "cursor_txid",
+    "cursor_id",
+    "failures",
+    "retry_at",
+    "last_error",
+    "delivered_at",
+)
+
+
+def sign(secret, body, timestamp=None):
+    """The signature header value of ``body``, sent at ``timestamp``."""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    digest = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret, body, header, tolerance=300, now=None):
+    """
+    Whether ``header`` signs ``body`` with ``secret`` and was made less than
+    ``tolerance`` seconds ago, as a receiver should check it.
+    """
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    now = time.time() if now is None else now
+    if abs(now - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, timestamp), header)
+
+
+def to_payload(rows):
+    """The request body for a batch of event rows."""
+    events = [
+        {
+            "id": row["id"],
+            "type": f"booking.{row['status']}",
+            "booking_id": row["booking_id"],
+            "bike_id": row["bike_id"],
+            "status": row["status"],
+            "previous_status": row["previous_status"] or None,
+            "created_at": row["created_at"].isoformat().replace("+00:00", "Z"),
+        }
+        for row in rows
+    ]
+    return json.dumps({"events": events}, separators=(",", ":")).encode()
+
+
+def retry_delay(failures):
+    """How long to wait after the ``failures``-th failed delivery in a row."""
+    return timedelta(seconds=settings.WEBHOOK_RETRY_BACKOFF * 2 ** (failures - 1))
+
+
+def pending_events(endpoint, xmin, limit):
+    """
+    Up to ``limit`` events after ``endpoint``'s cursor, in commit order, from
+    transactions older than ``xmin``.
+    """
+    events = BookingEvent.objects.filter(txid__lt=xmin).filter(
+        Q(txid__gt=endpoint.cursor_txid)
+        | Q(txid=endpoint.cursor_txid, id__gt=endpoint.cursor_id)
+    )
+    if endpoint.owner_id is not None:
+        events = events.filter(bike__owner_id=endpoint.owner_id)
+    return list(events.order_by("txid", "id").values("txid", *EVENT_FIELDS)[:limit])
+
+
+def _post(endpoint, rows):
+    """Send one batch; returns None when it was accepted, else the error."""
+    body = to_payload(rows)
+    try:
+        response = requests.post(
+            endpoint.url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign(endpoint.secret, body),
+            },
+            timeout=settings.WEBHOOK_TIMEOUT,
+            allow_redirects=False,
+        )
+    except requests.RequestException as exc:
+        WEBHOOK_REQUESTS.inc(result="failed")
+        return f"{type(exc).__name__}: {exc}"
+    if not 200 <= response.status_code < 300:
+        WEBHOOK_REQUESTS.inc(result="failed")
+        return f"HTTP {response.status_code}"
+    WEBHOOK_REQUESTS.inc(result="sent")
+    return None
+
+
+def deliver_next(exclude=(), now=None):
+    """
+    Claim a due endpoint not in ``exclude`` and send it its new events.
+    Returns (endpoint, events delivered), or None when no endpoint is due.
+    """
+    now = now or timezone.now()
+    batch_size = settings.WEBHOOK_BATCH_SIZE
+    with JOB_DURATION.time(job="webhook_delivery"):
+        claimed = _claim(exclude, now)
+        if claimed is None:
+            return None
+        endpoint, rows, lease = claimed
+        if not rows:
+            return endpoint, 0
+        batches = [rows[i : i + batch_size] for i in range(0, len(rows), batch_size)]
+        with ThreadPoolExecutor(
+            max_workers=min(endpoint.max_in_flight, len(batches))
+        ) as pool:
+            errors = list(pool.map(lambda batch: _post(endpoint, batch), batches))
+        delivered = []
+        for batch, error in zip(batches, errors):
+            if error is not None:
+                break
+            delivered.extend(batch)
+        _record(endpoint, delivered, next(filter(None, errors), None), now)
+        # Unless the lease ran out and another worker took the endpoint over.
+        saved = WebhookEndpoint.objects.filter(pk=endpoint.pk, retry_at=lease).update(
+            **{field: getattr(endpoint, field) for field in SAVED_FIELDS}
+        )
+        if not saved:
+            logger.warning("Lease on webhook endpoint %s ran out", endpoint.pk)
+    return endpoint, len(delivered)
+
+
+def _claim(exclude, now):
+    """
+    Lease a due endpoint not in ``exclude`` if it has new events. Returns
+    (endpoint, event rows, end of the lease), or None when none is due.
+    """
+    batch_size = settings.WEBHOOK_BATCH_SIZE
+    with transaction.atomic():
+        # Taken before the claim below, which starts a transaction id of ours.
+        xmin = snapshot_xmin()
+        endpoint = (
+            WebhookEndpoint.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, retry_at__lte=now)
+            .exclude(pk__in=exclude)
+            .order_by("retry_at", "pk")
+            .first()
+        )
+        if endpoint is None:
+            return None
+        rows = pending_events(endpoint, xmin, batch_size * endpoint.max_in_flight)
+        lease = now + timedelta(seconds=settings.WEBHOOK_LEASE)
+        if rows:
+            WebhookEndpoint.objects.filter(pk=endpoint.pk).update(retry_at=lease)
+    return endpoint, rows, lease
+
+
+def _record(endpoint, delivered, error, now):
+    if delivered:
+        endpoint.cursor_txid = delivered[-1]["txid"]
+        endpoint.cursor_id = delivered[-1]["id"]
+        endpoint.delivered_at = timezone.now()
+        for row in delivered:
+            WEBHOOK_DELAY.observe(
+                (endpoint.delivered_at - row["created_at"]).total_seconds()
+            )
+    if error is None:
+        endpoint.failures = 0
+        endpoint.last_error = ""
+        return
+    endpoint.failures += 1
+    endpoint.last_error = error
+    if endpoint.failures >= settings.WEBHOOK_MAX_ATTEMPTS:
+        logger.error("Disabling webhook endpoint %s: %s", endpoint.pk, error)
+        endpoint.is_active = False
+    else:
+        endpoint.retry_at = now + retry_delay(endpoint.failures)
+
+
+def deliver_webhooks(now=None):
+    """
+    Send the new events of every due endpoint once; returns how many events
+    were delivered.
+    """
+    done = set()
+    delivered = 0
+    while (claimed := deliver_next(exclude=done, now=now)) is not None:
+        endpoint, count = claimed
+        done.add(endpoint.pk)
+        delivered += count
+    return delivered